@@ -22,8 +22,22 @@ utils_csv_path = os.path.join(orquestacion_dir, "utils_csv.py")
 dashboard_embargos_path = os.path.join(dashboards_dir, "dashboard_embargos.py")
 dashboard_predicciones_path = os.path.join(dashboards_dir, "dashboard_predicciones.py")
 dashboard_styles_path = os.path.join(dashboards_dir, "dashboard_styles.py")
+motor_filtros_path = os.path.join(dashboards_dir, "motor_filtros.py")
+datos_embargos_path = os.path.join(dashboards_dir, "datos_embargos.py")
+agregados_embargos_path = os.path.join(dashboards_dir, "agregados_embargos.py")
+busqueda_embargos_path = os.path.join(dashboards_dir, "busqueda_embargos.py")
+datos_graficos_path = os.path.join(dashboards_dir, "datos_graficos.py")
+exportacion_embargos_path = os.path.join(dashboards_dir, "exportacion_embargos.py")
+paginacion_embargos_path = os.path.join(dashboards_dir, "paginacion_embargos.py")
+geografia_embargos_path = os.path.join(dashboards_dir, "geografia_embargos.py")
+municipios_dane_path = os.path.join(dashboards_dir, "municipios_dane.csv")
+ciclo_vida_embargos_path = os.path.join(dashboards_dir, "ciclo_vida_embargos.py")
 procesar_modelo_path = os.path.join(pipeline_ml_dir, "procesar_modelo.py")
+etapas_pipeline_path = os.path.join(pipeline_ml_dir, "etapas_pipeline.py")
+perfilado_path = os.path.join(pipeline_ml_dir, "perfilado.py")
 icon_path = os.path.join(project_root, "ob.ico")
+# Opcional: geometrías de municipios para la coropleta (sin ellas el mapa es de burbujas)
+municipios_geojson_path = os.path.join(dashboards_dir, "municipios_colombia.geojson")
 
 # Verificar que existen los archivos necesarios
 required_files = {
@@ -32,7 +46,19 @@ required_files = {
     "dashboard_embargos.py": dashboard_embargos_path,
     "dashboard_predicciones.py": dashboard_predicciones_path,
     "dashboard_styles.py": dashboard_styles_path,
+    "motor_filtros.py": motor_filtros_path,
+    "datos_embargos.py": datos_embargos_path,
+    "agregados_embargos.py": agregados_embargos_path,
+    "busqueda_embargos.py": busqueda_embargos_path,
+    "datos_graficos.py": datos_graficos_path,
+    "exportacion_embargos.py": exportacion_embargos_path,
+    "paginacion_embargos.py": paginacion_embargos_path,
+    "geografia_embargos.py": geografia_embargos_path,
+    "municipios_dane.csv": municipios_dane_path,
+    "ciclo_vida_embargos.py": ciclo_vida_embargos_path,
     "procesar_modelo.py": procesar_modelo_path,
+    "etapas_pipeline.py": etapas_pipeline_path,
+    "perfilado.py": perfilado_path,
 }
 
 print("[INFO] Verificando archivos fuente...")
@@ -62,7 +88,19 @@ args = [
     f"--add-data={dashboard_embargos_path};.",
     f"--add-data={dashboard_predicciones_path};.",
     f"--add-data={dashboard_styles_path};.",
+    f"--add-data={motor_filtros_path};.",
+    f"--add-data={datos_embargos_path};.",
+    f"--add-data={agregados_embargos_path};.",
+    f"--add-data={busqueda_embargos_path};.",
+    f"--add-data={datos_graficos_path};.",
+    f"--add-data={exportacion_embargos_path};.",
+    f"--add-data={paginacion_embargos_path};.",
+    f"--add-data={geografia_embargos_path};.",
+    f"--add-data={municipios_dane_path};.",
+    f"--add-data={ciclo_vida_embargos_path};.",
     f"--add-data={procesar_modelo_path};.",
+    f"--add-data={etapas_pipeline_path};.",
+    f"--add-data={perfilado_path};.",
     f"--add-data={utils_csv_path};.",
     # Imports ocultos necesarios
     "--hidden-import=streamlit",
@@ -80,6 +118,11 @@ args = [
     "--hidden-import=openpyxl.workbook",
     "--hidden-import=openpyxl.worksheet",
     "--hidden-import=openpyxl.cell",
+    "--hidden-import=xlsxwriter",
+    "--hidden-import=pyarrow",
+    "--hidden-import=pyarrow.feather",
+    "--hidden-import=pyarrow.parquet",
+    "--hidden-import=pyarrow.ipc",
     # Incluir todos los módulos de librerías grandes
     "--collect-all=streamlit",
     "--collect-all=plotly",
@@ -96,6 +139,10 @@ else:
     args.append("--icon=NONE")
     print("[ADVERTENCIA] No se encontro ob.ico. El ejecutable usara el icono por defecto.")
 
+if os.path.exists(municipios_geojson_path):
+    args.append(f"--add-data={municipios_geojson_path};.")
+    print(f"  [OK] municipios_colombia.geojson: {municipios_geojson_path}")
+
 # Agregar DLLs de XGBoost manualmente si es necesario
 try:
     import xgboost
@@ -0,0 +1,687 @@
+"""
+Agregados del dashboard de embargos, calculados bajo demanda por pestaña.
+
+Cada agregado es una función pura sobre la vista filtrada (`VistaFiltrada`) que
+devuelve un resultado pequeño (conteos, series mensuales, métricas) listo para
+graficar. `AGREGADOS_POR_PESTANA` declara qué agregados usa cada pestaña: solo
+se calculan los de la pestaña visible y, dentro de ella, solo los que se
+piden. El dashboard memoiza cada resultado por (datos, filtros, búsqueda,
+agregado), así que cambiar de pestaña o volver a una combinación de filtros
+no repite cálculos.
+"""
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ciclo_vida_embargos import CicloVida
+from datos_graficos import histograma
+from motor_filtros import IndiceFiltros, VistaFiltrada, contar_categorias
+
+# Puestos por mes que calcula `top_por_mes` (el mapa de calor muestra hasta este número)
+TOP_POR_MES = 20
+
+# Filtros de pocos valores por cuya combinación se precalculan las métricas
+# (`ParcialesMetricas`); ciudad, con cientos de valores, queda fuera
+DIMENSIONES_METRICAS = ('banco', 'estado', 'tipo', 'tipo_documento', 'mes')
+# Clave de los bosquejos de la distribución de montos (`BosquejoMontos`): mes × banco
+DIMENSIONES_MONTOS = ('mes', 'banco')
+
+
+def _es_activo(categorias: pd.Series) -> pd.Series:
+    """Estados 'Activo' (como en versión anterior: df_filt[df_filt['estado_embargo']=='Activo']) sin importar mayúsculas."""
+    return categorias.astype(str).str.strip().str.lower() == 'activo'
+
+
+def _clientes_por_fila(serie: pd.Series) -> pd.Series:
+    """1 por cada fila de cliente: `es_cliente` numérico tal cual; si es texto, SI/CLIENTE."""
+    if serie.dtype in ['int8', 'int16', 'int32', 'int64', 'float32', 'float64']:
+        return serie.fillna(0)
+    return serie.astype(str).str.contains('SI|CLIENTE', case=False, na=False).astype('int64')
+
+
+def metricas(vista: VistaFiltrada) -> Dict:
+    """Métricas principales (KPIs del resumen ejecutivo)."""
+    if vista.empty:
+        return {}
+
+    total = len(vista)
+
+    # Operaciones vectorizadas optimizadas
+    monto_total = 0.0
+    monto_promedio = 0.0
+    if 'montoaembargar' in vista.columns:
+        # Acumular en float64: la columna es float32 y sumarla en float32 pierde los últimos dígitos
+        montos = vista['montoaembargar'].astype('float64')
+        monto_total = float(montos.sum())
+        monto_promedio = float(montos.mean())
+
+    activos = 0
+    if 'estado_embargo' in vista.columns:
+        # La comparación se hace sobre las categorías únicas
+        activos = contar_categorias(vista['estado_embargo'], _es_activo)
+
+    clientes = 0
+    if 'es_cliente' in vista.columns:
+        clientes = int(_clientes_por_fila(vista['es_cliente']).sum())
+
+    # Calcular métricas adicionales de oficios
+    meses_unicos = vista['mes'].nunique() if 'mes' in vista.columns else 0
+
+    # Embargos judiciales
+    embargos_judiciales = 0
+    embargos_coactivos = 0
+    if 'tipo_canon' in vista.columns:
+        embargos_judiciales = int((vista['tipo_canon'] == 'JUDICIAL').sum())
+        embargos_coactivos = int((vista['tipo_canon'] == 'COACTIVO').sum())
+
+    return _armar_metricas(total, monto_total, monto_promedio, activos, clientes,
+                           meses_unicos, embargos_judiciales, embargos_coactivos)
+
+
+def _armar_metricas(total: int, monto_total: float, monto_promedio: float, activos: int, clientes: int,
+                    meses_unicos: int, embargos_judiciales: int, embargos_coactivos: int) -> Dict:
+    promedio_oficios_mes = 0.0
+    if total > 0 and meses_unicos > 0:
+        promedio_oficios_mes = total / meses_unicos
+    return {
+        'total': total,
+        'total_oficios': total,  # Los registros son los oficios
+        'monto_total': monto_total,
+        'monto_promedio': monto_promedio,
+        'activos': activos,
+        'clientes': clientes,
+        'porcentaje_clientes': (clientes / total * 100) if total > 0 else 0.0,
+        'promedio_oficios_mes': promedio_oficios_mes,
+        'embargos_judiciales': embargos_judiciales,
+        'embargos_coactivos': embargos_coactivos
+    }
+
+
+def _ordenar_por_mes(df: pd.DataFrame) -> pd.DataFrame:
+    """Ordena cronológicamente por la columna `mes` (YYYY-MM); descarta meses no parseables."""
+    try:
+        df['mes_datetime'] = pd.to_datetime(df['mes'], format='%Y-%m', errors='coerce')
+        df = df.dropna(subset=['mes_datetime'])
+        df = df.sort_values('mes_datetime')
+        return df.drop(columns=['mes_datetime'])
+    except Exception:
+        return df.sort_values('mes')
+
+
+def top_k(conteos: np.ndarray, k: int) -> np.ndarray:
+    """
+    Códigos de las `k` categorías con más filas, de mayor a menor y, a igual
+    conteo, en orden de categoría (el orden de `value_counts().head(k)`).
+
+    En lugar de ordenar todas las categorías, una selección parcial
+    (`np.partition`, O(n)) da el k-ésimo conteo y solo se ordenan las `k`
+    elegidas: O(n + k log k) con decenas de miles de funcionarios o remitentes.
+    """
+    n = len(conteos)
+    if k >= n:
+        return np.argsort(-conteos, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    umbral = np.partition(conteos, n - k)[n - k]
+    mayores = np.flatnonzero(conteos > umbral)
+    # Los empates en el umbral entran en orden de categoría hasta completar k
+    elegidos = np.concatenate([mayores, np.flatnonzero(conteos == umbral)[:k - len(mayores)]])
+    return elegidos[np.argsort(-conteos[elegidos], kind='stable')]
+
+
+def _conteos_categoria(conteos: np.ndarray, dtype: pd.CategoricalDtype, columna: str,
+                       sort: bool = True, top: int = None) -> pd.Series:
+    """
+    Series igual a `value_counts(sort=sort)` de una columna categórica (todas las
+    categorías, con conteo 0 incluido) a partir de sus conteos por código. Con
+    `top` (y `sort`) solo se ordenan las `top` categorías con más filas (`top_k`).
+    """
+    if sort and top is not None:
+        codigos = top_k(conteos, top)
+    elif sort:
+        codigos = np.argsort(-conteos, kind='stable')
+    else:
+        codigos = np.arange(len(dtype.categories)) if top is None else np.arange(min(top, len(dtype.categories)))
+    indice = pd.CategoricalIndex(pd.Categorical.from_codes(codigos, dtype=dtype), name=columna)
+    return pd.Series(conteos[codigos], index=indice, dtype='int64', name='count')
+
+
+def _observados(conteos: np.ndarray, dtype: pd.CategoricalDtype, columna: str) -> pd.DataFrame:
+    """Categorías con al menos una fila y su conteo, en orden de categoría (como `groupby(observed=True)`)."""
+    presentes = np.flatnonzero(conteos)
+    return pd.DataFrame({
+        columna: pd.Categorical.from_codes(presentes, dtype=dtype),
+        'cantidad': conteos[presentes].astype('int64'),
+    })
+
+
+def resumen_principal(vista: VistaFiltrada) -> Dict:
+    """
+    Todos los agregados de la pestaña principal en una sola pasada: cada columna
+    se reduce una vez a sus códigos categóricos para las filas seleccionadas y se
+    cuenta con `np.bincount`; mes y tipo de embargo se cuentan juntos (código
+    combinado), y de esa misma tabla salen la serie mensual y las proporciones.
+
+    Devuelve los conteos por tipo, estado y banco canónicos, los top 10 de
+    ciudades, funcionarios y remitentes, `oficios_por_mes` y `tipo_por_mes`
+    (solo los de las columnas presentes).
+    """
+    resultado = {}
+    conteos_simples = {
+        'conteo_tipo': ('tipo_canon', True, None),
+        'conteo_estado': ('estado_canon', False, None),
+        'conteo_banco': ('banco_canon', True, None),
+        'top_ciudades': ('ciudad', True, 10),
+        'top_funcionarios': ('funcionario', True, 10),
+        'top_remitentes': ('entidad_remitente', True, 10),
+    }
+    for nombre, (columna, sort, top) in conteos_simples.items():
+        if columna in vista.columns:
+            codigos, dtype = vista.codigos(columna)
+            # Código -1 (sin valor) -> posición 0, que se descarta
+            conteos = np.bincount(codigos + 1, minlength=len(dtype.categories) + 1)[1:]
+            resultado[nombre] = _conteos_categoria(conteos, dtype, columna, sort=sort, top=top)
+
+    if 'mes' not in vista.columns:
+        return resultado
+    codigos_mes, dtype_mes = vista.codigos('mes')
+    n_meses = len(dtype_mes.categories) + 1
+    if 'tipo_embargo' in vista.columns:
+        codigos_tipo, dtype_tipo = vista.codigos('tipo_embargo')
+        n_tipos = len(dtype_tipo.categories) + 1
+    else:
+        codigos_tipo, dtype_tipo, n_tipos = np.full(len(codigos_mes), -1), None, 1
+    # Tabla mes × tipo (fila/columna 0 = sin valor) en un solo bincount
+    combinado = (codigos_mes.astype(np.int64) + 1) * n_tipos + (codigos_tipo + 1)
+    tabla = np.bincount(combinado, minlength=n_meses * n_tipos).reshape(n_meses, n_tipos)
+
+    df_time = _observados(tabla[1:].sum(axis=1), dtype_mes, 'mes').rename(columns={'cantidad': 'oficios'})
+    resultado['oficios_por_mes'] = _ordenar_por_mes(df_time)
+
+    if dtype_tipo is not None:
+        # Se consideran TODOS los meses disponibles (igual que la evolución temporal)
+        meses, tipos = np.nonzero(tabla[1:, 1:])
+        prop_mensual = pd.DataFrame({
+            'mes': pd.Categorical.from_codes(meses, dtype=dtype_mes),
+            'tipo_embargo': pd.Categorical.from_codes(tipos, dtype=dtype_tipo),
+            'cantidad': tabla[1:, 1:][meses, tipos].astype('int64'),
+        })
+        total_mensual = prop_mensual.groupby('mes')['cantidad'].sum().reset_index(name='total')
+        prop_mensual = prop_mensual.merge(total_mensual, on='mes')
+        prop_mensual['proporcion'] = prop_mensual['cantidad'] / prop_mensual['total']
+        resultado['tipo_por_mes'] = _ordenar_por_mes(prop_mensual)
+    return resultado
+
+
+def top_por_mes(vista: VistaFiltrada, columna: str, k: int = TOP_POR_MES) -> pd.DataFrame:
+    """
+    Las `k` categorías de `columna` con más filas en cada mes, a partir de una
+    tabla mes × categoría contada con un solo `np.bincount` y un `top_k` por mes
+    (sin ordenar todas las categorías de cada mes).
+
+    Columnas `mes`, `columna`, `cantidad` y `puesto` (1 = la de más filas del
+    mes), en orden cronológico y por puesto; los meses sin fecha válida se
+    descartan, como en la evolución mensual.
+    """
+    vacio = pd.DataFrame({'mes': [], columna: [], 'cantidad': [], 'puesto': []})
+    if 'mes' not in vista.columns or columna not in vista.columns:
+        return vacio
+    codigos_mes, dtype_mes = vista.codigos('mes')
+    codigos_cat, dtype_cat = vista.codigos(columna)
+    n_categorias = len(dtype_cat.categories)
+    validos = (codigos_mes >= 0) & (codigos_cat >= 0)
+    combinado = codigos_mes[validos].astype(np.int64) * n_categorias + codigos_cat[validos]
+    tabla = np.bincount(combinado, minlength=len(dtype_mes.categories) * n_categorias)
+    tabla = tabla.reshape(len(dtype_mes.categories), n_categorias)
+
+    meses = _ordenar_por_mes(_observados(tabla.sum(axis=1), dtype_mes, 'mes'))['mes'].cat.codes.to_numpy()
+    partes_mes, partes_cat = [], []
+    for mes in meses:
+        elegidos = top_k(tabla[mes], k)
+        elegidos = elegidos[tabla[mes, elegidos] > 0]
+        partes_mes.append(np.full(len(elegidos), mes))
+        partes_cat.append(elegidos)
+    if not partes_mes:
+        return vacio
+    filas_mes, filas_cat = np.concatenate(partes_mes), np.concatenate(partes_cat)
+    return pd.DataFrame({
+        'mes': pd.Categorical.from_codes(filas_mes, dtype=dtype_mes),
+        columna: pd.Categorical.from_codes(filas_cat, dtype=dtype_cat),
+        'cantidad': tabla[filas_mes, filas_cat].astype('int64'),
+        'puesto': np.concatenate([np.arange(1, len(p) + 1) for p in partes_cat]),
+    })
+
+
+def resumen_ciudades(vista: VistaFiltrada) -> Dict:
+    """
+    Agregados por ciudad de la pestaña geográfica en una sola pasada sobre los
+    códigos de ciudad (`np.bincount`):
+
+    - `por_ciudad`: por cada ciudad con registros (en orden de categoría, como
+      `groupby(observed=True)`), `oficios`, `monto` (suma; sin montos, una
+      aproximación a partir del conteo), `monto_promedio` y `demandados`
+      (identificaciones distintas, si la columna existe);
+    - `matriz_ciudad_banco`: la tabla cruzada ciudad × banco de `pd.crosstab`,
+      primeras 10 ciudades, contada con un código combinado.
+    """
+    if 'ciudad' not in vista.columns:
+        return {}
+    codigos_ciudad, dtype_ciudad = vista.codigos('ciudad')
+    n_ciudades = len(dtype_ciudad.categories)
+    con_ciudad = codigos_ciudad >= 0
+    oficios = np.bincount(codigos_ciudad[con_ciudad], minlength=n_ciudades)
+    presentes = np.flatnonzero(oficios)
+    por_ciudad = pd.DataFrame({
+        'ciudad': pd.Categorical.from_codes(presentes, dtype=dtype_ciudad),
+        'oficios': oficios[presentes].astype('int64'),
+    })
+
+    if 'montoaembargar' in vista.columns:
+        # En float64, como las métricas; los montos vacíos no suman ni cuentan para el promedio
+        montos_fila = vista['montoaembargar'].to_numpy(dtype=np.float64, na_value=np.nan)[con_ciudad]
+        con_monto = ~np.isnan(montos_fila)
+        ciudades_monto = codigos_ciudad[con_ciudad][con_monto]
+        suma = np.bincount(ciudades_monto, weights=montos_fila[con_monto], minlength=n_ciudades)[presentes]
+        con_valor = np.bincount(ciudades_monto, minlength=n_ciudades)[presentes]
+        por_ciudad['monto'] = suma
+        with np.errstate(invalid='ignore', divide='ignore'):
+            por_ciudad['monto_promedio'] = np.where(con_valor > 0, suma / con_valor, np.nan)
+    else:
+        por_ciudad['monto'] = por_ciudad['oficios'] * 1000.0  # Aproximación
+
+    if 'identificacion' in vista.columns:
+        # Pares (ciudad, identificación) distintos, contados por ciudad
+        codigos_id, unicos = pd.factorize(vista['identificacion'].to_numpy()[con_ciudad])
+        validos = codigos_id >= 0
+        pares = np.unique(codigos_ciudad[con_ciudad][validos].astype(np.int64) * max(len(unicos), 1) + codigos_id[validos])
+        demandados = np.bincount(pares // max(len(unicos), 1), minlength=n_ciudades)
+        por_ciudad['demandados'] = demandados[presentes].astype('int64')
+
+    resultado = {'por_ciudad': por_ciudad}
+    if 'entidad_bancaria' in vista.columns:
+        codigos_banco, dtype_banco = vista.codigos('entidad_bancaria')
+        n_bancos = len(dtype_banco.categories)
+        ambos = con_ciudad & (codigos_banco >= 0)
+        combinado = codigos_ciudad[ambos].astype(np.int64) * n_bancos + codigos_banco[ambos]
+        tabla = np.bincount(combinado, minlength=n_ciudades * n_bancos).reshape(n_ciudades, n_bancos)
+        filas = np.flatnonzero(tabla.sum(axis=1))
+        columnas = np.flatnonzero(tabla.sum(axis=0))
+        resultado['matriz_ciudad_banco'] = pd.DataFrame(
+            tabla[np.ix_(filas, columnas)].astype('int64'),
+            index=pd.CategoricalIndex(pd.Categorical.from_codes(filas, dtype=dtype_ciudad), name='ciudad'),
+            columns=pd.CategoricalIndex(pd.Categorical.from_codes(columnas, dtype=dtype_banco), name='entidad_bancaria'),
+        ).head(10)
+    return resultado
+
+
+def montos(vista: VistaFiltrada) -> Dict:
+    """
+    Distribución de montos: conteo de ceros, cuartiles y límites IQR de los montos
+    mayores a cero, y el histograma de los montos dentro de esos límites. Cálculo
+    exacto sobre las filas (ver `BosquejoMontos` para la versión aproximada).
+    """
+    # En float64: la columna es float32 y promedio/desviación acumulados en float32 pierden precisión
+    serie = vista['montoaembargar'].astype('float64').dropna()
+    resultado = {
+        'valores_cero': int((serie == 0).sum()),
+        'valores_no_cero': int((serie != 0).sum()),
+        'total_montos': len(serie),
+        'no_cero': 0,
+        'aproximado': False,
+    }
+    montos_no_cero = serie[serie > 0]
+    if len(montos_no_cero) == 0:
+        return resultado
+
+    q1 = montos_no_cero.quantile(0.25)
+    q3 = montos_no_cero.quantile(0.75)
+    iqr = q3 - q1
+    limite_inferior = max(0, q1 - 1.5 * iqr)
+    limite_superior = q3 + 1.5 * iqr
+    sin_outliers = montos_no_cero[(montos_no_cero >= limite_inferior) & (montos_no_cero <= limite_superior)]
+    resultado.update({
+        'no_cero': len(montos_no_cero),
+        'sin_outliers': len(sin_outliers),
+        'histograma': histograma(sin_outliers.to_numpy()),
+        'outliers': len(montos_no_cero) - len(sin_outliers),
+        'q1': q1,
+        'q3': q3,
+        'minimo': montos_no_cero.min(),
+        'maximo': montos_no_cero.max(),
+        'mediana': montos_no_cero.median(),
+        'promedio': montos_no_cero.mean(),
+        'desviacion': montos_no_cero.std(),
+    })
+    return resultado
+
+
+# Cubetas logarítmicas de los montos: la cubeta i cubre (γ^(i-1), γ^i] y su valor
+# representativo tiene un error relativo de a lo sumo (γ - 1) / (γ + 1) ≈ 1 %
+GAMMA_MONTOS = 1.02
+
+
+class BosquejoMontos:
+    """
+    Distribución de `montoaembargar` resumida por clave (mes × banco en
+    `ParcialesMetricas`), combinable.
+
+    Por clave se guardan conteos (montos, ceros, positivos), suma y suma de
+    cuadrados, mínimo y máximo de los positivos, y un histograma de cubetas
+    logarítmicas fijas (como DDSketch): una tabla clave × cubeta cuyo tamaño
+    depende de las claves y del rango de los montos, no de las filas. Combinar
+    una selección es sumar las filas de esa tabla; de ahí salen cuartiles y
+    mediana con error relativo ≤ 1 %, límites IQR, valores atípicos y el
+    histograma, sin tocar las filas. Mínimo, máximo, promedio y desviación son
+    exactos.
+    """
+
+    def __init__(self, celda: np.ndarray, montos: np.ndarray, n_celdas: int):
+        def sumar(pesos) -> np.ndarray:
+            return np.bincount(celda, weights=pesos, minlength=n_celdas)
+
+        positivos = montos > 0
+        valores = montos[positivos]
+        celdas_positivas = celda[positivos]
+        self.total = sumar(~np.isnan(montos)).astype(np.int64)
+        self.ceros = sumar(montos == 0).astype(np.int64)
+        self.positivos = sumar(positivos).astype(np.int64)
+        self.suma = sumar(np.where(positivos, montos, 0.0))
+        self.suma_cuadrados = sumar(np.where(positivos, montos, 0.0) ** 2)
+        self.minimo = np.full(n_celdas, np.inf)
+        np.minimum.at(self.minimo, celdas_positivas, valores)
+        self.maximo = np.full(n_celdas, -np.inf)
+        np.maximum.at(self.maximo, celdas_positivas, valores)
+
+        cubetas = np.ceil(np.log(valores) / np.log(GAMMA_MONTOS)).astype(np.int64)
+        self.cubeta_inicial = int(cubetas.min(initial=0))
+        self.n_cubetas = int(cubetas.max(initial=0)) - self.cubeta_inicial + 1
+        self.histogramas = np.bincount(celdas_positivas * self.n_cubetas + (cubetas - self.cubeta_inicial),
+                                       minlength=n_celdas * self.n_cubetas).reshape(n_celdas, self.n_cubetas)
+        exponentes = np.arange(self.n_cubetas) + self.cubeta_inicial
+        self.representantes = 2 * GAMMA_MONTOS ** exponentes / (GAMMA_MONTOS + 1)
+
+    def combinar(self, seleccion: np.ndarray) -> Dict:
+        """Las mismas claves que `montos(vista)` para las combinaciones seleccionadas."""
+        total = int(self.total[seleccion].sum())
+        ceros = int(self.ceros[seleccion].sum())
+        resultado = {
+            'valores_cero': ceros,
+            'valores_no_cero': total - ceros,
+            'total_montos': total,
+            'no_cero': 0,
+            'aproximado': True,
+        }
+        no_cero = int(self.positivos[seleccion].sum())
+        if no_cero == 0:
+            return resultado
+
+        conteos = self.histogramas[seleccion].sum(axis=0)
+        minimo = float(self.minimo[seleccion].min())
+        maximo = float(self.maximo[seleccion].max())
+        representantes = np.clip(self.representantes, minimo, maximo)
+        acumulado = np.cumsum(conteos)
+
+        def valor_en_rango(rango: int) -> float:
+            # Dentro de su cubeta, el valor se ubica según su rango (uniforme en escala log)
+            cubeta = int(np.searchsorted(acumulado, rango, side='right'))
+            fraccion = (rango - (acumulado[cubeta] - conteos[cubeta]) + 0.5) / conteos[cubeta]
+            return float(np.clip(GAMMA_MONTOS ** (self.cubeta_inicial + cubeta - 1 + fraccion), minimo, maximo))
+
+        def filas_hasta(valor: float) -> float:
+            # Cantidad estimada de montos <= valor, con la misma ubicación dentro de la cubeta
+            if valor <= 0:
+                return 0.0
+            exponente = np.log(valor) / np.log(GAMMA_MONTOS) - self.cubeta_inicial
+            cubeta = int(np.ceil(exponente))
+            if cubeta < 0:
+                return 0.0
+            if cubeta >= self.n_cubetas:
+                return float(no_cero)
+            return float(acumulado[cubeta] - conteos[cubeta] + conteos[cubeta] * (exponente - cubeta + 1))
+
+        def cuantil(q: float) -> float:
+            # Interpolación lineal entre los rangos vecinos, como `Series.quantile`
+            rango = q * (no_cero - 1)
+            bajo, alto = valor_en_rango(int(np.floor(rango))), valor_en_rango(int(np.ceil(rango)))
+            return bajo + (alto - bajo) * (rango - np.floor(rango))
+
+        q1, q3 = cuantil(0.25), cuantil(0.75)
+        iqr = q3 - q1
+        limite_inferior = max(0, q1 - 1.5 * iqr)
+        limite_superior = q3 + 1.5 * iqr
+        dentro = (conteos > 0) & (representantes >= limite_inferior) & (representantes <= limite_superior)
+        sin_outliers = int(round(filas_hasta(limite_superior) - filas_hasta(limite_inferior)))
+
+        suma = float(self.suma[seleccion].sum())
+        promedio = suma / no_cero
+        varianza = (float(self.suma_cuadrados[seleccion].sum()) - suma * promedio) / (no_cero - 1) if no_cero > 1 else np.nan
+        resultado.update({
+            'no_cero': no_cero,
+            'sin_outliers': sin_outliers,
+            'histograma': histograma(representantes[dentro], conteos[dentro]),
+            'outliers': no_cero - sin_outliers,
+            'q1': q1,
+            'q3': q3,
+            'minimo': minimo,
+            'maximo': maximo,
+            'mediana': cuantil(0.5),
+            'promedio': promedio,
+            'desviacion': float(np.sqrt(max(varianza, 0.0))) if no_cero > 1 else np.nan,
+        })
+        return resultado
+
+
+def ciclo_vida(vista: VistaFiltrada) -> Dict:
+    """
+    Ciclo de vida por demandado de las filas seleccionadas (ver `CicloVida`).
+    Ordena los oficios en cada llamada; el dashboard reutiliza el orden
+    construido una vez por archivo cargado.
+    """
+    return CicloVida(vista.base).resumen(vista.posiciones)
+
+
+def _conteo(columna: str, sort: bool = True, top: int = None) -> Callable[[VistaFiltrada], pd.Series]:
+    def calcular(vista: VistaFiltrada) -> pd.Series:
+        conteos = vista[columna].value_counts(sort=sort)
+        return conteos if top is None else conteos.head(top)
+    calcular.__doc__ = f"Conteo de filas por `{columna}`" + (f" (top {top})." if top else ".")
+    return calcular
+
+
+def _ranking(columna: str, top: int) -> Callable[[VistaFiltrada], pd.Series]:
+    def calcular(vista: VistaFiltrada) -> pd.Series:
+        codigos, dtype = vista.codigos(columna)
+        conteos = np.bincount(codigos + 1, minlength=len(dtype.categories) + 1)[1:]
+        return _conteos_categoria(conteos, dtype, columna, top=top)
+    calcular.__doc__ = f"Las {top} categorías de `{columna}` con más filas (`value_counts().head({top})`)."
+    return calcular
+
+
+def _top_por_mes(columna: str) -> Callable[[VistaFiltrada], pd.DataFrame]:
+    def calcular(vista: VistaFiltrada) -> pd.DataFrame:
+        return top_por_mes(vista, columna)
+    calcular.__doc__ = f"Las {TOP_POR_MES} categorías de `{columna}` con más filas en cada mes."
+    return calcular
+
+
+AGREGADOS: Dict[str, Callable[[VistaFiltrada], object]] = {
+    'metricas': metricas,
+    'resumen_principal': resumen_principal,
+    'resumen_ciudades': resumen_ciudades,
+    'montos': montos,
+    'montos_exactos': montos,
+    'conteo_clientes': _conteo('es_cliente'),
+    'top_documentos': _ranking('tipo_documento', top=10),
+    'ciclo_vida': ciclo_vida,
+    'top_mes_banco': _top_por_mes('banco_canon'),
+    'top_mes_ciudad': _top_por_mes('ciudad'),
+    'top_mes_funcionario': _top_por_mes('funcionario'),
+    'top_mes_remitente': _top_por_mes('entidad_remitente'),
+}
+
+# Agregados que puede pedir cada pestaña. Las que no declaran 'metricas' no muestran
+# el resumen ejecutivo (y no lo calculan)
+AGREGADOS_POR_PESTANA: Dict[str, List[str]] = {
+    'Dashboard Principal': ['metricas', 'resumen_principal', 'top_mes_banco', 'top_mes_ciudad',
+                            'top_mes_funcionario', 'top_mes_remitente'],
+    'Análisis Geográfico': ['metricas', 'resumen_ciudades'],
+    'Análisis Detallado': ['metricas', 'montos', 'montos_exactos', 'conteo_clientes', 'top_documentos', 'ciclo_vida'],
+    'Exportación': [],
+}
+
+
+class AgregadosPestana:
+    """
+    Acceso a los agregados declarados para una pestaña. `calcular(nombre)` obtiene
+    el agregado (memoizado por el dashboard); dentro de una ejecución del script
+    cada agregado se pide una sola vez.
+    """
+
+    def __init__(self, pestana: str, calcular: Callable[[str], object]):
+        self.pestana = pestana
+        self.declarados = AGREGADOS_POR_PESTANA.get(pestana, [])
+        self._calcular = calcular
+        self._valores = {}
+
+    def usa(self, nombre: str) -> bool:
+        return nombre in self.declarados
+
+    def __getitem__(self, nombre: str):
+        if nombre not in self.declarados:
+            raise KeyError(f"La pestaña '{self.pestana}' no declara el agregado '{nombre}'")
+        if nombre not in self._valores:
+            self._valores[nombre] = self._calcular(nombre)
+        return self._valores[nombre]
+
+
+def _combinaciones(indice: IndiceFiltros, dimensiones: Tuple[str, ...],
+                   n: int) -> Tuple[np.ndarray, int, Dict[str, np.ndarray]]:
+    """
+    Combinación de grupos de cada fila en las `dimensiones` del índice presentes:
+    el id de combinación por fila, el número de combinaciones y, para cada
+    dimensión, el grupo de cada combinación.
+    """
+    ids = {clave: indice.columnas[clave].ids_por_fila() for clave in dimensiones if clave in indice.columnas}
+    # Compactada dimensión a dimensión para no desbordar
+    celda = np.zeros(n, dtype=np.int64)
+    for grupos in ids.values():
+        celda = pd.factorize(celda * (int(grupos.max(initial=0)) + 1) + grupos)[0]
+    n_celdas = int(celda.max(initial=-1)) + 1
+    # Primera fila de cada combinación: de ella se toman los grupos de la combinación
+    primera = np.empty(n_celdas, dtype=np.int64)
+    primera[celda[::-1]] = np.arange(n - 1, -1, -1)
+    return celda, n_celdas, {clave: grupos[primera] for clave, grupos in ids.items()}
+
+
+class ParcialesMetricas:
+    """
+    Métricas principales precalculadas por combinación de valores de filtro.
+
+    Las filas se agrupan por la combinación de sus grupos en las dimensiones de
+    pocos valores del índice de filtros (`DIMENSIONES_METRICAS`) y, para cada
+    combinación presente, se guardan los parciales: filas, suma y cantidad de
+    montos, activos, clientes, judiciales y coactivos. Las métricas de una
+    selección de filtros son la suma de los parciales de las combinaciones que
+    la cumplen: agregar o quitar un valor de un filtro suma o resta
+    combinaciones, sin recorrer las filas. El número de combinaciones no crece
+    con las filas. La distribución de montos sale de un bosquejo por mes × banco
+    (`BosquejoMontos`, `DIMENSIONES_MONTOS`).
+
+    Vale para los filtros sobre esas dimensiones (`cubre`); con otros filtros
+    (ciudad para las métricas; también estado, tipo y tipo de documento para los
+    montos) o con búsqueda global se calcula sobre la vista filtrada.
+    """
+
+    def __init__(self, df: pd.DataFrame, indice: IndiceFiltros):
+        self.indice = indice
+        self.columnas = df.columns
+        vista = VistaFiltrada(df)
+        celda, self.n_celdas, self.grupos = _combinaciones(indice, DIMENSIONES_METRICAS, len(df))
+
+        def sumar(pesos=None) -> np.ndarray:
+            return np.bincount(celda, weights=pesos, minlength=self.n_celdas)
+
+        self.filas = sumar().astype(np.int64)
+        ceros = np.zeros(self.n_celdas)
+        self.bosquejo_montos = None
+        if 'montoaembargar' in df.columns:
+            montos = df['montoaembargar'].to_numpy(dtype=np.float64, na_value=np.nan)
+            self.monto_suma = sumar(np.nan_to_num(montos))
+            self.monto_n = sumar(~np.isnan(montos)).astype(np.int64)
+            clave, n_claves, self.grupos_montos = _combinaciones(indice, DIMENSIONES_MONTOS, len(df))
+            self.bosquejo_montos = BosquejoMontos(clave, montos, n_claves)
+        else:
+            self.monto_suma, self.monto_n = ceros, ceros.astype(np.int64)
+        self.activos = ceros
+        if 'estado_embargo' in df.columns:
+            codigos, dtype = vista.codigos('estado_embargo')
+            cumple = np.append(np.asarray(_es_activo(pd.Series(dtype.categories)), dtype=bool), False)
+            self.activos = sumar(cumple[codigos])
+        self.clientes = ceros
+        if 'es_cliente' in df.columns:
+            self.clientes = sumar(_clientes_por_fila(df['es_cliente']).to_numpy(dtype=np.float64))
+        self.judiciales = self.coactivos = ceros
+        if 'tipo_canon' in df.columns:
+            codigos, dtype = vista.codigos('tipo_canon')
+            categorias = np.append(np.asarray(dtype.categories, dtype=object), None)
+            self.judiciales = sumar(categorias[codigos] == 'JUDICIAL')
+            self.coactivos = sumar(categorias[codigos] == 'COACTIVO')
+
+    def _activos(self, filtros: Dict[str, List]) -> List[str]:
+        """Filtros con valores elegidos sobre columnas del índice (los que aplica `IndiceFiltros.seleccionar`)."""
+        return [clave for clave, valores in filtros.items()
+                if valores and isinstance(valores, list) and clave in self.indice.columnas]
+
+    def cubre(self, nombre: str, filtros: Dict[str, List]) -> bool:
+        """Si el agregado `nombre` ('metricas' o 'montos') sale de los parciales con estos filtros."""
+        if nombre == 'montos':
+            if self.bosquejo_montos is None:
+                return False
+            return all(clave in self.grupos_montos for clave in self._activos(filtros))
+        return all(clave in self.grupos for clave in self._activos(filtros))
+
+    def _seleccion(self, grupos: Dict[str, np.ndarray], n: int, filtros: Dict[str, List]) -> np.ndarray:
+        """Máscara de las combinaciones de `grupos` que cumplen los filtros (reglas de `IndiceFiltros.seleccionar`)."""
+        fuera = [clave for clave in self._activos(filtros) if clave not in grupos]
+        if fuera:
+            raise ValueError(f"Filtros fuera de los parciales: {fuera}; usar el cálculo sobre la vista filtrada")
+        seleccion = np.ones(n, dtype=bool)
+        for clave in self._activos(filtros):
+            columna = self.indice.columnas[clave]
+            permitidos = np.zeros(len(columna.valores) + 1, dtype=bool)
+            permitidos[np.asarray(columna.claves(filtros[clave]), dtype=np.int64) + 1] = True
+            seleccion &= permitidos[grupos[clave]]
+        return seleccion
+
+    def celdas(self, filtros: Dict[str, List]) -> np.ndarray:
+        """Máscara de las combinaciones que cumplen los filtros."""
+        return self._seleccion(self.grupos, self.n_celdas, filtros)
+
+    def metricas(self, filtros: Dict[str, List]) -> Dict:
+        """Las mismas métricas que `metricas(vista)` para las filas que cumplen los filtros."""
+        seleccion = self.celdas(filtros)
+        total = int(self.filas[seleccion].sum())
+        if total == 0 or len(self.columnas) == 0:
+            return {}
+
+        monto_total = monto_promedio = 0.0
+        if 'montoaembargar' in self.columnas:
+            monto_n = int(self.monto_n[seleccion].sum())
+            monto_total = float(self.monto_suma[seleccion].sum())
+            monto_promedio = monto_total / monto_n if monto_n else float('nan')
+        meses_unicos = 0
+        if 'mes' in self.columnas and 'mes' in self.grupos:
+            # Grupo 0: sin mes; cada otro grupo es un mes distinto, como `nunique`
+            meses = self.grupos['mes'][seleccion]
+            meses_unicos = len(np.unique(meses[meses > 0]))
+        return _armar_metricas(total, monto_total, monto_promedio,
+                               int(round(self.activos[seleccion].sum())),
+                               int(round(self.clientes[seleccion].sum())),
+                               meses_unicos,
+                               int(round(self.judiciales[seleccion].sum())),
+                               int(round(self.coactivos[seleccion].sum())))
+
+    def montos(self, filtros: Dict[str, List]) -> Dict:
+        """Distribución de montos (aproximada, ver `BosquejoMontos`) para las filas que cumplen los filtros."""
+        return self.bosquejo_montos.combinar(self._seleccion(self.grupos_montos, len(self.bosquejo_montos.total), filtros))
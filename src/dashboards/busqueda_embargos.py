@@ -0,0 +1,141 @@
+"""
+Índice de búsqueda global del dashboard de embargos.
+
+La búsqueda es de subcadena sin distinguir mayúsculas sobre banco, ciudad,
+entidad remitente, nombres e identificación. En lugar de recorrer las cadenas
+de cada fila en cada consulta, `IndiceBusqueda` trabaja sobre los valores
+únicos de cada columna:
+
+- cada fila guarda el código de su valor único (un entero);
+- los valores únicos se indexan por trigramas (índice invertido: trigrama ->
+  valores que lo contienen), construido con numpy sobre los códigos Unicode.
+
+Resolver un término es intersectar las listas de sus trigramas, confirmar la
+subcadena solo en esos candidatos y marcar las filas con un acceso indexado
+por código. El índice se construye una vez por archivo cargado.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNAS_BUSQUEDA = ['entidad_bancaria', 'ciudad', 'entidad_remitente', 'nombres', 'identificacion']
+
+# Longitud mínima del término para buscar (la de los trigramas)
+LONGITUD_MINIMA = 3
+
+
+def _trigramas(codigos: np.ndarray) -> np.ndarray:
+    """Claves de los trigramas consecutivos de un arreglo de códigos Unicode (21 bits cada uno)."""
+    codigos = codigos.astype(np.uint64)
+    return (codigos[:-2] << np.uint64(42)) | (codigos[1:-1] << np.uint64(21)) | codigos[2:]
+
+
+def _codigos_unicode(texto: str) -> np.ndarray:
+    return np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32)
+
+
+class IndiceTexto:
+    """
+    Índice de trigramas sobre los valores únicos de una columna.
+
+    `codigos` tiene, por fila, la posición de su valor en `valores` (-1 sin
+    valor). Los valores que contienen el trigrama `trigramas[k]` son
+    `duenos[limites[k]:limites[k + 1]]`, ordenados y sin repetir.
+    """
+
+    def __init__(self, series: pd.Series):
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codigos, valores = series.cat.codes.to_numpy(), series.cat.categories
+        else:
+            codigos, valores = pd.factorize(series)
+        self.codigos = codigos.astype(np.int32, copy=False)
+        # Misma comparación que `str.contains(case=False, regex=False)`: texto de `astype(str)` en mayúsculas
+        self.valores = pd.Series(valores, dtype=object).astype(str).str.upper().to_numpy(dtype=object)
+        self._indexar()
+
+    def _indexar(self):
+        largos = np.fromiter(map(len, self.valores), dtype=np.int64, count=len(self.valores))
+        # Todos los valores en un solo arreglo de códigos, cada uno seguido de un separador
+        codigos = _codigos_unicode('\x00'.join(self.valores) + '\x00')
+        duenos = np.repeat(np.arange(len(self.valores), dtype=np.int32), largos + 1)
+        inicio_valor = np.concatenate([[0], np.cumsum(largos + 1)[:-1]])
+
+        if len(codigos) < LONGITUD_MINIMA:
+            self.trigramas = np.empty(0, dtype=np.uint64)
+            self.limites = np.zeros(1, dtype=np.int64)
+            self.duenos = np.empty(0, dtype=np.int32)
+            return
+
+        claves = _trigramas(codigos)
+        duenos = duenos[:-2]
+        # Solo los trigramas que caben completos dentro de su valor
+        completos = (np.arange(len(claves)) - inicio_valor[duenos] + LONGITUD_MINIMA) <= largos[duenos]
+        claves, duenos = claves[completos], duenos[completos]
+
+        # Orden estable: dentro de cada trigrama los dueños quedan ascendentes
+        orden = np.argsort(claves, kind='stable')
+        claves, duenos = claves[orden], duenos[orden]
+        nuevos = np.ones(len(claves), dtype=bool)
+        nuevos[1:] = (claves[1:] != claves[:-1]) | (duenos[1:] != duenos[:-1])
+        claves, duenos = claves[nuevos], duenos[nuevos]
+
+        inicios = np.flatnonzero(np.concatenate([[True], claves[1:] != claves[:-1]]))
+        self.trigramas = claves[inicios]
+        self.limites = np.append(inicios, len(claves))
+        self.duenos = duenos
+
+    def valores_que_contienen(self, termino: str) -> np.ndarray:
+        """Posiciones en `valores` de los que contienen `termino` (ya en mayúsculas)."""
+        if len(termino) < LONGITUD_MINIMA:
+            return np.flatnonzero([termino in valor for valor in self.valores])
+
+        listas = []
+        for clave in np.unique(_trigramas(_codigos_unicode(termino))):
+            k = np.searchsorted(self.trigramas, clave)
+            if k == len(self.trigramas) or self.trigramas[k] != clave:
+                return np.empty(0, dtype=np.int32)
+            listas.append(self.duenos[self.limites[k]:self.limites[k + 1]])
+
+        listas.sort(key=len)
+        candidatos = listas[0]
+        for lista in listas[1:]:
+            if len(candidatos) == 0:
+                break
+            candidatos = np.intersect1d(candidatos, lista, assume_unique=True)
+        # Tener todos los trigramas no garantiza la subcadena: se confirma en los candidatos
+        if len(termino) > LONGITUD_MINIMA:
+            contiene = np.fromiter((termino in self.valores[k] for k in candidatos), dtype=bool, count=len(candidatos))
+            candidatos = candidatos[contiene]
+        return candidatos
+
+    def filas(self, termino: str) -> np.ndarray:
+        """Máscara de las filas cuyo valor contiene `termino`."""
+        # Una posición extra al final para el código -1 (filas sin valor)
+        coincide = np.zeros(len(self.valores) + 1, dtype=bool)
+        coincide[self.valores_que_contienen(termino)] = True
+        return coincide[self.codigos]
+
+
+class IndiceBusqueda:
+    """Índice de búsqueda de todas las columnas de `COLUMNAS_BUSQUEDA` presentes."""
+
+    def __init__(self, datos, columnas: Optional[List[str]] = None):
+        self.n_filas = len(datos)
+        self.columnas: Dict[str, IndiceTexto] = {}
+        for columna in (columnas or COLUMNAS_BUSQUEDA):
+            if columna in datos.columns:
+                self.columnas[columna] = IndiceTexto(datos[columna])
+
+    def buscar(self, termino: str, posiciones: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Posiciones (ordenadas) de las filas en las que alguna columna contiene
+        `termino`, restringidas a `posiciones` si se indican (None = todas).
+        """
+        termino = termino.upper()
+        coincide = np.zeros(self.n_filas, dtype=bool)
+        for indice in self.columnas.values():
+            coincide |= indice.filas(termino)
+        if posiciones is None:
+            return np.flatnonzero(coincide)
+        return posiciones[coincide[posiciones]]
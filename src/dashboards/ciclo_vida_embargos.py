@@ -0,0 +1,216 @@
+"""
+Ciclo de vida de los embargos por demandado.
+
+Cada demandado (`identificacion`) recibe a lo largo del tiempo embargos,
+desembargos y requerimientos. `CicloVida` ordena una sola vez los oficios por
+(identificación, fecha, tipo), con una clave entera combinada y un
+`argsort` estable, y guarda ese orden por archivo cargado. Sobre las filas
+ordenadas, todo se calcula con desplazamientos vectorizados dentro de cada
+persona (sin `groupby` ni recorridos en Python):
+
+- días desde el embargo más reciente de la persona hasta cada desembargo;
+- embargos por persona y días entre embargos consecutivos;
+- cohortes por mes del primer embargo: porcentaje de personas con un
+  desembargo posterior dentro de los meses siguientes;
+- flujos entre los primeros oficios de cada persona (para un diagrama Sankey).
+
+`resumen(posiciones)` aplica los filtros del dashboard con una máscara sobre el
+orden guardado (O(n)): la selección conserva el orden y no se vuelve a ordenar.
+Se usa la fecha del oficio (o, si no existe, la del banco); los oficios sin
+identificación, sin fecha o "No procesable" no forman parte del ciclo.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from datos_graficos import histograma
+from motor_filtros import TIPOS_DOCUMENTO_ORDEN, canonizar_columna, normalize_tipo_documento_series
+
+# Tipos que forman el ciclo (códigos 0, 1 y 2, en este orden dentro de un mismo día)
+TIPOS_CICLO = TIPOS_DOCUMENTO_ORDEN[:3]
+EMBARGO, DESEMBARGO = 0, 1
+FIN_FLUJO = "Sin más oficios"
+
+COLUMNAS_FECHA = ['fecha_oficio', 'fecha_banco']
+MESES_COHORTE = 12
+PASOS_FLUJO = 4
+MAXIMO_EMBARGOS = 5  # Se agrupa como "5+"
+
+
+def _codigos_tipo(datos) -> np.ndarray:
+    """Código de `TIPOS_DOCUMENTO_ORDEN` por fila (-1 si no se reconoce)."""
+    if 'tipo_documento_canon' in datos.columns:
+        serie = datos['tipo_documento_canon']
+    else:
+        serie = canonizar_columna(datos['tipo_documento'], normalize_tipo_documento_series, TIPOS_DOCUMENTO_ORDEN)
+    return pd.Categorical(serie, categories=TIPOS_DOCUMENTO_ORDEN).codes
+
+
+def _codigos_persona(serie: pd.Series) -> np.ndarray:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int64)
+    codigos, _ = pd.factorize(serie.to_numpy())
+    return codigos.astype(np.int64, copy=False)
+
+
+def _primeros(persona: np.ndarray) -> np.ndarray:
+    """Máscara de la primera fila de cada persona en un arreglo ordenado por persona."""
+    primeros = np.ones(len(persona), dtype=bool)
+    primeros[1:] = persona[1:] != persona[:-1]
+    return primeros
+
+
+def _inicio_persona(persona: np.ndarray) -> np.ndarray:
+    """Para cada fila (ordenada por persona), la posición del primer oficio de su persona."""
+    return np.maximum.accumulate(np.where(_primeros(persona), np.arange(len(persona)), 0))
+
+
+class CicloVida:
+    """Oficios ordenados por (identificación, fecha, tipo), construidos una vez por archivo cargado."""
+
+    def __init__(self, datos):
+        self.n_filas = len(datos)
+        self.fecha_minima = np.datetime64('1970-01-01', 'D')
+        columna_fecha = next((col for col in COLUMNAS_FECHA if col in datos.columns), None)
+        if (self.n_filas == 0 or columna_fecha is None or 'identificacion' not in datos.columns
+                or not ({'tipo_documento', 'tipo_documento_canon'} & set(datos.columns))):
+            self.filas = np.empty(0, dtype=np.int64)
+            self.persona = np.empty(0, dtype=np.int64)
+            self.dia = np.empty(0, dtype=np.int64)
+            self.tipo = np.empty(0, dtype=np.int8)
+            return
+
+        persona = _codigos_persona(datos['identificacion'])
+        tipo = _codigos_tipo(datos)
+        fechas = pd.to_datetime(datos[columna_fecha], errors='coerce').to_numpy().astype('datetime64[D]')
+        validas = ~np.isnat(fechas)
+        filas = np.flatnonzero((persona >= 0) & (tipo >= 0) & (tipo < len(TIPOS_CICLO)) & validas)
+        if len(filas):
+            self.fecha_minima = fechas[filas].min()
+        dia = (fechas[filas] - self.fecha_minima).astype(np.int64)
+        persona, tipo = persona[filas], tipo[filas].astype(np.int64)
+
+        # Clave única (persona, día, tipo) en un int64: un solo argsort estable en lugar de lexsort
+        bits_dia = max(int(dia.max()).bit_length(), 1) if len(dia) else 1
+        clave = (persona << (bits_dia + 2)) | (dia << 2) | tipo
+        orden = np.argsort(clave, kind='stable')
+        self.filas = filas[orden]
+        self.persona = persona[orden]
+        self.dia = dia[orden]
+        self.tipo = tipo[orden].astype(np.int8)
+
+    def resumen(self, posiciones: Optional[np.ndarray] = None) -> Dict:
+        """Indicadores del ciclo de vida de las filas seleccionadas (None = todas)."""
+        if posiciones is None:
+            return self._resumir(self.persona, self.dia, self.tipo)
+        seleccion = np.zeros(self.n_filas, dtype=bool)
+        seleccion[posiciones] = True
+        conservar = seleccion[self.filas]
+        return self._resumir(self.persona[conservar], self.dia[conservar], self.tipo[conservar])
+
+    def _meses(self, dia: np.ndarray) -> np.ndarray:
+        """Número de mes (desde 1970-01) de cada día."""
+        return (self.fecha_minima + dia).astype('datetime64[M]').astype(np.int64)
+
+    def _resumir(self, persona: np.ndarray, dia: np.ndarray, tipo: np.ndarray) -> Dict:
+        n = len(persona)
+        posicion = np.arange(n)
+        inicio = _inicio_persona(persona)
+        es_embargo = tipo == EMBARGO
+
+        # Embargo más reciente de la misma persona para cada fila (desplazamiento hacia adelante)
+        ultimo_embargo = np.maximum.accumulate(np.where(es_embargo, posicion, -1))
+        con_embargo_previo = ultimo_embargo >= inicio
+        desembargos = tipo == DESEMBARGO
+        emparejados = desembargos & con_embargo_previo
+        dias_desembargo = dia[emparejados] - dia[ultimo_embargo[emparejados]]
+
+        # Embargos por persona y días entre embargos consecutivos
+        persona_embargo, dia_embargo = persona[es_embargo], dia[es_embargo]
+        primer_embargo = _primeros(persona_embargo)
+        embargos_persona = np.diff(np.append(np.flatnonzero(primer_embargo), len(persona_embargo)))
+        por_persona = np.bincount(np.minimum(embargos_persona, MAXIMO_EMBARGOS), minlength=MAXIMO_EMBARGOS + 1)[1:]
+        etiquetas = [str(k) for k in range(1, MAXIMO_EMBARGOS)] + [f"{MAXIMO_EMBARGOS}+"]
+        dias_reembargo = np.diff(dia_embargo)[~primer_embargo[1:]]
+
+        return {
+            'personas': int(_primeros(persona).sum()),
+            'oficios': n,
+            'personas_con_embargo': int(primer_embargo.sum()),
+            'personas_reembargadas': int((embargos_persona > 1).sum()),
+            'desembargos': int(desembargos.sum()),
+            'desembargos_sin_embargo': int((desembargos & ~con_embargo_previo).sum()),
+            'dias_desembargo': self._estadisticas(dias_desembargo),
+            'histograma_dias': histograma(dias_desembargo, log=False),
+            'embargos_por_persona': pd.Series(por_persona.astype('int64'), index=pd.Index(etiquetas, name='embargos'),
+                                              name='personas'),
+            'dias_reembargo': self._estadisticas(dias_reembargo),
+            'cohortes': self._cohortes(persona, dia, emparejados, persona_embargo, dia_embargo, primer_embargo),
+            'flujos': self._flujos(persona, tipo, posicion - inicio),
+        }
+
+    @staticmethod
+    def _estadisticas(dias: np.ndarray) -> Dict:
+        if len(dias) == 0:
+            return {'cantidad': 0, 'promedio': np.nan, 'q1': np.nan, 'mediana': np.nan, 'q3': np.nan}
+        q1, mediana, q3 = np.percentile(dias, [25, 50, 75])
+        return {'cantidad': int(len(dias)), 'promedio': float(dias.mean()), 'q1': float(q1),
+                'mediana': float(mediana), 'q3': float(q3)}
+
+    def _cohortes(self, persona, dia, emparejados, persona_embargo, dia_embargo, primer_embargo) -> pd.DataFrame:
+        """
+        Una fila por mes del primer embargo: `personas` de la cohorte y, por cada
+        mes transcurrido (0 a `MESES_COHORTE`), el porcentaje acumulado con un
+        desembargo posterior. Los meses que aún no se pueden observar quedan en NaN.
+        """
+        columnas = [f"Mes {k}" for k in range(MESES_COHORTE + 1)]
+        if not primer_embargo.any():
+            return pd.DataFrame(columns=['personas'] + columnas)
+        personas_cohorte = persona_embargo[primer_embargo]
+        mes_primero = self._meses(dia_embargo[primer_embargo])
+        ultimo_mes = int(self._meses(dia.max(keepdims=True))[0])
+
+        # Primer desembargo (posterior a algún embargo) de cada persona
+        persona_desembargo, dia_desembargo = persona[emparejados], dia[emparejados]
+        primero_desembargo = _primeros(persona_desembargo)
+        fila_cohorte = np.searchsorted(personas_cohorte, persona_desembargo[primero_desembargo])
+        desfase = self._meses(dia_desembargo[primero_desembargo]) - mes_primero[fila_cohorte]
+
+        meses, codigo_cohorte = np.unique(mes_primero, return_inverse=True)
+        personas = np.bincount(codigo_cohorte, minlength=len(meses))
+        dentro = desfase <= MESES_COHORTE
+        ancho = MESES_COHORTE + 1
+        combinado = codigo_cohorte[fila_cohorte[dentro]] * ancho + desfase[dentro]
+        desembargadas = np.bincount(combinado, minlength=len(meses) * ancho).reshape(len(meses), ancho)
+        porcentaje = np.cumsum(desembargadas, axis=1) / personas[:, None] * 100
+        porcentaje[meses[:, None] + np.arange(ancho) > ultimo_mes] = np.nan
+
+        tabla = pd.DataFrame(porcentaje, columns=columnas,
+                             index=pd.Index(np.datetime_as_string(meses.astype('datetime64[M]')), name='cohorte'))
+        tabla.insert(0, 'personas', personas.astype('int64'))
+        return tabla
+
+    @staticmethod
+    def _flujos(persona: np.ndarray, tipo: np.ndarray, paso: np.ndarray) -> pd.DataFrame:
+        """
+        Transiciones entre el oficio `paso` y el siguiente de la misma persona
+        (hasta `PASOS_FLUJO` oficios); después del último, `FIN_FLUJO`.
+        """
+        n = len(persona)
+        siguiente_misma = np.zeros(n, dtype=bool)
+        siguiente_misma[:-1] = persona[1:] == persona[:-1]
+        destino = np.full(n, len(TIPOS_CICLO))
+        destino[:-1] = np.where(siguiente_misma[:-1], tipo[1:], len(TIPOS_CICLO))
+        incluidas = paso < PASOS_FLUJO - 1
+        n_destinos = len(TIPOS_CICLO) + 1
+        combinado = (paso[incluidas] * len(TIPOS_CICLO) + tipo[incluidas]) * n_destinos + destino[incluidas]
+        conteos = np.bincount(combinado, minlength=(PASOS_FLUJO - 1) * len(TIPOS_CICLO) * n_destinos)
+        presentes = np.flatnonzero(conteos)
+        nombres_destino = np.array(TIPOS_CICLO + [FIN_FLUJO], dtype=object)
+        return pd.DataFrame({
+            'paso': (presentes // (len(TIPOS_CICLO) * n_destinos) + 1).astype('int64'),
+            'origen': np.array(TIPOS_CICLO, dtype=object)[presentes // n_destinos % len(TIPOS_CICLO)],
+            'destino': nombres_destino[presentes % n_destinos],
+            'cantidad': conteos[presentes].astype('int64'),
+        })
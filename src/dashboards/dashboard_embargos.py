@@ -15,13 +15,6 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import json
 
-try:
-    import openpyxl
-    from openpyxl import Workbook
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
-
 script_dir = os.path.dirname(os.path.abspath(__file__))
 if script_dir not in sys.path:
     sys.path.insert(0, script_dir)
@@ -100,6 +93,22 @@ except ImportError:
     def get_sidebar_header(title_line1, title_line2):
         return f"<div><h1>{title_line1} {title_line2}</h1></div>"
 
+from motor_filtros import (
+    IndiceFiltros, VistaFiltrada, agregar_columnas_canonicas, columnas_visibles,
+    BANCOS_PERMITIDOS, ESTADOS_ORDEN, TIPOS_ORDEN, TIPOS_DOCUMENTO_ORDEN
+)
+from agregados_embargos import AGREGADOS, TOP_POR_MES, AgregadosPestana, ParcialesMetricas
+from busqueda_embargos import IndiceBusqueda, LONGITUD_MINIMA
+from ciclo_vida_embargos import FIN_FLUJO, MESES_COHORTE, CicloVida
+from datos_graficos import puntos_figura, reducir_lttb, tamano_figura
+from exportacion_embargos import (COMPLETADO, COMPRESIONES, EN_ESPERA, FORMATOS_COMPRIMIDOS, TrabajoExportacion,
+                                  excel_disponible, formatos_disponibles, leer_archivo)
+from geografia_embargos import PROPIEDAD_CODIGO_GEOJSON, IndiceMunicipios, cargar_geojson, cargar_municipios
+from paginacion_embargos import FILAS_POR_PAGINA, OPCIONES_FILAS_POR_PAGINA, IndiceOrden, total_paginas
+from datos_embargos import (
+    ConjuntoDatos, HASH_FUNCS, EXTENSION_ARROW, abrir_arrow, conjunto_vacio, huella_archivo, ruta_arrow_vigente
+)
+
 # Configuración de página
 st.set_page_config(
     page_title="Oficios Bancarios",
@@ -112,9 +121,27 @@ st.set_page_config(
 st.markdown(get_dashboard_styles(), unsafe_allow_html=True)
 
 # === CARGA DE DATOS OPTIMIZADA ===
-@st.cache_data(show_spinner="Cargando datos...", ttl=86400)
-def load_data() -> pd.DataFrame:
-    """Carga los datos del CSV con optimizaciones de rendimiento"""
+# Columnas que usan filtros, métricas y gráficos: se cargan siempre y se excluyen las
+# filas con NaN en cualquiera de ellas. Con el archivo Arrow, el resto de columnas
+# (correo, direccion, nombres, ...) solo se lee cuando se necesita
+COLUMNAS_FUNDAMENTALES = [
+    # Columnas de filtrado críticas
+    'entidad_bancaria',  # Filtro principal, gráfico Top 10
+    'ciudad',            # Filtro principal, gráfico Top 10, análisis geográfico
+    'estado_embargo',    # Filtro principal, gráfico de distribución
+    'tipo_embargo',      # Filtro principal, gráfico, proporciones Judicial/Coactivo
+    'mes',               # Filtro principal, evolución temporal, proporciones mensuales
+    # Columnas de métricas y cálculos críticas
+    'montoaembargar',    # Métricas principales (total, promedio), estadísticas
+    'es_cliente',        # Métricas de porcentaje de clientes
+    # Columnas de rankings y visualizaciones importantes
+    'funcionario',       # Gráfico Top 10 Funcionarios
+    'entidad_remitente', # Gráfico Top 10 Entidades Remitentes
+    'tipo_documento'     # Análisis detallado, distribución de documentos
+]
+
+def load_data() -> ConjuntoDatos:
+    """Localiza el CSV consolidado y devuelve una vista del conjunto compartido entre sesiones"""
     try:
         # Intentar obtener la ruta del archivo
         from utils_csv import find_csv_file, get_data_path, get_base_path
@@ -165,7 +192,7 @@ def load_data() -> pd.DataFrame:
                 3. **Si el archivo no existe:** Ejecuta el procesamiento desde el launcher
                 """
                 st.error(error_msg)
-                return pd.DataFrame()
+                return conjunto_vacio()
         
         # Si encontramos el archivo, usar get_csv_path para validación adicional
         csv_path = get_csv_path("embargos_consolidado_mensual.csv", required=True)
@@ -188,52 +215,41 @@ def load_data() -> pd.DataFrame:
            - Verifica que el CSV original tenga el formato correcto
            - Haz clic en "¿Cómo generar/obtener los CSV?" para más información
         """)
-        return pd.DataFrame()
+        return conjunto_vacio()
     
     if csv_path is None:
-        return pd.DataFrame()
+        return conjunto_vacio()
     
-    try:
-        import chardet
-        with open(csv_path, 'rb') as f:
-            raw_data = f.read(10000)
-            result = chardet.detect(raw_data)
-            encoding = result['encoding'] if result else 'utf-8'
-    except:
-        encoding = 'utf-8'
+    # Si el pipeline dejó la copia Arrow del consolidado (y está al día), se usa esa
+    ruta = ruta_arrow_vigente(csv_path) or csv_path
     
-    encodings = [encoding, 'utf-8', 'latin-1', 'cp1252']
+    # La huella (ruta, mtime y tamaño), tomada antes de leer, es la clave del conjunto
+    # compartido: el archivo solo se vuelve a leer cuando cambia
+    datos = load_shared_dataset(ruta, huella_archivo(ruta))
+    return datos.vista()
+
+@st.cache_resource(show_spinner="Cargando datos...", max_entries=1)
+def load_shared_dataset(ruta: str, huella: str) -> ConjuntoDatos:
+    """
+    Carga los datos del consolidado (Arrow o CSV) con optimizaciones de rendimiento.
+    Se guarda una sola copia por proceso, compartida (sin copiar) por todas las sesiones.
+    """
+    tabla = None
     df = None
-    
-    # Optimizar tipos de datos desde el inicio
-    dtype_dict = {
-        'entidad_bancaria': 'category',
-        'ciudad': 'category',
-        'entidad_remitente': 'category',
-        'tipo_documento': 'category',
-        'estado_embargo': 'category',
-        'tipo_embargo': 'category',
-        'mes': 'category',
-        'funcionario': 'category',
-        'estado_demandado': 'category',
-        'tipo_carta': 'category'
-    }
-    
-    for enc in encodings:
+    if ruta.endswith(EXTENSION_ARROW):
         try:
-            df = pd.read_csv(
-                csv_path, 
-                encoding=enc, 
-                low_memory=False,
-                dtype=dtype_dict,
-                engine='c'  # Usar engine C para mejor rendimiento
-            )
-            break
-        except:
-            continue
+            # Memory mapping: solo las columnas fundamentales pasan a pandas; las demás
+            # se leen del archivo cuando la búsqueda, la tabla o la exportación las piden
+            tabla, df = abrir_arrow(ruta, COLUMNAS_FUNDAMENTALES)
+        except Exception as e:
+            print(f"[ADVERTENCIA] No se pudo abrir {os.path.basename(ruta)} ({e}); se usa el CSV")
+            tabla = None
+            ruta = os.path.splitext(ruta)[0] + ".csv"
+    if tabla is None:
+        df = read_consolidated_csv(ruta)
     
     if df is None or df.empty:
-        return pd.DataFrame()
+        return conjunto_vacio()
     
     # Limpieza optimizada con operaciones vectorizadas
     if 'montoaembargar' in df.columns:
@@ -260,196 +276,227 @@ def load_data() -> pd.DataFrame:
     # Excluir registros con NaN SOLO en columnas fundamentales
     # Las columnas no relevantes (correo, direccion, fecha_banco, etc.) pueden tener NaN
     # sin afectar el análisis del dashboard
-    columnas_fundamentales = [
-        # Columnas de filtrado críticas
-        'entidad_bancaria',  # Filtro principal, gráfico Top 10
-        'ciudad',            # Filtro principal, gráfico Top 10, análisis geográfico
-        'estado_embargo',    # Filtro principal, gráfico de distribución
-        'tipo_embargo',      # Filtro principal, gráfico, proporciones Judicial/Coactivo
-        'mes',               # Filtro principal, evolución temporal, proporciones mensuales
-        # Columnas de métricas y cálculos críticas
-        'montoaembargar',    # Métricas principales (total, promedio), estadísticas
-        'es_cliente',        # Métricas de porcentaje de clientes
-        # Columnas de rankings y visualizaciones importantes
-        'funcionario',       # Gráfico Top 10 Funcionarios
-        'entidad_remitente', # Gráfico Top 10 Entidades Remitentes
-        'tipo_documento'     # Análisis detallado, distribución de documentos
-    ]
-    
     # Filtrar solo las columnas fundamentales que existen en el DataFrame
-    columnas_fundamentales_validas = [col for col in columnas_fundamentales if col in df.columns]
+    columnas_fundamentales_validas = [col for col in COLUMNAS_FUNDAMENTALES if col in df.columns]
     
+    filas = None
     if columnas_fundamentales_validas:
         # Excluir registros que tengan NaN en cualquiera de las columnas fundamentales
         # Las columnas no relevantes (correo, direccion, referencia, etc.) pueden tener NaN
-        # sin que esto afecte el análisis del dashboard
-        df = df.dropna(subset=columnas_fundamentales_validas)
+        # sin que esto afecte el análisis del dashboard. Las posiciones conservadas
+        # (`filas`) alinean las columnas que después se lean del archivo Arrow
+        validas = df[columnas_fundamentales_validas].notna().all(axis=1).to_numpy()
+        if not validas.all():
+            filas = np.flatnonzero(validas)
+            df = df.iloc[filas]
     
-    return df
-
-# === FUNCIONES DE ANÁLISIS OPTIMIZADAS ===
-@st.cache_data(show_spinner=False)
-def calculate_metrics(df: pd.DataFrame) -> Dict:
-    """Calcula métricas principales de forma optimizada"""
-    if df.empty:
-        return {}
+    # Valores canónicos (banco_canon, estado_canon, tipo_canon, tipo_documento_canon),
+    # normalizados una sola vez sobre las categorías únicas
+    df = agregar_columnas_canonicas(df)
     
-    total = len(df)
-    
-    # Operaciones vectorizadas optimizadas
-    monto_total = 0.0
-    monto_promedio = 0.0
-    if 'montoaembargar' in df.columns:
-        monto_total = float(df['montoaembargar'].sum())
-        monto_promedio = float(df['montoaembargar'].mean())
-    
-    activos = 0
-    if 'estado_embargo' in df.columns:
-        # Buscar exactamente 'Activo' (como en versión anterior: df_filt[df_filt['estado_embargo']=='Activo'])
-        # Convertir a string y normalizar para comparación
-        estado_str = df['estado_embargo'].astype(str).str.strip()
-        # Buscar 'Activo' exacto (mayúscula inicial) - igual que versión anterior
-        # También buscar variaciones por si acaso
-        mask_activo = (estado_str == 'Activo') | (estado_str.str.contains('^activo$', case=False, na=False, regex=True))
-        activos = int(mask_activo.sum())
+    return ConjuntoDatos(df, huella=huella, ruta=ruta, tabla=tabla, filas=filas)
+
+def read_consolidated_csv(csv_path: str) -> Optional[pd.DataFrame]:
+    """Lee el CSV consolidado completo, con detección de codificación y tipos compactos"""
+    try:
+        import chardet
+        with open(csv_path, 'rb') as f:
+            raw_data = f.read(10000)
+            result = chardet.detect(raw_data)
+            encoding = result['encoding'] if result else 'utf-8'
+    except:
+        encoding = 'utf-8'
     
-    clientes = 0
-    if 'es_cliente' in df.columns:
-        if df['es_cliente'].dtype in ['int8', 'int16', 'int32', 'int64', 'float32', 'float64']:
-            clientes = int(df['es_cliente'].sum())
-        else:
-            clientes = int((df['es_cliente'].astype(str).str.contains('SI|CLIENTE', case=False, na=False)).sum())
+    encodings = [encoding, 'utf-8', 'latin-1', 'cp1252']
+    df = None
     
-    # Calcular métricas adicionales de oficios
-    promedio_oficios_mes = 0.0
-    if 'mes' in df.columns and total > 0:
-        meses_unicos = df['mes'].nunique()
-        if meses_unicos > 0:
-            promedio_oficios_mes = total / meses_unicos
+    # Optimizar tipos de datos desde el inicio
+    dtype_dict = {
+        'entidad_bancaria': 'category',
+        'ciudad': 'category',
+        'entidad_remitente': 'category',
+        'tipo_documento': 'category',
+        'estado_embargo': 'category',
+        'tipo_embargo': 'category',
+        'mes': 'category',
+        'funcionario': 'category',
+        'estado_demandado': 'category',
+        'tipo_carta': 'category'
+    }
     
-    # Embargos judiciales
-    embargos_judiciales = 0
-    embargos_coactivos = 0
-    if 'tipo_embargo' in df.columns:
-        tipo_series = df['tipo_embargo'].astype(str).str.upper()
-        embargos_judiciales = int(tipo_series.str.contains('JUDICIAL', na=False).sum())
-        embargos_coactivos = int(tipo_series.str.contains('COACTIVO', na=False).sum())
+    for enc in encodings:
+        try:
+            df = pd.read_csv(
+                csv_path, 
+                encoding=enc, 
+                low_memory=False,
+                dtype=dtype_dict,
+                engine='c'  # Usar engine C para mejor rendimiento
+            )
+            break
+        except:
+            continue
     
-    return {
-        'total': total,
-        'total_oficios': total,  # Los registros son los oficios
-        'monto_total': monto_total,
-        'monto_promedio': monto_promedio,
-        'activos': activos,
-        'clientes': clientes,
-        'porcentaje_clientes': (clientes / total * 100) if total > 0 else 0.0,
-        'promedio_oficios_mes': promedio_oficios_mes,
-        'embargos_judiciales': embargos_judiciales,
-        'embargos_coactivos': embargos_coactivos
-    }
+    return df
+
+# === FUNCIONES DE ANÁLISIS OPTIMIZADAS ===
+@st.cache_data(show_spinner=False, max_entries=500, hash_funcs=HASH_FUNCS)
+def get_aggregate(datos: ConjuntoDatos, filtros: Dict, search_term: str, nombre: str):
+    """
+    Calcula un agregado (ver `agregados_embargos.AGREGADOS`) sobre las filas que cumplen
+    los filtros. Memoizado por (datos, filtros, búsqueda, agregado): cada pestaña solo
+    paga por lo que muestra, y volver a una combinación ya vista no recalcula nada.
+    Sin búsqueda global ni filtro de ciudad, las métricas y la distribución de
+    montos salen de los parciales precalculados y no recorren las filas filtradas
+    ('montos_exactos' sí las recorre); el ciclo de vida parte de los oficios ya
+    ordenados por demandado.
+    """
+    if nombre in ('metricas', 'montos') and not search_term and not datos.empty:
+        parciales = get_metric_partials(datos)
+        if parciales.cubre(nombre, filtros):
+            return getattr(parciales, nombre)(filtros)
+    if nombre == 'ciclo_vida' and not datos.empty:
+        return get_lifecycle(datos).resumen(get_filtered_view(datos, filtros, search_term).posiciones)
+    return AGREGADOS[nombre](get_filtered_view(datos, filtros, search_term))
+
 
+@st.cache_resource(show_spinner=False, max_entries=1, hash_funcs=HASH_FUNCS)
+def get_filter_index(datos: ConjuntoDatos) -> IndiceFiltros:
+    """Índice de filtros (posiciones por valor canónico), construido una vez por archivo cargado"""
+    return IndiceFiltros(datos.df)
 
-def normalize_tipo_documento_series(series: Optional[pd.Series]) -> pd.Series:
-    """Normaliza los valores de tipo_documento a categorías principales."""
-    if series is None or series.empty:
-        if series is None:
-            return pd.Series(dtype='object')
-        return pd.Series(index=series.index, dtype='object')
-    doc_series = series.astype(str).str.upper().str.strip()
-    normalized = pd.Series('Embargo', index=series.index, dtype='object')
-    mask_desembargo = doc_series.str.contains('DESEM|LEVANT', case=False, na=False)
-    mask_requerimiento = doc_series.str.contains('REQUER', case=False, na=False)
-    mask_no_procesable = doc_series.str.contains('NO', case=False, na=False) & doc_series.str.contains('PROCES', case=False, na=False)
-    normalized[mask_desembargo] = 'Desembargo'
-    normalized[mask_requerimiento] = 'Requerimiento'
-    normalized[mask_no_procesable] = 'No procesable'
-    return normalized
+
+@st.cache_resource(show_spinner=False, max_entries=1, hash_funcs=HASH_FUNCS)
+def get_metric_partials(datos: ConjuntoDatos) -> ParcialesMetricas:
+    """Parciales de las métricas por combinación de valores de filtro, una vez por archivo cargado"""
+    return ParcialesMetricas(datos.df, get_filter_index(datos))
+
+
+@st.cache_resource(show_spinner="Preparando búsqueda...", max_entries=1, hash_funcs=HASH_FUNCS)
+def get_search_index(datos: ConjuntoDatos) -> IndiceBusqueda:
+    """
+    Índice de búsqueda global, construido una vez por archivo cargado y compartido
+    entre sesiones. Se crea con la primera búsqueda: nombres e identificacion solo
+    se leen del archivo si alguien busca.
+    """
+    return IndiceBusqueda(datos)
+
+
+@st.cache_resource(show_spinner=False, max_entries=1, hash_funcs=HASH_FUNCS)
+def get_sort_index(datos: ConjuntoDatos) -> IndiceOrden:
+    """Órdenes por columna de la tabla paginada, construidos al primer uso y compartidos entre sesiones"""
+    return IndiceOrden(datos)
+
+
+@st.cache_resource(show_spinner="Ordenando oficios por demandado...", max_entries=1, hash_funcs=HASH_FUNCS)
+def get_lifecycle(datos: ConjuntoDatos) -> CicloVida:
+    """Oficios ordenados por (identificación, fecha), una vez por archivo cargado; se crea al abrir el ciclo de vida"""
+    return CicloVida(datos)
+
+
+@st.cache_resource(show_spinner=False)
+def get_city_index() -> IndiceMunicipios:
+    """Listado de municipios DANE y nombres de ciudad ya resueltos, compartidos por todo el proceso"""
+    return IndiceMunicipios(cargar_municipios())
+
+
+@st.cache_resource(show_spinner=False)
+def get_municipality_geometries() -> Optional[Dict]:
+    """Geometrías simplificadas de los municipios (opcionales; sin ellas el mapa es de burbujas)"""
+    return cargar_geojson()
 
 # === FUNCIÓN DE FILTRADO OPTIMIZADA (NUNCA SE CONGELA) ===
-@st.cache_data(show_spinner=False, max_entries=100)
-def apply_filters_fast(df: pd.DataFrame, filtros: Dict, search_term: str = "") -> pd.DataFrame:
-    """Aplica filtros de forma ultra-rápida - GARANTIZA que nunca se congela"""
-    if df.empty:
-        return pd.DataFrame()
+@st.cache_data(show_spinner=False, max_entries=100, hash_funcs=HASH_FUNCS)
+def apply_filters_fast(datos: ConjuntoDatos, filtros: Dict, search_term: str = "") -> Optional[np.ndarray]:
+    """
+    Aplica filtros de forma ultra-rápida - GARANTIZA que nunca se congela.
+    Devuelve las posiciones de las filas seleccionadas (None = todas), no una copia
+    del DataFrame: el cache guarda solo el tamaño del índice por combinación de filtros.
+    """
+    if datos.empty:
+        return np.empty(0, dtype=np.int64)
     
     try:
-        mask = pd.Series(True, index=df.index)
-        if filtros.get('banco') and isinstance(filtros['banco'], list) and len(filtros['banco']) > 0:
-            if 'entidad_bancaria' in df.columns:
-                bancos_sel = [str(b).strip().upper() for b in filtros['banco']]
-                bancos_df = df['entidad_bancaria'].astype(str).str.strip().str.upper()
-                mask &= bancos_df.isin(bancos_sel)
-        
-        if filtros.get('ciudad') and isinstance(filtros['ciudad'], list) and len(filtros['ciudad']) > 0:
-            if 'ciudad' in df.columns:
-                mask &= df['ciudad'].isin(filtros['ciudad'])
-        
-        if filtros.get('estado') and isinstance(filtros['estado'], list) and len(filtros['estado']) > 0:
-            if 'estado_embargo' in df.columns:
-                estados_permitidos_map = {
-                    'CONFIRMADO': ['CONFIRMADO', 'CONFIRMADOS', 'Confirmado', 'Confirmados', 'confirmado', 'confirmados'],
-                    'PROCESADO': ['PROCESADO', 'PROCESADOS', 'Procesado', 'Procesados', 'procesado', 'procesados'],
-                    'SIN_CONFIRMAR': ['SIN_CONFIRMAR', 'SIN CONFIRMAR', 'SINCONFIRMAR', 'Sin confirmar', 'Sin Confirmar', 'SIN_CONFIRMADO', 'SIN CONFIRMADO'],
-                    'PROCESADO_CON_ERRORES': ['PROCESADO_CON_ERRORES', 'PROCESADO CON ERRORES', 'PROCESADOCONERRORES',
-                                             'PROCESADO_CON_ERROR', 'PROCESADO CON ERROR', 'Procesado con error', 
-                                             'Procesado con errores', 'CON_ERROR', 'CON_ERRORES', 'CON ERROR', 'CON ERRORES']
-                }
-                
-                estados_df = df['estado_embargo'].astype(str).str.strip().str.upper().str.replace(' ', '_').str.replace('-', '_').str.rstrip('_')
-                mask_estado = pd.Series(False, index=df.index)
-                for estado_seleccionado in filtros['estado']:
-                    if estado_seleccionado in estados_permitidos_map:
-                        variaciones = [v.upper().replace(' ', '_').replace('-', '_').rstrip('_') for v in estados_permitidos_map[estado_seleccionado]]
-                        mask_estado |= estados_df.isin(variaciones)
-                
-                mask &= mask_estado
-        
-        if filtros.get('tipo') and isinstance(filtros['tipo'], list) and len(filtros['tipo']) > 0:
-            if 'tipo_embargo' in df.columns:
-                tipo_embargo_map = {
-                    'JUDICIAL': ['JUDICIAL', 'Judicial', 'judicial', 'JUDICIALES', 'Judiciales'],
-                    'COACTIVO': ['COACTIVO', 'Coactivo', 'coactivo', 'COACTIVOS', 'Coactivos']
-                }
-                
-                tipos_df = df['tipo_embargo'].astype(str).str.strip().str.upper().str.replace(' ', '_').str.rstrip('_')
-                mask_tipo = pd.Series(False, index=df.index)
-                for tipo_seleccionado in filtros['tipo']:
-                    if tipo_seleccionado in tipo_embargo_map:
-                        variaciones = [v.upper().replace(' ', '_').rstrip('_') for v in tipo_embargo_map[tipo_seleccionado]]
-                        mask_tipo |= tipos_df.isin(variaciones)
-                
-                mask &= mask_tipo
-
-        if filtros.get('tipo_documento') and isinstance(filtros['tipo_documento'], list) and len(filtros['tipo_documento']) > 0:
-            if 'tipo_documento' in df.columns:
-                doc_normalizado = normalize_tipo_documento_series(df['tipo_documento'])
-                mask &= doc_normalizado.isin(filtros['tipo_documento'])
+        # Banco, ciudad, estado, tipo, tipo de documento y mes se resuelven con el índice
+        posiciones = get_filter_index(datos).seleccionar(filtros)
         
-        if filtros.get('mes') and isinstance(filtros['mes'], list) and len(filtros['mes']) > 0:
-            if 'mes' in df.columns:
-                mes_list = [str(x) for x in filtros['mes']]
-                mask &= df['mes'].astype(str).isin(mes_list)
+        if search_term and len(search_term) >= LONGITUD_MINIMA:
+            # Búsqueda global con el índice de trigramas sobre los valores únicos
+            posiciones = get_search_index(datos).buscar(search_term, posiciones)
         
-        df_filt = df.loc[mask].copy()
-        
-        if search_term and len(search_term) > 2:
-            search_cols = ['entidad_bancaria', 'ciudad', 'entidad_remitente', 'nombres', 'identificacion']
-            search_cols = [col for col in search_cols if col in df_filt.columns]
-            
-            if search_cols:
-                search_mask = pd.Series(False, index=df_filt.index)
-                for col in search_cols:
-                    try:
-                        search_mask |= df_filt[col].astype(str).str.contains(search_term, case=False, na=False, regex=False)
-                    except:
-                        continue
-                df_filt = df_filt.loc[search_mask]
-        
-        return df_filt
+        return posiciones
     except Exception as e:
-        # Si hay cualquier error, retornar DataFrame vacío en lugar de congelar
+        # Si hay cualquier error, retornar selección vacía en lugar de congelar
         # Esto previene que la aplicación se congele cuando se eliminan filtros
-        return pd.DataFrame()
+        return np.empty(0, dtype=np.int64)
+
+
+def get_filtered_view(datos: ConjuntoDatos, filtros: Dict, search_term: str = "") -> VistaFiltrada:
+    """Vista de las filas que cumplen los filtros sobre el DataFrame cargado (sin copiarlo)"""
+    if datos.empty:
+        return VistaFiltrada(datos, np.empty(0, dtype=np.int64))
+    return VistaFiltrada(datos, apply_filters_fast(datos, filtros, search_term))
+
+
+def render_chart(fig):
+    """
+    Muestra una figura. Con `?debug=1` en la URL informa cuántos puntos y bytes
+    envía al navegador (los datos ya llegan reducidos, ver `datos_graficos`).
+    """
+    st.plotly_chart(fig, use_container_width=True)
+    if st.query_params.get('debug') == '1':
+        st.caption(f"[debug] {puntos_figura(fig):,} puntos · {tamano_figura(fig) / 1024:,.1f} KB enviados al navegador")
+
+
+def render_export_jobs(trabajos: List[TrabajoExportacion], sondeo: bool):
+    """
+    Lista de exportaciones de la sesión. Se dibuja como fragmento: mientras hay
+    trabajos activos se refresca sola cada segundo sin volver a ejecutar el
+    resto del dashboard.
+    """
+    for trabajo in list(trabajos):
+        descripcion = f"**{trabajo.formato}**"
+        if trabajo.compresion != "Ninguna":
+            descripcion += f" ({trabajo.compresion})"
+        descripcion += f" · {trabajo.total:,} registros · {datetime.fromtimestamp(trabajo.creado).strftime('%H:%M:%S')}"
+        
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.markdown(descripcion)
+            if trabajo.activo:
+                texto = "En espera..." if trabajo.estado == EN_ESPERA else f"{trabajo.escritas:,} de {trabajo.total:,} registros"
+                st.progress(trabajo.avance, text=texto)
+            elif trabajo.estado == COMPLETADO:
+                archivo = trabajo.archivo
+                detalle = f"{archivo['bytes'] / 1024 ** 2:,.1f} MB en {trabajo.duracion:,.1f}s"
+                if archivo['hojas'] > 1:
+                    detalle += f" · {archivo['hojas']} hojas"
+                st.caption(f"{archivo['nombre_archivo']} ({detalle})")
+                # Descarga diferida: el archivo se lee del disco solo al pulsar el botón
+                st.download_button(
+                    label="Descargar",
+                    data=lambda ruta=archivo['ruta']: leer_archivo(ruta),
+                    file_name=archivo['nombre_archivo'],
+                    mime=archivo['mime'],
+                    key=f"descargar_exportacion_{trabajo.id}",
+                    on_click="ignore"
+                )
+            elif trabajo.error:
+                st.error(f"Error al generar el archivo: {trabajo.error}")
+            else:
+                st.caption("Cancelada")
+        with col2:
+            if trabajo.activo:
+                if st.button("Cancelar", key=f"cancelar_exportacion_{trabajo.id}"):
+                    trabajo.cancelar()
+            elif st.button("Quitar", key=f"quitar_exportacion_{trabajo.id}"):
+                trabajo.descartar()
+                trabajos.remove(trabajo)
+                st.rerun()
+    
+    # Al terminar el último trabajo activo se redibuja la página para dejar de refrescar
+    if sondeo and not any(trabajo.activo for trabajo in trabajos):
+        st.rerun()
 
 # === INTERFAZ PRINCIPAL ===
 def main():
@@ -479,9 +526,14 @@ def main():
         
         if st.button("Recargar Datos", use_container_width=True, help="Fuerza la recarga de datos desde el CSV, limpiando el cache"):
             # Limpiar cache de datos
-            load_data.clear()
+            load_shared_dataset.clear()
+            get_filter_index.clear()
+            get_search_index.clear()
+            get_metric_partials.clear()
+            get_sort_index.clear()
+            get_lifecycle.clear()
             apply_filters_fast.clear()
-            calculate_metrics.clear()
+            get_aggregate.clear()
             st.rerun()
         
         selected_tab = st.session_state.selected_tab
@@ -495,29 +547,29 @@ def main():
     # Cargar datos de forma lazy (después de mostrar interfaz)
     # NO bloquear la interfaz - cargar en background
     try:
-        df = load_data()
+        datos = load_data()
     except:
-        df = pd.DataFrame()
+        datos = conjunto_vacio()
     
-    if df.empty:
-        # Crear DataFrame vacío para que la interfaz funcione sin bloquear
-        df = pd.DataFrame()
+    # El DataFrame (vacío si no hay datos) para que la interfaz funcione sin bloquear;
+    # las funciones cacheadas reciben `datos`, identificado por la huella del archivo
+    df = datos.df
     
     # Obtener opciones únicas (cacheado) - solo si hay datos
-    @st.cache_data(show_spinner=False, ttl=86400)
-    def get_options_cached(df: pd.DataFrame, col: str) -> List:
+    @st.cache_data(show_spinner=False, ttl=86400, hash_funcs=HASH_FUNCS)
+    def get_options_cached(datos: ConjuntoDatos, col: str) -> List:
         """Obtiene opciones únicas de forma cacheada"""
-        if df.empty or col not in df.columns:
+        if datos.empty or col not in datos.df.columns:
             return []
         try:
-            return sorted([str(x) for x in df[col].dropna().unique() if str(x).strip()])
+            return sorted([str(x) for x in datos.df[col].dropna().unique() if str(x).strip()])
         except:
             return []
     
     def get_options(col):
         if df.empty:
             return []
-        return get_options_cached(df, col)
+        return get_options_cached(datos, col)
     
     # === FUNCIÓN: FILTROS MULTISELECT PROFESIONALES ===
     def create_multiselect_filter(title, options, key_prefix, container=None):
@@ -548,16 +600,22 @@ def main():
     # === SECCIÓN DE FILTROS ===
     st.markdown("### Filtros de Búsqueda", unsafe_allow_html=True)
     
-    # Eliminamos la búsqueda global para simplificar la experiencia de filtros
-    search_term = ""
-    
     # Filtros en columnas
     # === RESETEAR FILTROS (antes de crear widgets) ===
     if st.session_state.get('_reset_filtros', False):
-        for key in ['filtro_banco', 'filtro_ciudad', 'filtro_estado', 'filtro_tipo', 'filtro_mes', 'filtro_tipo_documento']:
+        for key in ['filtro_banco', 'filtro_ciudad', 'filtro_estado', 'filtro_tipo', 'filtro_mes', 'filtro_tipo_documento', 'busqueda_global']:
             if key in st.session_state:
                 del st.session_state[key]
         st.session_state['_reset_filtros'] = False
+    
+    # Búsqueda global (banco, ciudad, remitente, nombres, identificación) con índice
+    search_term = st.text_input(
+        "Búsqueda global",
+        key='busqueda_global',
+        placeholder=f"Nombre, identificación, banco, ciudad o remitente (mínimo {LONGITUD_MINIMA} caracteres)"
+    ).strip()
+    if len(search_term) < LONGITUD_MINIMA:
+        search_term = ""
 
     filtros = {}
     col_f1, col_f2, col_f3 = st.columns(3)
@@ -565,22 +623,9 @@ def main():
     
     with col_f1:
         if not df.empty and 'entidad_bancaria' in df.columns:
-            # Obtener opciones de bancos y filtrar valores no bancarios
-            bancos_raw = get_options('entidad_bancaria')
-            bancos_permitidos = ['FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER']
-            bancos = []
-            for banco in bancos_raw:
-                banco_norm = str(banco).strip().upper()
-                if banco_norm in bancos_permitidos and banco not in bancos:
-                    bancos.append(banco)
-            # Mantener el orden definido por negocios
-            bancos_ordenados = []
-            for permitido in bancos_permitidos:
-                for banco in bancos:
-                    if str(banco).strip().upper() == permitido:
-                        bancos_ordenados.append(banco)
-                        break
-            bancos = bancos_ordenados
+            # Solo los bancos reales, en el orden definido por negocios
+            bancos_presentes = get_filter_index(datos).valores('banco')
+            bancos = [b for b in BANCOS_PERMITIDOS if b in bancos_presentes]
             filtros['banco'] = create_multiselect_filter("Entidad Bancaria", bancos, 'filtro_banco', st)
         else:
             filtros['banco'] = []
@@ -594,32 +639,8 @@ def main():
     
     with col_f3:
         if not df.empty and 'estado_embargo' in df.columns:
-            estados_raw = get_options('estado_embargo')
-            
-            estados_permitidos_map = {
-                'CONFIRMADO': ['CONFIRMADO', 'CONFIRMADOS', 'Confirmado', 'Confirmados', 'confirmado', 'confirmados'],
-                'PROCESADO': ['PROCESADO', 'PROCESADOS', 'Procesado', 'Procesados', 'procesado', 'procesados'],
-                'SIN_CONFIRMAR': ['SIN_CONFIRMAR', 'SIN CONFIRMAR', 'SINCONFIRMAR', 'Sin confirmar', 'Sin Confirmar', 'SIN_CONFIRMADO', 'SIN CONFIRMADO'],
-                'PROCESADO_CON_ERRORES': ['PROCESADO_CON_ERRORES', 'PROCESADO CON ERRORES', 'PROCESADOCONERRORES',
-                                         'PROCESADO_CON_ERROR', 'PROCESADO CON ERROR', 'Procesado con error', 
-                                         'Procesado con errores', 'CON_ERROR', 'CON_ERRORES', 'CON ERROR', 'CON ERRORES']
-            }
-            
-            estados_filtrados = []
-            estados_normalizados_set = set()
-            
-            for estado_estandar, variaciones in estados_permitidos_map.items():
-                for estado_raw in estados_raw:
-                    estado_str = str(estado_raw).strip().upper().replace(' ', '_').replace('-', '_').rstrip('_')
-                    variaciones_normalizadas = [v.upper().replace(' ', '_').replace('-', '_').rstrip('_') for v in variaciones]
-                    
-                    if estado_str in variaciones_normalizadas and estado_estandar not in estados_normalizados_set:
-                        estados_filtrados.append(estado_estandar)
-                        estados_normalizados_set.add(estado_estandar)
-                        break
-            
-            estados_orden = ['CONFIRMADO', 'PROCESADO', 'SIN_CONFIRMAR', 'PROCESADO_CON_ERRORES']
-            estados_filtrados = [e for e in estados_orden if e in estados_filtrados]
+            estados_presentes = get_filter_index(datos).valores('estado')
+            estados_filtrados = [e for e in ESTADOS_ORDEN if e in estados_presentes]
             
             filtros['estado'] = create_multiselect_filter("Estado", estados_filtrados, 'filtro_estado', st)
         else:
@@ -627,28 +648,8 @@ def main():
     
     with col_f4:
         if not df.empty and 'tipo_embargo' in df.columns:
-            tipos_raw = get_options('tipo_embargo')
-            
-            tipo_embargo_map = {
-                'JUDICIAL': ['JUDICIAL', 'Judicial', 'judicial', 'JUDICIALES', 'Judiciales'],
-                'COACTIVO': ['COACTIVO', 'Coactivo', 'coactivo', 'COACTIVOS', 'Coactivos']
-            }
-            
-            tipos_filtrados = []
-            tipos_normalizados_set = set()
-            
-            for tipo_estandar, variaciones in tipo_embargo_map.items():
-                for tipo_raw in tipos_raw:
-                    tipo_str = str(tipo_raw).strip().upper().replace(' ', '_').rstrip('_')
-                    variaciones_normalizadas = [v.upper().replace(' ', '_').rstrip('_') for v in variaciones]
-                    
-                    if tipo_str in variaciones_normalizadas and tipo_estandar not in tipos_normalizados_set:
-                        tipos_filtrados.append(tipo_estandar)
-                        tipos_normalizados_set.add(tipo_estandar)
-                        break
-            
-            tipos_orden = ['JUDICIAL', 'COACTIVO']
-            tipos_filtrados = [t for t in tipos_orden if t in tipos_filtrados]
+            tipos_presentes = get_filter_index(datos).valores('tipo')
+            tipos_filtrados = [t for t in TIPOS_ORDEN if t in tipos_presentes]
             
             filtros['tipo'] = create_multiselect_filter("Tipo de Embargo", tipos_filtrados, 'filtro_tipo', st)
         else:
@@ -673,9 +674,8 @@ def main():
     
     with col_f6:
         if not df.empty and 'tipo_documento' in df.columns:
-            doc_map = normalize_tipo_documento_series(df['tipo_documento'])
-            doc_options = ['Embargo', 'Desembargo', 'Requerimiento', 'No procesable']
-            opciones_disponibles = [opt for opt in doc_options if opt in doc_map.unique().tolist()]
+            doc_presentes = get_filter_index(datos).valores('tipo_documento')
+            opciones_disponibles = [opt for opt in TIPOS_DOCUMENTO_ORDEN if opt in doc_presentes]
             filtros['tipo_documento'] = create_multiselect_filter("Tipo de Documento", opciones_disponibles, 'filtro_tipo_documento', st)
         else:
             filtros['tipo_documento'] = []
@@ -703,21 +703,33 @@ def main():
                 else:
                     filtros_safe[key] = []
             
-            df_filt = apply_filters_fast(df, filtros_safe, search_term)
+            df_filt = get_filtered_view(datos, filtros_safe, search_term)
         else:
-            df_filt = pd.DataFrame()
+            df_filt = VistaFiltrada(pd.DataFrame())
     except Exception as e:
-        # Si hay error, retornar DataFrame vacío en lugar de congelar
+        # Si hay error, retornar vista vacía en lugar de congelar
         st.warning(f"Error al aplicar filtros: {str(e)}")
-        df_filt = pd.DataFrame()
+        df_filt = VistaFiltrada(pd.DataFrame())
+    
+    # === AGREGADOS DE LA PESTAÑA VISIBLE (LAZY) ===
+    # Cada pestaña declara sus agregados (agregados_embargos.AGREGADOS_POR_PESTANA);
+    # solo se calculan los que la pestaña visible pide, memoizados por filtros
+    selected_tab = st.session_state.get('selected_tab', 'Dashboard Principal')
+    agregados = AgregadosPestana(
+        selected_tab,
+        lambda nombre: get_aggregate(datos, filtros_safe, search_term, nombre)
+    )
     
     # === MÉTRICAS PRINCIPALES MEJORADAS (LAZY) ===
-    # Solo calcular si hay datos
+    # Solo calcular si hay datos y la pestaña muestra el resumen ejecutivo
     if not df_filt.empty:
-        metrics = calculate_metrics(df_filt)
+        metrics = agregados['metricas'] if agregados.usa('metricas') else {}
         # Mostrar mensaje informativo sobre registros encontrados
         total_registros = len(df_filt)
         st.success(f"Se encontraron **{total_registros:,}** registros para los filtros actuales.")
+    elif not agregados.usa('metricas'):
+        metrics = {}
+        st.warning("No se encontraron registros para los filtros actuales.")
     else:
         metrics = {
             'total': 0,
@@ -880,8 +892,6 @@ def main():
     """, unsafe_allow_html=True)
     
     # === RENDERIZADO DE CONTENIDO SEGÚN NAVEGACIÓN ===
-    selected_tab = st.session_state.get('selected_tab', 'Dashboard Principal')
-    
     # === TAB 1: DASHBOARD PRINCIPAL ===
     if selected_tab == "Dashboard Principal":
         if df_filt.empty:
@@ -893,6 +903,9 @@ def main():
             </div>
             """, unsafe_allow_html=True)
         else:
+            # Todos los conteos de la pestaña salen de una sola pasada sobre los datos filtrados
+            principal = agregados['resumen_principal']
+            
             # Distribución de Datos
             st.markdown("### Distribución de Datos")
             
@@ -901,122 +914,51 @@ def main():
             
             with col_left:
                 st.markdown("#### Distribución por Tipo de Embargo")
-                if 'tipo_embargo' in df_filt.columns:
-                    tipo_embargo_map = {
-                        'JUDICIAL': ['JUDICIAL', 'Judicial', 'judicial', 'JUDICIAL_', 'JUDICIALES'],
-                        'COACTIVO': ['COACTIVO', 'Coactivo', 'coactivo', 'COACTIVO_', 'COACTIVOS']
-                    }
-                    
-                    tipo_raw = df_filt['tipo_embargo'].astype(str).str.strip()
-                    tipo_normalizado = tipo_raw.str.upper().str.replace(' ', '_').str.rstrip('_')
-                    mask_validos = pd.Series(False, index=df_filt.index)
-                    tipo_mapeado = pd.Series(index=df_filt.index, dtype=str)
-                    
-                    for tipo_estandar, variaciones in tipo_embargo_map.items():
-                        variaciones_normalizadas = [v.upper().replace(' ', '_').rstrip('_') for v in variaciones]
-                        mask = tipo_normalizado.isin(variaciones_normalizadas)
-                        mask_validos |= mask
-                        tipo_mapeado[mask] = tipo_estandar
-                    
-                    tipo_filtrado = df_filt[mask_validos].copy()
+                if 'tipo_canon' in df_filt.columns:
+                    tipo_counts = principal['conteo_tipo']
+                    tipo_counts = tipo_counts[tipo_counts > 0]
                     
-                    if not tipo_filtrado.empty:
-                        # Usar los tipos mapeados (estandarizados)
-                        tipo_filtrado['tipo_embargo_clean'] = tipo_mapeado[mask_validos]
-                        tipo_counts = tipo_filtrado['tipo_embargo_clean'].value_counts()
-                        tipo_counts = tipo_counts[tipo_counts.index.isin(['JUDICIAL', 'COACTIVO'])]
+                    if not tipo_counts.empty:
+                        df_pie = pd.DataFrame({
+                            'tipo': tipo_counts.index.astype(str),
+                            'cantidad': tipo_counts.values
+                        })
                         
-                        if not tipo_counts.empty:
-                            df_pie = pd.DataFrame({
-                                'tipo': tipo_counts.index,
-                                'cantidad': tipo_counts.values
-                            })
-                            
-                            fig = px.pie(
-                                df_pie,
-                                values='cantidad',
-                                names='tipo',
-                                hole=0.5,
-                                color_discrete_sequence=['#3c8198', '#bfe084', '#424e71', '#252559']
-                            )
-                            fig.update_traces(
-                                textposition='inside', 
-                                textinfo='percent+label',
-                                marker=dict(line=dict(color='#FFFFFF', width=2))
-                            )
-                            fig.update_layout(
-                                showlegend=True, 
-                                height=450,
-                                plot_bgcolor='rgba(0,0,0,0)',
-                                paper_bgcolor='rgba(0,0,0,0)',
-                                font=dict(size=12),
-                                legend=dict(
-                                    orientation="v",
-                                    yanchor="middle",
-                                    y=0.5,
-                                    xanchor="left",
-                                    x=1.05
-                                )
+                        fig = px.pie(
+                            df_pie,
+                            values='cantidad',
+                            names='tipo',
+                            hole=0.5,
+                            color_discrete_sequence=['#3c8198', '#bfe084', '#424e71', '#252559']
+                        )
+                        fig.update_traces(
+                            textposition='inside', 
+                            textinfo='percent+label',
+                            marker=dict(line=dict(color='#FFFFFF', width=2))
+                        )
+                        fig.update_layout(
+                            showlegend=True, 
+                            height=450,
+                            plot_bgcolor='rgba(0,0,0,0)',
+                            paper_bgcolor='rgba(0,0,0,0)',
+                            font=dict(size=12),
+                            legend=dict(
+                                orientation="v",
+                                yanchor="middle",
+                                y=0.5,
+                                xanchor="left",
+                                x=1.05
                             )
-                            st.plotly_chart(fig, use_container_width=True)
+                        )
+                        render_chart(fig)
             
             with col_right:
                 st.markdown("#### Distribución por Estado")
-                if 'estado_embargo' in df_filt.columns and len(df_filt) > 0:
-                    estados_permitidos_map = {
-                        'CONFIRMADO': [
-                            'CONFIRMADO', 'CONFIRMADOS', 'Confirmado', 'Confirmados', 'confirmado', 'confirmados',
-                            'CONFIRMADO_', 'CONFIRMADOS_'
-                        ],
-                        'PROCESADO': [
-                            'PROCESADO', 'PROCESADOS', 'Procesado', 'Procesados', 'procesado', 'procesados',
-                            'PROCESADO_', 'PROCESADOS_'
-                        ],
-                        'SIN_CONFIRMAR': [
-                            'SIN_CONFIRMAR', 'SIN CONFIRMAR', 'SINCONFIRMAR', 'Sin confirmar', 'Sin Confirmar',
-                            'SIN_CONFIRMAR_', 'SIN_CONFIRMADO', 'SIN CONFIRMADO', 'SINCONFIRMADO'
-                        ],
-                        'PROCESADO_CON_ERRORES': [
-                            'PROCESADO_CON_ERRORES', 'PROCESADO CON ERRORES', 'PROCESADOCONERRORES',
-                            'PROCESADO_CON_ERROR', 'PROCESADO CON ERROR', 'PROCESADOCONERROR',
-                            'Procesado con error', 'Procesado con errores', 'Procesado Con Error', 'Procesado Con Errores',
-                            'CON_ERROR', 'CON_ERRORES', 'CON ERROR', 'CON ERRORES',
-                            'PROCESADO_CON_ERRORES_', 'PROCESADO_CON_ERROR_'
-                        ]
-                    }
-                    
-                    # Normalizar valores: convertir a string, limpiar, y normalizar a mayúsculas
-                    # Reemplazar espacios por guiones bajos y eliminar caracteres especiales
-                    estados_raw = df_filt['estado_embargo'].astype(str).str.strip()
-                    estados_normalizados = estados_raw.str.upper().str.replace(' ', '_').str.replace('-', '_')
-                    # Eliminar guiones bajos al final
-                    estados_normalizados = estados_normalizados.str.rstrip('_')
-                    
-                    # Crear máscara para filtrar estados válidos
-                    mask_estados_validos = pd.Series(False, index=df_filt.index)
-                    estados_mapeados = pd.Series(index=df_filt.index, dtype=str)
-                    
-                    for estado_estandar, variaciones in estados_permitidos_map.items():
-                        variaciones_normalizadas = []
-                        for v in variaciones:
-                            v_norm = v.upper().replace(' ', '_').replace('-', '_').rstrip('_')
-                            variaciones_normalizadas.append(v_norm)
-                        mask = estados_normalizados.isin(variaciones_normalizadas)
-                        mask_estados_validos |= mask
-                        estados_mapeados[mask] = estado_estandar
-                    
-                    estados_filtrados = df_filt[mask_estados_validos].copy()
-                    
-                    if not estados_filtrados.empty:
-                        # Usar los estados mapeados (estandarizados)
-                        estados_filtrados['estado_clean'] = estados_mapeados[mask_estados_validos]
-                        estado_counts = estados_filtrados['estado_clean'].value_counts()
-                        
-                        # Asegurar que solo tenemos los estados permitidos en el orden correcto
-                        estados_orden = ['CONFIRMADO', 'PROCESADO', 'SIN_CONFIRMAR', 'PROCESADO_CON_ERRORES']
-                        estado_counts = estado_counts.reindex([e for e in estados_orden if e in estado_counts.index])
-                    else:
-                        estado_counts = pd.Series(dtype=int)
+                if 'estado_canon' in df_filt.columns and len(df_filt) > 0:
+                    # Conteo por estado canónico, en el orden de negocio (CONFIRMADO, PROCESADO, ...)
+                    estado_counts = principal['conteo_estado']
+                    estado_counts = estado_counts[estado_counts > 0]
+                    estado_counts.index = estado_counts.index.astype(str)
                     if not estado_counts.empty and len(estado_counts) > 0:
                         fig = go.Figure(data=[
                             go.Bar(
@@ -1039,7 +981,7 @@ def main():
                             yaxis=dict(title='Cantidad'),
                             font=dict(size=12)
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        render_chart(fig)
             
             # Rankings principales
             st.markdown("### Rankings Principales")
@@ -1048,26 +990,11 @@ def main():
             
             with col_a:
                 st.markdown("#### Entidades Bancarias")
-                if 'entidad_bancaria' in df_filt.columns and len(df_filt) > 0:
-                    # Solo incluir los 4 bancos reales
-                    bancos_validos = ['FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER']
-                    
-                    # Valores a excluir explícitamente (estados que no son bancos)
-                    valores_excluir = ['PROCESADO', 'DESEMBARGO', 'CONFIRMADO', 'EMBARGO',
-                                     'Procesado', 'Desembargo', 'Confirmado', 'Embargo',
-                                     'procesado', 'desembargo', 'confirmado', 'embargo']
-                    
-                    # Filtrar datos: solo incluir los bancos válidos y excluir valores de estado
-                    df_bancos_filtrado = df_filt[
-                        (df_filt['entidad_bancaria'].astype(str).str.upper().isin([b.upper() for b in bancos_validos])) &
-                        (~df_filt['entidad_bancaria'].astype(str).str.upper().isin([v.upper() for v in valores_excluir]))
-                    ]
-                    
-                    # Contar bancos válidos (solo los que tienen datos)
-                    top_bancos = df_bancos_filtrado['entidad_bancaria'].value_counts()
-                    
-                    # Filtrar solo los bancos válidos del resultado (por si acaso)
-                    top_bancos = top_bancos[top_bancos.index.astype(str).str.upper().isin([b.upper() for b in bancos_validos])]
+                if 'banco_canon' in df_filt.columns and len(df_filt) > 0:
+                    # Solo los 4 bancos reales (banco_canon es NaN para cualquier otro valor)
+                    top_bancos = principal['conteo_banco']
+                    top_bancos = top_bancos[top_bancos > 0]
+                    top_bancos.index = top_bancos.index.astype(str)
                     
                     if not top_bancos.empty and len(top_bancos) > 0:
                         fig = go.Figure(data=[
@@ -1093,12 +1020,12 @@ def main():
                             yaxis=dict(title='Banco'),
                             font=dict(size=12)
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        render_chart(fig)
             
             with col_b:
                 st.markdown("#### Ciudades")
                 if 'ciudad' in df_filt.columns and len(df_filt) > 0:
-                    top_ciudades = df_filt['ciudad'].value_counts().head(10)
+                    top_ciudades = principal['top_ciudades']
                     if not top_ciudades.empty and len(top_ciudades) > 0:
                         fig = go.Figure(data=[
                             go.Bar(
@@ -1123,12 +1050,12 @@ def main():
                             yaxis=dict(title='Ciudad'),
                             font=dict(size=12)
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        render_chart(fig)
             
             with col_c:
                 st.markdown("#### Funcionarios")
                 if 'funcionario' in df_filt.columns and len(df_filt) > 0:
-                    top_funcionarios = df_filt['funcionario'].value_counts().head(10)
+                    top_funcionarios = principal['top_funcionarios']
                     if not top_funcionarios.empty and len(top_funcionarios) > 0:
                         fig = go.Figure(data=[
                             go.Bar(
@@ -1153,21 +1080,13 @@ def main():
                             yaxis=dict(title='Funcionario'),
                             font=dict(size=12)
                         )
-                        st.plotly_chart(fig, use_container_width=True)
+                        render_chart(fig)
             
             # Evolución temporal
             st.markdown("### Evolución Temporal")
             
             if 'mes' in df_filt.columns and len(df_filt) > 0:
-                df_time = df_filt.groupby('mes', observed=True).size().reset_index(name='oficios')
-                
-                try:
-                    df_time['mes_datetime'] = pd.to_datetime(df_time['mes'], format='%Y-%m', errors='coerce')
-                    df_time = df_time.dropna(subset=['mes_datetime'])
-                    df_time = df_time.sort_values('mes_datetime')
-                    df_time = df_time.drop(columns=['mes_datetime'])
-                except:
-                    df_time = df_time.sort_values('mes')
+                df_time = reducir_lttb(principal['oficios_por_mes'], 'oficios')
                 
                 if not df_time.empty:
                     fig = px.line(
@@ -1188,14 +1107,14 @@ def main():
                         yaxis=dict(title='Cantidad de Oficios'),
                         font=dict(size=12)
                     )
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
                     st.caption("Interactúa: haz zoom o consulta valores pasando el mouse sobre los puntos.")
             
             # Principales Entidades Remitentes
             st.markdown("### Principales Entidades Remitentes")
             
             if 'entidad_remitente' in df_filt.columns and len(df_filt) > 0:
-                top_entidades = df_filt['entidad_remitente'].value_counts().head(10)
+                top_entidades = principal['top_remitentes']
                 if not top_entidades.empty and len(top_entidades) > 0:
                     fig = go.Figure(data=[
                         go.Bar(
@@ -1220,29 +1139,71 @@ def main():
                         yaxis=dict(title='Entidad Remitente'),
                         font=dict(size=12)
                     )
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
+            
+            # Top K por mes: cada mes con su propio ranking (memoizado por filtros y dimensión)
+            st.markdown("### Top por Mes")
+            dimensiones_top = {
+                "Funcionario": ('top_mes_funcionario', 'funcionario'),
+                "Entidad Remitente": ('top_mes_remitente', 'entidad_remitente'),
+                "Ciudad": ('top_mes_ciudad', 'ciudad'),
+                "Entidad Bancaria": ('top_mes_banco', 'banco_canon'),
+            }
+            dimensiones_top = {etiqueta: par for etiqueta, par in dimensiones_top.items() if par[1] in df_filt.columns}
+            
+            if 'mes' in df_filt.columns and dimensiones_top and len(df_filt) > 0:
+                col_dim, col_k = st.columns([2, 1])
+                with col_dim:
+                    dimension = st.selectbox("Dimensión", list(dimensiones_top), key="top_mes_dimension")
+                with col_k:
+                    k = st.slider("Top K", min_value=3, max_value=TOP_POR_MES, value=10, key="top_mes_k")
+                nombre_agregado, columna_top = dimensiones_top[dimension]
+                top_mes = agregados[nombre_agregado]
+                top_mes = top_mes[top_mes['puesto'] <= k]
+                
+                if top_mes.empty:
+                    st.info("No hay meses con datos para esta dimensión.")
+                else:
+                    # Filas: categorías que entran en el top de algún mes (las de más oficios arriba, hasta 30)
+                    top_mes = top_mes.assign(**{columna_top: top_mes[columna_top].astype(str), 'mes': top_mes['mes'].astype(str)})
+                    meses = list(dict.fromkeys(top_mes['mes']))
+                    totales_filas = top_mes.groupby(columna_top)['cantidad'].sum().sort_values(ascending=False, kind='stable')
+                    orden_filas = totales_filas.index[:30]
+                    cantidades = top_mes.pivot(index=columna_top, columns='mes', values='cantidad').reindex(index=orden_filas, columns=meses)
+                    puestos = top_mes.pivot(index=columna_top, columns='mes', values='puesto').reindex(index=orden_filas, columns=meses)
+                    
+                    fig = go.Figure(go.Heatmap(
+                        z=cantidades.to_numpy(dtype=np.float64),
+                        x=meses,
+                        y=cantidades.index,
+                        customdata=puestos.to_numpy(dtype=np.float64),
+                        colorscale=[[0, '#bfe084'], [0.5, '#3c8198'], [1, '#424e71']],
+                        colorbar=dict(title=dict(text="Oficios")),
+                        hoverongaps=False,
+                        hovertemplate='<b>%{y}</b><br>Mes: %{x}<br>Oficios: %{z:,}<br>Puesto: %{customdata}<extra></extra>'
+                    ))
+                    fig.update_layout(
+                        title=f"Top {k} por mes: {dimension}",
+                        height=max(400, 22 * len(cantidades) + 120),
+                        plot_bgcolor='rgba(0,0,0,0)',
+                        paper_bgcolor='rgba(0,0,0,0)',
+                        xaxis=dict(title='Mes', type='category'),
+                        yaxis=dict(title='', autorange='reversed', type='category'),
+                        font=dict(size=12),
+                        margin=dict(l=150)
+                    )
+                    render_chart(fig)
+                    nota = "Las celdas vacías son meses en los que la categoría no entró en el top."
+                    if len(totales_filas) > len(orden_filas):
+                        nota += f" Se muestran {len(orden_filas)} de las {len(totales_filas):,} categorías que entraron en algún top mensual."
+                    st.caption(nota)
             
             # Gráfica de Proporción Judicial vs Coactivo (Mensual)
             st.markdown("### Proporción Judicial vs Coactivo (Mensual)")
             
             if 'tipo_embargo' in df_filt.columns and 'mes' in df_filt.columns and len(df_filt) > 0:
-                # Calcular proporciones mensuales
-                # IMPORTANTE: Agrupar TODOS los datos por mes y tipo_embargo primero, sin limitar antes
-                # Esto asegura que se muestren todos los meses disponibles, similar al gráfico de evolución
-                
-                # Agrupar por mes y tipo_embargo (usar todos los datos)
-                prop_mensual = df_filt.groupby(['mes', 'tipo_embargo'], observed=True).size().reset_index(name='cantidad')
-                total_mensual = prop_mensual.groupby('mes')['cantidad'].sum().reset_index(name='total')
-                prop_mensual = prop_mensual.merge(total_mensual, on='mes')
-                prop_mensual['proporcion'] = prop_mensual['cantidad'] / prop_mensual['total']
-                
-                try:
-                    prop_mensual['mes_datetime'] = pd.to_datetime(prop_mensual['mes'], format='%Y-%m', errors='coerce')
-                    prop_mensual = prop_mensual.dropna(subset=['mes_datetime'])
-                    prop_mensual = prop_mensual.sort_values('mes_datetime')
-                    prop_mensual = prop_mensual.drop(columns=['mes_datetime'])
-                except Exception as e:
-                    prop_mensual = prop_mensual.sort_values('mes')
+                # Proporciones mensuales sobre todos los meses disponibles
+                prop_mensual = principal['tipo_por_mes']
                 
                 # Crear gráfico de área apilada
                 fig = go.Figure()
@@ -1264,7 +1225,7 @@ def main():
                 
                 for tipo in orden_tipos:
                     if tipo in tipos_disponibles:
-                        datos_tipo = prop_mensual[prop_mensual['tipo_embargo'] == tipo].sort_values('mes')
+                        datos_tipo = reducir_lttb(prop_mensual[prop_mensual['tipo_embargo'] == tipo].sort_values('mes'), 'proporcion')
                         color_tipo = colores.get(tipo, '#95a5a6')
                         fig.add_trace(go.Scatter(
                             x=datos_tipo['mes'],
@@ -1296,7 +1257,7 @@ def main():
                     )
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                render_chart(fig)
                 st.caption("Visualiza la proporción mensual según tipo de embargo.")
         
         # Footer
@@ -1312,23 +1273,14 @@ def main():
             st.warning("No hay datos para análisis geográfico.")
         else:
             st.markdown("### Distribución Geográfica")
+            # Un solo agregado por ciudad (memoizado por filtros) para el gráfico, la tabla y la matriz
+            ciudades = agregados['resumen_ciudades']
             
             col_geo1, col_geo2 = st.columns(2)
             
             with col_geo1:
                 if 'ciudad' in df_filt.columns:
-                    # Calcular estadísticas por ciudad
-                    ciudad_stats = df_filt.groupby('ciudad').agg({
-                        'montoaembargar': 'sum' if 'montoaembargar' in df_filt.columns else 'count'
-                    }).reset_index()
-                    
-                    if 'montoaembargar' in df_filt.columns:
-                        ciudad_stats.columns = ['ciudad', 'monto']
-                    else:
-                        ciudad_stats.columns = ['ciudad', 'monto']
-                        ciudad_stats['monto'] = ciudad_stats['monto'] * 1000  # Aproximación
-                    
-                    ciudad_stats = ciudad_stats.sort_values('monto', ascending=True).tail(20)
+                    ciudad_stats = ciudades['por_ciudad'].sort_values('monto', ascending=True).tail(20)
                     fig = go.Figure()
                     
                     fig.add_trace(go.Bar(
@@ -1373,30 +1325,28 @@ def main():
                         margin=dict(l=150, r=40, t=60, b=40)
                     )
                     
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
                     
                     # Mostrar también una tabla con todas las ciudades para referencia
                     with st.expander("Ver todas las ciudades (tabla completa)", expanded=False):
-                        ciudad_stats_all = df_filt.groupby('ciudad').agg({
-                            'montoaembargar': 'sum' if 'montoaembargar' in df_filt.columns else 'count'
-                        }).reset_index()
-                        
-                        if 'montoaembargar' in df_filt.columns:
-                            ciudad_stats_all.columns = ['ciudad', 'monto']
-                        else:
-                            ciudad_stats_all.columns = ['ciudad', 'monto']
-                            ciudad_stats_all['monto'] = ciudad_stats_all['monto'] * 1000
-                        
-                        ciudad_stats_all = ciudad_stats_all.sort_values('monto', ascending=False)
-                        ciudad_stats_all['monto'] = ciudad_stats_all['monto'].apply(lambda x: f"${x:,.0f}")
-                        st.dataframe(ciudad_stats_all, use_container_width=True, height=400)
+                        # El formato lo aplica el navegador (column_config), no se construyen textos por fila
+                        st.dataframe(
+                            ciudades['por_ciudad'].sort_values('monto', ascending=False),
+                            use_container_width=True,
+                            height=400,
+                            hide_index=True,
+                            column_config={
+                                'ciudad': st.column_config.TextColumn("Ciudad"),
+                                'oficios': st.column_config.NumberColumn("Oficios", format="localized"),
+                                'monto': st.column_config.NumberColumn("Monto total", format="dollar"),
+                                'monto_promedio': st.column_config.NumberColumn("Monto promedio", format="dollar"),
+                                'demandados': st.column_config.NumberColumn("Demandados distintos", format="localized"),
+                            }
+                        )
             
             with col_geo2:
                 if 'entidad_bancaria' in df_filt.columns and 'ciudad' in df_filt.columns:
-                    cross_tab = pd.crosstab(
-                        df_filt['ciudad'],
-                        df_filt['entidad_bancaria']
-                    ).head(10)
+                    cross_tab = ciudades['matriz_ciudad_banco']
                     
                     fig = px.imshow(
                         cross_tab,
@@ -1407,7 +1357,79 @@ def main():
                         aspect="auto"
                     )
                     fig.update_layout(height=500, title="Matriz Ciudad vs Banco")
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
+            
+            if 'ciudad' in df_filt.columns:
+                st.markdown("### Mapa por Municipio")
+                # Suma el agregado por ciudad por municipio DANE; cada nombre se resuelve una vez por proceso
+                mapa = get_city_index().por_municipio(ciudades['por_ciudad'])
+                municipios = mapa['municipios']
+                medida = st.radio("Medida", ["Oficios", "Monto"], horizontal=True, key="medida_mapa")
+                columna_medida = 'oficios' if medida == "Oficios" else 'monto'
+                
+                if municipios.empty:
+                    st.info("Ninguna ciudad de la selección corresponde a un municipio del listado DANE.")
+                else:
+                    texto_hover = (
+                        "<b>%{customdata[0]}</b> (%{customdata[1]})<br>Código DANE: %{customdata[2]}"
+                        "<br>Oficios: %{customdata[3]:,}<br>Monto: $%{customdata[4]:,.0f}<extra></extra>"
+                    )
+                    datos_hover = municipios[['municipio', 'departamento', 'codigo_dane', 'oficios', 'monto']].to_numpy()
+                    escala = [[0, '#bfe084'], [0.5, '#3c8198'], [1, '#424e71']]
+                    geometrias = get_municipality_geometries()
+                    
+                    if geometrias is not None:
+                        fig = go.Figure(go.Choropleth(
+                            geojson=geometrias,
+                            featureidkey=f"properties.{PROPIEDAD_CODIGO_GEOJSON}",
+                            locations=municipios['codigo_dane'],
+                            z=municipios[columna_medida],
+                            colorscale=escala,
+                            marker_line_width=0.3,
+                            colorbar=dict(title=dict(text=medida)),
+                            customdata=datos_hover,
+                            hovertemplate=texto_hover
+                        ))
+                        fig.update_geos(fitbounds="locations", visible=False)
+                    else:
+                        valores = municipios[columna_medida].to_numpy(dtype=np.float64)
+                        fig = go.Figure(go.Scattergeo(
+                            lat=municipios['latitud'],
+                            lon=municipios['longitud'],
+                            mode='markers',
+                            marker=dict(
+                                # Área de la burbuja proporcional a la medida
+                                size=8 + 40 * np.sqrt(valores / valores.max()) if valores.max() > 0 else 8,
+                                color=valores,
+                                colorscale=escala,
+                                line=dict(color='#3c8198', width=1),
+                                showscale=True,
+                                colorbar=dict(title=dict(text=medida))
+                            ),
+                            customdata=datos_hover,
+                            hovertemplate=texto_hover
+                        ))
+                        fig.update_geos(fitbounds="locations", showcountries=True, showland=True,
+                                        landcolor='#f7fafc', countrycolor='#a0aec0')
+                    
+                    fig.update_layout(height=600, margin=dict(l=0, r=0, t=10, b=0), paper_bgcolor='rgba(0,0,0,0)')
+                    render_chart(fig)
+                
+                sin_ubicar = mapa['sin_ubicar']
+                if not sin_ubicar.empty:
+                    with st.expander(f"{len(sin_ubicar):,} ciudades sin municipio reconocido "
+                                     f"({int(sin_ubicar['oficios'].sum()):,} oficios no aparecen en el mapa)", expanded=False):
+                        st.dataframe(
+                            sin_ubicar[['ciudad', 'oficios', 'monto']].sort_values('oficios', ascending=False),
+                            use_container_width=True,
+                            height=300,
+                            hide_index=True,
+                            column_config={
+                                'ciudad': st.column_config.TextColumn("Ciudad"),
+                                'oficios': st.column_config.NumberColumn("Oficios", format="localized"),
+                                'monto': st.column_config.NumberColumn("Monto total", format="dollar"),
+                            }
+                        )
         
         # Footer
         st.markdown("""
@@ -1426,79 +1448,86 @@ def main():
             # Selector de análisis
             analisis_tipo = st.selectbox(
                 "Selecciona tipo de análisis",
-                ["Distribución de Montos", "Análisis de Clientes", "Análisis de Documentos"]
+                ["Distribución de Montos", "Análisis de Clientes", "Análisis de Documentos", "Ciclo de Vida por Demandado"]
             )
             
             if analisis_tipo == "Distribución de Montos":
                 if 'montoaembargar' in df_filt.columns:
                     st.markdown("#### Análisis de Montos a Embargar")
+                    exactos = st.checkbox(
+                        "Calcular estadísticas exactas",
+                        key='montos_exactos',
+                        help="Con filtros solo de banco y mes, los cuartiles, la mediana y el histograma salen de un resumen "
+                             "precalculado por mes y banco (error relativo menor al 1%). Al marcarlo se recalculan sobre "
+                             "todos los registros filtrados."
+                    )
                     
                     # Análisis de valores cero y no cero
-                    montos = df_filt['montoaembargar'].dropna()
-                    valores_cero = (montos == 0).sum()
-                    valores_no_cero = (montos != 0).sum()
-                    total_montos = len(montos)
+                    montos = agregados['montos_exactos' if exactos else 'montos']
+                    valores_cero = montos['valores_cero']
+                    valores_no_cero = montos['valores_no_cero']
+                    total_montos = montos['total_montos']
                     
                     # Información sobre valores cero
                     if valores_cero > 0:
                         st.info(f"**Nota:** {valores_cero:,} registros ({valores_cero/total_montos*100:.1f}%) tienen monto igual a $0. Estos se excluyen del histograma para mejor visualización.")
                     
-                    montos_no_cero = montos[montos > 0]
-                    
-                    if len(montos_no_cero) > 0:
-                        q1 = montos_no_cero.quantile(0.25)
-                        q3 = montos_no_cero.quantile(0.75)
-                        iqr = q3 - q1
-                        limite_inferior = max(0, q1 - 1.5 * iqr)
-                        limite_superior = q3 + 1.5 * iqr
-                        
-                        montos_sin_outliers = montos_no_cero[
-                            (montos_no_cero >= limite_inferior) & 
-                            (montos_no_cero <= limite_superior)
-                        ]
+                    if montos['no_cero'] > 0:
+                        montos_sin_outliers = montos['sin_outliers']
+                        outliers_count = montos['outliers']
                         
-                        outliers_count = len(montos_no_cero) - len(montos_sin_outliers)
-                        
-                        # Histograma principal (sin outliers)
-                        if len(montos_sin_outliers) > 0:
-                            fig1 = px.histogram(
-                                montos_sin_outliers,
-                                x=montos_sin_outliers.values,
-                                nbins=50,
-                                labels={'x': 'Monto a Embargar', 'count': 'Frecuencia'},
-                                color_discrete_sequence=['#3c8198']
+                        # Histograma principal (sin outliers), ya agrupado en intervalos
+                        if montos_sin_outliers > 0:
+                            # Intervalos logarítmicos: escalones sobre un eje en escala log
+                            histograma = montos['histograma']
+                            fig1 = go.Figure(data=[
+                                go.Scatter(
+                                    x=list(histograma['desde']) + [histograma['hasta'].iloc[-1]],
+                                    y=list(histograma['cantidad']) + [histograma['cantidad'].iloc[-1]],
+                                    line_shape='hv',
+                                    fill='tozeroy',
+                                    mode='lines',
+                                    line=dict(color='#3c8198'),
+                                )
+                            ])
+                            fig1.update_layout(
+                                height=400,
+                                showlegend=False,
+                                xaxis=dict(title='Monto a Embargar (escala logarítmica)', type='log'),
+                                yaxis=dict(title='Frecuencia')
                             )
-                            fig1.update_layout(height=400, showlegend=False)
-                            st.plotly_chart(fig1, use_container_width=True)
+                            render_chart(fig1)
+                            if montos['aproximado']:
+                                st.caption("Cuartiles, mediana, valores atípicos e histograma calculados con un resumen precalculado de los montos (error relativo menor al 1%).")
                         else:
                             st.warning("No hay suficientes datos para mostrar el histograma.")
                         
                         # Información sobre outliers
                         if outliers_count > 0:
-                            st.warning(f"**Valores atípicos detectados:** {outliers_count:,} registros ({outliers_count/len(montos_no_cero)*100:.1f}%) están fuera del rango intercuartílico (IQR) y se excluyen del histograma principal para mejor visualización.")
+                            st.warning(f"**Valores atípicos detectados:** {outliers_count:,} registros ({outliers_count/montos['no_cero']*100:.1f}%) están fuera del rango intercuartílico (IQR) y se excluyen del histograma principal para mejor visualización.")
                         
                         # Estadísticas robustas
                         st.markdown("#### Estadísticas Descriptivas")
                         col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
                         
                         with col_stat1:
-                            st.metric("Mínimo", f"${montos_no_cero.min():,.0f}")
+                            st.metric("Mínimo", f"${montos['minimo']:,.0f}")
                         with col_stat2:
-                            st.metric("Máximo", f"${montos_no_cero.max():,.0f}")
+                            st.metric("Máximo", f"${montos['maximo']:,.0f}")
                         with col_stat3:
-                            st.metric("Mediana", f"${montos_no_cero.median():,.0f}")
+                            st.metric("Mediana", f"${montos['mediana']:,.0f}")
                         with col_stat4:
-                            st.metric("Promedio", f"${montos_no_cero.mean():,.0f}")
+                            st.metric("Promedio", f"${montos['promedio']:,.0f}")
                         
                         # Segunda fila de estadísticas
                         col_stat5, col_stat6, col_stat7, col_stat8 = st.columns(4)
                         
                         with col_stat5:
-                            st.metric("Q1 (25%)", f"${q1:,.0f}")
+                            st.metric("Q1 (25%)", f"${montos['q1']:,.0f}")
                         with col_stat6:
-                            st.metric("Q3 (75%)", f"${q3:,.0f}")
+                            st.metric("Q3 (75%)", f"${montos['q3']:,.0f}")
                         with col_stat7:
-                            st.metric("Desv. Estándar", f"${montos_no_cero.std():,.0f}")
+                            st.metric("Desv. Estándar", f"${montos['desviacion']:,.0f}")
                         with col_stat8:
                             st.metric("Valores > 0", f"{valores_no_cero:,}")
                     else:
@@ -1508,7 +1537,7 @@ def main():
                 st.markdown("#### Análisis de Clientes")
                 
                 if 'es_cliente' in df_filt.columns:
-                    cliente_counts = df_filt['es_cliente'].value_counts()
+                    cliente_counts = agregados['conteo_clientes']
                     
                     fig = px.pie(
                         cliente_counts,
@@ -1517,13 +1546,13 @@ def main():
                         color_discrete_sequence=['#424e71', '#3c8198']
                     )
                     fig.update_layout(height=400)
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
             
             elif analisis_tipo == "Análisis de Documentos":
                 st.markdown("#### Análisis de Documentos")
                 
                 if 'tipo_documento' in df_filt.columns:
-                    doc_counts = df_filt['tipo_documento'].value_counts().head(10)
+                    doc_counts = agregados['top_documentos']
                     
                     fig = px.bar(
                         x=doc_counts.index,
@@ -1533,12 +1562,158 @@ def main():
                         color_continuous_scale=[[0, '#bfe084'], [0.5, '#3c8198'], [1, '#424e71']]
                     )
                     fig.update_layout(height=400, showlegend=False)
-                    st.plotly_chart(fig, use_container_width=True)
+                    render_chart(fig)
+            
+            elif analisis_tipo == "Ciclo de Vida por Demandado":
+                st.markdown("#### Ciclo de Vida por Demandado")
+                
+                if 'identificacion' in df_filt.columns and 'tipo_documento' in df_filt.columns:
+                    ciclo = agregados['ciclo_vida']
+                    
+                    if ciclo['oficios'] == 0:
+                        st.info("No hay embargos, desembargos ni requerimientos con identificación y fecha en la selección.")
+                    else:
+                        dias = ciclo['dias_desembargo']
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            st.metric("Demandados con embargo", f"{ciclo['personas_con_embargo']:,}")
+                        with col2:
+                            reembargados = ciclo['personas_reembargadas'] / max(ciclo['personas_con_embargo'], 1) * 100
+                            st.metric("Con más de un embargo", f"{ciclo['personas_reembargadas']:,}", f"{reembargados:.1f}%", delta_color="off")
+                        with col3:
+                            st.metric("Mediana días a desembargo", f"{dias['mediana']:,.0f}" if dias['cantidad'] else "—")
+                        with col4:
+                            st.metric("Desembargos sin embargo previo", f"{ciclo['desembargos_sin_embargo']:,}",
+                                      help="Desembargos de demandados sin un embargo anterior en la selección")
+                        
+                        col_dias, col_repetidos = st.columns(2)
+                        with col_dias:
+                            histograma_dias = ciclo['histograma_dias']
+                            if not histograma_dias.empty:
+                                fig = go.Figure(go.Bar(
+                                    x=(histograma_dias['desde'] + histograma_dias['hasta']) / 2,
+                                    y=histograma_dias['cantidad'],
+                                    width=histograma_dias['hasta'] - histograma_dias['desde'],
+                                    marker=dict(color='#3c8198', line=dict(color='#FFFFFF', width=1)),
+                                    customdata=histograma_dias[['desde', 'hasta']].to_numpy(),
+                                    hovertemplate='%{customdata[0]:,.0f} a %{customdata[1]:,.0f} días<br>Desembargos: %{y:,}<extra></extra>'
+                                ))
+                                fig.update_layout(
+                                    title="Días desde el embargo hasta el desembargo",
+                                    xaxis_title="Días",
+                                    yaxis_title="Desembargos",
+                                    height=400,
+                                    plot_bgcolor='rgba(0,0,0,0)',
+                                    paper_bgcolor='rgba(0,0,0,0)'
+                                )
+                                render_chart(fig)
+                                st.caption(f"Q1: {dias['q1']:,.0f} días · Mediana: {dias['mediana']:,.0f} · Q3: {dias['q3']:,.0f} · "
+                                           f"Promedio: {dias['promedio']:,.0f} ({dias['cantidad']:,} desembargos)")
+                        with col_repetidos:
+                            por_persona = ciclo['embargos_por_persona']
+                            fig = go.Figure(go.Bar(
+                                x=por_persona.index,
+                                y=por_persona.values,
+                                marker=dict(color=por_persona.values, colorscale=[[0, '#bfe084'], [0.5, '#3c8198'], [1, '#424e71']]),
+                                text=por_persona.values,
+                                textposition='outside'
+                            ))
+                            fig.update_layout(
+                                title="Embargos por demandado",
+                                xaxis=dict(title="Embargos", type='category'),
+                                yaxis_title="Demandados",
+                                height=400,
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                paper_bgcolor='rgba(0,0,0,0)'
+                            )
+                            render_chart(fig)
+                            if ciclo['dias_reembargo']['cantidad']:
+                                st.caption(f"Mediana entre embargos consecutivos: {ciclo['dias_reembargo']['mediana']:,.0f} días")
+                        
+                        # Cohortes por mes del primer embargo
+                        cohortes = ciclo['cohortes']
+                        if not cohortes.empty:
+                            columnas_meses = [col for col in cohortes.columns if col != 'personas']
+                            fig = px.imshow(
+                                cohortes[columnas_meses],
+                                labels=dict(x="Meses desde el primer embargo", y="Cohorte", color="% desembargado"),
+                                color_continuous_scale=[[0, '#bfe084'], [0.5, '#3c8198'], [1, '#424e71']],
+                                text_auto='.0f',
+                                aspect="auto"
+                            )
+                            fig.update_traces(customdata=np.repeat(cohortes[['personas']].to_numpy(), len(columnas_meses), axis=1),
+                                              hovertemplate='Cohorte %{y} (%{customdata:,} demandados)<br>%{x}: %{z:.1f}% desembargado<extra></extra>')
+                            fig.update_layout(title="Cohortes: % de demandados con desembargo tras su primer embargo",
+                                              height=max(400, 24 * len(cohortes) + 120))
+                            render_chart(fig)
+                            st.caption(f"Porcentaje acumulado de cada cohorte con un desembargo hasta {MESES_COHORTE} meses "
+                                       "después del primer embargo; las celdas vacías aún no se pueden observar.")
+                        
+                        # Flujo de los primeros oficios de cada demandado
+                        flujos = ciclo['flujos']
+                        if not flujos.empty:
+                            nodos = {}
+                            for paso, origen, destino in flujos[['paso', 'origen', 'destino']].itertuples(index=False):
+                                nodos.setdefault(f"{paso}. {origen}", len(nodos))
+                                nodos.setdefault(destino if destino == FIN_FLUJO else f"{paso + 1}. {destino}", len(nodos))
+                            fuentes = [nodos[f"{p}. {o}"] for p, o in zip(flujos['paso'], flujos['origen'])]
+                            destinos = [nodos[d if d == FIN_FLUJO else f"{p + 1}. {d}"] for p, d in zip(flujos['paso'], flujos['destino'])]
+                            colores_tipo = {'Embargo': '#424e71', 'Desembargo': '#bfe084', 'Requerimiento': '#3c8198'}
+                            fig = go.Figure(go.Sankey(
+                                node=dict(
+                                    label=list(nodos),
+                                    color=[colores_tipo.get(nombre.split('. ')[-1], '#a0aec0') for nombre in nodos],
+                                    pad=15,
+                                    thickness=18
+                                ),
+                                link=dict(source=fuentes, target=destinos, value=flujos['cantidad'].tolist(),
+                                          color='rgba(60,129,152,0.25)')
+                            ))
+                            fig.update_layout(title="Secuencia de los primeros oficios por demandado", height=500,
+                                              paper_bgcolor='rgba(0,0,0,0)')
+                            render_chart(fig)
             
-            # Tabla de datos
+            # Tabla de datos: solo se materializa la página visible
             st.markdown("### Datos Filtrados")
+            columnas_tabla = columnas_visibles(df_filt)
+            
+            def volver_a_primera_pagina():
+                st.session_state['tabla_pagina'] = 1
+            
+            col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+            with col1:
+                orden_tabla = st.selectbox(
+                    "Ordenar por",
+                    ["(orden del archivo)"] + columnas_tabla,
+                    key="tabla_orden",
+                    on_change=volver_a_primera_pagina
+                )
+            with col2:
+                descendente = st.checkbox("Descendente", key="tabla_descendente", on_change=volver_a_primera_pagina)
+            with col3:
+                filas_por_pagina = st.selectbox(
+                    "Filas por página",
+                    OPCIONES_FILAS_POR_PAGINA,
+                    index=OPCIONES_FILAS_POR_PAGINA.index(FILAS_POR_PAGINA),
+                    key="tabla_filas_por_pagina",
+                    on_change=volver_a_primera_pagina
+                )
+            paginas = total_paginas(len(df_filt), filas_por_pagina)
+            # Al cambiar los filtros la página guardada puede quedar fuera de rango
+            if st.session_state.get('tabla_pagina', 1) > paginas:
+                st.session_state['tabla_pagina'] = paginas
+            with col4:
+                pagina = st.number_input("Página", min_value=1, max_value=paginas, step=1, key="tabla_pagina")
+            
+            columna_orden = None if orden_tabla == "(orden del archivo)" else orden_tabla
+            with st.spinner("Ordenando..."):
+                filas_pagina = get_sort_index(datos).pagina(
+                    df_filt.posiciones, pagina, filas_por_pagina, columna_orden, descendente
+                )
+            inicio = (pagina - 1) * filas_por_pagina
+            st.caption(f"Registros {inicio + 1:,} a {inicio + len(filas_pagina):,} de {len(df_filt):,} · página {pagina:,} de {paginas:,}")
             st.dataframe(
-                df_filt.head(100),
+                datos.tomar(columnas_tabla, filas_pagina),
                 use_container_width=True,
                 height=400
             )
@@ -1553,55 +1728,57 @@ def main():
     # === TAB 4: EXPORTACIÓN ===
     elif selected_tab == "Exportación":
         st.markdown("### Exportar Datos")
+        trabajos = st.session_state.setdefault('trabajos_exportacion', [])
         
         if df_filt.empty:
             st.warning("No hay datos para exportar.")
         else:
-            export_format = st.selectbox(
-                "Formato de exportación",
-                ["CSV", "Excel", "JSON"]
-            )
+            # Las columnas canónicas derivadas no se exportan
+            columnas_disponibles = columnas_visibles(df_filt)
             
-            if export_format == "CSV":
-                csv = df_filt.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="Descargar CSV",
-                    data=csv,
-                    file_name=f"embargos_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv"
+            col1, col2 = st.columns(2)
+            with col1:
+                export_format = st.selectbox(
+                    "Formato de exportación",
+                    formatos_disponibles(),
+                    help="Parquet y Arrow conservan los tipos de cada columna y ocupan mucho menos que CSV"
+                )
+            with col2:
+                # Excel, Parquet y Arrow ya se escriben comprimidos
+                compresion = st.selectbox(
+                    "Compresión",
+                    COMPRESIONES,
+                    disabled=export_format in FORMATOS_COMPRIMIDOS,
+                    help="Excel, Parquet y Arrow se entregan sin compresión adicional"
                 )
             
-            elif export_format == "Excel":
-                # Usar la variable global que se importó al inicio
-                if not OPENPYXL_AVAILABLE:
-                    st.error("No se puede exportar a Excel. La funcionalidad aun no está disponible.")
-                else:
-                    try:
-                        from io import BytesIO
-                        output = BytesIO()
-                        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                            df_filt.to_excel(writer, index=False, sheet_name='Embargos')
-                        excel_data = output.getvalue()
-                        st.download_button(
-                            label="Descargar Excel",
-                            data=excel_data,
-                            file_name=f"embargos_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    except Exception as e:
-                        st.error(f"Error al generar archivo Excel: {str(e)}")
+            columnas_elegidas = st.multiselect(
+                "Columnas a exportar",
+                columnas_disponibles,
+                default=columnas_disponibles,
+                key="columnas_exportacion"
+            )
+            # Se exportan en el orden del archivo, no en el de selección
+            columnas_export = [col for col in columnas_disponibles if col in columnas_elegidas]
             
-            elif export_format == "JSON":
-                json_str = df_filt.to_json(orient='records', date_format='iso')
-                st.download_button(
-                    label="Descargar JSON",
-                    data=json_str,
-                    file_name=f"embargos_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-                    mime="application/json"
-                )
+            st.info(f"Se exportarán {len(df_filt):,} registros con {len(columnas_export)} columnas.")
             
-            # Resumen de exportación
-            st.info(f"Se exportarán {len(df_filt):,} registros con {len(df_filt.columns)} columnas.")
+            if not columnas_export:
+                st.warning("Seleccione al menos una columna para exportar.")
+            elif export_format == "Excel" and not excel_disponible():
+                st.error("No se puede exportar a Excel. La funcionalidad aun no está disponible.")
+            elif st.button("Generar archivo", key="generar_exportacion"):
+                # La exportación corre en segundo plano con la selección actual
+                trabajos.insert(0, TrabajoExportacion(
+                    df_filt, columnas_export, export_format, compresion,
+                    nombre=f"embargos_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                ).iniciar())
+                st.caption("El archivo se genera en segundo plano: puede seguir filtrando o cambiar de pestaña mientras termina.")
+        
+        if trabajos:
+            st.markdown("#### Exportaciones")
+            sondeo = any(trabajo.activo for trabajo in trabajos)
+            st.fragment(render_export_jobs, run_every=1.0 if sondeo else None)(trabajos, sondeo)
         
         # Footer
         st.markdown("""
@@ -0,0 +1,157 @@
+"""
+Conjunto de datos cargado por el dashboard de embargos.
+
+`ConjuntoDatos` envuelve el DataFrame junto con una huella del archivo de
+origen (ruta, mtime y tamaño). Las funciones cacheadas de Streamlit reciben el
+conjunto y lo identifican por esa huella (`HASH_FUNCS`), de modo que buscar una
+entrada en el cache no recorre el DataFrame en cada interacción.
+
+El conjunto leído se comparte entre todas las sesiones del proceso; cada sesión
+recibe una `vista()`, que comparte los buffers y no puede alterar el original.
+
+Cuando el pipeline dejó junto al CSV consolidado su copia en Arrow IPC
+(`.arrow`), el archivo se abre con memory mapping: solo las columnas que usan
+filtros, métricas y gráficos pasan a pandas al cargar; las demás (correo,
+direccion, nombres, ...) se leen con `columna()` la primera vez que la búsqueda,
+la tabla o la exportación las piden.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Copy-on-Write: en pandas >= 3 siempre está activo; en 2.x hay que activarlo para
+# que modificar una vista no escriba sobre los buffers compartidos
+if int(pd.__version__.split('.')[0]) < 3:
+    try:
+        pd.set_option('mode.copy_on_write', True)
+    except Exception:
+        print("[ADVERTENCIA] Copy-on-Write no disponible en esta versión de pandas")
+
+EXTENSION_ARROW = ".arrow"
+
+
+@dataclass(eq=False)
+class ConjuntoDatos:
+    """
+    DataFrame cargado más la huella del archivo del que proviene.
+
+    Con `tabla` (Arrow, memory-mapped), `df` contiene solo las columnas leídas al
+    cargar y `filas` las posiciones de la tabla que sobrevivieron a la limpieza
+    (None = todas); el resto de columnas se materializa bajo demanda.
+    """
+    df: pd.DataFrame
+    huella: str
+    ruta: Optional[str] = None
+    tabla: Optional[Any] = None
+    filas: Optional[np.ndarray] = None
+    _perezosas: dict = field(default_factory=dict, repr=False)
+
+    @property
+    def empty(self) -> bool:
+        return self.df.empty
+
+    @property
+    def columns(self) -> pd.Index:
+        """Todas las columnas del conjunto (en el orden del archivo), incluidas las que aún no se leyeron."""
+        if self.tabla is None:
+            return self.df.columns
+        derivadas = [col for col in self.df.columns if col not in self.tabla.schema.names]
+        return pd.Index(self.tabla.schema.names + derivadas)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def __getitem__(self, columnas):
+        if isinstance(columnas, str):
+            return self.columna(columnas)
+        columnas = list(columnas)
+        if all(col in self.df.columns for col in columnas):
+            return self.df[columnas]
+        return pd.concat([self.columna(col) for col in columnas], axis=1)
+
+    def columna(self, nombre: str) -> pd.Series:
+        """Columna completa; si solo está en la tabla Arrow, se lee una vez y se guarda."""
+        if nombre in self.df.columns:
+            return self.df[nombre]
+        if self.tabla is None or nombre not in self.tabla.schema.names:
+            raise KeyError(nombre)
+        if nombre not in self._perezosas:
+            arreglo = self.tabla.column(nombre)
+            if self.filas is not None:
+                arreglo = arreglo.take(self.filas)
+            serie = arreglo.to_pandas()
+            serie.index = self.df.index
+            self._perezosas[nombre] = serie.rename(nombre)
+        return self._perezosas[nombre]
+
+    def tomar(self, columnas: List[str], posiciones: np.ndarray) -> pd.DataFrame:
+        """
+        Filas `posiciones` de las columnas pedidas. Las columnas que solo están en la
+        tabla Arrow (y no se leyeron todavía) se toman de ella fila por fila, sin
+        leer la columna completa.
+        """
+        partes = {}
+        for nombre in columnas:
+            if nombre in self.df.columns or nombre in self._perezosas or self.tabla is None:
+                partes[nombre] = self.columna(nombre).iloc[posiciones].reset_index(drop=True)
+            else:
+                filas = posiciones if self.filas is None else self.filas[posiciones]
+                partes[nombre] = self.tabla.column(nombre).take(filas).to_pandas().rename(nombre)
+        return pd.DataFrame(partes).set_axis(self.df.index[posiciones])
+
+    def vista(self) -> "ConjuntoDatos":
+        """
+        Conjunto con la misma huella sobre una copia superficial del DataFrame: no
+        duplica los datos, y asignar o modificar columnas en la vista crea una copia
+        propia en lugar de cambiar el conjunto compartido.
+        """
+        return ConjuntoDatos(self.df.copy(deep=False), huella=self.huella, ruta=self.ruta,
+                             tabla=self.tabla, filas=self.filas, _perezosas=self._perezosas)
+
+
+def huella_archivo(ruta: str) -> str:
+    """Identifica una versión concreta de un archivo: ruta absoluta, mtime y tamaño."""
+    stat = os.stat(ruta)
+    return f"{os.path.abspath(ruta)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+def conjunto_vacio() -> ConjuntoDatos:
+    return ConjuntoDatos(pd.DataFrame(), huella="vacio")
+
+
+def ruta_arrow_vigente(csv_path: str) -> Optional[str]:
+    """
+    Copia Arrow del CSV consolidado (mismo nombre, extensión `.arrow`) si existe,
+    pyarrow está disponible y no es más antigua que el CSV; si no, None.
+    """
+    ruta = os.path.splitext(csv_path)[0] + EXTENSION_ARROW
+    if not PYARROW_AVAILABLE or not os.path.exists(ruta):
+        return None
+    if os.path.getmtime(ruta) < os.path.getmtime(csv_path):
+        print(f"[ADVERTENCIA] {os.path.basename(ruta)} es anterior al CSV consolidado; se usa el CSV")
+        return None
+    return ruta
+
+
+def abrir_arrow(ruta: str, columnas: List[str]):
+    """
+    Abre el archivo Arrow IPC con memory mapping y devuelve `(tabla, df)`: la tabla
+    completa (sin leer) y un DataFrame con las `columnas` pedidas que existan.
+    Los diccionarios de Arrow llegan a pandas como categorías.
+    """
+    tabla = feather.read_table(ruta, memory_map=True)
+    presentes = [col for col in columnas if col in tabla.schema.names]
+    return tabla, tabla.select(presentes).to_pandas()
+
+
+# Para `st.cache_data` / `st.cache_resource(hash_funcs=HASH_FUNCS)`
+HASH_FUNCS = {ConjuntoDatos: lambda datos: datos.huella}
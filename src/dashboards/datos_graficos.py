@@ -0,0 +1,94 @@
+"""
+Preparación de los datos de los gráficos del dashboard de embargos.
+
+Las figuras de Plotly viajan completas al navegador por el websocket de
+Streamlit: cada punto de cada traza se serializa. Aquí se reducen los datos en
+el servidor antes de construir la figura, de modo que ningún gráfico lleve
+más de un número acotado de puntos:
+
+- `histograma`: intervalos calculados con `np.histogram` (logarítmicos por
+  defecto, adecuados para montos que abarcan varios órdenes de magnitud); la
+  figura recibe solo los bordes y los conteos.
+- `reducir_lttb`: reduce una serie de línea con Largest-Triangle-Three-Buckets,
+  que conserva la forma (picos y valles) con `max_puntos` puntos.
+- `puntos_figura` / `tamano_figura`: puntos y bytes que envía una figura, para
+  el modo de depuración del dashboard.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Límites de puntos por gráfico
+MAX_INTERVALOS_HISTOGRAMA = 50
+MAX_PUNTOS_LINEA = 500
+
+
+def histograma(valores: np.ndarray, pesos: Optional[np.ndarray] = None,
+               bins: int = MAX_INTERVALOS_HISTOGRAMA, log: bool = True) -> pd.DataFrame:
+    """
+    Histograma de `bins` intervalos entre el mínimo y el máximo de `valores`,
+    como DataFrame `desde`, `hasta`, `cantidad`. Con `log` los intervalos son
+    de igual ancho en escala logarítmica (requiere valores > 0).
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+    if len(valores) == 0:
+        return pd.DataFrame({'desde': [], 'hasta': [], 'cantidad': []})
+    minimo, maximo = float(valores.min()), float(valores.max())
+    if log and minimo > 0 and maximo > minimo:
+        bordes = np.geomspace(minimo, maximo, bins + 1)
+    else:
+        bordes = bins
+    conteos, bordes = np.histogram(valores, bins=bordes, weights=pesos)
+    return pd.DataFrame({'desde': bordes[:-1], 'hasta': bordes[1:], 'cantidad': conteos.astype('int64')})
+
+
+def indices_lttb(y: np.ndarray, max_puntos: int) -> np.ndarray:
+    """
+    Posiciones de los puntos que conserva Largest-Triangle-Three-Buckets sobre una
+    serie con x equiespaciado (0, 1, 2, ...): siempre el primero y el último, y en
+    cada tramo intermedio el punto que forma el triángulo de mayor área con el
+    punto elegido en el tramo anterior y el promedio del tramo siguiente.
+    """
+    n = len(y)
+    if max_puntos >= n or max_puntos < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    x = np.arange(n, dtype=np.float64)
+    limites = np.linspace(1, n - 1, max_puntos - 1).astype(np.int64)
+    elegidos = np.empty(max_puntos, dtype=np.int64)
+    elegidos[0], elegidos[-1] = 0, n - 1
+    anterior = 0
+    for i in range(max_puntos - 2):
+        inicio, fin = limites[i], limites[i + 1]
+        siguiente_fin = limites[i + 2] if i + 2 < len(limites) else n
+        x_promedio = x[fin:siguiente_fin].mean()
+        y_promedio = y[fin:siguiente_fin].mean()
+        areas = np.abs((x[anterior] - x_promedio) * (y[inicio:fin] - y[anterior])
+                       - (x[anterior] - x[inicio:fin]) * (y_promedio - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        elegidos[i + 1] = anterior
+    return elegidos
+
+
+def reducir_lttb(df: pd.DataFrame, columna_y: str, max_puntos: int = MAX_PUNTOS_LINEA) -> pd.DataFrame:
+    """Filas de `df` (ya ordenado en el eje x) que conserva LTTB sobre `columna_y`; sin cambios si caben."""
+    if len(df) <= max_puntos:
+        return df
+    return df.iloc[indices_lttb(df[columna_y].to_numpy(), max_puntos)]
+
+
+def puntos_figura(fig) -> int:
+    """Cantidad de valores que llevan las trazas de una figura (x/y/z, valores de pastel)."""
+    total = 0
+    for traza in fig.data:
+        for atributo in ('x', 'y', 'z', 'values'):
+            valores = getattr(traza, atributo, None)
+            if valores is not None:
+                total += int(np.size(valores))
+    return total
+
+
+def tamano_figura(fig) -> int:
+    """Bytes del JSON de la figura, lo que viaja al navegador."""
+    return len(fig.to_json().encode('utf-8'))
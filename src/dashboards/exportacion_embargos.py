@@ -0,0 +1,533 @@
+"""
+Exportación por bloques del dashboard de embargos.
+
+Exportar una selección grande armando el archivo completo en memoria
+(`to_csv()` / `ExcelWriter` sobre un `BytesIO`) mantiene a la vez el
+DataFrame, el archivo y la copia que entrega el botón de descarga. Aquí el
+archivo se escribe en un temporal, bloque a bloque:
+
+- las filas se materializan de `FILAS_POR_BLOQUE` en `FILAS_POR_BLOQUE`
+  desde la vista filtrada, sin construir el DataFrame completo;
+- CSV y JSON se escriben por bloques sobre el archivo, opcionalmente
+  comprimido con gzip o zip mientras se escribe;
+- Excel usa xlsxwriter en modo `constant_memory` (cada fila se escribe al
+  disco al pasar a la siguiente) o, si no está instalado, openpyxl en modo
+  `write_only`; al llegar al límite de filas de Excel se abre una hoja nueva;
+- Parquet y Arrow IPC (con pyarrow, comprimidos con zstd) escriben un grupo de
+  filas por bloque y conservan los tipos al volver a leerlos. Las columnas que
+  el conjunto aún tiene solo en su tabla Arrow se copian de ella sin pasar por
+  pandas.
+
+El dashboard entrega el temporal con una descarga diferida: el contenido se
+lee del disco una sola vez, cuando se pulsa el botón.
+
+Cada exportación del dashboard es un `TrabajoExportacion` que corre en un hilo
+aparte: el script de Streamlit no espera a que termine, informa el avance
+bloque a bloque y puede cancelarse entre un bloque y el siguiente.
+"""
+import gzip
+import io
+import itertools
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+FORMATOS = {
+    'CSV': ('csv', 'text/csv'),
+    'Excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'JSON': ('json', 'application/json'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'Arrow': ('arrow', 'application/vnd.apache.arrow.file'),
+}
+COMPRESIONES = ['Ninguna', 'gzip', 'zip']
+# Formatos que ya se escriben comprimidos: no se les aplica gzip/zip
+FORMATOS_COMPRIMIDOS = {'Excel', 'Parquet', 'Arrow'}
+# Compresión interna de Parquet y Arrow IPC
+COMPRESION_ARROW = 'zstd'
+
+FILAS_POR_BLOQUE = 100_000
+# Excel escribe celda por celda: bloques menores para informar el avance (y cancelar) más seguido
+FILAS_POR_BLOQUE_EXCEL = 10_000
+# Filas por hoja de Excel, incluido el encabezado
+MAX_FILAS_EXCEL = 1_048_576
+HOJA_EXCEL = 'Embargos'
+
+# Carpeta de los temporales; se borran los que tengan más de `HORAS_TEMPORALES`
+DIRECTORIO_EXPORTACION = os.path.join(tempfile.gettempdir(), 'embargos_exportaciones')
+HORAS_TEMPORALES = 24
+
+# Exportaciones que corren a la vez; las demás esperan su turno
+MAX_TRABAJOS_SIMULTANEOS = 2
+
+
+def excel_disponible() -> bool:
+    return XLSXWRITER_AVAILABLE or OPENPYXL_AVAILABLE
+
+
+def formatos_disponibles() -> List[str]:
+    """Formatos que se ofrecen; Parquet y Arrow solo con pyarrow instalado."""
+    formatos = ['CSV', 'Excel', 'JSON']
+    if PYARROW_AVAILABLE:
+        formatos += ['Parquet', 'Arrow']
+    return formatos
+
+
+def bloques(vista, columnas: List[str], filas_por_bloque: int = FILAS_POR_BLOQUE) -> Iterator[pd.DataFrame]:
+    """
+    DataFrames consecutivos de a lo sumo `filas_por_bloque` filas de la vista, con
+    `columnas`. Sobre un `ConjuntoDatos` cada bloque se arma con `tomar`: las
+    columnas que solo están en la tabla Arrow se leen bloque a bloque y no quedan
+    guardadas completas en el conjunto.
+    """
+    if hasattr(vista.base, 'tomar'):
+        posiciones = vista.posiciones_base()
+        for inicio in range(0, len(posiciones), filas_por_bloque):
+            yield vista.base.tomar(columnas, posiciones[inicio:inicio + filas_por_bloque])
+        return
+    base = vista.base[columnas]
+    for inicio in range(0, len(vista), filas_por_bloque):
+        fin = inicio + filas_por_bloque
+        if vista.posiciones is None:
+            yield base.iloc[inicio:fin]
+        else:
+            yield base.iloc[vista.posiciones[inicio:fin]]
+
+
+@contextmanager
+def _abrir_texto(ruta: str, compresion: str, nombre_interno: str):
+    """Archivo de texto UTF-8 en `ruta`, comprimido al escribir según `compresion`."""
+    if compresion == 'gzip':
+        with gzip.open(ruta, 'wt', encoding='utf-8', newline='') as archivo:
+            yield archivo
+    elif compresion == 'zip':
+        with zipfile.ZipFile(ruta, 'w', compression=zipfile.ZIP_DEFLATED) as contenedor:
+            with contenedor.open(nombre_interno, 'w', force_zip64=True) as binario:
+                with io.TextIOWrapper(binario, encoding='utf-8', newline='') as archivo:
+                    yield archivo
+    else:
+        with open(ruta, 'w', encoding='utf-8', newline='') as archivo:
+            yield archivo
+
+
+def escribir_csv(vista, columnas: List[str], archivo, progreso: Optional[Callable[[int, int], None]] = None,
+                 filas_por_bloque: int = FILAS_POR_BLOQUE) -> int:
+    """Escribe la vista como CSV (encabezado una sola vez) y devuelve las filas escritas."""
+    escritas = 0
+    for bloque in bloques(vista, columnas, filas_por_bloque):
+        bloque.to_csv(archivo, index=False, header=escritas == 0)
+        escritas += len(bloque)
+        if progreso:
+            progreso(escritas, len(vista))
+    if escritas == 0:
+        pd.DataFrame(columns=columnas).to_csv(archivo, index=False)
+    return escritas
+
+
+def escribir_json(vista, columnas: List[str], archivo, progreso: Optional[Callable[[int, int], None]] = None,
+                  filas_por_bloque: int = FILAS_POR_BLOQUE) -> int:
+    """
+    Escribe la vista como un arreglo JSON de registros, igual al de
+    `to_json(orient='records', date_format='iso')`, y devuelve las filas escritas.
+    """
+    escritas = 0
+    archivo.write('[')
+    for bloque in bloques(vista, columnas, filas_por_bloque):
+        if escritas:
+            archivo.write(',')
+        # Sin los corchetes del bloque: los registros se encadenan en un solo arreglo
+        archivo.write(bloque.to_json(orient='records', date_format='iso')[1:-1])
+        escritas += len(bloque)
+        if progreso:
+            progreso(escritas, len(vista))
+    archivo.write(']')
+    return escritas
+
+
+def _filas_excel(bloque: pd.DataFrame) -> Iterator[tuple]:
+    """Filas del bloque con tipos de Python y None en lugar de NaN/NaT."""
+    valores = bloque.astype(object)
+    return valores.where(bloque.notna().to_numpy(), None).itertuples(index=False, name=None)
+
+
+def _nombre_hoja(numero: int) -> str:
+    return HOJA_EXCEL if numero == 1 else f'{HOJA_EXCEL}_{numero}'
+
+
+def escribir_excel(vista, columnas: List[str], ruta: str, progreso: Optional[Callable[[int, int], None]] = None,
+                   filas_por_bloque: int = FILAS_POR_BLOQUE, max_filas_hoja: int = MAX_FILAS_EXCEL) -> Dict:
+    """
+    Escribe la vista en un .xlsx, repartida en hojas de a lo sumo `max_filas_hoja`
+    filas (encabezado incluido). Devuelve las filas escritas y la cantidad de hojas.
+    """
+    if not excel_disponible():
+        raise ImportError("Se necesita xlsxwriter u openpyxl para exportar a Excel")
+
+    if XLSXWRITER_AVAILABLE:
+        libro = xlsxwriter.Workbook(ruta, {
+            'constant_memory': True,
+            'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+            'remove_timezone': True,
+            'strings_to_urls': False,
+            'nan_inf_to_errors': True,
+        })
+
+        def nueva_hoja(numero):
+            return libro.add_worksheet(_nombre_hoja(numero))
+
+        def escribir_fila(hoja, fila, valores):
+            hoja.write_row(fila, 0, valores)
+    else:
+        libro = Workbook(write_only=True)
+
+        def nueva_hoja(numero):
+            return libro.create_sheet(_nombre_hoja(numero))
+
+        def escribir_fila(hoja, fila, valores):
+            hoja.append(valores)
+
+    hojas = 1
+    hoja = nueva_hoja(hojas)
+    escribir_fila(hoja, 0, columnas)
+    fila = 1
+    escritas = 0
+    for bloque in bloques(vista, columnas, filas_por_bloque):
+        for valores in _filas_excel(bloque):
+            if fila == max_filas_hoja:
+                hojas += 1
+                hoja = nueva_hoja(hojas)
+                escribir_fila(hoja, 0, columnas)
+                fila = 1
+            escribir_fila(hoja, fila, valores)
+            fila += 1
+        escritas += len(bloque)
+        if progreso:
+            progreso(escritas, len(vista))
+
+    if XLSXWRITER_AVAILABLE:
+        libro.close()
+    else:
+        libro.save(ruta)
+    return {'filas': escritas, 'hojas': hojas}
+
+
+def _columnas_directas(base, columnas: List[str]) -> List[str]:
+    """
+    Columnas que el conjunto todavía tiene solo en su tabla Arrow (no se leyeron
+    a pandas): se exportan tomando las filas de la tabla, sin convertirlas. Las
+    de diccionario pasan por pandas para que todos los bloques compartan categorías.
+    """
+    tabla = getattr(base, 'tabla', None)
+    if tabla is None:
+        return []
+    return [col for col in columnas
+            if col not in base.df.columns and col in tabla.schema.names
+            and not pa.types.is_dictionary(tabla.schema.field(col).type)]
+
+
+def _bloque_pandas_arrow(bloque: pd.DataFrame) -> 'pa.Table':
+    """Bloque de pandas como tabla Arrow; las columnas de objetos con tipos mezclados se pasan a texto."""
+    for columna in bloque.columns:
+        serie = bloque[columna]
+        if serie.dtype == object and pd.api.types.infer_dtype(serie, skipna=True).startswith('mixed'):
+            bloque = bloque.assign(**{columna: serie.where(serie.isna(), serie.astype(str))})
+    return pa.Table.from_pandas(bloque, preserve_index=False)
+
+
+def _esquema_estable(esquema: 'pa.Schema') -> 'pa.Schema':
+    """Esquema del primer bloque, con texto en lugar de nulo para columnas sin valores en ese bloque."""
+    for i, campo in enumerate(esquema):
+        if pa.types.is_null(campo.type):
+            esquema = esquema.set(i, campo.with_type(pa.large_string()))
+    return esquema
+
+
+def bloques_arrow(vista, columnas: List[str], filas_por_bloque: int = FILAS_POR_BLOQUE) -> Iterator['pa.Table']:
+    """
+    Tablas Arrow consecutivas de la vista con `columnas` y el mismo esquema (el
+    del primer bloque). Con una vista vacía devuelve una tabla sin filas, para
+    que el archivo lleve el esquema.
+    """
+    base = vista.base
+    directas = _columnas_directas(base, columnas)
+    de_pandas = [col for col in columnas if col not in directas]
+    marco = base[de_pandas] if de_pandas else None
+    posiciones = vista.posiciones_base()
+    esquema = None
+    for inicio in range(0, max(len(posiciones), 1), filas_por_bloque):
+        filas = posiciones[inicio:inicio + filas_por_bloque]
+        tabla = _bloque_pandas_arrow(marco.iloc[filas]) if de_pandas else None
+        if directas:
+            filas_tabla = filas if base.filas is None else base.filas[filas]
+            arreglos = {col: base.tabla.column(col).take(filas_tabla) for col in directas}
+            if tabla is None:
+                tabla = pa.table(arreglos)
+            else:
+                for col, arreglo in arreglos.items():
+                    tabla = tabla.append_column(col, arreglo)
+        tabla = tabla.select(columnas)
+        if esquema is None:
+            esquema = _esquema_estable(tabla.schema)
+        yield tabla if tabla.schema.equals(esquema) else tabla.cast(esquema)
+
+
+def _escribir_tablas(vista, columnas: List[str], abrir: Callable, progreso: Optional[Callable[[int, int], None]],
+                     filas_por_bloque: int) -> int:
+    """Escribe los bloques Arrow con el escritor que devuelve `abrir(esquema)` y devuelve las filas escritas."""
+    escritor = None
+    escritas = 0
+    try:
+        for tabla in bloques_arrow(vista, columnas, filas_por_bloque):
+            if escritor is None:
+                escritor = abrir(tabla.schema)
+            escritor.write_table(tabla)
+            escritas += tabla.num_rows
+            if progreso and tabla.num_rows:
+                progreso(escritas, len(vista))
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return escritas
+
+
+def escribir_parquet(vista, columnas: List[str], ruta: str, progreso: Optional[Callable[[int, int], None]] = None,
+                     filas_por_bloque: int = FILAS_POR_BLOQUE) -> int:
+    """Escribe la vista en Parquet (zstd), un grupo de filas por bloque, y devuelve las filas escritas."""
+    return _escribir_tablas(vista, columnas,
+                            lambda esquema: pq.ParquetWriter(ruta, esquema, compression=COMPRESION_ARROW),
+                            progreso, filas_por_bloque)
+
+
+def escribir_arrow(vista, columnas: List[str], ruta: str, progreso: Optional[Callable[[int, int], None]] = None,
+                   filas_por_bloque: int = FILAS_POR_BLOQUE) -> int:
+    """Escribe la vista en Arrow IPC (formato de archivo, buffers en zstd) y devuelve las filas escritas."""
+    opciones = ipc.IpcWriteOptions(compression=COMPRESION_ARROW)
+    return _escribir_tablas(vista, columnas,
+                            lambda esquema: ipc.new_file(ruta, esquema, options=opciones),
+                            progreso, filas_por_bloque)
+
+
+def limpiar_temporales(directorio: str = DIRECTORIO_EXPORTACION, horas: float = HORAS_TEMPORALES):
+    """Borra las exportaciones anteriores a `horas` horas."""
+    if not os.path.isdir(directorio):
+        return
+    limite = time.time() - horas * 3600
+    for nombre in os.listdir(directorio):
+        ruta = os.path.join(directorio, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+
+
+def eliminar_archivo(ruta: Optional[str]):
+    """Borra un archivo exportado si todavía existe."""
+    if ruta and os.path.exists(ruta):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+
+
+def exportar(vista, columnas: List[str], formato: str, compresion: str = 'Ninguna',
+             nombre: str = 'embargos_export', directorio: Optional[str] = None,
+             progreso: Optional[Callable[[int, int], None]] = None,
+             filas_por_bloque: Optional[int] = None, max_filas_hoja: int = MAX_FILAS_EXCEL) -> Dict:
+    """
+    Exporta la vista a un archivo temporal en `formato` (una clave de `FORMATOS`).
+
+    La compresión ('gzip' o 'zip') aplica a CSV y JSON; los formatos de
+    `FORMATOS_COMPRIMIDOS` ya se escriben comprimidos y se entregan tal cual. Devuelve un diccionario con `ruta` (temporal),
+    `nombre_archivo` (para la descarga), `mime`, `filas`, `hojas` y `bytes`.
+    """
+    extension, mime = FORMATOS[formato]
+    if formato in FORMATOS_COMPRIMIDOS:
+        compresion = 'Ninguna'
+    if formato in ('Parquet', 'Arrow') and not PYARROW_AVAILABLE:
+        raise ImportError(f"Se necesita pyarrow para exportar a {formato}")
+    if filas_por_bloque is None:
+        filas_por_bloque = FILAS_POR_BLOQUE_EXCEL if formato == 'Excel' else FILAS_POR_BLOQUE
+    nombre_archivo = f'{nombre}.{extension}'
+    if compresion == 'gzip':
+        nombre_archivo, mime = f'{nombre_archivo}.gz', 'application/gzip'
+    elif compresion == 'zip':
+        nombre_archivo, mime = f'{nombre}.zip', 'application/zip'
+
+    directorio = directorio or DIRECTORIO_EXPORTACION
+    os.makedirs(directorio, exist_ok=True)
+    limpiar_temporales(directorio)
+    descriptor, ruta = tempfile.mkstemp(prefix=f'{nombre}_', suffix=f'_{nombre_archivo}', dir=directorio)
+    os.close(descriptor)
+
+    try:
+        hojas = 0
+        if formato == 'Excel':
+            resultado = escribir_excel(vista, columnas, ruta, progreso, filas_por_bloque, max_filas_hoja)
+            filas, hojas = resultado['filas'], resultado['hojas']
+        elif formato == 'Parquet':
+            filas = escribir_parquet(vista, columnas, ruta, progreso, filas_por_bloque)
+        elif formato == 'Arrow':
+            filas = escribir_arrow(vista, columnas, ruta, progreso, filas_por_bloque)
+        else:
+            escribir = escribir_csv if formato == 'CSV' else escribir_json
+            with _abrir_texto(ruta, compresion, f'{nombre}.{extension}') as archivo:
+                filas = escribir(vista, columnas, archivo, progreso, filas_por_bloque)
+    except BaseException:
+        eliminar_archivo(ruta)
+        raise
+
+    return {
+        'ruta': ruta,
+        'nombre_archivo': nombre_archivo,
+        'mime': mime,
+        'filas': int(filas),
+        'hojas': hojas,
+        'bytes': os.path.getsize(ruta),
+    }
+
+
+def leer_archivo(ruta: str) -> bytes:
+    """Contenido del archivo exportado, para la descarga diferida."""
+    with open(ruta, 'rb') as archivo:
+        return archivo.read()
+
+
+# Estados de un trabajo de exportación
+EN_ESPERA = 'en espera'
+EN_CURSO = 'en curso'
+COMPLETADO = 'completado'
+CANCELADO = 'cancelado'
+ERROR = 'error'
+
+_EJECUTOR = ThreadPoolExecutor(max_workers=MAX_TRABAJOS_SIMULTANEOS, thread_name_prefix='exportacion')
+_IDENTIFICADORES = itertools.count(1)
+
+
+class ExportacionCancelada(Exception):
+    """Se pidió cancelar la exportación antes de que terminara."""
+
+
+class TrabajoExportacion:
+    """
+    Exportación de una vista en un hilo de fondo.
+
+    El hilo solo actualiza atributos (`estado`, `escritas`, `archivo`, `error`);
+    el dashboard los lee en cada ejecución para dibujar el avance. La vista se
+    toma al crear el trabajo, así que cambiar los filtros después no lo afecta.
+    """
+
+    def __init__(self, vista, columnas: List[str], formato: str, compresion: str = 'Ninguna',
+                 nombre: str = 'embargos_export', directorio: Optional[str] = None):
+        self.id = next(_IDENTIFICADORES)
+        self.vista = vista
+        self.columnas = list(columnas)
+        self.formato = formato
+        self.compresion = 'Ninguna' if formato in FORMATOS_COMPRIMIDOS else compresion
+        self.nombre = nombre
+        self.directorio = directorio
+        self.total = len(vista)
+        self.escritas = 0
+        self.estado = EN_ESPERA
+        self.archivo: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.creado = time.time()
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self._cancelar = threading.Event()
+        self._futuro = None
+
+    def iniciar(self) -> 'TrabajoExportacion':
+        self._futuro = _EJECUTOR.submit(self._ejecutar)
+        return self
+
+    def _progreso(self, escritas: int, total: int):
+        if self._cancelar.is_set():
+            raise ExportacionCancelada()
+        self.escritas = escritas
+
+    def _ejecutar(self):
+        if self._cancelar.is_set():
+            self.estado = CANCELADO
+            return
+        self.estado = EN_CURSO
+        self.inicio = time.time()
+        try:
+            archivo = exportar(self.vista, self.columnas, self.formato, self.compresion,
+                               nombre=self.nombre, directorio=self.directorio, progreso=self._progreso)
+            if self._cancelar.is_set():
+                # Cancelado después del último bloque
+                eliminar_archivo(archivo['ruta'])
+                raise ExportacionCancelada()
+            self.archivo = archivo
+            self.estado = COMPLETADO
+        except ExportacionCancelada:
+            self.estado = CANCELADO
+        except Exception as e:
+            self.error = str(e)
+            self.estado = ERROR
+        finally:
+            self.fin = time.time()
+            # La vista ya no hace falta: no retener las posiciones filtradas
+            self.vista = None
+
+    @property
+    def activo(self) -> bool:
+        return self.estado in (EN_ESPERA, EN_CURSO)
+
+    @property
+    def avance(self) -> float:
+        """Fracción de registros escritos (1.0 al completar)."""
+        if self.estado == COMPLETADO or self.total == 0:
+            return 1.0
+        return min(self.escritas / self.total, 1.0)
+
+    @property
+    def duracion(self) -> Optional[float]:
+        if self.inicio is None:
+            return None
+        return (self.fin or time.time()) - self.inicio
+
+    def cancelar(self):
+        """Pide la cancelación; un trabajo en curso se detiene al terminar el bloque actual."""
+        self._cancelar.set()
+        if self._futuro is not None and self._futuro.cancel():
+            self.estado = CANCELADO
+
+    def descartar(self):
+        """Cancela el trabajo si sigue activo y borra su archivo."""
+        self.cancelar()
+        if self.archivo:
+            eliminar_archivo(self.archivo['ruta'])
+            self.archivo = None
+
+    def esperar(self, timeout: Optional[float] = None):
+        """Bloquea hasta que el hilo termine (para pruebas y scripts)."""
+        if self._futuro is not None and not self._futuro.cancelled():
+            self._futuro.result(timeout)
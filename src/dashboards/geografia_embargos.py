@@ -0,0 +1,211 @@
+"""
+Ubicación de las ciudades de los oficios en municipios DANE para el mapa de la
+pestaña geográfica.
+
+La columna `ciudad` trae el nombre escrito por cada entidad (con o sin tildes,
+"BOGOTA D.C.", "CALI - VALLE", ...). `IndiceMunicipios` lo resuelve al código
+DANE del municipio:
+
+- normalizando el texto (mayúsculas, sin tildes ni signos) y probando el
+  nombre completo o un alias conocido;
+- si no coincide, quitando del final la designación de distrito o el
+  departamento, por nombre o sigla ("SANTA MARTA D.T.C.H.", "PEREIRA
+  RISARALDA", "CALI - VALLE"); con departamento, el municipio debe ser de ese
+  departamento;
+- si tampoco, con el nombre del municipio más parecido (`difflib`) por
+  encima de `SIMILITUD_MINIMA`, entre los que empiezan por la misma letra.
+
+Un nombre que tienen varios municipios ("LA UNION", "RIONEGRO") solo se
+resuelve si uno de ellos es capital de departamento o si el departamento
+acompaña al nombre; si no, queda sin ubicar en lugar de ir a un municipio de
+otro departamento.
+
+Cada nombre se resuelve una sola vez y queda memoizado en el índice, que se
+construye una vez por proceso; como la ciudad es categórica, el mapa solo
+resuelve las categorías, no las filas. Los oficios y montos por municipio se
+suman a partir del agregado por ciudad (`resumen_ciudades`), sin recorrer las
+filas filtradas.
+
+`municipios_dane.csv` (junto a este módulo) trae el listado completo de
+municipios y áreas no municipalizadas de la DIVIPOLA (código DANE, nombre,
+departamento y centroide aproximado de la cabecera); con ella el mapa es de
+burbujas. Si junto al módulo está además `municipios_colombia.geojson`
+(geometrías simplificadas del marco geoestadístico del DANE, con el código de 5
+dígitos en la propiedad `PROPIEDAD_CODIGO_GEOJSON`), el mapa se dibuja como
+coropleta.
+"""
+import difflib
+import json
+import os
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_MODULO = os.path.dirname(os.path.abspath(__file__))
+RUTA_MUNICIPIOS = os.path.join(DIRECTORIO_MODULO, "municipios_dane.csv")
+RUTA_GEOJSON = os.path.join(DIRECTORIO_MODULO, "municipios_colombia.geojson")
+PROPIEDAD_CODIGO_GEOJSON = "MPIO_CDPMP"
+
+# Parecido mínimo (difflib.SequenceMatcher.ratio) para aceptar un nombre aproximado,
+# solo en nombres de al menos LONGITUD_MINIMA_PARECIDO letras ("SAN" no es "SUAN")
+SIMILITUD_MINIMA = 0.85
+LONGITUD_MINIMA_PARECIDO = 6
+
+# Nombres oficiales o usuales que no se parecen lo suficiente al del listado
+ALIAS = {
+    'BOGOTA D C': 'BOGOTA',
+    'BOGOTA DC': 'BOGOTA',
+    'SANTAFE DE BOGOTA': 'BOGOTA',
+    'SANTA FE DE BOGOTA': 'BOGOTA',
+    'SANTIAGO DE CALI': 'CALI',
+    'CARTAGENA DE INDIAS': 'CARTAGENA',
+    'SAN JOSE DE CUCUTA': 'CUCUTA',
+    'SAN JUAN DE PASTO': 'PASTO',
+    'GUADALAJARA DE BUGA': 'BUGA',
+    'SAN ANDRES DE TUMACO': 'TUMACO',
+    'EL ESPINAL': 'ESPINAL',
+    'SAN JUAN GIRON': 'GIRON',
+    'SAN JUAN DE GIRON': 'GIRON',
+}
+
+# Siglas y formas cortas de los departamentos (código DANE de 2 dígitos) que se
+# escriben después del municipio; los nombres completos salen del listado
+SIGLAS_DEPARTAMENTO = {
+    'ANT': '05', 'ATL': '08', 'BOL': '13', 'BOY': '15', 'CAL': '17', 'CAQ': '18', 'CAU': '19',
+    'CES': '20', 'COR': '23', 'CUN': '25', 'CUND': '25', 'CHO': '27', 'HUI': '41', 'LAG': '44',
+    'GUAJIRA': '44', 'MAG': '47', 'MET': '50', 'NAR': '52', 'NSA': '54', 'N DE SANTANDER': '54',
+    'NORTE SANTANDER': '54', 'QUI': '63', 'RIS': '66', 'SAN': '68', 'STDER': '68', 'SUC': '70',
+    'TOL': '73', 'VAC': '76', 'VALLE': '76', 'ARA': '81', 'CAS': '85', 'PUT': '86', 'SAP': '88',
+    'SAN ANDRES': '88', 'AMA': '91', 'GUA': '94', 'GUV': '95', 'VAU': '97', 'VID': '99',
+}
+
+# Designaciones de distrito que se escriben después del nombre ("SANTA MARTA D.T.C.H.")
+DESIGNACIONES_DISTRITO = {'D C', 'DC', 'D E', 'D T', 'DT', 'D T C H', 'DTCH', 'D T Y C', 'D E I P'}
+
+_NO_ALFANUMERICO = re.compile(r'[^A-Z0-9]+')
+
+
+def normalizar_nombre(nombre) -> str:
+    """Mayúsculas, sin tildes (Ñ como N, como se escribe a menudo) y con los signos reemplazados por un espacio."""
+    texto = unicodedata.normalize('NFKD', str(nombre).strip().upper()).encode('ascii', 'ignore').decode('ascii')
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def cargar_municipios(ruta: str = RUTA_MUNICIPIOS) -> pd.DataFrame:
+    """Listado de municipios (código DANE como texto de 5 dígitos, nombre, departamento y centroide)."""
+    municipios = pd.read_csv(ruta, dtype={'codigo_dane': str}, encoding='utf-8')
+    municipios['codigo_dane'] = municipios['codigo_dane'].str.zfill(5)
+    return municipios
+
+
+def cargar_geojson(ruta: str = RUTA_GEOJSON) -> Optional[Dict]:
+    """Geometrías de los municipios si el archivo existe; si no (o no se puede leer), None."""
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ADVERTENCIA] No se pudo leer {os.path.basename(ruta)}: {e}")
+        return None
+
+
+class IndiceMunicipios:
+    """Resolución memoizada de nombres de ciudad a filas del listado de municipios."""
+
+    def __init__(self, municipios: pd.DataFrame):
+        self.municipios = municipios.reset_index(drop=True)
+        self._departamento = self.municipios['codigo_dane'].str[:2].to_numpy()
+        self._capital = self.municipios['codigo_dane'].str.endswith('001').to_numpy()
+        self._por_nombre: Dict[str, List[int]] = {}
+        for posicion, clave in enumerate(self.municipios['municipio'].map(normalizar_nombre)):
+            self._por_nombre.setdefault(clave, []).append(posicion)
+        # Candidatos del nombre aproximado, por inicial
+        self._nombres: Dict[str, List[str]] = {}
+        for clave in self._por_nombre:
+            self._nombres.setdefault(clave[:1], []).append(clave)
+        self._departamentos = dict(SIGLAS_DEPARTAMENTO)
+        for nombre, codigo in zip(self.municipios['departamento'].map(normalizar_nombre), self._departamento):
+            self._departamentos.setdefault(nombre, codigo)
+        self._resueltos: Dict[str, int] = {}
+
+    def _unico(self, clave: str, departamento: Optional[str] = None) -> int:
+        """
+        Municipio con el nombre `clave` (o su alias), del `departamento` si se da.
+        Con varios, la capital de departamento; si ninguno lo es, -1 (ambiguo).
+        """
+        candidatos = self._por_nombre.get(ALIAS.get(clave, clave), [])
+        if departamento is not None:
+            candidatos = [p for p in candidatos if self._departamento[p] == departamento]
+        if len(candidatos) > 1:
+            candidatos = [p for p in candidatos if self._capital[p]]
+        return candidatos[0] if len(candidatos) == 1 else -1
+
+    def _partir(self, clave: str) -> Tuple[str, Optional[str]]:
+        """Quita del final la designación de distrito y el departamento (nombre o sigla), si los hay."""
+        palabras = clave.split()
+        departamento = None
+        quitado = True
+        while quitado and len(palabras) > 1:
+            quitado = False
+            # Primero la cola más larga: "VALLE DEL CAUCA" antes que "CAUCA"
+            for n_palabras in range(len(palabras) - 1, 0, -1):
+                cola = ' '.join(palabras[-n_palabras:])
+                if cola in DESIGNACIONES_DISTRITO or (departamento is None and cola in self._departamentos):
+                    if cola not in DESIGNACIONES_DISTRITO:
+                        departamento = self._departamentos[cola]
+                    palabras = palabras[:-n_palabras]
+                    quitado = True
+                    break
+        return ' '.join(palabras), departamento
+
+    def _buscar(self, clave: str) -> int:
+        if not clave:
+            return -1
+        if clave in self._por_nombre or clave in ALIAS:
+            return self._unico(clave)
+        nombre, departamento = self._partir(clave)
+        if nombre in self._por_nombre or nombre in ALIAS:
+            return self._unico(nombre, departamento)
+        if len(nombre) < LONGITUD_MINIMA_PARECIDO:
+            return -1
+        parecidos = difflib.get_close_matches(nombre, self._nombres.get(nombre[:1], []), n=1, cutoff=SIMILITUD_MINIMA)
+        return self._unico(parecidos[0], departamento) if parecidos else -1
+
+    def resolver_nombre(self, nombre) -> int:
+        """Fila del municipio de `nombre` (-1 si no se reconoce)."""
+        if pd.isna(nombre):
+            return -1
+        if nombre not in self._resueltos:
+            self._resueltos[nombre] = self._buscar(normalizar_nombre(nombre))
+        return self._resueltos[nombre]
+
+    def resolver(self, nombres: Iterable) -> np.ndarray:
+        """Fila del municipio de cada nombre (int32, -1 = no reconocido)."""
+        return np.fromiter((self.resolver_nombre(nombre) for nombre in nombres), dtype=np.int32)
+
+    def por_municipio(self, por_ciudad: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+        """
+        Suma `oficios` y `monto` del agregado por ciudad (`resumen_ciudades`) por
+        municipio. Devuelve `municipios` (una fila por municipio con oficios, con
+        su código, centroide y las ciudades que lo componen) y `sin_ubicar` (las
+        filas de `por_ciudad` que no se reconocieron).
+        """
+        posiciones = self.resolver(por_ciudad['ciudad'])
+        ubicadas = posiciones >= 0
+        n_municipios = len(self.municipios)
+        oficios = np.bincount(posiciones[ubicadas], weights=por_ciudad['oficios'].to_numpy()[ubicadas],
+                              minlength=n_municipios)
+        monto = np.bincount(posiciones[ubicadas], weights=por_ciudad['monto'].to_numpy(dtype=np.float64)[ubicadas],
+                            minlength=n_municipios)
+        presentes = np.flatnonzero(oficios)
+        ciudades = pd.Series(por_ciudad['ciudad'].astype(str).to_numpy()[ubicadas])
+        nombres = ciudades.groupby(posiciones[ubicadas]).agg(', '.join)
+        municipios = self.municipios.iloc[presentes].reset_index(drop=True)
+        municipios['oficios'] = oficios[presentes].astype('int64')
+        municipios['monto'] = monto[presentes]
+        municipios['ciudades'] = nombres.reindex(presentes).to_numpy()
+        return {'municipios': municipios, 'sin_ubicar': por_ciudad[~ubicadas].reset_index(drop=True)}
@@ -0,0 +1,348 @@
+"""
+Valores canónicos e índice de filtros del dashboard de embargos.
+
+`agregar_columnas_canonicas` deriva al cargar los datos las columnas
+`banco_canon`, `estado_canon`, `tipo_canon` y `tipo_documento_canon`: la
+normalización de variantes de texto se aplica a las categorías únicas de cada
+columna y no a cada fila, de modo que filtros, métricas y gráficos comparan
+categorías por igualdad.
+
+`IndiceFiltros` se construye una sola vez por DataFrame cargado: para cada
+filtro (banco, ciudad, estado, tipo, tipo de documento, mes) las posiciones de
+las filas quedan agrupadas por valor canónico (arreglos ordenados de enteros).
+Resolver una combinación de filtros es unir los grupos seleccionados dentro de
+cada columna e intersectar entre columnas, sin recorrer cadenas.
+
+El resultado de filtrar son posiciones de fila, no un DataFrame: `VistaFiltrada`
+combina el DataFrame base con esas posiciones y solo extrae las columnas que
+cada gráfico pide.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+BANCOS_PERMITIDOS = ['FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER']
+
+ESTADOS_ORDEN = ['CONFIRMADO', 'PROCESADO', 'SIN_CONFIRMAR', 'PROCESADO_CON_ERRORES']
+ESTADOS_PERMITIDOS_MAP = {
+    'CONFIRMADO': [
+        'CONFIRMADO', 'CONFIRMADOS', 'Confirmado', 'Confirmados', 'confirmado', 'confirmados',
+        'CONFIRMADO_', 'CONFIRMADOS_'
+    ],
+    'PROCESADO': [
+        'PROCESADO', 'PROCESADOS', 'Procesado', 'Procesados', 'procesado', 'procesados',
+        'PROCESADO_', 'PROCESADOS_'
+    ],
+    'SIN_CONFIRMAR': [
+        'SIN_CONFIRMAR', 'SIN CONFIRMAR', 'SINCONFIRMAR', 'Sin confirmar', 'Sin Confirmar',
+        'SIN_CONFIRMAR_', 'SIN_CONFIRMADO', 'SIN CONFIRMADO', 'SINCONFIRMADO'
+    ],
+    'PROCESADO_CON_ERRORES': [
+        'PROCESADO_CON_ERRORES', 'PROCESADO CON ERRORES', 'PROCESADOCONERRORES',
+        'PROCESADO_CON_ERROR', 'PROCESADO CON ERROR', 'PROCESADOCONERROR',
+        'Procesado con error', 'Procesado con errores', 'Procesado Con Error', 'Procesado Con Errores',
+        'CON_ERROR', 'CON_ERRORES', 'CON ERROR', 'CON ERRORES',
+        'PROCESADO_CON_ERRORES_', 'PROCESADO_CON_ERROR_'
+    ]
+}
+
+TIPOS_ORDEN = ['JUDICIAL', 'COACTIVO']
+TIPO_EMBARGO_MAP = {
+    'JUDICIAL': ['JUDICIAL', 'Judicial', 'judicial', 'JUDICIAL_', 'JUDICIALES', 'Judiciales'],
+    'COACTIVO': ['COACTIVO', 'Coactivo', 'coactivo', 'COACTIVO_', 'COACTIVOS', 'Coactivos']
+}
+
+TIPOS_DOCUMENTO_ORDEN = ['Embargo', 'Desembargo', 'Requerimiento', 'No procesable']
+
+
+def _normalizar_texto(series: pd.Series, guiones: bool) -> pd.Series:
+    texto = series.astype(str).str.strip().str.upper().str.replace(' ', '_')
+    if guiones:
+        texto = texto.str.replace('-', '_')
+    return texto.str.rstrip('_')
+
+
+def _mapear_variaciones(series: pd.Series, mapa: Dict[str, List[str]], guiones: bool) -> pd.Series:
+    """Traduce cada variación conocida a su valor estándar; el resto queda en NaN."""
+    variaciones = {}
+    for estandar, valores in mapa.items():
+        for v in valores:
+            v_norm = v.upper().replace(' ', '_')
+            if guiones:
+                v_norm = v_norm.replace('-', '_')
+            variaciones[v_norm.rstrip('_')] = estandar
+    return _normalizar_texto(series, guiones).map(variaciones)
+
+
+def normalizar_banco(series: pd.Series) -> pd.Series:
+    """Nombre del banco en mayúsculas; lo que no es uno de los bancos reales queda en NaN."""
+    bancos = series.astype(str).str.strip().str.upper()
+    return bancos.where(bancos.isin(BANCOS_PERMITIDOS))
+
+
+def normalizar_estado(series: pd.Series) -> pd.Series:
+    return _mapear_variaciones(series, ESTADOS_PERMITIDOS_MAP, guiones=True)
+
+
+def normalizar_tipo_embargo(series: pd.Series) -> pd.Series:
+    return _mapear_variaciones(series, TIPO_EMBARGO_MAP, guiones=False)
+
+
+def normalize_tipo_documento_series(series: Optional[pd.Series]) -> pd.Series:
+    """Normaliza los valores de tipo_documento a categorías principales."""
+    if series is None or series.empty:
+        if series is None:
+            return pd.Series(dtype='object')
+        return pd.Series(index=series.index, dtype='object')
+    doc_series = series.astype(str).str.upper().str.strip()
+    normalized = pd.Series('Embargo', index=series.index, dtype='object')
+    mask_desembargo = doc_series.str.contains('DESEM|LEVANT', case=False, na=False)
+    mask_requerimiento = doc_series.str.contains('REQUER', case=False, na=False)
+    mask_no_procesable = doc_series.str.contains('NO', case=False, na=False) & doc_series.str.contains('PROCES', case=False, na=False)
+    normalized[mask_desembargo] = 'Desembargo'
+    normalized[mask_requerimiento] = 'Requerimiento'
+    normalized[mask_no_procesable] = 'No procesable'
+    return normalized
+
+
+def _como_texto(series: pd.Series) -> pd.Series:
+    return series.astype(str)
+
+
+# Columna canónica -> (columna original, normalización, categorías en orden de negocio)
+COLUMNAS_CANONICAS: Dict[str, tuple] = {
+    'banco_canon': ('entidad_bancaria', normalizar_banco, BANCOS_PERMITIDOS),
+    'estado_canon': ('estado_embargo', normalizar_estado, ESTADOS_ORDEN),
+    'tipo_canon': ('tipo_embargo', normalizar_tipo_embargo, TIPOS_ORDEN),
+    'tipo_documento_canon': ('tipo_documento', normalize_tipo_documento_series, TIPOS_DOCUMENTO_ORDEN),
+}
+
+# Filtro del dashboard -> (columnas candidatas, normalización de los valores seleccionados).
+# Se usa la primera columna presente; sobre una columna canónica la normalización no cambia nada.
+FILTROS_INDEXADOS: Dict[str, tuple] = {
+    'banco': (('banco_canon', 'entidad_bancaria'), normalizar_banco),
+    'ciudad': (('ciudad',), _como_texto),
+    'estado': (('estado_canon', 'estado_embargo'), normalizar_estado),
+    'tipo': (('tipo_canon', 'tipo_embargo'), normalizar_tipo_embargo),
+    'tipo_documento': (('tipo_documento_canon', 'tipo_documento'), normalize_tipo_documento_series),
+    'mes': (('mes',), _como_texto),
+}
+
+
+def _como_categorica(series: pd.Series) -> pd.Series:
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series
+    return series.astype('category')
+
+
+def canonizar_columna(series: pd.Series, normalizar: Callable[[pd.Series], pd.Series],
+                      categorias: List[str]) -> pd.Series:
+    """
+    Columna categórica con los valores canónicos de `series`. La normalización
+    recorre solo las categorías únicas; las filas se traducen por código.
+    Los valores que no corresponden a ninguna categoría quedan en NaN.
+    """
+    series = _como_categorica(series)
+    canon = normalizar(pd.Series(series.cat.categories))
+    codigos_categoria = pd.Categorical(canon, categories=categorias).codes
+    # El código -1 (NaN en la columna original) se mantiene en -1
+    tabla = np.append(codigos_categoria, -1).astype(np.int8)
+    codigos = tabla[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=series.index)
+
+
+def agregar_columnas_canonicas(df: pd.DataFrame) -> pd.DataFrame:
+    """Agrega (en el mismo DataFrame) las columnas canónicas cuya columna original existe."""
+    for destino, (origen, normalizar, categorias) in COLUMNAS_CANONICAS.items():
+        if origen in df.columns:
+            df[destino] = canonizar_columna(df[origen], normalizar, categorias)
+    return df
+
+
+def columnas_visibles(df: pd.DataFrame) -> List[str]:
+    """Columnas originales del DataFrame (sin las canónicas derivadas), para tablas y exportación."""
+    return [col for col in df.columns if col not in COLUMNAS_CANONICAS]
+
+
+def contar_categorias(series: pd.Series, condicion: Callable[[pd.Series], pd.Series]) -> int:
+    """Filas cuya categoría cumple `condicion` (evaluada sobre las categorías únicas)."""
+    series = _como_categorica(series)
+    cumple = np.asarray(condicion(pd.Series(series.cat.categories)), dtype=bool)
+    conteos = np.bincount(series.cat.codes.to_numpy() + 1, minlength=len(cumple) + 1)[1:]
+    return int(conteos[cumple].sum())
+
+
+class IndiceColumna:
+    """
+    Posiciones de fila agrupadas por valor canónico de una columna.
+
+    `orden` contiene todas las posiciones ordenadas por valor (y, dentro de cada
+    valor, ascendentes); las del valor `k` son `orden[limites[k]:limites[k + 1]]`.
+    Las filas sin valor canónico no pertenecen a ningún grupo.
+    """
+
+    def __init__(self, series: pd.Series, normalizar: Callable[[pd.Series], pd.Series]):
+        self.normalizar = normalizar
+        series = _como_categorica(series)
+        categorias = pd.Series(series.cat.categories)
+        # La normalización solo recorre las categorías únicas
+        ids_categoria, self.valores = pd.factorize(normalizar(categorias).to_numpy(dtype=object))
+        # Código -1 (NaN en la columna) y categorías sin valor canónico -> grupo 0
+        tabla = np.concatenate([ids_categoria + 1, [0]]).astype(np.int32)
+        ids_fila = tabla[series.cat.codes.to_numpy()]
+
+        tipo_pos = np.int32 if len(series) < np.iinfo(np.int32).max else np.int64
+        self.orden = np.argsort(ids_fila, kind='stable').astype(tipo_pos, copy=False)
+        conteos = np.bincount(ids_fila, minlength=len(self.valores) + 1)
+        # El grupo 0 (sin valor) ocupa el inicio de `orden`; el valor k empieza donde termina el k-1
+        self.limites = np.cumsum(conteos)
+        self.conteos = conteos[1:]
+        self.posicion_valor = {valor: k for k, valor in enumerate(self.valores)}
+
+    def claves(self, seleccion: List) -> List[int]:
+        """Posiciones en `valores` de los valores seleccionados que existen (ordenadas)."""
+        claves = normalizar_seleccion(self.normalizar, seleccion)
+        return sorted({self.posicion_valor[c] for c in claves if c in self.posicion_valor})
+
+    def grupos(self, seleccion: List) -> List[np.ndarray]:
+        """Grupos de posiciones (vistas sobre `orden`) de los valores seleccionados."""
+        return [self.orden[self.limites[k]:self.limites[k + 1]] for k in self.claves(seleccion)]
+
+    def ids_por_fila(self) -> np.ndarray:
+        """Grupo de cada fila: 0 sin valor canónico, `k + 1` para el valor `k`."""
+        ids = np.empty(len(self.orden), dtype=np.int32)
+        ids[self.orden] = np.repeat(np.arange(len(self.limites), dtype=np.int32),
+                                    np.diff(self.limites, prepend=0))
+        return ids
+
+    def posiciones(self, seleccion: List) -> np.ndarray:
+        """Filas cuyo valor canónico está en `seleccion` (unión, ordenadas)."""
+        grupos = self.grupos(seleccion)
+        if not grupos:
+            return self.orden[:0]
+        if len(grupos) == 1:
+            return grupos[0]
+        return np.sort(np.concatenate(grupos))
+
+    def valores_presentes(self) -> List[str]:
+        """Valores canónicos con al menos una fila."""
+        return [valor for valor, n in zip(self.valores, self.conteos) if n > 0]
+
+
+def normalizar_seleccion(normalizar: Callable[[pd.Series], pd.Series], seleccion: List) -> set:
+    """Lleva los valores elegidos en un filtro a la misma forma canónica del índice."""
+    if not seleccion:
+        return set()
+    return {v for v in normalizar(pd.Series(list(seleccion), dtype=object)) if isinstance(v, str)}
+
+
+class IndiceFiltros:
+    """Índice de todas las columnas filtrables de un DataFrame."""
+
+    def __init__(self, df: pd.DataFrame):
+        self.n_filas = len(df)
+        self.columnas = {}
+        for clave, (candidatas, normalizar) in FILTROS_INDEXADOS.items():
+            columna = next((c for c in candidatas if c in df.columns), None)
+            if columna is not None:
+                self.columnas[clave] = IndiceColumna(df[columna], normalizar)
+
+    def valores(self, clave: str) -> List[str]:
+        """Valores canónicos disponibles para un filtro (vacío si la columna no existe)."""
+        indice = self.columnas.get(clave)
+        return indice.valores_presentes() if indice is not None else []
+
+    def seleccionar(self, filtros: Dict[str, List]) -> Optional[np.ndarray]:
+        """
+        Posiciones (ordenadas) de las filas que cumplen todos los filtros activos:
+        OR entre los valores de un filtro y AND entre filtros. Devuelve None si no
+        hay ningún filtro activo (todas las filas).
+        """
+        selecciones = []
+        for clave, seleccion in filtros.items():
+            if not seleccion or not isinstance(seleccion, list) or clave not in self.columnas:
+                continue
+            selecciones.append((clave, self.columnas[clave].grupos(seleccion)))
+        if not selecciones:
+            return None
+
+        # Solo la selección más pequeña se materializa como posiciones ordenadas;
+        # las demás se marcan grupo a grupo en un mapa de bits para intersectar
+        selecciones.sort(key=lambda item: sum(len(g) for g in item[1]))
+        clave, _ = selecciones[0]
+        resultado = self.columnas[clave].posiciones(filtros[clave])
+        if len(selecciones) > 1:
+            bitmap = np.zeros(self.n_filas, dtype=bool)
+            for _, grupos in selecciones[1:]:
+                if len(resultado) == 0:
+                    break
+                for grupo in grupos:
+                    bitmap[grupo] = True
+                resultado = resultado[bitmap[resultado]]
+                for grupo in grupos:
+                    bitmap[grupo] = False
+        return resultado
+
+
+class VistaFiltrada:
+    """
+    Filas seleccionadas de un DataFrame base, sin copiarlo.
+
+    Expone lo que usan los gráficos del dashboard (`columns`, `empty`, `len`,
+    `vista[columna]`); cada columna pedida se extrae una sola vez y solo para
+    las filas seleccionadas. `frame` materializa un subconjunto de columnas
+    cuando hace falta un DataFrame (tablas, agrupaciones, exportación).
+
+    La base puede ser cualquier objeto con `columns`, `len()` y `base[columna]` /
+    `base[lista]` como un DataFrame (p. ej. un conjunto cuyas columnas se leen
+    bajo demanda).
+    """
+
+    def __init__(self, df, posiciones: Optional[np.ndarray] = None):
+        self.base = df
+        self.posiciones = posiciones
+        self._columnas = {}
+        self._codigos = {}
+
+    @property
+    def columns(self) -> pd.Index:
+        return self.base.columns
+
+    def __len__(self) -> int:
+        return len(self.base) if self.posiciones is None else len(self.posiciones)
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0 or len(self.base.columns) == 0
+
+    def posiciones_base(self) -> np.ndarray:
+        """Posiciones de las filas seleccionadas dentro del DataFrame base."""
+        if self.posiciones is None:
+            return np.arange(len(self.base))
+        return self.posiciones
+
+    def __getitem__(self, columna: str) -> pd.Series:
+        if columna not in self._columnas:
+            serie = self.base[columna]
+            self._columnas[columna] = serie if self.posiciones is None else serie.iloc[self.posiciones]
+        return self._columnas[columna]
+
+    def codigos(self, columna: str) -> Tuple[np.ndarray, pd.CategoricalDtype]:
+        """
+        Códigos categóricos de la columna para las filas seleccionadas (-1 = sin valor)
+        y su tipo: permite contar con `np.bincount` sin construir una Series.
+        """
+        if columna not in self._codigos:
+            serie = _como_categorica(self.base[columna])
+            codigos = serie.cat.codes.to_numpy()
+            self._codigos[columna] = (codigos if self.posiciones is None else codigos[self.posiciones], serie.dtype)
+        return self._codigos[columna]
+
+    def frame(self, columnas: Optional[List[str]] = None, limite: Optional[int] = None) -> pd.DataFrame:
+        """DataFrame con las columnas pedidas (todas por defecto) y, opcionalmente, solo las primeras filas."""
+        base = self.base[list(self.columns) if columnas is None else columnas]
+        if self.posiciones is None:
+            return base if limite is None else base.iloc[:limite]
+        posiciones = self.posiciones if limite is None else self.posiciones[:limite]
+        return base.iloc[posiciones]
@@ -0,0 +1,155 @@
+"""
+Tabla paginada de los registros filtrados del dashboard de embargos.
+
+La tabla "Datos Filtrados" recorre la selección completa de a una página:
+solo las filas de la página visible se materializan y se envían al navegador.
+
+Para ordenar sin ordenar la selección en cada interacción, `IndiceOrden`
+guarda por columna (la primera vez que se ordena por ella, una vez por
+archivo cargado):
+
+- el rango de cada fila (entero; los valores iguales comparten rango y los
+  nulos van al final en ambos sentidos);
+- el orden estable ascendente de todas las filas por ese rango. El
+  descendente se deriva de él en O(n) invirtiendo los grupos de rango sin
+  invertir las filas dentro de cada grupo.
+
+El índice se comparte entre sesiones: solo conserva las `COLUMNAS_EN_CACHE`
+columnas ordenadas más recientemente. Las columnas que el conjunto tiene solo
+en su tabla Arrow se leen para calcular los rangos sin quedar guardadas en él.
+
+Una página de la selección ordenada sale del orden global filtrado con una
+máscara de la selección (O(n)) o, si la selección es pequeña, de ordenar solo
+sus filas por rango (O(k log k)); ambos caminos dan el mismo resultado que un
+`sort_values(kind='stable', na_position='last')` sobre las filas filtradas.
+"""
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+OPCIONES_FILAS_POR_PAGINA = [50, 100, 500]
+FILAS_POR_PAGINA = 100
+
+# Con selecciones menores que n / FRACCION_SELECCION_PEQUENA se ordenan solo sus filas
+FRACCION_SELECCION_PEQUENA = 8
+
+# Columnas con rangos y orden guardados (8 bytes por fila cada una); la menos usada sale primero
+COLUMNAS_EN_CACHE = 3
+
+
+def total_paginas(filas: int, filas_por_pagina: int = FILAS_POR_PAGINA) -> int:
+    return max(1, -(-filas // filas_por_pagina))
+
+
+def rangos(series: pd.Series) -> np.ndarray:
+    """
+    Rango de cada valor de la serie (int32, -1 = nulo). Las categorías se ordenan
+    por su texto, no por el orden de la categoría.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categorias = series.cat.categories
+        rango_categoria = np.argsort(np.argsort(categorias.astype(str).to_numpy(), kind='stable'), kind='stable')
+        codigos = series.cat.codes.to_numpy()
+        return np.where(codigos < 0, -1, rango_categoria[codigos]).astype(np.int32)
+    try:
+        codigos, _ = pd.factorize(series, sort=True)
+    except TypeError:
+        # Tipos mezclados que no se pueden comparar: se ordena por su texto
+        codigos, _ = pd.factorize(series.where(series.isna(), series.astype(str)), sort=True)
+    return codigos.astype(np.int32, copy=False)
+
+
+def _clave(rango: np.ndarray, maximo: int, descendente: bool) -> np.ndarray:
+    """Clave entera cuyo orden ascendente estable es el pedido, con los nulos al final."""
+    return np.where(rango < 0, maximo + 1, maximo - rango if descendente else rango)
+
+
+def _invertir_grupos(orden: np.ndarray, rango: np.ndarray) -> np.ndarray:
+    """
+    Orden descendente estable (nulos al final) a partir del ascendente: los grupos
+    de filas con el mismo rango quedan en orden inverso, pero las filas de cada
+    grupo conservan su orden.
+    """
+    no_nulos = int((rango >= 0).sum())
+    invertido = orden[:no_nulos][::-1]
+    rango_invertido = rango[invertido]
+    inicio_grupo = np.ones(no_nulos, dtype=bool)
+    inicio_grupo[1:] = rango_invertido[1:] != rango_invertido[:-1]
+    inicios = np.flatnonzero(inicio_grupo)
+    finales = np.append(inicios[1:], no_nulos)
+    grupo = np.cumsum(inicio_grupo) - 1
+    # Dentro de cada grupo [inicio, fin) la posición i pasa a inicio + fin - 1 - i
+    destino = inicios[grupo] + finales[grupo] - 1 - np.arange(no_nulos)
+    return np.concatenate([invertido[destino], orden[no_nulos:]])
+
+
+class IndiceOrden:
+    """Rangos y orden por columna de un conjunto de datos, construidos al primer uso (LRU por columna)."""
+
+    def __init__(self, datos, columnas_en_cache: int = COLUMNAS_EN_CACHE):
+        self.datos = datos
+        self.n_filas = len(datos)
+        self.columnas_en_cache = columnas_en_cache
+        # columna -> (rango, máximo, orden ascendente)
+        self._columnas = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _serie(self, columna: str) -> pd.Series:
+        """Columna completa; si solo está en la tabla Arrow, se lee sin guardarla en el conjunto."""
+        if getattr(self.datos, 'tabla', None) is not None and columna not in self.datos.df.columns:
+            return self.datos.tomar([columna], np.arange(self.n_filas))[columna]
+        return self.datos[columna]
+
+    def _entrada(self, columna: str) -> Tuple[np.ndarray, int, np.ndarray]:
+        with self._lock:
+            if columna in self._columnas:
+                self._columnas.move_to_end(columna)
+                return self._columnas[columna]
+        rango = rangos(self._serie(columna))
+        maximo = int(rango.max()) if len(rango) else 0
+        orden = np.argsort(_clave(rango, maximo, False), kind='stable').astype(np.int32)
+        with self._lock:
+            self._columnas[columna] = (rango, maximo, orden)
+            self._columnas.move_to_end(columna)
+            while len(self._columnas) > self.columnas_en_cache:
+                self._columnas.popitem(last=False)
+        return rango, maximo, orden
+
+    def rango(self, columna: str) -> Tuple[np.ndarray, int]:
+        """Rangos de la columna y su máximo."""
+        rango, maximo, _ = self._entrada(columna)
+        return rango, maximo
+
+    def orden(self, columna: str, descendente: bool = False) -> np.ndarray:
+        """Posiciones de todas las filas ordenadas por `columna` (estable, nulos al final)."""
+        rango, _, orden = self._entrada(columna)
+        return _invertir_grupos(orden, rango) if descendente else orden
+
+    def ordenar(self, posiciones: Optional[np.ndarray], columna: str, descendente: bool = False) -> np.ndarray:
+        """Posiciones de la selección (None = todas; si no, en orden de fila) en el orden pedido."""
+        if posiciones is not None and len(posiciones) * FRACCION_SELECCION_PEQUENA < self.n_filas:
+            rango, maximo = self.rango(columna)
+            return posiciones[np.argsort(_clave(rango[posiciones], maximo, descendente), kind='stable')]
+        orden = self.orden(columna, descendente)
+        if posiciones is None:
+            return orden
+        seleccion = np.zeros(self.n_filas, dtype=bool)
+        seleccion[posiciones] = True
+        return orden[seleccion[orden]]
+
+    def pagina(self, posiciones: Optional[np.ndarray], numero: int, filas_por_pagina: int = FILAS_POR_PAGINA,
+               columna: Optional[str] = None, descendente: bool = False) -> np.ndarray:
+        """
+        Posiciones (en el conjunto) de las filas de la página `numero` (desde 1) de
+        la selección, ordenada por `columna` o, sin columna, en el orden del archivo.
+        """
+        inicio = (numero - 1) * filas_por_pagina
+        fin = inicio + filas_por_pagina
+        if columna is None:
+            if posiciones is None:
+                return np.arange(inicio, min(fin, self.n_filas))
+            return posiciones[inicio:fin]
+        return self.ordenar(posiciones, columna, descendente)[inicio:fin]
@@ -65,6 +65,17 @@ def get_script_path(script_name):
             'dashboard_predicciones.py': os.path.join(src_dir, 'dashboards', 'dashboard_predicciones.py'),
             'dashboard_styles.py': os.path.join(src_dir, 'dashboards', 'dashboard_styles.py'),
             'dashboard_tabs_futuro.py': os.path.join(src_dir, 'dashboards', 'dashboard_tabs_futuro.py'),
+            'ciclo_vida_embargos.py': os.path.join(src_dir, 'dashboards', 'ciclo_vida_embargos.py'),
+            'geografia_embargos.py': os.path.join(src_dir, 'dashboards', 'geografia_embargos.py'),
+            'municipios_dane.csv': os.path.join(src_dir, 'dashboards', 'municipios_dane.csv'),
+            'municipios_colombia.geojson': os.path.join(src_dir, 'dashboards', 'municipios_colombia.geojson'),
+            'paginacion_embargos.py': os.path.join(src_dir, 'dashboards', 'paginacion_embargos.py'),
+            'exportacion_embargos.py': os.path.join(src_dir, 'dashboards', 'exportacion_embargos.py'),
+            'datos_graficos.py': os.path.join(src_dir, 'dashboards', 'datos_graficos.py'),
+            'busqueda_embargos.py': os.path.join(src_dir, 'dashboards', 'busqueda_embargos.py'),
+            'agregados_embargos.py': os.path.join(src_dir, 'dashboards', 'agregados_embargos.py'),
+            'datos_embargos.py': os.path.join(src_dir, 'dashboards', 'datos_embargos.py'),
+            'motor_filtros.py': os.path.join(src_dir, 'dashboards', 'motor_filtros.py'),
             'procesar_modelo.py': os.path.join(src_dir, 'pipeline_ml', 'procesar_modelo.py'),
             'utils_csv.py': os.path.join(script_dir, 'utils_csv.py'),  # En orquestacion
             'ob.ico': os.path.join(project_root, 'ob.ico'),
@@ -277,7 +288,7 @@ def run_streamlit(script_path, base_path, dashboard_name, csv_files=None, port=8
                 shutil.copy2(script_path, dest_script_path)
                 script_path = dest_script_path
                 
-                shared_assets = ["utils_csv.py", "dashboard_styles.py", "ob.ico"]
+                shared_assets = ["utils_csv.py", "dashboard_styles.py", "motor_filtros.py", "datos_embargos.py", "agregados_embargos.py", "busqueda_embargos.py", "datos_graficos.py", "exportacion_embargos.py", "paginacion_embargos.py", "geografia_embargos.py", "municipios_dane.csv", "municipios_colombia.geojson", "ciclo_vida_embargos.py", "ob.ico"]
                 for asset in shared_assets:
                     asset_source = get_script_path(asset)
                     if asset_source and os.path.exists(asset_source):
@@ -1451,7 +1462,13 @@ contacta al administrador de la Base de Datos o al equipo técnico.
         csv_files = {
             "embargos_consolidado_mensual.csv": consolidado_path
         }
-        
+        # Copia Arrow del consolidado (si el pipeline la generó): el dashboard la abre
+        # con memory mapping. copy2 conserva la fecha de modificación, que el dashboard
+        # compara con la del CSV para decidir si la copia está al día
+        arrow_path = os.path.splitext(consolidado_path)[0] + ".arrow"
+        if os.path.exists(arrow_path):
+            csv_files["embargos_consolidado_mensual.arrow"] = arrow_path
+
         # Ejecutar en segundo plano
         port = self.port_mapping["Embargos"]
         process = run_streamlit(script_path, base_path, "Embargos", csv_files, port)
@@ -0,0 +1,292 @@
+"""
+Ejecución del pipeline como un grafo de etapas con caché por contenido.
+
+Cada etapa declara sus archivos de entrada, las etapas de las que depende, sus
+parámetros y los archivos que produce. La clave de una etapa es un hash de sus
+parámetros y del contenido de sus entradas (incluidas las salidas de las etapas
+previas), de modo que una nueva ejecución omite las etapas vigentes y retoma
+desde la primera que cambió o falló.
+
+Las salidas de cada clave se conservan en `.cache_etapas/<etapa>/<clave>/` para
+restaurarlas sin recalcular si se vuelve a una combinación ya vista.
+"""
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+DIRECTORIO_CACHE = ".cache_etapas"
+ARCHIVO_MANIFIESTO = "manifiesto.json"
+ARCHIVO_SALIDAS_CACHE = "salidas.json"
+MAX_VERSIONES_CACHE = 3
+TAMANO_LECTURA_HASH = 1 << 20
+
+
+@dataclass
+class Etapa:
+    """
+    Una etapa del pipeline.
+
+    `funcion` no recibe argumentos y escribe `salidas` (nombres de archivo dentro
+    del directorio de salida). Si devuelve False, la ejecución se detiene sin error
+    (p. ej. datos insuficientes) y la etapa no queda registrada.
+
+    `opcionales` son salidas de mejor esfuerzo (p. ej. una copia que otro proceso
+    puede tener abierta): si no se pueden borrar antes de ejecutar o la etapa no
+    las genera, la etapa se completa igual y solo se registran las que escribió.
+    """
+    nombre: str
+    funcion: Callable[[], Optional[bool]]
+    salidas: List[str]
+    entradas: List[str] = field(default_factory=list)
+    dependencias: List[str] = field(default_factory=list)
+    parametros: dict = field(default_factory=dict)
+    opcionales: List[str] = field(default_factory=list)
+
+
+def hash_archivo(path: str) -> str:
+    """Hash del contenido de un archivo, leído por bloques."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for bloque in iter(lambda: f.read(TAMANO_LECTURA_HASH), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def ordenar_etapas(etapas: Iterable[Etapa]) -> List[Etapa]:
+    """Orden topológico estable; falla si hay dependencias desconocidas o ciclos."""
+    por_nombre = {}
+    for etapa in etapas:
+        if etapa.nombre in por_nombre:
+            raise ValueError(f"Etapa duplicada: {etapa.nombre}")
+        por_nombre[etapa.nombre] = etapa
+
+    orden, visitadas, en_curso = [], set(), set()
+
+    def visitar(nombre: str) -> None:
+        if nombre in visitadas:
+            return
+        if nombre in en_curso:
+            raise ValueError(f"Ciclo de dependencias en la etapa: {nombre}")
+        if nombre not in por_nombre:
+            raise ValueError(f"Dependencia desconocida: {nombre}")
+        en_curso.add(nombre)
+        for dep in por_nombre[nombre].dependencias:
+            visitar(dep)
+        en_curso.discard(nombre)
+        visitadas.add(nombre)
+        orden.append(por_nombre[nombre])
+
+    for nombre in por_nombre:
+        visitar(nombre)
+    return orden
+
+
+class EjecutorEtapas:
+    """
+    Ejecuta un conjunto de etapas en orden de dependencias, omitiendo las vigentes.
+
+    El manifiesto (`.cache_etapas/manifiesto.json`) guarda por etapa la clave de la
+    última ejecución y el hash de cada salida, además de las huellas
+    (tamaño, mtime) de los archivos ya hasheados para no releerlos si no cambiaron.
+    """
+
+    def __init__(self, output_dir: str, etapas: Iterable[Etapa], forzar: Iterable[str] = (), version: str = ""):
+        self.output_dir = output_dir
+        self.etapas = ordenar_etapas(etapas)
+        self.forzar = set(forzar)
+        desconocidas = self.forzar - {e.nombre for e in self.etapas}
+        if desconocidas:
+            raise ValueError(f"Etapas desconocidas en --force-stage: {', '.join(sorted(desconocidas))}")
+        self.version = version
+        self.dir_cache = os.path.join(output_dir, DIRECTORIO_CACHE)
+        self.ruta_manifiesto = os.path.join(self.dir_cache, ARCHIVO_MANIFIESTO)
+        self.manifiesto = self._cargar_manifiesto()
+        self.estados = {}
+
+    def _cargar_manifiesto(self) -> dict:
+        try:
+            with open(self.ruta_manifiesto, encoding='utf-8') as f:
+                manifiesto = json.load(f)
+        except (OSError, ValueError):
+            manifiesto = {}
+        manifiesto.setdefault('etapas', {})
+        manifiesto.setdefault('huellas', {})
+        return manifiesto
+
+    def _guardar_manifiesto(self) -> None:
+        os.makedirs(self.dir_cache, exist_ok=True)
+        temporal = self.ruta_manifiesto + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.manifiesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, self.ruta_manifiesto)
+
+    def _hash(self, path: str) -> str:
+        """Hash de un archivo reutilizando el registrado si su tamaño y mtime no cambiaron."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        huella = [stat.st_size, stat.st_mtime_ns]
+        previo = self.manifiesto['huellas'].get(path)
+        if previo and previo['huella'] == huella:
+            return previo['hash']
+        valor = hash_archivo(path)
+        self.manifiesto['huellas'][path] = {'huella': huella, 'hash': valor}
+        return valor
+
+    def _clave(self, etapa: Etapa) -> str:
+        contenido = {
+            'etapa': etapa.nombre,
+            'version': self.version,
+            'parametros': etapa.parametros,
+            'entradas': [self._hash(path) for path in etapa.entradas],
+            'dependencias': {
+                dep: self.manifiesto['etapas'][dep]['salidas'] for dep in sorted(etapa.dependencias)
+            },
+        }
+        serializado = json.dumps(contenido, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.blake2b(serializado, digest_size=16).hexdigest()
+
+    def _salidas_vigentes(self, registro: dict) -> bool:
+        for nombre, valor in registro['salidas'].items():
+            path = os.path.join(self.output_dir, nombre)
+            if not os.path.exists(path) or self._hash(path) != valor:
+                return False
+        return True
+
+    def _restaurar(self, etapa: Etapa, clave: str) -> Optional[dict]:
+        """Copia al directorio de salida las salidas guardadas para `clave`, si están íntegras."""
+        dir_clave = os.path.join(self.dir_cache, etapa.nombre, clave)
+        try:
+            with open(os.path.join(dir_clave, ARCHIVO_SALIDAS_CACHE), encoding='utf-8') as f:
+                salidas = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not set(etapa.salidas) <= set(salidas) <= set(etapa.salidas) | set(etapa.opcionales):
+            return None
+        for nombre, valor in salidas.items():
+            origen = os.path.join(dir_clave, nombre)
+            if not os.path.exists(origen) or hash_archivo(origen) != valor:
+                return None
+        restauradas = {}
+        for nombre, valor in salidas.items():
+            destino = os.path.join(self.output_dir, nombre)
+            try:
+                if os.path.exists(destino):
+                    os.remove(destino)
+                shutil.copy2(os.path.join(dir_clave, nombre), destino)
+            except OSError as e:
+                if nombre not in etapa.opcionales:
+                    raise
+                print(f"[ADVERTENCIA] No se pudo restaurar {nombre}: {e}")
+                continue
+            restauradas[nombre] = valor
+        return restauradas
+
+    def _guardar_en_cache(self, etapa: Etapa, clave: str, salidas: dict) -> None:
+        dir_etapa = os.path.join(self.dir_cache, etapa.nombre)
+        dir_clave = os.path.join(dir_etapa, clave)
+        if os.path.isdir(dir_clave):
+            shutil.rmtree(dir_clave)
+        os.makedirs(dir_clave)
+        for nombre in salidas:
+            origen = os.path.join(self.output_dir, nombre)
+            destino = os.path.join(dir_clave, nombre)
+            # Enlace duro cuando se puede (no duplica disco); las salidas se borran
+            # antes de cada ejecución, así que nunca se sobrescribe el archivo enlazado
+            try:
+                os.link(origen, destino)
+            except OSError:
+                shutil.copy2(origen, destino)
+        with open(os.path.join(dir_clave, ARCHIVO_SALIDAS_CACHE), 'w', encoding='utf-8') as f:
+            json.dump(salidas, f, indent=2)
+
+        versiones = sorted(
+            (os.path.join(dir_etapa, d) for d in os.listdir(dir_etapa)),
+            key=os.path.getmtime, reverse=True
+        )
+        for antigua in versiones[MAX_VERSIONES_CACHE:]:
+            shutil.rmtree(antigua, ignore_errors=True)
+
+    def _borrar_opcionales(self, etapa: Etapa) -> Dict[str, int]:
+        """
+        Borra las salidas opcionales previas. Devuelve las que no se pudieron borrar
+        (p. ej. abiertas por otro proceso en Windows) con su mtime, para distinguir
+        después si la etapa las reescribió.
+        """
+        bloqueadas = {}
+        for nombre in etapa.opcionales:
+            path = os.path.join(self.output_dir, nombre)
+            if not os.path.exists(path):
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"[ADVERTENCIA] No se pudo borrar {nombre} antes de la etapa '{etapa.nombre}': {e}")
+                bloqueadas[nombre] = os.stat(path).st_mtime_ns
+        return bloqueadas
+
+    def _opcionales_generadas(self, etapa: Etapa, bloqueadas: Dict[str, int]) -> List[str]:
+        """Salidas opcionales que la etapa escribió (las bloqueadas que no cambiaron no cuentan)."""
+        generadas = []
+        for nombre in etapa.opcionales:
+            path = os.path.join(self.output_dir, nombre)
+            if not os.path.exists(path):
+                continue
+            if nombre in bloqueadas and os.stat(path).st_mtime_ns == bloqueadas[nombre]:
+                continue
+            generadas.append(nombre)
+        return generadas
+
+    def ejecutar(self) -> Dict[str, str]:
+        """
+        Ejecuta el grafo. Devuelve el estado de cada etapa alcanzada:
+        'vigente', 'restaurada', 'ejecutada', 'detenida' o 'fallida' (también
+        disponible en `self.estados` si la ejecución termina con una excepción).
+
+        Si una etapa lanza una excepción, el manifiesto conserva las etapas ya
+        completadas y la excepción se propaga; la siguiente ejecución retoma ahí.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        estados = self.estados = {}
+        for etapa in self.etapas:
+            clave = self._clave(etapa)
+            registro = self.manifiesto['etapas'].get(etapa.nombre)
+            forzada = etapa.nombre in self.forzar
+
+            if not forzada and registro and registro['clave'] == clave and self._salidas_vigentes(registro):
+                print(f"[INFO] Etapa '{etapa.nombre}' vigente, se omite")
+                estados[etapa.nombre] = 'vigente'
+                continue
+
+            salidas = None if forzada else self._restaurar(etapa, clave)
+            if salidas is not None:
+                print(f"[INFO] Etapa '{etapa.nombre}' restaurada desde caché")
+                estados[etapa.nombre] = 'restaurada'
+            else:
+                print(f"\n[INFO] Ejecutando etapa '{etapa.nombre}'...")
+                # Se invalida antes de correr: si falla, la etapa queda pendiente
+                self.manifiesto['etapas'].pop(etapa.nombre, None)
+                self._guardar_manifiesto()
+                for nombre in etapa.salidas:
+                    path = os.path.join(self.output_dir, nombre)
+                    if os.path.exists(path):
+                        os.remove(path)
+                bloqueadas = self._borrar_opcionales(etapa)
+                estados[etapa.nombre] = 'fallida'
+                if etapa.funcion() is False:
+                    print(f"[ADVERTENCIA] La etapa '{etapa.nombre}' no se completó; se detiene el pipeline")
+                    estados[etapa.nombre] = 'detenida'
+                    break
+                faltantes = [n for n in etapa.salidas if not os.path.exists(os.path.join(self.output_dir, n))]
+                if faltantes:
+                    raise RuntimeError(f"La etapa '{etapa.nombre}' no generó: {', '.join(faltantes)}")
+                generadas = etapa.salidas + self._opcionales_generadas(etapa, bloqueadas)
+                salidas = {n: self._hash(os.path.join(self.output_dir, n)) for n in generadas}
+                self._guardar_en_cache(etapa, clave, salidas)
+                estados[etapa.nombre] = 'ejecutada'
+
+            self.manifiesto['etapas'][etapa.nombre] = {'clave': clave, 'salidas': salidas}
+            self._guardar_manifiesto()
+        return estados
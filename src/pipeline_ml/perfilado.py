@@ -0,0 +1,280 @@
+"""
+Instrumentación por secciones del pipeline: tiempo de pared, tiempo de CPU,
+memoria (RSS) y filas procesadas.
+
+Las secciones se anidan (`consolidar/escritura`, `clasificar/ajuste[tipo_embargo]`)
+y se acumulan en un registro global del proceso que se vuelca como
+`reporte_ejecucion.json` junto a los archivos generados. `perfilar` envuelve
+una ejecución completa con cProfile o pyinstrument (si está instalado).
+
+De cada sección se guarda la memoria residente al entrar (`rss_inicio_mb`), el
+pico durante la sección (`rss_pico_seccion_mb`) y su incremento sobre la de
+entrada (`rss_incremento_mb`): el pico de toda la vida del proceso (`ru_maxrss`)
+no dice qué etapa usó la memoria. En Linux el pico se reinicia al entrar a cada
+sección (`/proc/self/clear_refs`) y se lee de `VmHWM`; donde no se puede, se
+muestrea la memoria residente cada `INTERVALO_MUESTREO_S` mientras haya
+secciones abiertas.
+"""
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import List, Optional
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Windows
+    RESOURCE_AVAILABLE = False
+
+try:
+    from pyinstrument import Profiler
+    PYINSTRUMENT_AVAILABLE = True
+except ImportError:
+    PYINSTRUMENT_AVAILABLE = False
+
+ARCHIVO_REPORTE = "reporte_ejecucion.json"
+ARCHIVO_PERFIL = "perfil_ejecucion"
+
+# Cada cuánto se muestrea la memoria residente donde no se puede reiniciar el pico
+INTERVALO_MUESTREO_S = 0.05
+
+
+def _memoria_windows():
+    """Contadores de memoria del proceso actual vía psapi (sin dependencias externas)."""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    contadores = PROCESS_MEMORY_COUNTERS()
+    contadores.cb = ctypes.sizeof(contadores)
+    proceso = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(proceso, ctypes.byref(contadores), contadores.cb):
+        raise OSError("GetProcessMemoryInfo falló")
+    return contadores
+
+
+def rss_pico_mb() -> Optional[float]:
+    """
+    Pico de memoria residente del proceso, en MB (None si no se puede medir). En
+    Linux `RegistroSecciones` lo reinicia al entrar a cada sección.
+    """
+    try:
+        if RESOURCE_AVAILABLE:
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Linux reporta KB; macOS, bytes
+            return round(pico / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+        if sys.platform == 'win32':
+            return round(_memoria_windows().PeakWorkingSetSize / (1024 * 1024), 1)
+    except Exception:
+        pass
+    return None
+
+
+def rss_actual_mb() -> Optional[float]:
+    """Memoria residente actual del proceso, en MB (None si no se puede medir)."""
+    try:
+        if sys.platform.startswith('linux'):
+            with open('/proc/self/statm') as f:
+                paginas = int(f.read().split()[1])
+            return round(paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+        if sys.platform == 'win32':
+            return round(_memoria_windows().WorkingSetSize / (1024 * 1024), 1)
+    except Exception:
+        pass
+    return None
+
+
+def _leer_vmhwm_mb() -> Optional[float]:
+    """Pico de memoria residente desde el último reinicio (VmHWM), en MB; None si no se puede leer."""
+    try:
+        with open('/proc/self/status') as f:
+            for linea in f:
+                if linea.startswith('VmHWM:'):
+                    return round(int(linea.split()[1]) / 1024, 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reiniciar_vmhwm() -> bool:
+    """Reinicia el pico de memoria residente del proceso (Linux); False si no se puede."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+class RegistroSecciones:
+    """Acumula las secciones medidas en el proceso, en orden de finalización."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._muestreo = None
+        self.reiniciar()
+
+    def reiniciar(self) -> None:
+        self.secciones = []
+        self._pila = []
+        # Pico de memoria observado hasta ahora por cada sección abierta (paralelo a `_pila`)
+        self._picos: List[Optional[float]] = []
+        self._pico_proceso = rss_pico_mb()
+        # Si se puede reiniciar VmHWM se usa por sección; si no, se muestrea la memoria residente
+        self._con_reinicio = _leer_vmhwm_mb() is not None and _reiniciar_vmhwm()
+        self.inicio = datetime.now()
+
+    def _observar(self, rss: Optional[float]) -> None:
+        """Lleva `rss` al pico de todas las secciones abiertas y al del proceso."""
+        if rss is None:
+            return
+        with self._lock:
+            self._picos = [rss if pico is None else max(pico, rss) for pico in self._picos]
+            self._pico_proceso = rss if self._pico_proceso is None else max(self._pico_proceso, rss)
+
+    def _muestrear(self, detener: threading.Event) -> None:
+        while not detener.wait(INTERVALO_MUESTREO_S):
+            self._observar(rss_actual_mb())
+
+    def _abrir(self, nombre: str) -> Optional[float]:
+        """Apila la sección y reinicia o empieza a muestrear el pico; devuelve la memoria al entrar."""
+        if self._con_reinicio:
+            # El pico hasta aquí pertenece a las secciones que ya estaban abiertas
+            self._observar(_leer_vmhwm_mb())
+            _reiniciar_vmhwm()
+        elif self._muestreo is None:
+            detener = threading.Event()
+            hilo = threading.Thread(target=self._muestrear, args=(detener,), daemon=True)
+            hilo.start()
+            self._muestreo = (hilo, detener)
+        inicio = rss_actual_mb()
+        self._pila.append(nombre)
+        with self._lock:
+            self._picos.append(inicio)
+        return inicio
+
+    def _cerrar(self) -> Optional[float]:
+        """Desapila la sección y devuelve su pico de memoria."""
+        if self._con_reinicio:
+            self._observar(_leer_vmhwm_mb())
+        self._observar(rss_actual_mb())
+        self._pila.pop()
+        with self._lock:
+            pico = self._picos.pop()
+        if not self._pila and self._muestreo is not None:
+            hilo, detener = self._muestreo
+            detener.set()
+            hilo.join()
+            self._muestreo = None
+        return pico
+
+    @contextmanager
+    def medir(self, nombre: str, filas: Optional[int] = None):
+        """
+        Mide el bloque. Devuelve un dict donde el bloque puede anotar `filas`
+        u otros datos que se agregan tal cual a la sección.
+        """
+        rss_inicio = self._abrir(nombre)
+        datos = {'filas': filas}
+        seccion = '/'.join(self._pila)
+        nivel = len(self._pila) - 1
+        pared_0, cpu_0 = time.perf_counter(), time.process_time()
+        error = None
+        try:
+            yield datos
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            pared, cpu = time.perf_counter() - pared_0, time.process_time() - cpu_0
+            pico = self._cerrar()
+            registro = {
+                'seccion': seccion,
+                'nivel': nivel,
+                'pared_s': round(pared, 4),
+                'cpu_s': round(cpu, 4),
+                'rss_inicio_mb': rss_inicio,
+                'rss_pico_seccion_mb': pico,
+                'rss_incremento_mb': round(pico - rss_inicio, 1) if None not in (pico, rss_inicio) else None,
+            }
+            registro.update({k: v for k, v in datos.items() if v is not None})
+            if error:
+                registro['error'] = error
+            self.secciones.append(registro)
+
+    def guardar_reporte(self, output_dir: str, extra: Optional[dict] = None) -> str:
+        """Escribe el reporte JSON de la ejecución y devuelve su ruta."""
+        reporte = {
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'fin': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            # Los reinicios por sección también reinician ru_maxrss: se usa el máximo observado
+            'rss_pico_mb': max((v for v in (self._pico_proceso, rss_pico_mb()) if v is not None), default=None),
+            'secciones': self.secciones,
+        }
+        reporte.update(extra or {})
+        path = os.path.join(output_dir, ARCHIVO_REPORTE)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2, default=str)
+        return path
+
+
+PERFIL = RegistroSecciones()
+medir = PERFIL.medir
+
+
+@contextmanager
+def perfilar(output_dir: str, herramienta: Optional[str] = 'cprofile'):
+    """
+    Perfila el bloque con cProfile (`perfil_ejecucion.prof` + resumen `.txt`) o
+    con pyinstrument (`perfil_ejecucion.html`). Con `herramienta=None` no hace nada.
+    """
+    if not herramienta:
+        yield
+        return
+    if herramienta == 'pyinstrument' and not PYINSTRUMENT_AVAILABLE:
+        print("[ADVERTENCIA] pyinstrument no está instalado; se usa cProfile")
+        herramienta = 'cprofile'
+
+    base = os.path.join(output_dir, ARCHIVO_PERFIL)
+    if herramienta == 'pyinstrument':
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(base + ".html", 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+            print(f"[OK] Perfil guardado: {base}.html")
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(base + ".prof")
+        resumen = io.StringIO()
+        pstats.Stats(profiler, stream=resumen).sort_stats('cumulative').print_stats(40)
+        with open(base + ".txt", 'w', encoding='utf-8') as f:
+            f.write(resumen.getvalue())
+        print(f"[OK] Perfil guardado: {base}.prof (resumen en {base}.txt)")
@@ -6,22 +6,73 @@ import argparse
 import csv
 import os
 import sys
-from dataclasses import dataclass
+import tempfile
+from dataclasses import asdict, dataclass
 from typing import Optional
 
 import pandas as pd
 import numpy as np
+import xgboost as xgb
 from xgboost import XGBRegressor, XGBClassifier
 from sklearn.metrics import mean_squared_error, mean_absolute_error, classification_report, confusion_matrix
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 import json
 
+try:
+    import pyarrow.feather as feather
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+if script_dir not in sys.path:
+    sys.path.insert(0, script_dir)
+
+from etapas_pipeline import Etapa, EjecutorEtapas, hash_archivo
+from perfilado import PERFIL, medir, perfilar
+
 Z_VALUE = 1.96
 MAX_INTERVAL_RATIO = 1.35
 MIN_INTERVAL_ABS = 500.0
 MIN_CLASS_SAMPLES = 100
-DTYPE_OVERRIDES = {'tipo_carta': 'string'}
+
+# Columnas del consolidado que consume el entrenamiento y su tipo compacto en lectura.
+# Las demás (correo, direccion, nombres, expediente, referencia, ...) no se cargan.
+COLUMNAS_ENTRENAMIENTO = [
+    'id', 'identificacion', 'fecha_banco', 'ciudad', 'entidad_remitente',
+    'tipo_embargo', 'estado_embargo', 'montoaembargar', 'es_cliente'
+]
+DTYPES_ENTRENAMIENTO = {
+    'identificacion': 'category',
+    'fecha_banco': 'category',
+    'ciudad': 'category',
+    'entidad_remitente': 'category',
+    'tipo_embargo': 'category',
+    'estado_embargo': 'category',
+    'montoaembargar': 'float32',
+    'es_cliente': 'category',
+}
+VALORES_CLIENTE = {'1', 'SI', 'SI_ES_CLIENTE', 'CLIENTE', 'TRUE', 'SÍ', 'YES'}
+ARCHIVO_CONSOLIDADO = "embargos_consolidado_mensual.csv"
+# Copia del consolidado en Arrow IPC que el dashboard de embargos abre con memory mapping
+ARCHIVO_CONSOLIDADO_ARROW = "embargos_consolidado_mensual.arrow"
+COLUMNAS_CATEGORICAS = ['entidad_bancaria', 'ciudad', 'entidad_remitente', 'tipo_documento',
+                        'tipo_embargo', 'estado_embargo', 'estado_demandado', 'tipo_carta', 'mes',
+                        'funcionario']
+ARCHIVO_AGRUPADORES = "agrupadores_categorias.json"
+ARCHIVO_AGREGADOS = "agregados_mensuales.csv"
+ARCHIVO_CONTEOS = "conteos_categorias.json"
+ETAPAS_PIPELINE = ['consolidar', 'agregar', 'regresion', 'clasificar']
+COLUMNAS_AGRUPADAS = ['ciudad', 'entidad_remitente', 'tipo_embargo', 'estado_embargo']
+
+# Modo fuera de memoria: filas por bloque y columnas numéricas que se guardan por bloque
+TAMANO_BLOQUE = 250_000
+TEST_SIZE = 0.2
+COLUMNAS_BLOQUE = [
+    'entidad_remitente_enc', 'mes_num', 'montoaembargar',
+    'tipo_embargo_enc', 'estado_embargo_enc', 'es_cliente_bin'
+]
 
 
 @dataclass
@@ -38,6 +89,88 @@ class ForecastConfig:
     horizon: int = 12
 
 
+def _como_categoria(serie: pd.Series) -> pd.Series:
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    return serie.astype('category')
+
+
+@dataclass
+class AgrupadorCategoriasRaras:
+    """
+    Colapsa en una etiqueta común los niveles con menos de `min_freq` registros.
+
+    Trabaja sobre los códigos de la categórica (conteo con bincount y remapeo por
+    tabla), y recuerda los niveles conservados para aplicar el mismo mapeo a datos
+    nuevos: cualquier nivel no visto en el ajuste también se envía a `etiqueta`.
+    """
+    min_freq: int = 10
+    etiqueta: str = 'OTRO'
+    categorias_: Optional[pd.Index] = None
+
+    def fit(self, serie: pd.Series) -> "AgrupadorCategoriasRaras":
+        serie = _como_categoria(serie)
+        codigos = serie.cat.codes.to_numpy()
+        conteos = np.bincount(codigos[codigos >= 0], minlength=len(serie.cat.categories))
+        return self.fit_conteos(pd.Series(conteos, index=serie.cat.categories))
+
+    def fit_conteos(self, conteos: pd.Series) -> "AgrupadorCategoriasRaras":
+        """Ajusta a partir de conteos por nivel ya acumulados (p. ej. sobre varios bloques)."""
+        conservadas = conteos.index[conteos.to_numpy() >= self.min_freq]
+        self.categorias_ = pd.Index(pd.unique(np.append(conservadas.to_numpy(dtype=object), self.etiqueta)))
+        return self
+
+    def agrupar_conteos(self, conteos: pd.Series) -> pd.Series:
+        """Suma los conteos por nivel según el mapeo ajustado (los raros van a `etiqueta`)."""
+        etiquetas = np.where(conteos.index.isin(self.categorias_), conteos.index.to_numpy(dtype=object), self.etiqueta)
+        return conteos.groupby(etiquetas).sum()
+
+    def transform(self, serie: pd.Series) -> pd.Series:
+        if self.categorias_ is None:
+            raise ValueError("AgrupadorCategoriasRaras no está ajustado; llama a fit() primero")
+        serie = _como_categoria(serie)
+        codigo_etiqueta = self.categorias_.get_loc(self.etiqueta)
+        mapa = self.categorias_.get_indexer(serie.cat.categories)
+        mapa = np.where(mapa >= 0, mapa, codigo_etiqueta)
+        # El último elemento de la tabla atiende los nulos (código -1)
+        tabla = np.append(mapa, codigo_etiqueta)
+        nuevos = tabla[serie.cat.codes.to_numpy()]
+        resultado = pd.Categorical.from_codes(nuevos, categories=self.categorias_)
+        return pd.Series(resultado, index=serie.index, name=serie.name)
+
+    def fit_transform(self, serie: pd.Series) -> pd.Series:
+        return self.fit(serie).transform(serie)
+
+    def to_dict(self) -> dict:
+        return {
+            'min_freq': self.min_freq,
+            'etiqueta': self.etiqueta,
+            'categorias': [] if self.categorias_ is None else self.categorias_.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AgrupadorCategoriasRaras":
+        return cls(
+            min_freq=data.get('min_freq', 10),
+            etiqueta=data.get('etiqueta', 'OTRO'),
+            # Mismo tipo de índice que en fit_conteos, para que transform dé la misma categórica
+            categorias_=pd.Index(np.array(data.get('categorias', []), dtype=object)),
+        )
+
+
+def guardar_agrupadores(agrupadores: dict, path: str) -> None:
+    """Persiste el mapeo de niveles de cada columna para reutilizarlo en predicción."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({col: agr.to_dict() for col, agr in agrupadores.items()}, f, ensure_ascii=False, indent=2)
+
+
+def cargar_agrupadores(path: str) -> dict:
+    """Carga los agrupadores ajustados por `guardar_agrupadores`."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {col: AgrupadorCategoriasRaras.from_dict(cfg) for col, cfg in data.items()}
+
+
 def _confidence_label(horizonte: int) -> str:
     if horizonte <= 3:
         return "Alta"
@@ -71,6 +204,45 @@ def _ensure_month_continuity(df: pd.DataFrame) -> pd.DataFrame:
     df['mes_label'] = df['año'].astype(str) + "-" + df['mes_num'].astype(str).str.zfill(2)
     return df
 
+
+def _normalizar_categoria(serie: pd.Series, relleno: str = 'OTRO') -> pd.Series:
+    """Rellena nulos y aplica strip/upper sobre las categorías, no sobre cada fila."""
+    serie = _como_categoria(serie)
+    categorias = serie.cat.categories
+    normalizadas = categorias.astype(str).str.strip().str.upper()
+    nuevas = pd.Index(pd.unique(np.append(normalizadas.to_numpy(dtype=object), relleno)))
+    codigos = serie.cat.codes.to_numpy()
+    codigo_relleno = nuevas.get_loc(relleno)
+    if len(categorias):
+        mapa = nuevas.get_indexer(normalizadas)
+        codigos = np.where(codigos >= 0, mapa[codigos], codigo_relleno)
+    else:
+        codigos = np.full(len(codigos), codigo_relleno)
+    resultado = pd.Categorical.from_codes(codigos, categories=nuevas)
+    return pd.Series(resultado, index=serie.index, name=serie.name).cat.remove_unused_categories()
+
+
+def _codificar_categoria(serie: pd.Series):
+    """Equivalente a LabelEncoder.fit_transform usando los códigos de la categórica."""
+    serie = serie.cat.remove_unused_categories()
+    encoder = LabelEncoder().fit(serie.cat.categories.to_numpy(dtype=object))
+    codigos = serie.cat.set_categories(encoder.classes_).cat.codes
+    return codigos, encoder
+
+
+def _leer_consolidado_entrenamiento(consolidado_path: str, tamano_bloque: Optional[int] = None):
+    """
+    Lee del consolidado solo las columnas de entrenamiento, con tipos compactos.
+
+    Con `tamano_bloque` devuelve un lector que entrega DataFrames de ese número de filas.
+    """
+    disponibles = pd.read_csv(consolidado_path, nrows=0).columns
+    faltantes = [col for col in COLUMNAS_ENTRENAMIENTO if col not in disponibles]
+    if faltantes:
+        raise ValueError(f"El consolidado no tiene las columnas requeridas: {', '.join(faltantes)}")
+    return pd.read_csv(consolidado_path, usecols=COLUMNAS_ENTRENAMIENTO, dtype=DTYPES_ENTRENAMIENTO,
+                       chunksize=tamano_bloque)
+
 # Configurar codificación UTF-8 para Windows
 if sys.platform == 'win32':
     try:
@@ -83,6 +255,7 @@ if sys.platform == 'win32':
         # Si falla, continuar sin cambios (los mensajes ya no usan emojis)
         pass
 
+@medir("consolidar")
 def procesar_csv_original(csv_files, output_dir=None, sampling_cfg: Optional[SamplingConfig] = None):
     """
     Procesa los archivos CSV originales de la BD y genera el consolidado
@@ -115,103 +288,115 @@ def procesar_csv_original(csv_files, output_dir=None, sampling_cfg: Optional[Sam
     
     for input_file in csv_files:
         print(f"Leyendo archivo: {os.path.basename(input_file)}")
-        rows = []
-        # Intentar diferentes codificaciones
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-        df_temp = None
+        # Lectura + reparación de filas; la construcción del DataFrame se mide aparte
+        with medir(f"lectura[{os.path.basename(input_file)}]") as seccion:
+            corregidas_previas, omitidas_previas = len(log_corregidas), len(log_omitidas)
+            rows = []
+            # Intentar diferentes codificaciones
+            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+            df_temp = None
         
-        for encoding in encodings:
-            try:
-                with open(input_file, encoding=encoding) as infile:
-                    reader = csv.reader(infile)
-                    headers = next(reader)
-                    for idx, row in enumerate(reader, start=2):
-                        # Reparar filas con menos columnas
-                        if len(row) < num_expected:
-                            row = row + [''] * (num_expected - len(row))
-                            log_corregidas.append((os.path.basename(input_file), idx, 'faltantes', len(row)))
-                        # Reparar filas con más columnas
-                        if len(row) > num_expected:
-                            extra = len(row) - num_expected
-                            direccion = ','.join(row[4:4+1+extra])
-                            fixed = row[:4] + [direccion] + row[4+1+extra:]
-                            if len(fixed) == num_expected:
-                                row = fixed
-                                log_corregidas.append((os.path.basename(input_file), idx, 'excedente', len(row)))
+            for encoding in encodings:
+                try:
+                    with open(input_file, encoding=encoding) as infile:
+                        reader = csv.reader(infile)
+                        headers = next(reader)
+                        for idx, row in enumerate(reader, start=2):
+                            # Reparar filas con menos columnas
+                            if len(row) < num_expected:
+                                row = row + [''] * (num_expected - len(row))
+                                log_corregidas.append((os.path.basename(input_file), idx, 'faltantes', len(row)))
+                            # Reparar filas con más columnas
+                            if len(row) > num_expected:
+                                extra = len(row) - num_expected
+                                direccion = ','.join(row[4:4+1+extra])
+                                fixed = row[:4] + [direccion] + row[4+1+extra:]
+                                if len(fixed) == num_expected:
+                                    row = fixed
+                                    log_corregidas.append((os.path.basename(input_file), idx, 'excedente', len(row)))
+                                else:
+                                    log_omitidas.append((os.path.basename(input_file), idx, len(row), row))
+                                    continue
+                            if len(row) == num_expected:
+                                rows.append(row)
                             else:
                                 log_omitidas.append((os.path.basename(input_file), idx, len(row), row))
-                                continue
-                        if len(row) == num_expected:
-                            rows.append(row)
-                        else:
-                            log_omitidas.append((os.path.basename(input_file), idx, len(row), row))
-                df_temp = pd.DataFrame(rows, columns=expected_columns)
-                break
-            except UnicodeDecodeError:
-                continue
-            except Exception as e:
-                print(f"Error al leer {input_file} con encoding {encoding}: {e}")
-                continue
+                    with medir("construccion_frame", filas=len(rows)):
+                        df_temp = pd.DataFrame(rows, columns=expected_columns)
+                    break
+                except UnicodeDecodeError:
+                    continue
+                except Exception as e:
+                    print(f"Error al leer {input_file} con encoding {encoding}: {e}")
+                    continue
         
-        if df_temp is not None and not df_temp.empty:
-            dataframes.append(df_temp)
-        else:
-            print(f"[ADVERTENCIA] No se pudo leer {input_file}")
+            seccion['filas'] = len(rows)
+            seccion['corregidas'] = len(log_corregidas) - corregidas_previas
+            seccion['omitidas'] = len(log_omitidas) - omitidas_previas
+            if df_temp is not None and not df_temp.empty:
+                dataframes.append(df_temp)
+            else:
+                print(f"[ADVERTENCIA] No se pudo leer {input_file}")
     
     if not dataframes:
         raise ValueError("No se pudieron leer los archivos CSV")
     
     # Unión de todo
-    df = pd.concat(dataframes, ignore_index=True)
+    with medir("concatenacion"):
+        df = pd.concat(dataframes, ignore_index=True)
     
     # Limpieza y normalización
-    df['montoaembargar'] = pd.to_numeric(df['montoaembargar'], errors='coerce').fillna(0)
+    with medir("normalizacion", filas=len(df)):
+        df['montoaembargar'] = pd.to_numeric(df['montoaembargar'], errors='coerce').fillna(0)
     
-    def clean_es_cliente(val):
-        v = str(val).strip().upper()
-        return 1 if v in {'1', 'SI_ES_CLIENTE', 'CLIENTE', 'SI', 'SÍ', 'TRUE', 'Y', 'YES'} else 0
+        def clean_es_cliente(val):
+            v = str(val).strip().upper()
+            return 1 if v in {'1', 'SI_ES_CLIENTE', 'CLIENTE', 'SI', 'SÍ', 'TRUE', 'Y', 'YES'} else 0
     
-    df['es_cliente'] = df['es_cliente'].apply(clean_es_cliente).astype(int)
+        df['es_cliente'] = df['es_cliente'].apply(clean_es_cliente).astype(int)
     
-    # Categóricas: upper, strip y sin nulos
-    cat_cols = ['entidad_bancaria', 'ciudad', 'entidad_remitente', 'tipo_documento', 
-                'tipo_embargo', 'estado_embargo', 'estado_demandado', 'tipo_carta', 'mes']
-    for col in cat_cols:
-        if col in df.columns:
-            df[col] = df[col].astype(str).str.strip().str.upper().replace({'NAN': '', 'NONE': '', 'NULL': ''})
+        # Categóricas: upper, strip y sin nulos
+        cat_cols = [col for col in COLUMNAS_CATEGORICAS if col != 'funcionario']
+        for col in cat_cols:
+            if col in df.columns:
+                df[col] = df[col].astype(str).str.strip().str.upper().replace({'NAN': '', 'NONE': '', 'NULL': ''})
     
-    # Agrupa clases raras
-    for col in ['tipo_embargo', 'estado_embargo']:
-        if col in df.columns:
-            vc = df[col].value_counts()
-            raros = vc[vc < 10].index
-            df.loc[df[col].isin(raros), col] = 'OTRO'
+        # Agrupa clases raras
+        for col in ['tipo_embargo', 'estado_embargo']:
+            if col in df.columns:
+                df[col] = AgrupadorCategoriasRaras(min_freq=10).fit_transform(df[col])
     
-    # Limpia fechas
-    for col in ['fecha_banco', 'fecha_oficio']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
-    
-    apply_sampling = (sampling_cfg.n_per_month is not None) or (sampling_cfg.frac < 0.9999)
-    if apply_sampling:
-        print(f"[INFO] Aplicando muestreo mensual (frac={sampling_cfg.frac}, n={sampling_cfg.n_per_month})")
-
-        def _sampler(group: pd.DataFrame) -> pd.DataFrame:
-            if sampling_cfg.n_per_month is not None:
-                n_rows = min(sampling_cfg.n_per_month, len(group))
-                return group.sample(n=n_rows, random_state=sampling_cfg.random_state)
-            frac = min(max(sampling_cfg.frac, 0.0), 1.0)
-            if frac == 0:
-                return group.head(0)
-            return group.sample(frac=frac, random_state=sampling_cfg.random_state)
-
-        df_muestreado = df.groupby('mes', group_keys=False).apply(_sampler).reset_index(drop=True)
-    else:
-        df_muestreado = df.reset_index(drop=True).copy()
+        # Limpia fechas
+        for col in ['fecha_banco', 'fecha_oficio']:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    with medir("muestreo") as seccion:
+        apply_sampling = (sampling_cfg.n_per_month is not None) or (sampling_cfg.frac < 0.9999)
+        if apply_sampling:
+            print(f"[INFO] Aplicando muestreo mensual (frac={sampling_cfg.frac}, n={sampling_cfg.n_per_month})")
+
+            def _sampler(group: pd.DataFrame) -> pd.DataFrame:
+                if sampling_cfg.n_per_month is not None:
+                    n_rows = min(sampling_cfg.n_per_month, len(group))
+                    return group.sample(n=n_rows, random_state=sampling_cfg.random_state)
+                frac = min(max(sampling_cfg.frac, 0.0), 1.0)
+                if frac == 0:
+                    return group.head(0)
+                return group.sample(frac=frac, random_state=sampling_cfg.random_state)
+
+            df_muestreado = df.groupby('mes', group_keys=False).apply(_sampler).reset_index(drop=True)
+        else:
+            df_muestreado = df.reset_index(drop=True).copy()
+        seccion['filas'] = len(df_muestreado)
     
     # Guarda resultado consolidado
-    output_file = os.path.join(output_dir, "embargos_consolidado_mensual.csv")
-    df_muestreado.to_csv(output_file, index=False)
+    output_file = os.path.join(output_dir, ARCHIVO_CONSOLIDADO)
+    with medir("escritura", filas=len(df_muestreado)):
+        df_muestreado.to_csv(output_file, index=False)
+    # Después del CSV: el dashboard solo usa la copia Arrow si no es más antigua que el CSV
+    with medir("escritura_arrow", filas=len(df_muestreado)):
+        guardar_consolidado_arrow(df_muestreado, output_dir)
     print(f"\n[OK] Archivo consolidado generado: {output_file}")
     print(f"   Filas originales: {len(df):,}, tras muestreo: {len(df_muestreado):,}")
     print(f"   Filas corregidas: {len(log_corregidas)}")
@@ -219,73 +404,76 @@ def procesar_csv_original(csv_files, output_dir=None, sampling_cfg: Optional[Sam
     
     return output_file
 
-def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, horizonte=12):
+
+def guardar_consolidado_arrow(df: pd.DataFrame, output_dir: str) -> Optional[str]:
     """
-    Entrena los modelos y genera los archivos de predicciones y clasificaciones
-    
-    Args:
-        consolidado_path: Ruta al archivo consolidado
-        output_dir: Directorio donde guardar los archivos generados
+    Guarda el consolidado en Arrow IPC (Feather v2) sin compresión, para que el
+    dashboard lo abra con memory mapping y lea solo las columnas que usa.
+
+    Los valores son los que el dashboard obtendría del CSV: textos vacíos como nulos
+    y las columnas categóricas como diccionarios (llegan a pandas como `category`).
     """
-    if output_dir is None:
-        output_dir = os.path.dirname(consolidado_path) if os.path.dirname(consolidado_path) else os.getcwd()
-    else:
-        os.makedirs(output_dir, exist_ok=True)
-    
-    print("\n" + "="*60)
-    print("ENTRENANDO MODELOS Y GENERANDO PREDICCIONES")
-    print("="*60)
-    
-    # Cargar datos consolidados
-    df = pd.read_csv(consolidado_path, dtype=DTYPE_OVERRIDES)
-    
-    def agrupar_otros(df, col, min_freq=10):
-        freq = df[col].value_counts()
-        otros = freq[freq < min_freq].index
-        df[col] = df[col].apply(lambda x: 'OTRO' if x in otros else x)
-        return df
-    
-    # Limpieza adicional
-    for col in ['ciudad', 'entidad_remitente', 'tipo_embargo', 'estado_embargo']:
-        df[col] = df[col].fillna('OTRO').astype(str).str.strip().str.upper()
-        df = agrupar_otros(df, col, min_freq=10)
-    
-    df['montoaembargar'] = pd.to_numeric(df['montoaembargar'], errors='coerce')
-    
-    def clean_cliente(val):
-        v = str(val).strip().upper()
-        return 1 if v in {'1', 'SI', 'SI_ES_CLIENTE', 'CLIENTE', 'TRUE', 'SÍ', 'YES'} else 0
-    
-    df['es_cliente_bin'] = df['es_cliente'].apply(clean_cliente).astype(int)
-    
-    df['fecha_banco'] = pd.to_datetime(df['fecha_banco'], errors='coerce')
-    df['año'] = pd.to_numeric(df['fecha_banco'].dt.year, errors='coerce')
-    df['mes_num'] = pd.to_numeric(df['fecha_banco'].dt.month, errors='coerce')
-    df = df.dropna(subset=['año', 'mes_num']).copy()
-    df['año'] = df['año'].astype(int)
-    df['mes_num'] = df['mes_num'].astype(int)
-    
-    # Encoding
-    le_ciudad = LabelEncoder()
-    le_entidad = LabelEncoder()
-    le_tipo_embargo = LabelEncoder()
-    le_estado_embargo = LabelEncoder()
-    
-    df['ciudad_enc'] = le_ciudad.fit_transform(df['ciudad'])
-    df['entidad_remitente_enc'] = le_entidad.fit_transform(df['entidad_remitente'])
-    df['tipo_embargo_enc'] = le_tipo_embargo.fit_transform(df['tipo_embargo'])
-    df['estado_embargo_enc'] = le_estado_embargo.fit_transform(df['estado_embargo'])
-    
-    df['mes_sin'] = np.sin(2 * np.pi * df['mes_num'] / 12.0)
-    df['mes_cos'] = np.cos(2 * np.pi * df['mes_num'] / 12.0)
-    df['mes_index'] = df['año'] * 12 + df['mes_num']
-    
-    # Agregación por mes
-    oficios_por_mes = df.groupby(['año', 'mes_num']).agg({
-        'id': 'count',
-        'identificacion': pd.Series.nunique,
-        'montoaembargar': 'sum'
-    }).reset_index().sort_values(['año', 'mes_num'])
+    if not PYARROW_AVAILABLE:
+        print("[ADVERTENCIA] pyarrow no está instalado; el dashboard leerá el CSV consolidado")
+        return None
+    columnas = {}
+    for col in df.columns:
+        serie = df[col]
+        if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+            serie = serie.mask(serie == '')
+        if col in COLUMNAS_CATEGORICAS:
+            serie = serie.astype('category')
+        columnas[col] = serie
+    output_file = os.path.join(output_dir, ARCHIVO_CONSOLIDADO_ARROW)
+    try:
+        feather.write_feather(pd.DataFrame(columnas), output_file, compression='uncompressed')
+    except OSError as e:
+        # En Windows falla si un dashboard abierto tiene el archivo mapeado; como queda
+        # más antiguo que el CSV, el dashboard vuelve a leer el CSV
+        print(f"[ADVERTENCIA] No se pudo escribir {ARCHIVO_CONSOLIDADO_ARROW}: {e}")
+        return None
+    return output_file
+
+
+def _preparar_frame_entrenamiento(df: pd.DataFrame, agrupadores: Optional[dict], ajustar: bool = True,
+                                  conteos: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Limpia un frame (o bloque) del consolidado para el entrenamiento.
+
+    Normaliza las categóricas y, si hay `agrupadores`, agrupa los niveles raros
+    (ajustándolos si `ajustar` es True). Deriva es_cliente_bin, año y mes_num y
+    descarta las filas sin fecha válida. Si se pasa `conteos`, acumula ahí los
+    niveles normalizados de cada columna antes de descartar filas.
+    """
+    for col in COLUMNAS_AGRUPADAS:
+        df[col] = _normalizar_categoria(df[col])
+        if conteos is not None:
+            conteos[col] = conteos[col].add(df[col].value_counts(), fill_value=0)
+        if agrupadores is not None:
+            if ajustar:
+                agrupadores[col] = AgrupadorCategoriasRaras(min_freq=10)
+                df[col] = agrupadores[col].fit_transform(df[col])
+            else:
+                df[col] = agrupadores[col].transform(df[col])
+
+    # es_cliente se evalúa una vez por categoría y se expande con los códigos
+    cliente_cats = df['es_cliente'].cat.categories.astype(str).str.strip().str.upper()
+    cliente_lut = np.append(cliente_cats.isin(VALORES_CLIENTE), False).astype(np.int8)
+    df['es_cliente_bin'] = cliente_lut[df['es_cliente'].cat.codes.to_numpy()]
+
+    fecha_banco = pd.to_datetime(df['fecha_banco'], errors='coerce')
+    df['año'] = fecha_banco.dt.year
+    df['mes_num'] = fecha_banco.dt.month
+    df = df.drop(columns=['fecha_banco', 'es_cliente'])
+    del fecha_banco
+    df = df.dropna(subset=['año', 'mes_num'])
+    df['año'] = df['año'].astype(np.int16)
+    df['mes_num'] = df['mes_num'].astype(np.int8)
+    return df
+
+
+def _agregar_lags(oficios_por_mes: pd.DataFrame) -> pd.DataFrame:
+    """Completa la serie mensual y agrega rezagos, medias móviles y estacionalidad."""
     oficios_por_mes = _ensure_month_continuity(oficios_por_mes)
     
     oficios_por_mes['oficios_lag1'] = oficios_por_mes['id'].shift(1)
@@ -308,7 +496,16 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
     )
     oficios_por_mes['mes_sin'] = np.sin(2 * np.pi * oficios_por_mes['mes_num'] / 12.0)
     oficios_por_mes['mes_cos'] = np.cos(2 * np.pi * oficios_por_mes['mes_num'] / 12.0)
-    
+    return oficios_por_mes
+
+
+def _entrenar_regresiones(oficios_por_mes: pd.DataFrame, output_dir: str, horizonte: int) -> bool:
+    """
+    Entrena las regresiones de oficios y demandados, con su validación y pronóstico.
+
+    Returns:
+        bool: False si no hay suficientes años para validar (no se genera nada)
+    """
     # Validación temporal
     ultimo_año = oficios_por_mes['año'].max()
     train = oficios_por_mes[oficios_por_mes['año'] < ultimo_año]
@@ -316,7 +513,7 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
     
     if len(train) == 0 or len(test) == 0:
         print("[ADVERTENCIA] No hay suficientes datos para entrenar los modelos (se necesita al menos 2 años)")
-        return
+        return False
     
     forecast_cfg = ForecastConfig(horizon=horizonte)
 
@@ -339,8 +536,10 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
             objective='count:poisson', random_state=42,
             base_score=np.mean(y_train_clean)
         )
-        regressor.fit(X_train_clean, y_train_clean)
-        y_pred = regressor.predict(X_test_clean)
+        with medir("ajuste_validacion[oficios]", filas=len(X_train_clean)):
+            regressor.fit(X_train_clean, y_train_clean)
+        with medir("prediccion_validacion[oficios]"):
+            y_pred = regressor.predict(X_test_clean)
         
         rmse = np.sqrt(mean_squared_error(y_test_clean, y_pred))
         mae = mean_absolute_error(y_test_clean, y_pred)
@@ -358,7 +557,8 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
         else:
             df_pred_oficios['mes'] = df_pred_oficios['año'].astype(str) + "-" + df_pred_oficios['mes_num'].astype(str).str.zfill(2)
         output_file = os.path.join(output_dir, "predicciones_oficios_validacion.csv")
-        df_pred_oficios[['mes', 'real_oficios', 'pred_oficios']].to_csv(output_file, index=False)
+        with medir("escritura_validacion[oficios]", filas=len(df_pred_oficios)):
+            df_pred_oficios[['mes', 'real_oficios', 'pred_oficios']].to_csv(output_file, index=False)
         print(f"   [OK] Generado: {output_file}")
         
         # ============================================================================
@@ -379,7 +579,8 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
                 objective='count:poisson', random_state=42,
                 base_score=np.mean(y_full_clean)
             )
-            regressor_futuro.fit(X_full_clean, y_full_clean)
+            with medir("ajuste_futuro[oficios]", filas=len(X_full_clean)):
+                regressor_futuro.fit(X_full_clean, y_full_clean)
             print(f"   Modelo entrenado con {len(X_full_clean)} registros históricos")
 
             residual_scale = interval_scale if interval_scale > 0 else max(1.0, np.std(y_full_clean))
@@ -399,61 +600,63 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
             # Predicción recursiva para 12 meses
             predicciones_futuras = []
             
-            for horizonte in range(1, forecast_cfg.horizon + 1):
-                # Calcular fecha del mes a predecir
-                mes_futuro = ultimo_mes + horizonte
-                año_futuro = ultimo_año
-                while mes_futuro > 12:
-                    mes_futuro -= 12
-                    año_futuro += 1
+            with medir("prediccion_futuro[oficios]", filas=forecast_cfg.horizon):
+                for horizonte in range(1, forecast_cfg.horizon + 1):
+                    # Calcular fecha del mes a predecir
+                    mes_futuro = ultimo_mes + horizonte
+                    año_futuro = ultimo_año
+                    while mes_futuro > 12:
+                        mes_futuro -= 12
+                        año_futuro += 1
                 
-                # Calcular componentes trigonométricas
-                mes_sin = np.sin(2 * np.pi * mes_futuro / 12)
-                mes_cos = np.cos(2 * np.pi * mes_futuro / 12)
+                    # Calcular componentes trigonométricas
+                    mes_sin = np.sin(2 * np.pi * mes_futuro / 12)
+                    mes_cos = np.cos(2 * np.pi * mes_futuro / 12)
                 
-                # Crear features para predicción
-                lag1_val, lag2_val, lag3_val = recientes[-1], recientes[-2], recientes[-3]
-                ma_val = float(np.mean(recientes))
-                X_futuro = pd.DataFrame({
-                    'año': [año_futuro],
-                    'mes_num': [mes_futuro],
-                    'mes_sin': [mes_sin],
-                    'mes_cos': [mes_cos],
-                    'oficios_lag1': [lag1_val],
-                    'oficios_lag2': [lag2_val],
-                    'oficios_lag3': [lag3_val],
-                    'oficios_ma3': [ma_val]
-                })
+                    # Crear features para predicción
+                    lag1_val, lag2_val, lag3_val = recientes[-1], recientes[-2], recientes[-3]
+                    ma_val = float(np.mean(recientes))
+                    X_futuro = pd.DataFrame({
+                        'año': [año_futuro],
+                        'mes_num': [mes_futuro],
+                        'mes_sin': [mes_sin],
+                        'mes_cos': [mes_cos],
+                        'oficios_lag1': [lag1_val],
+                        'oficios_lag2': [lag2_val],
+                        'oficios_lag3': [lag3_val],
+                        'oficios_ma3': [ma_val]
+                    })
                 
-                # Predecir
-                pred_oficios = float(regressor_futuro.predict(X_futuro)[0])
-                pred_oficios = max(0, pred_oficios)  # No permitir valores negativos
+                    # Predecir
+                    pred_oficios = float(regressor_futuro.predict(X_futuro)[0])
+                    pred_oficios = max(0, pred_oficios)  # No permitir valores negativos
                 
-                intervalo = _compute_interval(residual_scale, horizonte, pred_oficios)
+                    intervalo = _compute_interval(residual_scale, horizonte, pred_oficios)
                 
-                limite_inferior = max(0, pred_oficios - intervalo)
-                limite_superior = pred_oficios + intervalo
+                    limite_inferior = max(0, pred_oficios - intervalo)
+                    limite_superior = pred_oficios + intervalo
                 
-                nivel_confianza = _confidence_label(horizonte)
+                    nivel_confianza = _confidence_label(horizonte)
                 
-                # Guardar predicción
-                mes_str = f"{año_futuro}-{str(mes_futuro).zfill(2)}"
-                predicciones_futuras.append({
-                    'mes': mes_str,
-                    'pred_oficios': round(pred_oficios, 2),
-                    'limite_inferior': round(limite_inferior, 2),
-                    'limite_superior': round(limite_superior, 2),
-                    'nivel_confianza': nivel_confianza,
-                    'horizonte_meses': horizonte
-                })
+                    # Guardar predicción
+                    mes_str = f"{año_futuro}-{str(mes_futuro).zfill(2)}"
+                    predicciones_futuras.append({
+                        'mes': mes_str,
+                        'pred_oficios': round(pred_oficios, 2),
+                        'limite_inferior': round(limite_inferior, 2),
+                        'limite_superior': round(limite_superior, 2),
+                        'nivel_confianza': nivel_confianza,
+                        'horizonte_meses': horizonte
+                    })
                 
-                # Actualizar lags para siguiente iteración (predicción recursiva)
-                recientes = [recientes[-2], recientes[-1], pred_oficios]
+                    # Actualizar lags para siguiente iteración (predicción recursiva)
+                    recientes = [recientes[-2], recientes[-1], pred_oficios]
             
             # Guardar predicciones futuras
             df_futuro_oficios = pd.DataFrame(predicciones_futuras)
             output_file_futuro = os.path.join(output_dir, "predicciones_oficios_futuro.csv")
-            df_futuro_oficios.to_csv(output_file_futuro, index=False)
+            with medir("escritura_futuro[oficios]", filas=len(df_futuro_oficios)):
+                df_futuro_oficios.to_csv(output_file_futuro, index=False)
             print(f"   [OK] Generado: {output_file_futuro}")
             print(f"   Predicción para próximo mes ({predicciones_futuras[0]['mes']}): {predicciones_futuras[0]['pred_oficios']:.0f} oficios")
             print(f"   Proyección anual (12 meses): {sum(p['pred_oficios'] for p in predicciones_futuras):.0f} oficios")
@@ -497,8 +700,10 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
             objective='count:poisson', random_state=42,
             base_score=np.mean(y_train_d_clean)
         )
-        regressor_dem.fit(X_train_d_clean, y_train_d_clean)
-        y_pred_d = regressor_dem.predict(X_test_d_clean)
+        with medir("ajuste_validacion[demandados]", filas=len(X_train_d_clean)):
+            regressor_dem.fit(X_train_d_clean, y_train_d_clean)
+        with medir("prediccion_validacion[demandados]"):
+            y_pred_d = regressor_dem.predict(X_test_d_clean)
         
         rmse = np.sqrt(mean_squared_error(y_test_d_clean, y_pred_d))
         mae = mean_absolute_error(y_test_d_clean, y_pred_d)
@@ -516,7 +721,8 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
         else:
             df_pred_demandados['mes'] = df_pred_demandados['año'].astype(str) + "-" + df_pred_demandados['mes_num'].astype(str).str.zfill(2)
         output_file = os.path.join(output_dir, "predicciones_demandados_validacion.csv")
-        df_pred_demandados[['mes', 'real_demandados', 'pred_demandados']].to_csv(output_file, index=False)
+        with medir("escritura_validacion[demandados]", filas=len(df_pred_demandados)):
+            df_pred_demandados[['mes', 'real_demandados', 'pred_demandados']].to_csv(output_file, index=False)
         print(f"   [OK] Generado: {output_file}")
         
         # ============================================================================
@@ -537,7 +743,8 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
                 objective='count:poisson', random_state=42,
                 base_score=np.mean(y_full_d_clean)
             )
-            regressor_dem_futuro.fit(X_full_d_clean, y_full_d_clean)
+            with medir("ajuste_futuro[demandados]", filas=len(X_full_d_clean)):
+                regressor_dem_futuro.fit(X_full_d_clean, y_full_d_clean)
             print(f"   Modelo entrenado con {len(X_full_d_clean)} registros históricos")
 
             residual_scale_d = interval_scale_d if interval_scale_d > 0 else max(1.0, np.std(y_full_d_clean))
@@ -557,61 +764,63 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
             # Predicción recursiva para 12 meses
             predicciones_futuras_dem = []
             
-            for horizonte in range(1, forecast_cfg.horizon + 1):
-                # Calcular fecha del mes a predecir
-                mes_futuro = ultimo_mes + horizonte
-                año_futuro = ultimo_año
-                while mes_futuro > 12:
-                    mes_futuro -= 12
-                    año_futuro += 1
+            with medir("prediccion_futuro[demandados]", filas=forecast_cfg.horizon):
+                for horizonte in range(1, forecast_cfg.horizon + 1):
+                    # Calcular fecha del mes a predecir
+                    mes_futuro = ultimo_mes + horizonte
+                    año_futuro = ultimo_año
+                    while mes_futuro > 12:
+                        mes_futuro -= 12
+                        año_futuro += 1
                 
-                # Calcular componentes trigonométricas
-                mes_sin = np.sin(2 * np.pi * mes_futuro / 12)
-                mes_cos = np.cos(2 * np.pi * mes_futuro / 12)
+                    # Calcular componentes trigonométricas
+                    mes_sin = np.sin(2 * np.pi * mes_futuro / 12)
+                    mes_cos = np.cos(2 * np.pi * mes_futuro / 12)
                 
-                # Crear features para predicción
-                lag1_val, lag2_val, lag3_val = recientes_d[-1], recientes_d[-2], recientes_d[-3]
-                ma_val = float(np.mean(recientes_d))
-                X_futuro_d = pd.DataFrame({
-                    'año': [año_futuro],
-                    'mes_num': [mes_futuro],
-                    'mes_sin': [mes_sin],
-                    'mes_cos': [mes_cos],
-                    'demandados_lag1': [lag1_val],
-                    'demandados_lag2': [lag2_val],
-                    'demandados_lag3': [lag3_val],
-                    'demandados_ma3': [ma_val]
-                })
+                    # Crear features para predicción
+                    lag1_val, lag2_val, lag3_val = recientes_d[-1], recientes_d[-2], recientes_d[-3]
+                    ma_val = float(np.mean(recientes_d))
+                    X_futuro_d = pd.DataFrame({
+                        'año': [año_futuro],
+                        'mes_num': [mes_futuro],
+                        'mes_sin': [mes_sin],
+                        'mes_cos': [mes_cos],
+                        'demandados_lag1': [lag1_val],
+                        'demandados_lag2': [lag2_val],
+                        'demandados_lag3': [lag3_val],
+                        'demandados_ma3': [ma_val]
+                    })
                 
-                # Predecir
-                pred_demandados = float(regressor_dem_futuro.predict(X_futuro_d)[0])
-                pred_demandados = max(0, pred_demandados)  # No permitir valores negativos
+                    # Predecir
+                    pred_demandados = float(regressor_dem_futuro.predict(X_futuro_d)[0])
+                    pred_demandados = max(0, pred_demandados)  # No permitir valores negativos
                 
-                intervalo = _compute_interval(residual_scale_d, horizonte, pred_demandados)
+                    intervalo = _compute_interval(residual_scale_d, horizonte, pred_demandados)
                 
-                limite_inferior = max(0, pred_demandados - intervalo)
-                limite_superior = pred_demandados + intervalo
+                    limite_inferior = max(0, pred_demandados - intervalo)
+                    limite_superior = pred_demandados + intervalo
                 
-                nivel_confianza = _confidence_label(horizonte)
+                    nivel_confianza = _confidence_label(horizonte)
                 
-                # Guardar predicción
-                mes_str = f"{año_futuro}-{str(mes_futuro).zfill(2)}"
-                predicciones_futuras_dem.append({
-                    'mes': mes_str,
-                    'pred_demandados': round(pred_demandados, 2),
-                    'limite_inferior': round(limite_inferior, 2),
-                    'limite_superior': round(limite_superior, 2),
-                    'nivel_confianza': nivel_confianza,
-                    'horizonte_meses': horizonte
-                })
+                    # Guardar predicción
+                    mes_str = f"{año_futuro}-{str(mes_futuro).zfill(2)}"
+                    predicciones_futuras_dem.append({
+                        'mes': mes_str,
+                        'pred_demandados': round(pred_demandados, 2),
+                        'limite_inferior': round(limite_inferior, 2),
+                        'limite_superior': round(limite_superior, 2),
+                        'nivel_confianza': nivel_confianza,
+                        'horizonte_meses': horizonte
+                    })
                 
-                # Actualizar lags para siguiente iteración (predicción recursiva)
-                recientes_d = [recientes_d[-2], recientes_d[-1], pred_demandados]
+                    # Actualizar lags para siguiente iteración (predicción recursiva)
+                    recientes_d = [recientes_d[-2], recientes_d[-1], pred_demandados]
             
             # Guardar predicciones futuras
             df_futuro_demandados = pd.DataFrame(predicciones_futuras_dem)
             output_file_futuro = os.path.join(output_dir, "predicciones_demandados_futuro.csv")
-            df_futuro_demandados.to_csv(output_file_futuro, index=False)
+            with medir("escritura_futuro[demandados]", filas=len(df_futuro_demandados)):
+                df_futuro_demandados.to_csv(output_file_futuro, index=False)
             print(f"   [OK] Generado: {output_file_futuro}")
             print(f"   Predicción para próximo mes ({predicciones_futuras_dem[0]['mes']}): {predicciones_futuras_dem[0]['pred_demandados']:.0f} demandados")
             print(f"   Proyección anual (12 meses): {sum(p['pred_demandados'] for p in predicciones_futuras_dem):.0f} demandados")
@@ -635,7 +844,50 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
         df_futuro_demandados = pd.DataFrame(columns=['mes', 'pred_demandados', 'limite_inferior', 'limite_superior', 'nivel_confianza', 'horizonte_meses'])
         df_futuro_demandados.to_csv(output_file_futuro, index=False)
         print(f"   [INFO] Archivo vacío creado: {output_file_futuro}")
+    return True
+
+
+def report_to_df(report, modelo, target_names, y_test, y_pred, label_names):
+    """Convierte un reporte de clasificación a DataFrame e incluye matriz de confusión"""
+    df_metrics = pd.DataFrame(report).transpose().reset_index()
+    df_metrics = df_metrics.rename(columns={'index': 'clase'})
+    df_metrics['modelo'] = modelo
+    df_metrics = df_metrics[df_metrics['clase'].isin(target_names)]
+    if 'precision' in df_metrics.columns:
+        df_metrics = df_metrics.rename(columns={
+            'precision': 'precision',
+            'recall': 'recall',
+            'f1-score': 'f1',
+            'support': 'soporte'
+        })
+        df_metrics = df_metrics[['modelo', 'clase', 'precision', 'recall', 'f1', 'soporte']]
+    
+    # Calcular matriz de confusión
+    try:
+        cm = confusion_matrix(y_test, y_pred, labels=range(len(label_names)))
+        # Guardar como JSON (una sola fila por modelo)
+        df_metrics['matriz_confusion'] = json.dumps(cm.tolist())
+        df_metrics['clases_matriz'] = json.dumps(label_names)
+    except Exception as e:
+        print(f"      [ADVERTENCIA] No se pudo calcular matriz de confusión: {e}")
+        df_metrics['matriz_confusion'] = None
+        df_metrics['clases_matriz'] = None
     
+    return df_metrics
+
+
+def _guardar_clasificaciones(dfs_clasificaciones: list, output_dir: str) -> None:
+    """Guarda las métricas y matrices de confusión de todos los clasificadores."""
+    if dfs_clasificaciones:
+        df_metrics_all = pd.concat(dfs_clasificaciones, ignore_index=True)
+        output_file = os.path.join(output_dir, "resultados_clasificaciones.csv")
+        with medir("escritura", filas=len(df_metrics_all)):
+            df_metrics_all.to_csv(output_file, index=False)
+        print(f"\n[OK] Generado: {output_file}")
+
+
+def _entrenar_clasificaciones(df: pd.DataFrame, encoders: dict, output_dir: str) -> None:
+    """Entrena los clasificadores de tipo, estado y cliente sobre el frame en memoria."""
     # CLASIFICACIONES
     print("\n[INFO] Entrenando modelos de clasificación...")
     features_clf = [
@@ -643,34 +895,6 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
         'estado_embargo_enc', 'es_cliente_bin'
     ]
     
-    def report_to_df(report, modelo, target_names, y_test, y_pred, label_names):
-        """Convierte un reporte de clasificación a DataFrame e incluye matriz de confusión"""
-        df_metrics = pd.DataFrame(report).transpose().reset_index()
-        df_metrics = df_metrics.rename(columns={'index': 'clase'})
-        df_metrics['modelo'] = modelo
-        df_metrics = df_metrics[df_metrics['clase'].isin(target_names)]
-        if 'precision' in df_metrics.columns:
-            df_metrics = df_metrics.rename(columns={
-                'precision': 'precision',
-                'recall': 'recall',
-                'f1-score': 'f1',
-                'support': 'soporte'
-            })
-            df_metrics = df_metrics[['modelo', 'clase', 'precision', 'recall', 'f1', 'soporte']]
-        
-        # Calcular matriz de confusión
-        try:
-            cm = confusion_matrix(y_test, y_pred, labels=range(len(label_names)))
-            # Guardar como JSON (una sola fila por modelo)
-            df_metrics['matriz_confusion'] = json.dumps(cm.tolist())
-            df_metrics['clases_matriz'] = json.dumps(label_names)
-        except Exception as e:
-            print(f"      [ADVERTENCIA] No se pudo calcular matriz de confusión: {e}")
-            df_metrics['matriz_confusion'] = None
-            df_metrics['clases_matriz'] = None
-        
-        return df_metrics
-    
     def prepare_multiclass_dataset(feature_cols, target_col, encoder, min_samples=MIN_CLASS_SAMPLES):
         """Filtra clases poco representadas y re-encodea etiquetas para evitar errores."""
         target_series = df[target_col].copy()
@@ -693,7 +917,7 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
     dfs_clasificaciones = []
     
     # 1. Tipo Embargo
-    tipo_dataset = prepare_multiclass_dataset(features_clf, 'tipo_embargo_enc', le_tipo_embargo)
+    tipo_dataset = prepare_multiclass_dataset(features_clf, 'tipo_embargo_enc', encoders['tipo_embargo'])
     if tipo_dataset is None:
         print(f"   [ADVERTENCIA] Tipo Embargo: no hay suficientes clases con al menos {MIN_CLASS_SAMPLES} registros.")
     else:
@@ -708,8 +932,10 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
                 eval_metric='mlogloss',
                 tree_method="hist"
             )
-            clf.fit(X_train, y_train)
-            y_pred = clf.predict(X_test)
+            with medir("ajuste[tipo_embargo]", filas=len(X_train)):
+                clf.fit(X_train, y_train)
+            with medir("prediccion[tipo_embargo]", filas=len(X_test)):
+                y_pred = clf.predict(X_test)
             report = classification_report(
                 y_test, y_pred, output_dict=True,
                 target_names=tipo_labels, zero_division=0
@@ -726,7 +952,7 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
         'entidad_remitente_enc', 'mes_num', 'montoaembargar',
         'tipo_embargo_enc', 'es_cliente_bin'
     ]
-    estado_dataset = prepare_multiclass_dataset(features_clf2, 'estado_embargo_enc', le_estado_embargo)
+    estado_dataset = prepare_multiclass_dataset(features_clf2, 'estado_embargo_enc', encoders['estado_embargo'])
     if estado_dataset is None:
         print(f"   [ADVERTENCIA] Estado Embargo: no hay suficientes clases con al menos {MIN_CLASS_SAMPLES} registros.")
     else:
@@ -741,8 +967,10 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
                 eval_metric='mlogloss',
                 tree_method="hist"
             )
-            clf2.fit(X_train2, y_train2)
-            y_pred2 = clf2.predict(X_test2)
+            with medir("ajuste[estado_embargo]", filas=len(X_train2)):
+                clf2.fit(X_train2, y_train2)
+            with medir("prediccion[estado_embargo]", filas=len(X_test2)):
+                y_pred2 = clf2.predict(X_test2)
             report2 = classification_report(
                 y_test2, y_pred2, output_dict=True,
                 target_names=estado_labels, zero_division=0
@@ -768,8 +996,10 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
                             subsample=0.9, colsample_bytree=0.8,
                             eval_metric='auc',
                             tree_method="hist", scale_pos_weight=scale_pos_weight)
-        clf3.fit(X_train3, y_train3)
-        y_pred3 = clf3.predict(X_test3)
+        with medir("ajuste[cliente]", filas=len(X_train3)):
+            clf3.fit(X_train3, y_train3)
+        with medir("prediccion[cliente]", filas=len(X_test3)):
+            y_pred3 = clf3.predict(X_test3)
         labels_report3 = np.unique(np.concatenate([y_test3, y_pred3]))
         target_names3 = ["NO_CLIENTE", "CLIENTE"]
         all_classes3 = ["NO_CLIENTE", "CLIENTE"]
@@ -780,18 +1010,477 @@ def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, h
     except Exception as e:
         print(f"   [ADVERTENCIA] Error en Cliente: {e}")
     
-    # Guardar resultados de clasificaciones
-    if dfs_clasificaciones:
-        df_metrics_all = pd.concat(dfs_clasificaciones, ignore_index=True)
-        output_file = os.path.join(output_dir, "resultados_clasificaciones.csv")
-        df_metrics_all.to_csv(output_file, index=False)
-        print(f"\n[OK] Generado: {output_file}")
+    _guardar_clasificaciones(dfs_clasificaciones, output_dir)
+
+
+def _agregar_por_bloques(consolidado_path: str, tamano_bloque: int):
+    """
+    Primera pasada fuera de memoria: agregados mensuales y conteos por nivel.
+
+    Los demandados únicos por mes se cuentan de forma exacta con el hash de la
+    identificación, así que la memoria crece con los distintos por mes y no
+    con el número de filas.
+
+    Returns:
+        tuple: (oficios_por_mes, conteos antes de descartar fechas, conteos finales)
+    """
+    conteos_ajuste = {col: pd.Series(dtype='int64') for col in COLUMNAS_AGRUPADAS}
+    conteos_finales = {col: pd.Series(dtype='int64') for col in COLUMNAS_AGRUPADAS}
+    mensual = None
+    ids_por_mes = {}
+    for bloque in _leer_consolidado_entrenamiento(consolidado_path, tamano_bloque):
+        bloque = _preparar_frame_entrenamiento(bloque, agrupadores=None, conteos=conteos_ajuste)
+        for col in COLUMNAS_AGRUPADAS:
+            conteos_finales[col] = conteos_finales[col].add(bloque[col].value_counts(), fill_value=0)
+
+        parcial = bloque.groupby(['año', 'mes_num']).agg({'id': 'count', 'montoaembargar': 'sum'})
+        mensual = parcial if mensual is None else mensual.add(parcial, fill_value=0)
+
+        ident = bloque['identificacion']
+        hashes_cats = pd.util.hash_array(ident.cat.categories.to_numpy(dtype=object))
+        codigos = ident.cat.codes.to_numpy()
+        validos = codigos >= 0
+        hashes = hashes_cats[codigos[validos]]
+        claves = (bloque['año'].to_numpy(dtype=np.int32)[validos] * 12
+                  + bloque['mes_num'].to_numpy(dtype=np.int32)[validos])
+        for clave in np.unique(claves):
+            nuevos = np.unique(hashes[claves == clave])
+            previos = ids_por_mes.get(clave)
+            ids_por_mes[clave] = nuevos if previos is None else np.union1d(previos, nuevos)
+
+    if mensual is None:
+        raise ValueError("El consolidado no tiene registros para entrenar")
+    oficios_por_mes = mensual.reset_index()
+    oficios_por_mes['id'] = oficios_por_mes['id'].astype(np.int64)
+    claves = oficios_por_mes['año'].astype(np.int32) * 12 + oficios_por_mes['mes_num'].astype(np.int32)
+    oficios_por_mes['identificacion'] = [len(ids_por_mes.get(c, ())) for c in claves]
+    oficios_por_mes = oficios_por_mes[['año', 'mes_num', 'id', 'identificacion', 'montoaembargar']]
+    oficios_por_mes = oficios_por_mes.sort_values(['año', 'mes_num']).reset_index(drop=True)
+    return oficios_por_mes, conteos_ajuste, conteos_finales
+
+
+def _escribir_bloques_clasificacion(consolidado_path: str, tamano_bloque: int, agrupadores: dict,
+                                    encoders: dict, directorio: str, random_state: int = 42):
+    """
+    Segunda pasada: agrupa, codifica y guarda cada bloque como matriz float32 en disco.
+
+    Cada fila recibe al azar (con semilla) su marca de prueba, con proporción TEST_SIZE.
+
+    Returns:
+        tuple: (rutas de los bloques, negativos y positivos de es_cliente en entrenamiento)
+    """
+    rng = np.random.default_rng(random_state)
+    rutas = []
+    negativos = positivos = 0
+    lector = _leer_consolidado_entrenamiento(consolidado_path, tamano_bloque)
+    for i, bloque in enumerate(lector):
+        bloque = _preparar_frame_entrenamiento(bloque, agrupadores, ajustar=False)
+        for col in ['entidad_remitente', 'tipo_embargo', 'estado_embargo']:
+            categorias = bloque[col].cat.set_categories(encoders[col].classes_)
+            bloque[f'{col}_enc'] = categorias.cat.codes
+        matriz = bloque[COLUMNAS_BLOQUE].to_numpy(dtype=np.float32)
+        es_test = rng.random(len(matriz)) < TEST_SIZE
+        cliente_train = bloque['es_cliente_bin'].to_numpy()[~es_test]
+        positivos += int(cliente_train.sum())
+        negativos += int(len(cliente_train) - cliente_train.sum())
+        ruta = os.path.join(directorio, f"bloque_{i:05d}.npz")
+        np.savez(ruta, X=matriz, es_test=es_test)
+        rutas.append(ruta)
+    return rutas, negativos, positivos
+
+
+def _cargar_bloque(ruta: str, idx_x: list, idx_y: int, tabla_etiquetas: np.ndarray, prueba: bool):
+    """Carga un bloque y devuelve (X, y) de la partición pedida, con etiquetas re-codificadas."""
+    with np.load(ruta) as datos:
+        matriz = datos['X']
+        es_test = datos['es_test']
+    etiquetas = tabla_etiquetas[matriz[:, idx_y].astype(np.int64)]
+    mascara = (etiquetas >= 0) & (es_test if prueba else ~es_test)
+    return matriz[mascara][:, idx_x], etiquetas[mascara]
+
+
+class _IteradorBloques(xgb.DataIter):
+    """Entrega a XGBoost los bloques de entrenamiento de un modelo, uno a la vez."""
+
+    def __init__(self, rutas: list, idx_x: list, idx_y: int, tabla_etiquetas: np.ndarray, cache_prefix: str):
+        self._rutas = rutas
+        self._idx_x = idx_x
+        self._idx_y = idx_y
+        self._tabla = tabla_etiquetas
+        self._pos = 0
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        while self._pos < len(self._rutas):
+            X, y = _cargar_bloque(self._rutas[self._pos], self._idx_x, self._idx_y, self._tabla, prueba=False)
+            self._pos += 1
+            if len(y):
+                input_data(data=X, label=y)
+                return True
+        return False
+
+    def reset(self) -> None:
+        self._pos = 0
+
+
+def _entrenar_clasificador_por_bloques(rutas: list, features: list, target_col: str, tabla_etiquetas: np.ndarray,
+                                       n_clases: int, directorio: str, params_extra: Optional[dict] = None):
+    """Entrena con memoria externa de XGBoost y predice la partición de prueba bloque a bloque."""
+    idx_x = [COLUMNAS_BLOQUE.index(col) for col in features]
+    idx_y = COLUMNAS_BLOQUE.index(target_col)
+    params = {
+        'max_depth': 7, 'eta': 0.1, 'subsample': 0.9, 'colsample_bytree': 0.8,
+        'tree_method': 'hist'
+    }
+    if n_clases > 2:
+        params.update({'objective': 'multi:softprob', 'num_class': n_clases, 'eval_metric': 'mlogloss'})
+    else:
+        params.update({'objective': 'binary:logistic', 'eval_metric': 'logloss'})
+    params.update(params_extra or {})
+
+    iterador = _IteradorBloques(rutas, idx_x, idx_y, tabla_etiquetas,
+                                cache_prefix=os.path.join(directorio, f"cache_{target_col}"))
+    with medir(f"ajuste[{target_col}]") as seccion:
+        if hasattr(xgb, 'ExtMemQuantileDMatrix'):
+            dtrain = xgb.ExtMemQuantileDMatrix(iterador)
+        else:
+            dtrain = xgb.DMatrix(iterador)
+        seccion['filas'] = dtrain.num_row()
+        booster = xgb.train(params, dtrain, num_boost_round=100)
+        del dtrain
+
+    with medir(f"prediccion[{target_col}]") as seccion:
+        y_test, y_pred = [], []
+        for ruta in rutas:
+            X, y = _cargar_bloque(ruta, idx_x, idx_y, tabla_etiquetas, prueba=True)
+            if not len(y):
+                continue
+            proba = booster.predict(xgb.DMatrix(X))
+            pred = proba.argmax(axis=1) if proba.ndim == 2 else (proba > 0.5).astype(np.int64)
+            y_test.append(y.astype(np.int16))
+            y_pred.append(pred.astype(np.int16))
+        seccion['filas'] = sum(len(y) for y in y_test)
+    if not y_test:
+        raise ValueError("No hay filas de prueba")
+    return np.concatenate(y_test), np.concatenate(y_pred)
+
+
+def _tabla_clases_validas(conteos: pd.Series, encoder: LabelEncoder, target_col: str,
+                          min_samples: int = MIN_CLASS_SAMPLES):
+    """
+    Equivalente por conteos de prepare_multiclass_dataset: descarta clases con
+    poco soporte y arma la tabla código original -> etiqueta re-codificada (-1 si se descarta).
+    """
+    conteos = conteos.reindex(encoder.classes_, fill_value=0)
+    conteos = conteos[conteos > 0]
+    validas = conteos[conteos >= min_samples]
+    if len(validas) < 2:
+        return None
+    descartadas = conteos[conteos < min_samples]
+    if not descartadas.empty:
+        print(f"      [INFO] {target_col}: se descartan {len(descartadas)} clases con soporte < {min_samples}")
+    label_names = sorted(validas.index.tolist())
+    tabla = np.full(len(encoder.classes_), -1, dtype=np.int64)
+    tabla[encoder.transform(label_names)] = np.arange(len(label_names))
+    return tabla, label_names
+
+
+def _clasificar_por_bloques(consolidado_path: str, output_dir: str, tamano_bloque: int,
+                            agrupadores: dict, conteos: dict) -> None:
+    """
+    Entrena los clasificadores leyendo el consolidado por bloques.
+
+    Escribe los bloques codificados a un directorio temporal y XGBoost los consume
+    con su iterador de memoria externa. Los encoders y el soporte de cada clase
+    salen de los conteos de la etapa de agregación. La partición de prueba es
+    aleatoria con semilla, no estratificada.
+    """
+    encoders = {}
+    for col in COLUMNAS_AGRUPADAS:
+        presentes = conteos[col][conteos[col] > 0].index
+        encoders[col] = LabelEncoder().fit(presentes.to_numpy(dtype=object))
+
+    print("\n[INFO] Entrenando modelos de clasificación por bloques...")
+    dfs_clasificaciones = []
+    with tempfile.TemporaryDirectory(prefix="embargos_bloques_") as directorio:
+        with medir("escritura_bloques"):
+            rutas, negativos, positivos = _escribir_bloques_clasificacion(
+                consolidado_path, tamano_bloque, agrupadores, encoders, directorio
+            )
+
+        modelos = [
+            ("Tipo Embargo", 'tipo_embargo', 'tipo_embargo_enc',
+             ['entidad_remitente_enc', 'mes_num', 'montoaembargar', 'estado_embargo_enc', 'es_cliente_bin']),
+            ("Estado Embargo", 'estado_embargo', 'estado_embargo_enc',
+             ['entidad_remitente_enc', 'mes_num', 'montoaembargar', 'tipo_embargo_enc', 'es_cliente_bin']),
+        ]
+        for nombre, col, target_col, features in modelos:
+            clases = _tabla_clases_validas(conteos[col], encoders[col], target_col)
+            if clases is None:
+                print(f"   [ADVERTENCIA] {nombre}: no hay suficientes clases con al menos {MIN_CLASS_SAMPLES} registros.")
+                continue
+            try:
+                tabla, label_names = clases
+                y_test, y_pred = _entrenar_clasificador_por_bloques(
+                    rutas, features, target_col, tabla, len(label_names), directorio
+                )
+                report = classification_report(
+                    y_test, y_pred, output_dict=True, labels=range(len(label_names)),
+                    target_names=label_names, zero_division=0
+                )
+                dfs_clasificaciones.append(report_to_df(report, nombre, label_names, y_test, y_pred, label_names))
+                print(f"   [OK] Modelo: {nombre}")
+            except Exception as e:
+                print(f"   [ADVERTENCIA] Error en {nombre}: {e}")
+
+        try:
+            scale_pos_weight = negativos / positivos if positivos > 0 else 1
+            target_names3 = ["NO_CLIENTE", "CLIENTE"]
+            y_test3, y_pred3 = _entrenar_clasificador_por_bloques(
+                rutas,
+                ['entidad_remitente_enc', 'mes_num', 'montoaembargar', 'tipo_embargo_enc', 'estado_embargo_enc'],
+                'es_cliente_bin', np.arange(2), 2, directorio,
+                params_extra={'eval_metric': 'auc', 'scale_pos_weight': scale_pos_weight}
+            )
+            report3 = classification_report(y_test3, y_pred3, output_dict=True, labels=range(2),
+                                            target_names=target_names3, zero_division=0)
+            dfs_clasificaciones.append(report_to_df(report3, "Cliente", target_names3, y_test3, y_pred3, target_names3))
+            print("   [OK] Modelo: Cliente/No Cliente")
+        except Exception as e:
+            print(f"   [ADVERTENCIA] Error en Cliente: {e}")
+
+    _guardar_clasificaciones(dfs_clasificaciones, output_dir)
+
+
+def _guardar_conteos(conteos: dict, path: str) -> None:
+    """Persiste los conteos por nivel (ya agrupados) de cada columna categórica."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({col: {str(k): int(v) for k, v in serie.items()} for col, serie in conteos.items()},
+                  f, ensure_ascii=False, indent=2)
+
+
+def _cargar_conteos(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {col: pd.Series(valores, dtype='int64') for col, valores in data.items()}
+
+
+@medir("agregar")
+def etapa_agregar(consolidado_path: str, output_dir: str, fuera_de_memoria: bool = False,
+                  tamano_bloque: int = TAMANO_BLOQUE, df: Optional[pd.DataFrame] = None) -> None:
+    """
+    Etapa de agregación: serie mensual de oficios/demandados, agrupadores de
+    niveles raros y conteos por nivel (soporte de clases para los clasificadores).
+
+    `df` es el consolidado ya leído con `_leer_consolidado_entrenamiento` (la
+    ejecución directa lo lee una vez para agregar y clasificar); no se modifica.
+    """
+    if fuera_de_memoria:
+        print(f"[INFO] Modo fuera de memoria (bloques de {tamano_bloque:,} filas)")
+        with medir("primera_pasada") as seccion:
+            oficios_por_mes, conteos_ajuste, conteos_finales = _agregar_por_bloques(consolidado_path, tamano_bloque)
+            seccion['filas'] = int(oficios_por_mes['id'].sum())
+        agrupadores = {
+            col: AgrupadorCategoriasRaras(min_freq=10).fit_conteos(conteos_ajuste[col])
+            for col in COLUMNAS_AGRUPADAS
+        }
+        conteos = {col: agrupadores[col].agrupar_conteos(conteos_finales[col]) for col in COLUMNAS_AGRUPADAS}
+    else:
+        if df is None:
+            # Cargar solo las columnas que usa el entrenamiento (categóricas, float32)
+            with medir("lectura") as seccion:
+                df = _leer_consolidado_entrenamiento(consolidado_path)
+                seccion['filas'] = len(df)
+        # Limpieza adicional: normaliza y agrupa niveles raros, guardando el mapeo
+        agrupadores = {}
+        with medir("preparacion") as seccion:
+            # Copia superficial: reemplazar columnas no altera el frame recibido
+            df = _preparar_frame_entrenamiento(df.copy(deep=False), agrupadores)
+            seccion['filas'] = len(df)
+        conteos = {col: df[col].value_counts() for col in COLUMNAS_AGRUPADAS}
+        # Agregación por mes
+        with medir("agregacion_mensual", filas=len(df)):
+            oficios_por_mes = df.groupby(['año', 'mes_num']).agg({
+                'id': 'count',
+                'identificacion': pd.Series.nunique,
+                'montoaembargar': 'sum'
+            }).reset_index().sort_values(['año', 'mes_num'])
+
+    guardar_agrupadores(agrupadores, os.path.join(output_dir, ARCHIVO_AGRUPADORES))
+    _guardar_conteos(conteos, os.path.join(output_dir, ARCHIVO_CONTEOS))
+    with medir("escritura", filas=len(oficios_por_mes)):
+        oficios_por_mes.to_csv(os.path.join(output_dir, ARCHIVO_AGREGADOS), index=False)
+    print(f"[OK] Agregados mensuales: {len(oficios_por_mes)} meses")
+
+
+@medir("regresion")
+def etapa_regresion(output_dir: str, horizonte: int = 12) -> bool:
+    """
+    Etapa de regresión: validación temporal y pronóstico de oficios y demandados.
+
+    El pronóstico usa los residuos de la validación para sus intervalos, por eso
+    ambas partes van en la misma etapa.
+    """
+    oficios_por_mes = pd.read_csv(os.path.join(output_dir, ARCHIVO_AGREGADOS))
+    oficios_por_mes = _agregar_lags(oficios_por_mes)
+    return _entrenar_regresiones(oficios_por_mes, output_dir, horizonte)
+
+
+@medir("clasificar")
+def etapa_clasificar(consolidado_path: str, output_dir: str, fuera_de_memoria: bool = False,
+                     tamano_bloque: int = TAMANO_BLOQUE, df: Optional[pd.DataFrame] = None) -> None:
+    """
+    Etapa de clasificación, con los agrupadores ajustados en la etapa de agregación.
+    Con `df` (consolidado ya leído) no vuelve a leer el archivo.
+    """
+    agrupadores = cargar_agrupadores(os.path.join(output_dir, ARCHIVO_AGRUPADORES))
+    if fuera_de_memoria:
+        conteos = _cargar_conteos(os.path.join(output_dir, ARCHIVO_CONTEOS))
+        _clasificar_por_bloques(consolidado_path, output_dir, tamano_bloque, agrupadores, conteos)
+        return
+
+    if df is None:
+        with medir("lectura") as seccion:
+            df = _leer_consolidado_entrenamiento(consolidado_path)
+            seccion['filas'] = len(df)
+    with medir("preparacion") as seccion:
+        df = _preparar_frame_entrenamiento(df, agrupadores, ajustar=False)
+        seccion['filas'] = len(df)
+    # Encoding (códigos de la categórica ordenados igual que LabelEncoder)
+    encoders = {}
+    for col in COLUMNAS_AGRUPADAS:
+        df[f'{col}_enc'], encoders[col] = _codificar_categoria(df[col])
+    _entrenar_clasificaciones(df, encoders, output_dir)
+
+
+def entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir=None, horizonte=12,
+                                            fuera_de_memoria=False, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Entrena los modelos y genera los archivos de predicciones y clasificaciones
     
+    Args:
+        consolidado_path: Ruta al archivo consolidado
+        output_dir: Directorio donde guardar los archivos generados
+        fuera_de_memoria: Si True, lee el consolidado por bloques y entrena con memoria externa
+        tamano_bloque: Filas por bloque en el modo fuera de memoria
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(consolidado_path) if os.path.dirname(consolidado_path) else os.getcwd()
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+    
+    print("\n" + "="*60)
+    print("ENTRENANDO MODELOS Y GENERANDO PREDICCIONES")
+    print("="*60)
+
+    try:
+        # En memoria, el consolidado se lee una sola vez para agregar y clasificar;
+        # el grafo de etapas (`ejecutar_pipeline`) lo lee en cada etapa
+        df = None
+        if not fuera_de_memoria:
+            with medir("lectura") as seccion:
+                df = _leer_consolidado_entrenamiento(consolidado_path)
+                seccion['filas'] = len(df)
+        etapa_agregar(consolidado_path, output_dir, fuera_de_memoria, tamano_bloque, df=df)
+        if not etapa_regresion(output_dir, horizonte):
+            return
+        etapa_clasificar(consolidado_path, output_dir, fuera_de_memoria, tamano_bloque, df=df)
+    finally:
+        # Incluye las secciones de procesar_csv_original si corrió en este mismo proceso
+        ruta_reporte = PERFIL.guardar_reporte(output_dir, extra={'modo': 'directo'})
+        print(f"[INFO] Reporte de tiempos: {ruta_reporte}")
+        PERFIL.reiniciar()
+
     print("\n" + "="*60)
     print("[OK] PROCESAMIENTO COMPLETADO")
     print("="*60)
 
 
+def construir_etapas(csv_files, output_dir: str, sampling_cfg: Optional[SamplingConfig] = None,
+                     horizonte: int = 12, fuera_de_memoria: bool = False,
+                     tamano_bloque: int = TAMANO_BLOQUE) -> list:
+    """
+    Declara el pipeline completo como grafo: consolidar -> agregar -> regresion y clasificar.
+
+    El orden de declaración se respeta, así que si la regresión se detiene por
+    falta de datos tampoco se clasifica (como en la ejecución directa).
+    """
+    sampling_cfg = sampling_cfg or SamplingConfig()
+    consolidado_path = os.path.join(output_dir, ARCHIVO_CONSOLIDADO)
+    params_bloques = {'fuera_de_memoria': fuera_de_memoria}
+    if fuera_de_memoria:
+        params_bloques['tamano_bloque'] = tamano_bloque
+    return [
+        Etapa(
+            nombre='consolidar',
+            funcion=lambda: procesar_csv_original(csv_files, output_dir, sampling_cfg),
+            entradas=list(csv_files),
+            parametros={'muestreo': asdict(sampling_cfg)},
+            salidas=[ARCHIVO_CONSOLIDADO],
+            # Copia para el dashboard: en Windows no se puede reemplazar mientras un
+            # dashboard abierto la tiene mapeada, y entonces se sigue usando el CSV
+            opcionales=[ARCHIVO_CONSOLIDADO_ARROW] if PYARROW_AVAILABLE else [],
+        ),
+        Etapa(
+            nombre='agregar',
+            funcion=lambda: etapa_agregar(consolidado_path, output_dir, fuera_de_memoria, tamano_bloque),
+            dependencias=['consolidar'],
+            parametros=params_bloques,
+            salidas=[ARCHIVO_AGREGADOS, ARCHIVO_AGRUPADORES, ARCHIVO_CONTEOS],
+        ),
+        Etapa(
+            nombre='regresion',
+            funcion=lambda: etapa_regresion(output_dir, horizonte),
+            dependencias=['agregar'],
+            parametros={'horizonte': horizonte},
+            salidas=[
+                "predicciones_oficios_validacion.csv", "predicciones_oficios_futuro.csv",
+                "predicciones_demandados_validacion.csv", "predicciones_demandados_futuro.csv",
+            ],
+        ),
+        Etapa(
+            nombre='clasificar',
+            funcion=lambda: etapa_clasificar(consolidado_path, output_dir, fuera_de_memoria, tamano_bloque),
+            dependencias=['consolidar', 'agregar'],
+            parametros=params_bloques,
+            salidas=["resultados_clasificaciones.csv"],
+        ),
+    ]
+
+
+def ejecutar_pipeline(csv_files, output_dir: str, sampling_cfg: Optional[SamplingConfig] = None,
+                      horizonte: int = 12, fuera_de_memoria: bool = False,
+                      tamano_bloque: int = TAMANO_BLOQUE, forzar=()) -> dict:
+    """
+    Ejecuta el pipeline con caché por etapa: omite las etapas cuyas entradas y
+    parámetros no cambiaron y retoma desde la primera pendiente o fallida.
+
+    Args:
+        forzar: Nombres de etapas a re-ejecutar aunque estén vigentes ('todas' = todas)
+    """
+    etapas = construir_etapas(csv_files, output_dir, sampling_cfg, horizonte, fuera_de_memoria, tamano_bloque)
+    forzar = set(forzar or ())
+    if 'todas' in forzar:
+        forzar = {etapa.nombre for etapa in etapas}
+    ejecutor = EjecutorEtapas(output_dir, etapas, forzar=forzar, version=hash_archivo(os.path.abspath(__file__)))
+    PERFIL.reiniciar()
+    try:
+        return ejecutor.ejecutar()
+    finally:
+        ruta_reporte = PERFIL.guardar_reporte(output_dir, extra={
+            'modo': 'pipeline',
+            'etapas': ejecutor.estados,
+            'parametros': {
+                'archivos': [os.path.basename(f) for f in csv_files],
+                'muestreo': asdict(sampling_cfg or SamplingConfig()),
+                'horizonte': horizonte,
+                'fuera_de_memoria': fuera_de_memoria,
+                'tamano_bloque': tamano_bloque,
+            },
+        })
+        print(f"[INFO] Reporte de tiempos: {ruta_reporte}")
+
+
 def parse_arguments():
     parser = argparse.ArgumentParser(
         description="Procesa los CSV de embargos y genera archivos para los dashboards"
@@ -807,6 +1496,16 @@ def parse_arguments():
                         help="Meses futuros a pronosticar")
     parser.add_argument("--random-state", dest="random_state", type=int, default=42,
                         help="Semilla para operaciones aleatorias (muestreo)")
+    parser.add_argument("--fuera-de-memoria", dest="fuera_de_memoria", action="store_true",
+                        help="Entrena leyendo el consolidado por bloques (para archivos que no caben en RAM)")
+    parser.add_argument("--tamano-bloque", dest="tamano_bloque", type=int, default=TAMANO_BLOQUE,
+                        help="Filas por bloque en el modo fuera de memoria")
+    parser.add_argument("--force-stage", dest="force_stage", action="append", default=[],
+                        choices=ETAPAS_PIPELINE + ['todas'],
+                        help="Re-ejecuta la etapa aunque esté en caché (se puede repetir; 'todas' = todas)")
+    parser.add_argument("--profile", dest="profile", nargs="?", const="cprofile", default=None,
+                        choices=["cprofile", "pyinstrument"],
+                        help="Guarda un perfil de la ejecución en el directorio de salida (default: cprofile)")
     return parser.parse_args()
 
 def main():
@@ -846,11 +1545,13 @@ def main():
     print("="*60)
     
     try:
-        # Paso 1: Procesar y consolidar
-        consolidado_path = procesar_csv_original(csv_files, output_dir, sampling_cfg)
-        
-        # Paso 2: Entrenar modelos y generar predicciones
-        entrenar_modelos_y_generar_predicciones(consolidado_path, output_dir, horizonte=args.horizonte)
+        # Consolidar -> agregar -> regresión -> clasificación, con caché por etapa
+        with perfilar(output_dir, args.profile):
+            estados = ejecutar_pipeline(csv_files, output_dir, sampling_cfg, horizonte=args.horizonte,
+                                        fuera_de_memoria=args.fuera_de_memoria,
+                                        tamano_bloque=args.tamano_bloque, forzar=args.force_stage)
+        if 'detenida' in estados.values():
+            return
         
         print(f"\n[OK] Todos los archivos han sido generados en: {output_dir}")
         
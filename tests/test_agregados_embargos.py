@@ -0,0 +1,338 @@
+"""
+Script de prueba para los agregados del dashboard: el resumen de la pestaña
+principal (una sola pasada con `np.bincount` sobre códigos categóricos) debe
+devolver exactamente lo mismo que los `value_counts` y `groupby` por gráfico
+que reemplaza, y las métricas armadas con los parciales por combinación de
+filtros deben coincidir con las calculadas sobre las filas filtradas (la
+distribución de montos, dentro del error del bosquejo) con un número de
+combinaciones que no crece con las filas, al igual que los
+agregados por ciudad de la pestaña geográfica frente a `groupby` y `pd.crosstab`,
+y los rankings por selección parcial (`top_k`, también por mes) frente a
+`value_counts().head(k)`
+"""
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from agregados_embargos import (AGREGADOS, ParcialesMetricas, _ordenar_por_mes, metricas, montos, resumen_ciudades,
+                                resumen_principal, top_k, top_por_mes)
+from motor_filtros import IndiceFiltros, VistaFiltrada, agregar_columnas_canonicas
+
+print("="*60)
+print("TEST: Resumen de la pestaña principal y métricas por parciales")
+print("="*60)
+
+
+def resumen_por_graficos(vista):
+    """Referencia: un recorrido por gráfico, como antes del resumen."""
+    tipo_mes = vista.frame(['mes', 'tipo_embargo']).groupby(['mes', 'tipo_embargo'], observed=True).size().reset_index(name='cantidad')
+    total_mensual = tipo_mes.groupby('mes')['cantidad'].sum().reset_index(name='total')
+    tipo_mes = tipo_mes.merge(total_mensual, on='mes')
+    tipo_mes['proporcion'] = tipo_mes['cantidad'] / tipo_mes['total']
+    return {
+        'conteo_tipo': vista['tipo_canon'].value_counts(),
+        'conteo_estado': vista['estado_canon'].value_counts(sort=False),
+        'conteo_banco': vista['banco_canon'].value_counts(),
+        'top_ciudades': vista['ciudad'].value_counts().head(10),
+        'top_funcionarios': vista['funcionario'].value_counts().head(10),
+        'top_remitentes': vista['entidad_remitente'].value_counts().head(10),
+        'oficios_por_mes': _ordenar_por_mes(vista.frame(['mes']).groupby('mes', observed=True).size().reset_index(name='oficios')),
+        'tipo_por_mes': _ordenar_por_mes(tipo_mes),
+    }
+
+
+rng = np.random.default_rng(5)
+n = 300_000
+df = pd.DataFrame({
+    'entidad_bancaria': rng.choice(['FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER', 'PROCESADO'], n),
+    'ciudad': rng.choice([f'CIUDAD {i}' for i in range(40)] + [None], n),
+    'estado_embargo': rng.choice(['CONFIRMADO', 'Procesado', 'SIN CONFIRMAR', 'OTRO'], n),
+    'tipo_embargo': rng.choice(['JUDICIAL', 'COACTIVO', 'coactivo', '0', None], n),
+    'tipo_documento': rng.choice(['EMBARGO', 'DESEMBARGO'], n),
+    'mes': rng.choice(['2023-01', '2023-02', '2023-11', '2024-01', 'sin mes', None], n),
+    'funcionario': rng.choice([f'F{i}' for i in range(25)], n),
+    # Remitentes con conteos repetidos: el orden de los empates debe coincidir
+    'entidad_remitente': np.repeat([f'R{i}' for i in range(12)], n // 12),
+}).astype('category')
+df = agregar_columnas_canonicas(df)
+
+print("\n1. Mismos resultados que los conteos por gráfico")
+casos = {
+    'sin filtros': None,
+    'filtro aleatorio': np.sort(rng.choice(n, n // 4, replace=False)),
+    'pocas filas': np.array([3, 10, 11, 500]),
+    'sin filas': np.empty(0, dtype=np.int64),
+}
+for caso, posiciones in casos.items():
+    esperado = resumen_por_graficos(VistaFiltrada(df, posiciones))
+    obtenido = resumen_principal(VistaFiltrada(df, posiciones))
+    if sorted(obtenido) != sorted(esperado):
+        print(f"   ✗ {caso}: claves {sorted(obtenido)}")
+        sys.exit(1)
+    for clave, valor in esperado.items():
+        try:
+            if isinstance(valor, pd.Series):
+                pd.testing.assert_series_equal(obtenido[clave], valor)
+            else:
+                pd.testing.assert_frame_equal(obtenido[clave], valor)
+        except AssertionError as e:
+            print(f"   ✗ {caso} / {clave}: {e}")
+            sys.exit(1)
+    print(f"   ✓ {caso}")
+
+print("\n2. Columnas ausentes")
+parcial = resumen_principal(VistaFiltrada(df[['ciudad', 'mes']]))
+if sorted(parcial) != ['oficios_por_mes', 'top_ciudades']:
+    print(f"   ✗ Claves inesperadas: {sorted(parcial)}")
+    sys.exit(1)
+print("   ✓ Solo los agregados de las columnas presentes")
+
+print("\n3. Tiempo")
+posiciones = casos['filtro aleatorio']
+inicio = time.perf_counter()
+resumen_por_graficos(VistaFiltrada(df, posiciones))
+t_graficos = time.perf_counter() - inicio
+inicio = time.perf_counter()
+resumen_principal(VistaFiltrada(df, posiciones))
+t_resumen = time.perf_counter() - inicio
+print(f"   ✓ Por gráfico: {t_graficos * 1000:.1f} ms | una pasada: {t_resumen * 1000:.1f} ms")
+
+print("\n4. Métricas desde los parciales por combinación de filtros")
+df['estado_embargo'] = pd.Categorical(rng.choice(['CONFIRMADO', 'Activo', ' ACTIVO', 'Procesado', None], n))
+df['montoaembargar'] = (rng.lognormal(13, 2, n)).astype('float32')
+df['es_cliente'] = rng.integers(0, 2, n).astype('int8')
+indice = IndiceFiltros(df)
+inicio = time.perf_counter()
+parciales = ParcialesMetricas(df, indice)
+print(f"   ✓ {parciales.n_celdas:,} combinaciones para {n:,} filas en {time.perf_counter() - inicio:.3f}s")
+opciones = {
+    'banco': [[], ['FALABELLA'], ['COLPATRIA', 'SANTANDER']],
+    'ciudad': [[], ['CIUDAD 3'], ['CIUDAD 1', 'CIUDAD 7', 'NO EXISTE']],
+    'tipo': [[], ['COACTIVO']],
+    'mes': [[], ['2023-02', '2024-01'], ['NO EXISTE']],
+}
+tiempo_parciales = tiempo_filas = 0.0
+combinaciones = 0
+for valores in itertools.product(*opciones.values()):
+    filtros = dict(zip(opciones.keys(), valores))
+    if filtros['ciudad']:
+        # Ciudad no está en las combinaciones: esas métricas se calculan sobre la vista filtrada
+        if parciales.cubre('metricas', filtros):
+            print(f"   ✗ Los parciales no deben cubrir un filtro de ciudad: {filtros}")
+            sys.exit(1)
+        continue
+    inicio = time.perf_counter()
+    esperado = metricas(VistaFiltrada(df, indice.seleccionar(filtros)))
+    tiempo_filas += time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    obtenido = parciales.metricas(filtros)
+    tiempo_parciales += time.perf_counter() - inicio
+    if sorted(obtenido) != sorted(esperado) or any(
+            not np.isclose(obtenido[k], esperado[k], rtol=1e-12) for k in esperado):
+        print(f"   ✗ Diferencia con filtros {filtros}:\n     {obtenido}\n     {esperado}")
+        sys.exit(1)
+    combinaciones += 1
+print(f"   ✓ {combinaciones} combinaciones coinciden con `metricas` sobre la vista filtrada")
+print(f"   ✓ Por combinación: {tiempo_filas / combinaciones * 1000:.1f} ms recorriendo filas | "
+      f"{tiempo_parciales / combinaciones * 1000:.2f} ms con parciales")
+
+print("\n5. Distribución de montos desde el bosquejo")
+df.loc[df.index[::10], 'montoaembargar'] = 0
+parciales = ParcialesMetricas(df, indice)
+peor = 0.0
+cubiertas = 0
+for valores in itertools.product(*opciones.values()):
+    filtros = dict(zip(opciones.keys(), valores))
+    # El bosquejo es por mes × banco: con filtro de ciudad o tipo se recalcula sobre las filas
+    if parciales.cubre('montos', filtros) != (not filtros['ciudad'] and not filtros['tipo']):
+        print(f"   ✗ Cobertura del bosquejo incorrecta con filtros {filtros}")
+        sys.exit(1)
+    if not parciales.cubre('montos', filtros):
+        continue
+    cubiertas += 1
+    exacto = montos(VistaFiltrada(df, indice.seleccionar(filtros)))
+    aproximado = parciales.montos(filtros)
+    if any(aproximado[k] != exacto[k] for k in ['valores_cero', 'valores_no_cero', 'total_montos', 'no_cero']):
+        print(f"   ✗ Conteos distintos con filtros {filtros}")
+        sys.exit(1)
+    if exacto['no_cero'] == 0:
+        continue
+    for clave in ['minimo', 'maximo', 'promedio', 'desviacion']:
+        if not np.isclose(aproximado[clave], exacto[clave], rtol=1e-9):
+            print(f"   ✗ {clave} no es exacto con filtros {filtros}: {aproximado[clave]} vs {exacto[clave]}")
+            sys.exit(1)
+    for clave in ['q1', 'mediana', 'q3']:
+        error = abs(aproximado[clave] - exacto[clave]) / exacto[clave]
+        peor = max(peor, error)
+        if error > 0.01:
+            print(f"   ✗ {clave} con error relativo {error:.3%} (filtros {filtros})")
+            sys.exit(1)
+    if abs(aproximado['outliers'] - exacto['outliers']) > 0.01 * exacto['no_cero'] + 2:
+        print(f"   ✗ Atípicos: {aproximado['outliers']} vs {exacto['outliers']} (filtros {filtros})")
+        sys.exit(1)
+print(f"   ✓ {cubiertas} selecciones por mes y banco: conteos, mínimo, máximo, promedio y desviación exactos; "
+      f"cuartiles con error ≤ {peor:.3%}")
+
+print("\n6. Combinaciones acotadas con cientos de ciudades")
+# Reparto realista: ~1.100 municipios con frecuencias muy desiguales y cuatro años de meses
+municipios = [f'MUNICIPIO {i}' for i in range(1_100)]
+pesos = 1 / np.arange(1, len(municipios) + 1)
+grande = pd.DataFrame({
+    'entidad_bancaria': rng.choice(['FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER'], n),
+    'ciudad': rng.choice(municipios, n, p=pesos / pesos.sum()),
+    'estado_embargo': rng.choice(['CONFIRMADO', 'Procesado', 'SIN CONFIRMAR', 'Activo'], n),
+    'tipo_embargo': rng.choice(['JUDICIAL', 'COACTIVO'], n),
+    'tipo_documento': rng.choice(['EMBARGO', 'DESEMBARGO', 'REQUERIMIENTO'], n),
+    'mes': rng.choice([f'{a}-{m:02d}' for a in range(2021, 2025) for m in range(1, 13)], n),
+}).astype('category')
+grande['montoaembargar'] = rng.lognormal(13, 2, n).astype('float32')
+grande = agregar_columnas_canonicas(grande)
+indice_grande = IndiceFiltros(grande)
+parciales = ParcialesMetricas(grande, indice_grande)
+if parciales.n_celdas > len(grande) // 20:
+    print(f"   ✗ {parciales.n_celdas:,} combinaciones para {len(grande):,} filas: crecen con las filas")
+    sys.exit(1)
+filtros = {'banco': ['FALABELLA']}
+esperado = metricas(VistaFiltrada(grande, indice_grande.seleccionar(filtros)))
+obtenido = parciales.metricas(filtros)
+if any(not np.isclose(obtenido[k], esperado[k], rtol=1e-12) for k in esperado):
+    print(f"   ✗ Métricas distintas:\n     {obtenido}\n     {esperado}")
+    sys.exit(1)
+inicio = time.perf_counter()
+for _ in range(20):
+    metricas(VistaFiltrada(grande, indice_grande.seleccionar(filtros)))
+t_filas = (time.perf_counter() - inicio) / 20
+inicio = time.perf_counter()
+for _ in range(20):
+    parciales.metricas(filtros)
+t_parciales = (time.perf_counter() - inicio) / 20
+if t_parciales > t_filas:
+    print(f"   ✗ Los parciales ({t_parciales * 1000:.2f} ms) no son más rápidos que las filas ({t_filas * 1000:.2f} ms)")
+    sys.exit(1)
+histogramas = parciales.bosquejo_montos.histogramas
+# Una fila por mes × banco presente; las cubetas dependen del rango de los montos, no de las filas
+if histogramas.shape[0] > 4 * 48:
+    print(f"   ✗ Bosquejo de montos de {histogramas.shape} para {len(grande):,} filas: debe ser por mes × banco")
+    sys.exit(1)
+inicio = time.perf_counter()
+for _ in range(20):
+    montos(VistaFiltrada(grande, indice_grande.seleccionar(filtros)))
+t_montos_filas = (time.perf_counter() - inicio) / 20
+inicio = time.perf_counter()
+for _ in range(20):
+    parciales.montos(filtros)
+t_montos = (time.perf_counter() - inicio) / 20
+if t_montos > t_montos_filas:
+    print(f"   ✗ El bosquejo ({t_montos * 1000:.2f} ms) no es más rápido que las filas ({t_montos_filas * 1000:.2f} ms)")
+    sys.exit(1)
+con_ciudad = {'banco': ['FALABELLA'], 'ciudad': ['MUNICIPIO 0']}
+if parciales.cubre('metricas', con_ciudad):
+    print("   ✗ Con filtro de ciudad se debe usar la vista filtrada")
+    sys.exit(1)
+try:
+    parciales.metricas(con_ciudad)
+    print("   ✗ Pedir a los parciales un filtro de ciudad debe fallar")
+    sys.exit(1)
+except ValueError:
+    pass
+print(f"   ✓ {parciales.n_celdas:,} combinaciones para {len(grande):,} filas de {grande['ciudad'].nunique():,} ciudades")
+print(f"   ✓ Un banco: {t_filas * 1000:.2f} ms recorriendo filas | {t_parciales * 1000:.3f} ms con parciales")
+print(f"   ✓ Montos de un banco: {t_montos_filas * 1000:.2f} ms recorriendo filas | {t_montos * 1000:.3f} ms "
+      f"con el bosquejo de {histogramas.shape[0]} meses × bancos y {histogramas.shape[1]} cubetas")
+
+print("\n7. Agregados por ciudad")
+ciudades = pd.DataFrame({
+    'ciudad': df['ciudad'],
+    'entidad_bancaria': df['entidad_bancaria'],
+    'montoaembargar': np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(13, 2, n)),
+    'identificacion': np.where(rng.random(n) < 0.05, np.nan, rng.integers(0, 20_000, n)),
+})
+for caso, posiciones in casos.items():
+    vista = VistaFiltrada(ciudades, posiciones)
+    filas = vista.frame(list(ciudades.columns))
+    obtenido = resumen_ciudades(vista)
+    esperado = filas.groupby('ciudad', observed=True).agg(
+        oficios=('ciudad', 'size'), monto=('montoaembargar', 'sum'),
+        monto_promedio=('montoaembargar', 'mean'), demandados=('identificacion', 'nunique'),
+    ).reset_index()
+    try:
+        pd.testing.assert_frame_equal(obtenido['por_ciudad'], esperado, check_dtype=False, rtol=1e-9)
+        pd.testing.assert_frame_equal(obtenido['matriz_ciudad_banco'],
+                                      pd.crosstab(filas['ciudad'], filas['entidad_bancaria']).head(10),
+                                      check_dtype=False, check_categorical=False, check_names=False)
+    except AssertionError as e:
+        print(f"   ✗ {caso}: {e}")
+        sys.exit(1)
+    print(f"   ✓ {caso}")
+sin_montos = resumen_ciudades(VistaFiltrada(ciudades[['ciudad']]))
+if sorted(sin_montos) != ['por_ciudad'] or list(sin_montos['por_ciudad'].columns) != ['ciudad', 'oficios', 'monto']:
+    print(f"   ✗ Sin montos ni bancos: {sin_montos}")
+    sys.exit(1)
+print("   ✓ Sin montos, identificaciones ni bancos")
+
+print("\n8. Rankings por selección parcial")
+for _ in range(2_000):
+    conteos = rng.integers(0, 6, rng.integers(1, 60))
+    k = int(rng.integers(0, 70))
+    esperado = pd.Series(conteos).sort_values(ascending=False, kind='stable').index.to_numpy()[:k]
+    if not np.array_equal(top_k(conteos, k), esperado):
+        print(f"   ✗ top_k({list(conteos)}, {k}) = {top_k(conteos, k)}, esperado {esperado}")
+        sys.exit(1)
+print("   ✓ top_k igual al orden estable de value_counts, con empates y k mayor que las categorías")
+
+# Remitentes con muchas categorías y conteos repetidos
+rankings = pd.DataFrame({
+    'mes': df['mes'],
+    'entidad_remitente': pd.Categorical(rng.integers(0, 40_000, n).astype(str)),
+    'tipo_documento': df['tipo_documento'],
+})
+for caso, posiciones in casos.items():
+    vista = VistaFiltrada(rankings, posiciones)
+    filas = vista.frame(list(rankings.columns))
+    try:
+        pd.testing.assert_series_equal(AGREGADOS['top_documentos'](vista), filas['tipo_documento'].value_counts().head(10))
+    except AssertionError as e:
+        print(f"   ✗ {caso} / top_documentos: {e}")
+        sys.exit(1)
+    obtenido = top_por_mes(vista, 'entidad_remitente', 5)
+    meses = _ordenar_por_mes(filas.groupby('mes', observed=True).size().reset_index(name='n'))['mes']
+    partes = []
+    for mes in meses:
+        conteo = filas.loc[filas['mes'] == mes, 'entidad_remitente'].value_counts().head(5)
+        conteo = conteo[conteo > 0]
+        partes.append(pd.DataFrame({'mes': mes, 'entidad_remitente': conteo.index.astype(str),
+                                    'cantidad': conteo.to_numpy(), 'puesto': np.arange(1, len(conteo) + 1)}))
+    esperado = pd.concat(partes, ignore_index=True) if partes else obtenido.iloc[:0]
+    comparado = obtenido.assign(mes=obtenido['mes'].astype(str), entidad_remitente=obtenido['entidad_remitente'].astype(str))
+    try:
+        pd.testing.assert_frame_equal(comparado.reset_index(drop=True), esperado.astype({'mes': str}),
+                                      check_dtype=False, check_index_type=False)
+    except AssertionError as e:
+        print(f"   ✗ {caso} / top por mes: {e}")
+        sys.exit(1)
+    print(f"   ✓ {caso}: top 10 de documentos y top 5 por mes de {len(meses)} meses")
+
+conteos = np.bincount(rankings['entidad_remitente'].cat.codes, minlength=40_000)
+inicio = time.perf_counter()
+for _ in range(20):
+    pd.Series(conteos).sort_values(ascending=False, kind='stable').head(10)
+t_orden = (time.perf_counter() - inicio) / 20
+inicio = time.perf_counter()
+for _ in range(20):
+    top_k(conteos, 10)
+t_top = (time.perf_counter() - inicio) / 20
+print(f"   ✓ Top 10 de 40,000 categorías: {t_orden * 1000:.2f} ms ordenando todas | {t_top * 1000:.3f} ms con top_k")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,136 @@
+"""
+Script de prueba para AgrupadorCategoriasRaras: ajustarlo sobre un frame y
+sobre conteos acumulados por bloques debe dar el mismo mapeo, los niveles raros,
+no vistos y nulos deben ir a la etiqueta común, y el mapeo guardado en
+agrupadores_categorias.json debe transformar igual al volver a cargarlo
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/pipeline_ml al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+pipeline_ml_dir = os.path.join(project_root, "src", "pipeline_ml")
+sys.path.insert(0, pipeline_ml_dir)
+
+from procesar_modelo import (ARCHIVO_AGRUPADORES, AgrupadorCategoriasRaras, cargar_agrupadores,
+                             guardar_agrupadores)
+
+print("="*60)
+print("TEST: Agrupador de categorías raras")
+print("="*60)
+
+MIN_FREQ = 10
+rng = np.random.default_rng(29)
+n = 20_000
+# Niveles con frecuencias alrededor de MIN_FREQ (incluido el límite exacto) y nulos
+niveles = ['BOGOTA', 'MEDELLIN', 'CALI', 'OCAÑA', 'PASTO'] + [f'MUNICIPIO {i}' for i in range(30)]
+valores = list(rng.choice(niveles[:3], n - 200))
+valores += ['OCAÑA'] * MIN_FREQ + ['PASTO'] * (MIN_FREQ - 1)
+valores += [f'MUNICIPIO {i}' for i in range(30) for _ in range(i % 12)]
+valores += [None] * (200 - 2 * MIN_FREQ + 1 - sum(i % 12 for i in range(30)))
+serie = pd.Series(rng.permutation(np.array(valores, dtype=object)), name='ciudad')
+
+
+def referencia(valores: pd.Series, conservadas: set, etiqueta: str = 'OTRO') -> np.ndarray:
+    """Mapeo fila por fila: los niveles conservados quedan igual, el resto (y los nulos) a la etiqueta."""
+    return np.array([v if isinstance(v, str) and v in conservadas else etiqueta for v in valores], dtype=object)
+
+
+conteos = serie.value_counts()
+conservadas = set(conteos.index[conteos >= MIN_FREQ])
+
+print("\n1. Ajuste sobre el frame")
+for nombre, entrada in [('object', serie), ('category', serie.astype('category'))]:
+    agrupador = AgrupadorCategoriasRaras(min_freq=MIN_FREQ).fit(entrada)
+    if set(agrupador.categorias_) != conservadas | {'OTRO'} or agrupador.categorias_[-1] != 'OTRO':
+        print(f"   ✗ {nombre}: niveles conservados {sorted(agrupador.categorias_)}")
+        sys.exit(1)
+    transformada = agrupador.transform(entrada)
+    if not (transformada.astype(object).to_numpy() == referencia(serie, conservadas)).all():
+        print(f"   ✗ {nombre}: la transformación no coincide con el mapeo fila por fila")
+        sys.exit(1)
+if 'OCAÑA' not in conservadas or 'PASTO' in conservadas:
+    print("   ✗ El límite debe ser inclusivo: OCAÑA (min_freq) se conserva y PASTO (min_freq - 1) no")
+    sys.exit(1)
+print(f"   ✓ {len(conservadas)} niveles conservados de {serie.nunique()}; el resto y los nulos van a 'OTRO'")
+
+print("\n2. Ajuste sobre conteos acumulados por bloques")
+acumulados = pd.Series(dtype='int64')
+for inicio in range(0, n, 3_000):
+    acumulados = acumulados.add(serie.iloc[inicio:inicio + 3_000].value_counts(), fill_value=0)
+por_frame = AgrupadorCategoriasRaras(min_freq=MIN_FREQ).fit(serie)
+por_conteos = AgrupadorCategoriasRaras(min_freq=MIN_FREQ).fit_conteos(acumulados)
+if set(por_conteos.categorias_) != set(por_frame.categorias_):
+    print(f"   ✗ Niveles distintos: {sorted(set(por_conteos.categorias_) ^ set(por_frame.categorias_))}")
+    sys.exit(1)
+if not (por_conteos.transform(serie).astype(object).to_numpy() == por_frame.transform(serie).astype(object).to_numpy()).all():
+    print("   ✗ Los dos ajustes transforman distinto")
+    sys.exit(1)
+print("   ✓ Mismo mapeo desde el frame y desde los conteos de 7 bloques")
+
+print("\n3. Conteos agrupados")
+agrupados = por_conteos.agrupar_conteos(acumulados).astype('int64').sort_index()
+esperado = pd.Series(referencia(serie.dropna(), conservadas)).value_counts().sort_index()
+if not agrupados.equals(esperado.rename(None).rename_axis(None)):
+    print(f"   ✗ agrupar_conteos:\n{agrupados}\nesperado:\n{esperado}")
+    sys.exit(1)
+print(f"   ✓ Mismos conteos que agrupar fila por fila ('OTRO': {agrupados['OTRO']:,})")
+
+print("\n4. Niveles no vistos y nulos")
+nuevos = pd.Series(['BOGOTA', 'BARRANQUILLA', None, np.nan, 'PASTO', 'OCAÑA'], name='ciudad')
+obtenido = por_frame.transform(nuevos).astype(object).tolist()
+if obtenido != ['BOGOTA', 'OTRO', 'OTRO', 'OTRO', 'OTRO', 'OCAÑA']:
+    print(f"   ✗ {obtenido}")
+    sys.exit(1)
+vacia = por_frame.transform(pd.Series([], dtype=object))
+if len(vacia) or list(vacia.cat.categories) != list(por_frame.categorias_):
+    print("   ✗ Una serie vacía debe dar una categórica vacía con las categorías ajustadas")
+    sys.exit(1)
+try:
+    AgrupadorCategoriasRaras().transform(nuevos)
+    print("   ✗ Transformar sin ajustar debe fallar")
+    sys.exit(1)
+except ValueError:
+    pass
+print("   ✓ No vistos y nulos a 'OTRO'; sin ajustar se rechaza")
+
+print("\n5. Ida y vuelta por agrupadores_categorias.json")
+agrupadores = {
+    'ciudad': por_frame,
+    'tipo_embargo': AgrupadorCategoriasRaras(min_freq=3, etiqueta='OTROS').fit(
+        pd.Series(['JUDICIAL'] * 5 + ['COACTIVO'] * 2)),
+    'sin_ajustar': AgrupadorCategoriasRaras(),
+}
+with tempfile.TemporaryDirectory() as directorio:
+    ruta = os.path.join(directorio, ARCHIVO_AGRUPADORES)
+    guardar_agrupadores(agrupadores, ruta)
+    with open(ruta, encoding='utf-8') as f:
+        if 'OCAÑA' not in f.read():
+            print("   ✗ Los niveles con tildes o Ñ deben guardarse legibles (ensure_ascii=False)")
+            sys.exit(1)
+    cargados = cargar_agrupadores(ruta)
+if list(cargados) != list(agrupadores):
+    print(f"   ✗ Columnas cargadas: {list(cargados)}")
+    sys.exit(1)
+for col, original in agrupadores.items():
+    cargado = cargados[col]
+    if cargado.to_dict() != original.to_dict():
+        print(f"   ✗ {col}: {cargado.to_dict()} != {original.to_dict()}")
+        sys.exit(1)
+prueba = pd.concat([serie, nuevos], ignore_index=True)
+if not cargados['ciudad'].transform(prueba).equals(por_frame.transform(prueba)):
+    print("   ✗ El agrupador cargado transforma distinto")
+    sys.exit(1)
+if cargados['tipo_embargo'].transform(pd.Series(['COACTIVO', 'JUDICIAL'])).astype(object).tolist() != ['OTROS', 'JUDICIAL']:
+    print("   ✗ El agrupador cargado debe conservar min_freq y etiqueta")
+    sys.exit(1)
+print("   ✓ Mismo min_freq, etiqueta, niveles y transformación después de cargar")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
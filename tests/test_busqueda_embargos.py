@@ -0,0 +1,82 @@
+"""
+Script de prueba para el índice de búsqueda global del dashboard: cualquier
+término debe devolver exactamente las mismas filas que la búsqueda por
+subcadena (`str.contains`) sobre cada columna que reemplaza
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from busqueda_embargos import COLUMNAS_BUSQUEDA, IndiceBusqueda
+
+print("="*60)
+print("TEST: Índice de búsqueda global del dashboard")
+print("="*60)
+
+
+def buscar_con_mascaras(df, termino, posiciones=None):
+    """Búsqueda de referencia: la de `apply_filters_fast` antes del índice."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in COLUMNAS_BUSQUEDA:
+        if col in df.columns:
+            mask |= (df[col].notna() & df[col].astype(str).str.contains(termino, case=False, na=False, regex=False)).to_numpy()
+    resultado = np.flatnonzero(mask)
+    return resultado if posiciones is None else np.intersect1d(resultado, posiciones)
+
+
+rng = np.random.default_rng(11)
+n = 200_000
+nombres = np.array(['JUAN PEREZ', 'Ana María Ruiz', 'ÁLVARO GÓMEZ', 'PEDRO PÉREZ GARCÍA', 'anabel peña', 'JOSÉ ÑÚÑEZ'])
+df = pd.DataFrame({
+    'entidad_bancaria': pd.Categorical(rng.choice(['FALABELLA', 'COLPATRIA', 'SANTANDER', None], n)),
+    'ciudad': pd.Categorical(rng.choice(['BOGOTA', 'MEDELLIN', 'Cartagena', 'SANTA MARTA'], n)),
+    'entidad_remitente': pd.Categorical(rng.choice(['JUZGADO 1 CIVIL', 'DIAN', 'ALCALDIA DE SANTA MARTA'], n)),
+    'nombres': np.where(rng.random(n) < 0.02, None, nombres[rng.integers(0, len(nombres), n)] + ' ' + rng.integers(0, 50_000, n).astype(str)),
+    'identificacion': rng.integers(10_000_000, 99_999_999, n),
+})
+
+print("\n1. Construcción del índice")
+inicio = time.perf_counter()
+indice = IndiceBusqueda(df)
+print(f"   ✓ {len(indice.columnas)} columnas indexadas en {time.perf_counter() - inicio:.3f}s")
+
+print("\n2. Términos contra la búsqueda por subcadena")
+terminos = ['san', 'SANTA', 'marta', 'pérez', 'PEREZ', 'ñúñez', 'ana ', 'ana', 'juzgado 1',
+            '123', '4567', '99999', 'z 1', 'dian', 'xyz', 'gómez 4', 'ab', 'a']
+posiciones = np.sort(rng.choice(n, n // 3, replace=False))
+inicio = time.perf_counter()
+for termino in terminos:
+    for pos in (None, posiciones):
+        esperado = buscar_con_mascaras(df, termino, pos)
+        obtenido = indice.buscar(termino, pos)
+        if not np.array_equal(esperado, obtenido):
+            print(f"   ✗ '{termino}': {len(esperado)} vs {len(obtenido)} filas")
+            sys.exit(1)
+print(f"   ✓ {len(terminos)} términos coinciden, con y sin filtros previos")
+
+print("\n3. Tiempo por consulta")
+inicio = time.perf_counter()
+for termino in terminos:
+    indice.buscar(termino)
+promedio_ms = (time.perf_counter() - inicio) / len(terminos) * 1000
+print(f"   ✓ {promedio_ms:.1f} ms por término en {n:,} filas")
+
+print("\n4. Columnas ausentes y términos sin coincidencias")
+parcial = IndiceBusqueda(df[['ciudad']])
+if list(parcial.columnas) != ['ciudad'] or len(parcial.buscar('no existe')) != 0:
+    print("   ✗ Índice parcial inesperado")
+    sys.exit(1)
+print("   ✓ Solo se indexan las columnas presentes")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
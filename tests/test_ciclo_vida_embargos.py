@@ -0,0 +1,192 @@
+"""
+Script de prueba para el ciclo de vida por demandado: los días a desembargo,
+embargos por persona, cohortes y flujos calculados sobre el orden guardado
+deben coincidir con los de una referencia con `groupby`/`shift` sobre las
+filas ordenadas, también con filtros, y el orden debe construirse en segundos
+para millones de filas
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from ciclo_vida_embargos import FIN_FLUJO, MAXIMO_EMBARGOS, MESES_COHORTE, PASOS_FLUJO, TIPOS_CICLO, CicloVida
+from motor_filtros import VistaFiltrada, normalize_tipo_documento_series
+
+print("="*60)
+print("TEST: Ciclo de vida por demandado")
+print("="*60)
+
+
+def generar(n: int, semilla: int) -> pd.DataFrame:
+    rng = np.random.default_rng(semilla)
+    tipos = np.array(['EMBARGO', 'Desembargo', 'requerimiento', 'No procesable', 'OTRO'], dtype=object)
+    fechas = pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 700, n), unit='D')
+    return pd.DataFrame({
+        'identificacion': rng.integers(0, n // 4, n).astype(str),
+        'tipo_documento': pd.Categorical(rng.choice(tipos, n, p=[0.45, 0.3, 0.15, 0.05, 0.05])),
+        'fecha_oficio': np.where(rng.random(n) < 0.03, pd.NaT, fechas),
+        'banco': rng.choice(np.array(['A', 'B', 'C'], dtype=object), n),
+    })
+
+
+def referencia(df: pd.DataFrame) -> dict:
+    """Mismos indicadores con groupby/shift sobre las filas válidas ordenadas por (persona, fecha, tipo)."""
+    tipo = normalize_tipo_documento_series(df['tipo_documento'].astype(object))
+    filas = pd.DataFrame({
+        'persona': df['identificacion'].to_numpy(),
+        'fecha': pd.to_datetime(df['fecha_oficio']).to_numpy(),
+        'tipo': pd.Categorical(tipo.where(tipo.isin(TIPOS_CICLO)), categories=TIPOS_CICLO).codes,
+    })
+    filas = filas[(filas['tipo'] >= 0) & filas['fecha'].notna() & filas['persona'].notna()]
+    filas = filas.sort_values(['persona', 'fecha', 'tipo'], kind='stable').reset_index(drop=True)
+    grupos = filas.groupby('persona', sort=False)
+
+    embargo = filas['tipo'] == 0
+    filas['fecha_embargo'] = filas['fecha'].where(embargo)
+    filas['ultimo_embargo'] = filas.groupby('persona', sort=False)['fecha_embargo'].ffill()
+    desembargos = filas[filas['tipo'] == 1]
+    emparejados = desembargos[desembargos['ultimo_embargo'].notna()]
+    dias = (emparejados['fecha'] - emparejados['ultimo_embargo']).dt.days.to_numpy()
+
+    embargos = filas[embargo]
+    por_persona = embargos.groupby('persona').size()
+    conteo = por_persona.clip(upper=MAXIMO_EMBARGOS).value_counts()
+    conteo = conteo.reindex(range(1, MAXIMO_EMBARGOS + 1), fill_value=0).to_numpy()
+    reembargo = embargos.groupby('persona')['fecha'].diff().dropna().dt.days.to_numpy()
+
+    # Cohortes: mes del primer embargo y mes del primer desembargo posterior a un embargo
+    primer = embargos.groupby('persona')['fecha'].min().dt.to_period('M')
+    primer_desembargo = emparejados.groupby('persona')['fecha'].min().dt.to_period('M')
+    desfase = (primer_desembargo - primer.reindex(primer_desembargo.index)).map(lambda d: d.n)
+    ultimo_mes = filas['fecha'].max().to_period('M')
+    cohortes = {}
+    for mes, personas in primer.groupby(primer):
+        desfases = desfase.reindex(personas.index).dropna()
+        fila = {'personas': len(personas)}
+        for k in range(MESES_COHORTE + 1):
+            fila[f"Mes {k}"] = np.nan if mes + k > ultimo_mes else (desfases <= k).sum() / len(personas) * 100
+        cohortes[str(mes)] = fila
+    cohortes = pd.DataFrame.from_dict(cohortes, orient='index')
+
+    # Flujos: oficio k -> oficio k + 1 de la misma persona (o fin)
+    filas['paso'] = grupos.cumcount() + 1
+    filas['siguiente'] = grupos['tipo'].shift(-1)
+    filas = filas[filas['paso'] < PASOS_FLUJO]
+    nombres = np.array(TIPOS_CICLO, dtype=object)
+    flujos = pd.DataFrame({
+        'paso': filas['paso'].to_numpy(),
+        'origen': nombres[filas['tipo'].to_numpy()],
+        'destino': [FIN_FLUJO if pd.isna(s) else TIPOS_CICLO[int(s)] for s in filas['siguiente']],
+    }).value_counts().rename('cantidad').reset_index()
+
+    return {
+        'personas': grupos.ngroups,
+        'desembargos': len(desembargos),
+        'desembargos_sin_embargo': len(desembargos) - len(emparejados),
+        'dias': dias, 'reembargo': reembargo, 'conteo': conteo,
+        'cohortes': cohortes, 'flujos': flujos,
+    }
+
+
+def comparar(obtenido: dict, esperado: dict, caso: str) -> None:
+    errores = []
+    for clave in ('personas', 'desembargos', 'desembargos_sin_embargo'):
+        if obtenido[clave] != esperado[clave]:
+            errores.append(f"{clave}: {obtenido[clave]} != {esperado[clave]}")
+    dias = obtenido['dias_desembargo']
+    if dias['cantidad'] != len(esperado['dias']) or (len(esperado['dias']) and not np.isclose(
+            dias['mediana'], np.median(esperado['dias'])) or not np.isclose(dias['promedio'], esperado['dias'].mean())):
+        errores.append(f"días a desembargo: {dias}")
+    if obtenido['histograma_dias']['cantidad'].sum() != len(esperado['dias']):
+        errores.append("el histograma no suma los desembargos emparejados")
+    if not np.array_equal(obtenido['embargos_por_persona'].to_numpy(), esperado['conteo']):
+        errores.append(f"embargos por persona: {obtenido['embargos_por_persona'].tolist()} != {esperado['conteo'].tolist()}")
+    if obtenido['dias_reembargo']['cantidad'] != len(esperado['reembargo']) or (
+            len(esperado['reembargo']) and not np.isclose(obtenido['dias_reembargo']['mediana'],
+                                                          np.median(esperado['reembargo']))):
+        errores.append(f"días entre embargos: {obtenido['dias_reembargo']}")
+    try:
+        pd.testing.assert_frame_equal(obtenido['cohortes'], esperado['cohortes'], check_dtype=False,
+                                      check_names=False, check_index_type=False, rtol=1e-9)
+    except AssertionError as e:
+        errores.append(f"cohortes: {e}")
+    claves = ['paso', 'origen', 'destino']
+    flujos = obtenido['flujos'].sort_values(claves).reset_index(drop=True)
+    esperados = esperado['flujos'].sort_values(claves).reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(flujos, esperados[flujos.columns], check_dtype=False)
+    except AssertionError as e:
+        errores.append(f"flujos: {e}")
+    if errores:
+        print(f"   ✗ {caso}:")
+        for error in errores:
+            print(f"     - {error}")
+        sys.exit(1)
+
+
+df = generar(60_000, 21)
+ciclo = CicloVida(df)
+
+print("\n1. Orden por demandado, fecha y tipo")
+clave = np.stack([ciclo.persona, ciclo.dia, ciclo.tipo.astype(np.int64)])
+if not np.array_equal(np.lexsort(clave[::-1]), np.arange(len(ciclo.filas))):
+    print("   ✗ Las filas no quedaron ordenadas por (persona, día, tipo)")
+    sys.exit(1)
+print(f"   ✓ {len(ciclo.filas):,} de {len(df):,} oficios en el ciclo (sin fecha ni 'No procesable')")
+
+print("\n2. Indicadores sin filtros")
+resumen = ciclo.resumen()
+comparar(resumen, referencia(df), "sin filtros")
+print(f"   ✓ {resumen['personas']:,} demandados, {resumen['dias_desembargo']['cantidad']:,} desembargos emparejados, "
+      f"{len(resumen['cohortes'])} cohortes, {len(resumen['flujos'])} flujos")
+
+print("\n3. Selecciones del dashboard sobre el mismo orden")
+rng = np.random.default_rng(5)
+selecciones = {
+    'banco A': np.flatnonzero(df['banco'].to_numpy() == 'A'),
+    'muestra 10%': np.sort(rng.choice(len(df), len(df) // 10, replace=False)),
+    'sin filas': np.empty(0, dtype=np.int64),
+}
+for caso, posiciones in selecciones.items():
+    obtenido = ciclo.resumen(VistaFiltrada(df, posiciones).posiciones)
+    if len(posiciones):
+        comparar(obtenido, referencia(df.iloc[posiciones]), caso)
+    elif obtenido['oficios'] or not obtenido['cohortes'].empty or not obtenido['flujos'].empty:
+        print(f"   ✗ {caso}: la selección vacía debe dar un ciclo vacío")
+        sys.exit(1)
+    print(f"   ✓ {caso}: {obtenido['oficios']:,} oficios de {obtenido['personas']:,} demandados")
+
+print("\n4. Columnas faltantes")
+for faltante in ('identificacion', 'fecha_oficio', 'tipo_documento'):
+    vacio = CicloVida(df.drop(columns=faltante)).resumen()
+    if vacio['oficios'] != 0 or vacio['embargos_por_persona'].sum() != 0:
+        print(f"   ✗ Sin '{faltante}' el ciclo debe quedar vacío")
+        sys.exit(1)
+print("   ✓ Sin identificación, fecha o tipo de documento el ciclo queda vacío")
+
+print("\n5. Volumen")
+grande = generar(2_200_000, 3)
+inicio = time.perf_counter()
+ciclo = CicloVida(grande)
+construccion = time.perf_counter() - inicio
+posiciones = np.flatnonzero(grande['banco'].to_numpy() != 'C')
+inicio = time.perf_counter()
+ciclo.resumen(posiciones)
+consulta = time.perf_counter() - inicio
+if construccion > 15 or consulta > 5:
+    print(f"   ✗ Demasiado lento: orden {construccion:.2f} s, resumen {consulta:.2f} s")
+    sys.exit(1)
+print(f"   ✓ {len(grande):,} filas: orden {construccion:.2f} s (una vez por archivo), resumen filtrado {consulta:.2f} s")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
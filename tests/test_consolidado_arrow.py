@@ -0,0 +1,101 @@
+"""
+Script de prueba para la copia Arrow del consolidado: el dashboard debe ver los
+mismos valores que leyendo el CSV, y las columnas que no carga al inicio deben
+leerse después alineadas con las filas conservadas
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Agregar src/pipeline_ml y src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+sys.path.insert(0, os.path.join(project_root, "src", "pipeline_ml"))
+sys.path.insert(0, os.path.join(project_root, "src", "dashboards"))
+
+from procesar_modelo import ARCHIVO_CONSOLIDADO, PYARROW_AVAILABLE, guardar_consolidado_arrow
+from datos_embargos import ConjuntoDatos, abrir_arrow, ruta_arrow_vigente
+
+print("="*60)
+print("TEST: Consolidado en Arrow IPC con columnas bajo demanda")
+print("="*60)
+
+if not PYARROW_AVAILABLE:
+    print("\n[ADVERTENCIA] pyarrow no está instalado; no hay nada que verificar")
+    sys.exit(0)
+
+rng = np.random.default_rng(3)
+n = 50_000
+df = pd.DataFrame({
+    'id': np.arange(n).astype(str),
+    'ciudad': rng.choice(['BOGOTA', 'CALI', ''], n, p=[.5, .45, .05]),
+    'correo': [f'x{i}@juz.gov.co' for i in range(n)],
+    'nombres': rng.choice(['JUAN PEREZ', 'ANA RUIZ', ''], n),
+    'fecha_banco': pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    'montoaembargar': rng.random(n) * 1e6,
+    'mes': rng.choice(['2023-01', '2023-02'], n),
+    'es_cliente': rng.integers(0, 2, n),
+})
+
+with tempfile.TemporaryDirectory() as tmp:
+    csv_path = os.path.join(tmp, ARCHIVO_CONSOLIDADO)
+    df.to_csv(csv_path, index=False)
+    ruta = guardar_consolidado_arrow(df, tmp)
+
+    print("\n1. Archivo Arrow junto al CSV")
+    if ruta_arrow_vigente(csv_path) != ruta:
+        print(f"   ✗ No se detectó la copia Arrow vigente: {ruta}")
+        sys.exit(1)
+    os.utime(ruta, (0, 0))
+    if ruta_arrow_vigente(csv_path) is not None:
+        print("   ✗ Se aceptó una copia Arrow más antigua que el CSV")
+        sys.exit(1)
+    print("   ✓ Se usa solo si no es más antigua que el CSV")
+
+    print("\n2. Mismos valores que el CSV")
+    tabla, df_arrow = abrir_arrow(ruta, ['ciudad', 'mes', 'montoaembargar', 'no_existe'])
+    df_csv = pd.read_csv(csv_path, dtype={'ciudad': 'category', 'mes': 'category'})
+    if list(df_arrow.columns) != ['ciudad', 'mes', 'montoaembargar']:
+        print(f"   ✗ Columnas cargadas inesperadas: {list(df_arrow.columns)}")
+        sys.exit(1)
+    for col in ['ciudad', 'mes']:
+        if df_arrow[col].dtype != 'category' or not df_arrow[col].astype(object).equals(df_csv[col].astype(object)):
+            print(f"   ✗ {col} difiere del CSV")
+            sys.exit(1)
+    if df_arrow['ciudad'].isna().sum() != (df['ciudad'] == '').sum():
+        print("   ✗ Los textos vacíos no quedaron como nulos")
+        sys.exit(1)
+    print("   ✓ Categóricas como diccionarios y textos vacíos como nulos")
+
+    print("\n3. Columnas bajo demanda alineadas con las filas conservadas")
+    validas = df_arrow['ciudad'].notna().to_numpy()
+    filas = np.flatnonzero(validas)
+    datos = ConjuntoDatos(df_arrow.iloc[filas], huella="test", ruta=ruta, tabla=tabla, filas=filas)
+    if list(datos.columns) != list(df.columns):
+        print(f"   ✗ Columnas del conjunto: {list(datos.columns)}")
+        sys.exit(1)
+    if datos._perezosas:
+        print("   ✗ Se leyeron columnas antes de pedirlas")
+        sys.exit(1)
+    correo = datos.columna('correo')
+    esperado = df['correo'].iloc[filas]
+    if not correo.index.equals(datos.df.index) or not correo.astype(object).tolist() == esperado.tolist():
+        print("   ✗ La columna leída bajo demanda no está alineada")
+        sys.exit(1)
+    vista = datos.vista()
+    if list(vista['nombres'].dropna().head(3)) != list(df['nombres'].iloc[filas].replace('', np.nan).dropna().head(3)):
+        print("   ✗ La vista no comparte las columnas leídas")
+        sys.exit(1)
+    if sorted(datos._perezosas) != ['correo', 'nombres']:
+        print(f"   ✗ Columnas leídas: {sorted(datos._perezosas)}")
+        sys.exit(1)
+    print(f"   ✓ Solo se leyeron las columnas pedidas ({len(filas):,} de {n:,} filas)")
+    # Liberar el mapeo antes de borrar la carpeta temporal (Windows)
+    del tabla, df_arrow, datos, vista, correo
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,76 @@
+"""
+Script de prueba para la preparación de datos de los gráficos: los histogramas
+y las series reducidas deben tener un número acotado de puntos sin perder los
+totales ni los extremos de la serie
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+import plotly.graph_objects as go
+
+from datos_graficos import (MAX_INTERVALOS_HISTOGRAMA, histograma, indices_lttb, puntos_figura,
+                            reducir_lttb, tamano_figura)
+
+print("="*60)
+print("TEST: Datos de los gráficos acotados en el servidor")
+print("="*60)
+
+rng = np.random.default_rng(1)
+
+print("\n1. Histograma logarítmico")
+montos = rng.lognormal(13, 2.5, 2_000_000)
+hist = histograma(montos)
+if len(hist) != MAX_INTERVALOS_HISTOGRAMA or hist['cantidad'].sum() != len(montos):
+    print(f"   ✗ {len(hist)} intervalos, {hist['cantidad'].sum()} valores")
+    sys.exit(1)
+razones = (hist['hasta'] / hist['desde']).to_numpy()
+if not np.allclose(razones, razones[0]):
+    print("   ✗ Los intervalos no son de igual ancho en escala logarítmica")
+    sys.exit(1)
+ponderado = histograma(np.array([1.0, 10.0, 100.0]), pesos=np.array([5, 0, 7]), bins=2)
+if ponderado['cantidad'].tolist() != [5, 7]:
+    print(f"   ✗ Histograma con pesos: {ponderado['cantidad'].tolist()}")
+    sys.exit(1)
+if not histograma(np.array([0.0, 1.0, 2.0]), bins=2)['desde'].tolist() == [0.0, 1.0]:
+    print("   ✗ Con ceros debe usar intervalos lineales")
+    sys.exit(1)
+print(f"   ✓ {len(montos):,} valores en {len(hist)} intervalos")
+
+print("\n2. Reducción LTTB")
+n = 20_000
+y = np.sin(np.linspace(0, 20, n)) + rng.normal(0, 0.05, n)
+y[12_345] = 10  # pico aislado
+indices = indices_lttb(y, 500)
+if len(indices) != 500 or indices[0] != 0 or indices[-1] != n - 1 or np.any(np.diff(indices) <= 0):
+    print("   ✗ Índices inválidos")
+    sys.exit(1)
+if 12_345 not in indices:
+    print("   ✗ Se perdió el pico de la serie")
+    sys.exit(1)
+df = pd.DataFrame({'mes': np.arange(n), 'oficios': y})
+if len(reducir_lttb(df, 'oficios')) != 500 or len(reducir_lttb(df.head(30), 'oficios')) != 30:
+    print("   ✗ reducir_lttb no respeta el límite")
+    sys.exit(1)
+print("   ✓ 500 puntos, con extremos y picos conservados")
+
+print("\n3. Tamaño de las figuras")
+fig_cruda = go.Figure(go.Scatter(x=df['mes'], y=df['oficios']))
+reducido = reducir_lttb(df, 'oficios')
+fig_reducida = go.Figure(go.Scatter(x=reducido['mes'], y=reducido['oficios']))
+if puntos_figura(fig_reducida) != 1000 or tamano_figura(fig_reducida) >= tamano_figura(fig_cruda) / 10:
+    print(f"   ✗ {puntos_figura(fig_reducida)} puntos, {tamano_figura(fig_reducida)} bytes")
+    sys.exit(1)
+print(f"   ✓ {tamano_figura(fig_cruda) / 1024:,.0f} KB -> {tamano_figura(fig_reducida) / 1024:,.0f} KB")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,145 @@
+"""
+Script de prueba para el grafo de etapas con caché: omisión de etapas vigentes,
+reanudación tras un fallo, --force-stage y salidas opcionales que no se pueden
+borrar (una copia abierta por otro proceso)
+"""
+import os
+import sys
+import tempfile
+
+# Agregar la carpeta src/pipeline_ml al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+pipeline_ml_dir = os.path.join(project_root, "src", "pipeline_ml")
+sys.path.insert(0, pipeline_ml_dir)
+
+from etapas_pipeline import Etapa, EjecutorEtapas
+
+print("="*60)
+print("TEST: Grafo de etapas con caché por contenido")
+print("="*60)
+
+llamadas = []
+fallar = {'b': False}
+
+
+def construir(directorio, entrada, parametro_b=1):
+    def etapa_a():
+        llamadas.append('a')
+        with open(entrada) as f_in, open(os.path.join(directorio, 'a.txt'), 'w') as f_out:
+            f_out.write(f_in.read().upper())
+
+    def etapa_b():
+        llamadas.append('b')
+        if fallar['b']:
+            raise RuntimeError("fallo simulado")
+        with open(os.path.join(directorio, 'a.txt')) as f_in, open(os.path.join(directorio, 'b.txt'), 'w') as f_out:
+            f_out.write(f_in.read() * parametro_b)
+
+    return [
+        Etapa('b', etapa_b, salidas=['b.txt'], dependencias=['a'], parametros={'n': parametro_b}),
+        Etapa('a', etapa_a, salidas=['a.txt'], entradas=[entrada]),
+    ]
+
+
+def correr(directorio, entrada, esperado, **kwargs):
+    llamadas.clear()
+    forzar = kwargs.pop('forzar', ())
+    EjecutorEtapas(directorio, construir(directorio, entrada, **kwargs), forzar=forzar).ejecutar()
+    if llamadas != esperado:
+        print(f"   ✗ Se esperaban {esperado}, se ejecutaron {llamadas}")
+        sys.exit(1)
+    print(f"   ✓ Ejecutadas: {llamadas or 'ninguna'}")
+
+
+with tempfile.TemporaryDirectory() as directorio:
+    entrada = os.path.join(directorio, 'entrada.txt')
+    with open(entrada, 'w') as f:
+        f.write("hola")
+
+    print("\n1. Primera ejecución (orden por dependencias)")
+    correr(directorio, entrada, ['a', 'b'])
+
+    print("\n2. Re-ejecución sin cambios")
+    correr(directorio, entrada, [])
+
+    print("\n3. Cambio de parámetro de 'b'")
+    correr(directorio, entrada, ['b'], parametro_b=2)
+
+    print("\n4. Volver al parámetro anterior (restaura desde caché)")
+    correr(directorio, entrada, [])
+    with open(os.path.join(directorio, 'b.txt')) as f:
+        if f.read() != "HOLA":
+            print("   ✗ La salida restaurada no coincide")
+            sys.exit(1)
+
+    print("\n5. Cambio de contenido de la entrada + fallo en 'b'")
+    with open(entrada, 'w') as f:
+        f.write("chao")
+    fallar['b'] = True
+    try:
+        correr(directorio, entrada, ['a', 'b'])
+        print("   ✗ La excepción de la etapa no se propagó")
+        sys.exit(1)
+    except RuntimeError:
+        print("   ✓ La excepción se propagó")
+
+    print("\n6. Reanudación: solo se ejecuta la etapa fallida")
+    fallar['b'] = False
+    correr(directorio, entrada, ['b'])
+
+    print("\n7. --force-stage a")
+    correr(directorio, entrada, ['a'], forzar=['a'])
+
+print("\n8. Salida opcional bloqueada por otro proceso")
+with tempfile.TemporaryDirectory() as directorio:
+    entrada = os.path.join(directorio, 'entrada.txt')
+    with open(entrada, 'w') as f:
+        f.write("hola")
+    bloqueada = os.path.join(directorio, 'c.arrow')
+    remove_original = os.remove
+
+    def etapa_c():
+        with open(os.path.join(directorio, 'c.txt'), 'w') as f_out:
+            f_out.write("c")
+        # Como guardar_consolidado_arrow: si el archivo está abierto, no se escribe
+        if not os.path.exists(bloqueada):
+            with open(bloqueada, 'w') as f_out:
+                f_out.write("copia")
+
+    def remove_bloqueado(path, *args, **kwargs):
+        if os.path.abspath(path) == bloqueada:
+            raise PermissionError(13, "El archivo está siendo utilizado por otro proceso", path)
+        return remove_original(path, *args, **kwargs)
+
+    def ejecutor(forzar=()):
+        etapa = Etapa('c', etapa_c, salidas=['c.txt'], opcionales=['c.arrow'], entradas=[entrada])
+        return EjecutorEtapas(directorio, [etapa], forzar=forzar)
+
+    ejecutor().ejecutar()
+    registradas = sorted(ejecutor().manifiesto['etapas']['c']['salidas'])
+    if registradas != ['c.arrow', 'c.txt']:
+        print(f"   ✗ Salidas registradas: {registradas}")
+        sys.exit(1)
+    print("   ✓ La copia generada queda registrada")
+
+    os.remove = remove_bloqueado
+    try:
+        estados = ejecutor(forzar=['c']).ejecutar()
+    finally:
+        os.remove = remove_original
+    registradas = sorted(ejecutor().manifiesto['etapas']['c']['salidas'])
+    if estados != {'c': 'ejecutada'} or registradas != ['c.txt']:
+        print(f"   ✗ Estados {estados}, salidas registradas {registradas}")
+        sys.exit(1)
+    print("   ✓ Sin poder borrarla, la etapa se completa y no registra la copia que no escribió")
+
+    remove_original(bloqueada)
+    if ejecutor().ejecutar() != {'c': 'vigente'}:
+        print("   ✗ Sin la copia opcional la etapa debe seguir vigente")
+        sys.exit(1)
+    print("   ✓ Sin la copia opcional la etapa sigue vigente")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,199 @@
+"""
+Script de prueba para la exportación por bloques del dashboard: CSV y JSON
+escritos bloque a bloque (con y sin compresión) deben ser idénticos a los
+generados de una vez con pandas, Excel debe repartir las filas en hojas
+sin pasar el límite por hoja, Parquet y Arrow deben conservar valores y tipos
+(también las columnas tomadas directamente de la tabla Arrow del conjunto),
+ningún formato debe leer completas las columnas que solo están en esa tabla, y
+los trabajos en segundo plano deben informar el avance y poder cancelarse sin
+dejar archivos
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from datos_embargos import ConjuntoDatos, abrir_arrow
+from exportacion_embargos import (CANCELADO, COMPLETADO, PYARROW_AVAILABLE, TrabajoExportacion, excel_disponible,
+                                  exportar, leer_archivo)
+from motor_filtros import VistaFiltrada
+
+print("="*60)
+print("TEST: Exportación por bloques")
+print("="*60)
+
+rng = np.random.default_rng(3)
+n = 25_000
+df = pd.DataFrame({
+    'entidad_bancaria': pd.Categorical(rng.choice(['FALABELLA', 'COLPATRIA', None], n)),
+    'nombres': np.where(rng.random(n) < 0.05, None, rng.choice(['JUAN, PÉREZ', 'ANA "LA" RUIZ', 'JOSÉ ÑÚÑEZ'], n)),
+    'identificacion': rng.integers(10_000_000, 99_999_999, n),
+    'montoaembargar': np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(13, 2, n)),
+    'fecha_oficio': pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 700, n), unit='D'),
+})
+columnas = list(df.columns)
+posiciones = np.sort(rng.choice(n, n // 2, replace=False))
+vista = VistaFiltrada(df, posiciones)
+esperado = vista.frame(columnas)
+directorio = tempfile.mkdtemp()
+
+try:
+    print("\n1. CSV y JSON idénticos a la exportación en memoria")
+    referencias = {
+        'CSV': esperado.to_csv(index=False).encode('utf-8'),
+        'JSON': esperado.to_json(orient='records', date_format='iso').encode('utf-8'),
+    }
+    for formato, referencia in referencias.items():
+        for compresion in ['Ninguna', 'gzip', 'zip']:
+            archivo = exportar(vista, columnas, formato, compresion, directorio=directorio, filas_por_bloque=4_000)
+            contenido = leer_archivo(archivo['ruta'])
+            if compresion == 'gzip':
+                contenido = gzip.decompress(contenido)
+            elif compresion == 'zip':
+                with zipfile.ZipFile(archivo['ruta']) as contenedor:
+                    contenido = contenedor.read(contenedor.namelist()[0])
+            if contenido != referencia or archivo['filas'] != len(vista):
+                print(f"   ✗ {formato} / {compresion}: contenido distinto")
+                sys.exit(1)
+        print(f"   ✓ {formato} sin compresión, gzip y zip")
+
+    print("\n2. Selección vacía")
+    vacio = exportar(VistaFiltrada(df, np.empty(0, dtype=np.int64)), columnas, 'CSV', directorio=directorio)
+    if leer_archivo(vacio['ruta']).decode('utf-8').strip() != ','.join(columnas):
+        print("   ✗ El CSV vacío debe tener solo el encabezado")
+        sys.exit(1)
+    print("   ✓ Solo el encabezado")
+
+    print("\n3. Excel repartido en hojas")
+    if not excel_disponible():
+        print("   - Sin xlsxwriter ni openpyxl, se omite")
+    else:
+        # Límite reducido para no escribir un millón de filas en la prueba
+        archivo = exportar(vista, columnas, 'Excel', 'zip', directorio=directorio,
+                           filas_por_bloque=3_000, max_filas_hoja=5_001)
+        hojas = pd.read_excel(archivo['ruta'], sheet_name=None)
+        if archivo['nombre_archivo'].endswith('.zip') or list(hojas) != ['Embargos', 'Embargos_2', 'Embargos_3']:
+            print(f"   ✗ Hojas inesperadas: {list(hojas)} ({archivo['nombre_archivo']})")
+            sys.exit(1)
+        leido = pd.concat(hojas.values(), ignore_index=True)
+        if max(len(h) for h in hojas.values()) != 5_000 or len(leido) != len(vista):
+            print(f"   ✗ Filas por hoja: {[len(h) for h in hojas.values()]}")
+            sys.exit(1)
+        if not (np.allclose(leido['montoaembargar'], esperado['montoaembargar'], equal_nan=True)
+                and (leido['identificacion'].to_numpy() == esperado['identificacion'].to_numpy()).all()
+                and (leido['fecha_oficio'].to_numpy() == esperado['fecha_oficio'].to_numpy()).all()
+                and leido['nombres'].isna().sum() == esperado['nombres'].isna().sum()):
+            print("   ✗ Los valores leídos no coinciden con los exportados")
+            sys.exit(1)
+        print(f"   ✓ {archivo['filas']:,} registros en {archivo['hojas']} hojas de a lo sumo 5,000 filas")
+
+    print("\n4. Parquet y Arrow")
+    if not PYARROW_AVAILABLE:
+        print("   - Sin pyarrow, se omite")
+    else:
+        # Conjunto respaldado por Arrow: dos columnas en pandas, sin las filas impares, y
+        # una columna derivada con textos y números mezclados
+        ruta_arrow = os.path.join(directorio, 'consolidado.arrow')
+        df.to_feather(ruta_arrow)
+        filas = np.arange(0, n, 2)
+        tabla, cargado = abrir_arrow(ruta_arrow, ['entidad_bancaria', 'montoaembargar'])
+        cargado = cargado.iloc[filas].reset_index(drop=True)
+        cargado['mixta'] = pd.Series(np.where(np.arange(len(filas)) % 3 == 0, 'A', None), dtype=object).fillna(7)
+        conjunto = ConjuntoDatos(cargado, huella='prueba', tabla=tabla, filas=filas)
+        vista_arrow = VistaFiltrada(conjunto, np.sort(rng.choice(len(filas), 5_000, replace=False)))
+        columnas_arrow = ['entidad_bancaria', 'nombres', 'identificacion', 'montoaembargar', 'fecha_oficio', 'mixta']
+        for vista_prueba, cols in [(vista, columnas), (vista_arrow, columnas_arrow)]:
+            referencia = vista_prueba.frame(cols).reset_index(drop=True)
+            if 'mixta' in cols:
+                referencia['mixta'] = referencia['mixta'].astype(str)
+            for formato, leer in [('Parquet', pd.read_parquet), ('Arrow', pd.read_feather)]:
+                archivo = exportar(vista_prueba, cols, formato, 'gzip', directorio=directorio, filas_por_bloque=1_500)
+                leido = leer(archivo['ruta'])
+                try:
+                    pd.testing.assert_frame_equal(leido, referencia, check_dtype=False, check_categorical=False)
+                except AssertionError as e:
+                    print(f"   ✗ {formato}: {e}")
+                    sys.exit(1)
+                if not (isinstance(leido['entidad_bancaria'].dtype, pd.CategoricalDtype)
+                        and leido['identificacion'].dtype == referencia['identificacion'].dtype
+                        and leido['fecha_oficio'].dtype.kind == 'M' and archivo['nombre_archivo'].endswith(formato.lower())):
+                    print(f"   ✗ {formato}: tipos {dict(leido.dtypes)}")
+                    sys.exit(1)
+        print("   ✓ Mismos valores y tipos, desde pandas y desde la tabla Arrow del conjunto")
+
+    print("\n5. CSV, JSON y Excel desde la tabla Arrow del conjunto")
+    if not PYARROW_AVAILABLE:
+        print("   - Sin pyarrow, se omite")
+    else:
+        # Solo 'entidad_bancaria' en pandas: las demás columnas deben leerse bloque a bloque
+        tabla, cargado = abrir_arrow(ruta_arrow, ['entidad_bancaria'])
+        conjunto = ConjuntoDatos(cargado.iloc[filas].reset_index(drop=True), huella='prueba', tabla=tabla, filas=filas)
+        seleccion = np.sort(rng.choice(len(filas), 3_000, replace=False))
+        vista_arrow = VistaFiltrada(conjunto, seleccion)
+        referencia = df.iloc[filas[seleccion]][columnas]
+        referencias_arrow = {
+            'CSV': referencia.to_csv(index=False).encode('utf-8'),
+            'JSON': referencia.to_json(orient='records', date_format='iso').encode('utf-8'),
+        }
+        for formato, contenido_esperado in referencias_arrow.items():
+            archivo = exportar(vista_arrow, columnas, formato, directorio=directorio, filas_por_bloque=700)
+            if leer_archivo(archivo['ruta']) != contenido_esperado:
+                print(f"   ✗ {formato}: contenido distinto al de las mismas filas en pandas")
+                sys.exit(1)
+        if excel_disponible():
+            archivo = exportar(vista_arrow, columnas, 'Excel', directorio=directorio, filas_por_bloque=700)
+            if len(pd.read_excel(archivo['ruta'])) != len(seleccion):
+                print("   ✗ Excel: filas distintas a las seleccionadas")
+                sys.exit(1)
+        if conjunto._perezosas:
+            print(f"   ✗ Columnas leídas completas: {sorted(conjunto._perezosas)}")
+            sys.exit(1)
+        print("   ✓ Mismo contenido, sin leer completas las columnas que solo están en la tabla Arrow")
+
+    print("\n6. Trabajos en segundo plano")
+    grande = VistaFiltrada(pd.concat([df] * 40, ignore_index=True))
+    inicio = time.perf_counter()
+    trabajo = TrabajoExportacion(grande, columnas, 'JSON', 'gzip', nombre='cancelado', directorio=directorio).iniciar()
+    lanzado = time.perf_counter() - inicio
+    while trabajo.escritas == 0 and trabajo.activo:
+        time.sleep(0.01)
+    avance_parcial = trabajo.avance
+    trabajo.cancelar()
+    trabajo.esperar(60)
+    if lanzado > 0.5 or trabajo.estado != CANCELADO or not 0 < avance_parcial < 1:
+        print(f"   ✗ Estado {trabajo.estado}, avance {avance_parcial:.2f}, lanzamiento {lanzado:.2f}s")
+        sys.exit(1)
+    if any(nombre.startswith(trabajo.nombre) for nombre in os.listdir(directorio)):
+        print("   ✗ La cancelación dejó el archivo temporal")
+        sys.exit(1)
+    print(f"   ✓ Cancelado al {avance_parcial:.0%} sin dejar archivo; iniciarlo tomó {lanzado * 1000:.1f} ms")
+
+    trabajo = TrabajoExportacion(vista, columnas, 'CSV', nombre='completo', directorio=directorio).iniciar()
+    trabajo.esperar(60)
+    if trabajo.estado != COMPLETADO or trabajo.avance != 1.0 or leer_archivo(trabajo.archivo['ruta']) != referencias['CSV']:
+        print(f"   ✗ Trabajo completo en estado {trabajo.estado}")
+        sys.exit(1)
+    ruta = trabajo.archivo['ruta']
+    trabajo.descartar()
+    if os.path.exists(ruta) or trabajo.archivo is not None:
+        print("   ✗ Descartar debe borrar el archivo")
+        sys.exit(1)
+    print("   ✓ Completado con el mismo contenido; descartarlo borra el archivo")
+finally:
+    shutil.rmtree(directorio, ignore_errors=True)
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,121 @@
+"""
+Script de prueba para el modo fuera de memoria del entrenamiento
+(`--fuera-de-memoria`): sobre un consolidado pequeño leído en bloques de pocas
+filas, los agregados mensuales, los agrupadores, los conteos por nivel y las
+predicciones de regresión deben ser idénticos a los del modo en memoria, y la
+clasificación con memoria externa de XGBoost debe generar su reporte
+"""
+import filecmp
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/pipeline_ml al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+pipeline_ml_dir = os.path.join(project_root, "src", "pipeline_ml")
+sys.path.insert(0, pipeline_ml_dir)
+
+from procesar_modelo import (ARCHIVO_AGREGADOS, ARCHIVO_AGRUPADORES, ARCHIVO_CONSOLIDADO, ARCHIVO_CONTEOS,
+                             entrenar_modelos_y_generar_predicciones)
+
+print("="*60)
+print("TEST: Entrenamiento fuera de memoria vs en memoria")
+print("="*60)
+
+TAMANO_BLOQUE_PRUEBA = 1_500
+ARCHIVOS_REGRESION = [
+    "predicciones_oficios_validacion.csv", "predicciones_oficios_futuro.csv",
+    "predicciones_demandados_validacion.csv", "predicciones_demandados_futuro.csv",
+]
+
+rng = np.random.default_rng(17)
+n = 12_000
+fechas = pd.date_range('2021-01-01', '2023-12-31', freq='D')
+ciudades = ['BOGOTA', 'Medellín', 'CALI ', 'BARRANQUILLA'] + [f'MUNICIPIO {i}' for i in range(40)]
+remitentes = ['DIAN', 'SECRETARIA DE HACIENDA', 'JUZGADO 1 CIVIL'] + [f'JUZGADO {i} LABORAL' for i in range(60)]
+consolidado = pd.DataFrame({
+    'id': np.arange(1, n + 1),
+    'identificacion': rng.integers(1_000, 4_000, n).astype(str),
+    # Algunas fechas inválidas, que el entrenamiento descarta
+    'fecha_banco': np.where(rng.random(n) < 0.02, 'SIN FECHA', rng.choice(fechas, n).astype('datetime64[D]').astype(str)),
+    'ciudad': rng.choice(ciudades, n, p=[0.3, 0.2, 0.15, 0.15] + [0.2 / 40] * 40),
+    'entidad_remitente': rng.choice(remitentes, n, p=[0.35, 0.25, 0.1] + [0.3 / 60] * 60),
+    'tipo_embargo': rng.choice(['JUDICIAL', 'COACTIVO', 'judicial'], n, p=[0.5, 0.4, 0.1]),
+    'estado_embargo': rng.choice(['PROCESADO', 'CONFIRMADO', 'SIN_CONFIRMAR', 'RARO'], n, p=[0.45, 0.35, 0.199, 0.001]),
+    # Montos enteros: las sumas por mes son exactas en cualquier orden de bloques
+    'montoaembargar': rng.integers(0, 20_000, n).astype(float),
+    'es_cliente': rng.choice(['SI', 'NO'], n),
+    # Columna que el entrenamiento no lee
+    'nombres': rng.choice(['ANA', 'JOSÉ'], n),
+})
+
+directorio = tempfile.mkdtemp()
+try:
+    consolidado_path = os.path.join(directorio, ARCHIVO_CONSOLIDADO)
+    consolidado.to_csv(consolidado_path, index=False)
+    salida_memoria = os.path.join(directorio, 'en_memoria')
+    salida_bloques = os.path.join(directorio, 'fuera_de_memoria')
+
+    print("\n1. Ejecución en memoria")
+    entrenar_modelos_y_generar_predicciones(consolidado_path, salida_memoria)
+    print("\n2. Ejecución fuera de memoria")
+    entrenar_modelos_y_generar_predicciones(consolidado_path, salida_bloques, fuera_de_memoria=True,
+                                            tamano_bloque=TAMANO_BLOQUE_PRUEBA)
+    print(f"   ✓ {n:,} filas en bloques de {TAMANO_BLOQUE_PRUEBA:,} ({-(-n // TAMANO_BLOQUE_PRUEBA)} bloques)")
+
+    print("\n3. Agregados y predicciones de regresión idénticos")
+    for archivo in [ARCHIVO_AGREGADOS] + ARCHIVOS_REGRESION:
+        memoria, bloques = os.path.join(salida_memoria, archivo), os.path.join(salida_bloques, archivo)
+        if not (os.path.exists(memoria) and os.path.exists(bloques)):
+            print(f"   ✗ {archivo}: no se generó en ambos modos")
+            sys.exit(1)
+        if not filecmp.cmp(memoria, bloques, shallow=False):
+            print(f"   ✗ {archivo}: distinto entre modos")
+            sys.exit(1)
+    agregados = pd.read_csv(os.path.join(salida_memoria, ARCHIVO_AGREGADOS))
+    if agregados['id'].sum() != (consolidado['fecha_banco'] != 'SIN FECHA').sum():
+        print("   ✗ Los oficios por mes no suman las filas con fecha válida")
+        sys.exit(1)
+    print(f"   ✓ {ARCHIVO_AGREGADOS} ({len(agregados)} meses) y {len(ARCHIVOS_REGRESION)} archivos de regresión")
+
+    print("\n4. Agrupadores y conteos por nivel")
+    leidos = {}
+    for archivo in [ARCHIVO_AGRUPADORES, ARCHIVO_CONTEOS]:
+        for salida in [salida_memoria, salida_bloques]:
+            with open(os.path.join(salida, archivo), encoding='utf-8') as f:
+                leidos[(archivo, salida)] = json.load(f)
+    if leidos[(ARCHIVO_AGRUPADORES, salida_memoria)] != leidos[(ARCHIVO_AGRUPADORES, salida_bloques)]:
+        print(f"   ✗ {ARCHIVO_AGRUPADORES}: distinto entre modos")
+        sys.exit(1)
+    # En memoria los conteos incluyen en 0 los niveles sin filas (p. ej. 'OTRO'); el soporte es el mismo
+    soporte = {salida: {col: {nivel: v for nivel, v in conteos.items() if v > 0}
+                        for col, conteos in leidos[(ARCHIVO_CONTEOS, salida)].items()}
+               for salida in [salida_memoria, salida_bloques]}
+    if soporte[salida_memoria] != soporte[salida_bloques]:
+        print(f"   ✗ {ARCHIVO_CONTEOS}: soporte por nivel distinto entre modos")
+        sys.exit(1)
+    print("   ✓ Mismos niveles agrupados y mismo soporte por clase")
+
+    print("\n5. Clasificación con memoria externa")
+    ruta = os.path.join(salida_bloques, "resultados_clasificaciones.csv")
+    if not os.path.exists(ruta):
+        print("   ✗ No se generó resultados_clasificaciones.csv")
+        sys.exit(1)
+    clasificaciones = pd.read_csv(ruta)
+    modelos = set(clasificaciones['modelo']) if 'modelo' in clasificaciones.columns else set()
+    if modelos != {'Tipo Embargo', 'Estado Embargo', 'Cliente'}:
+        print(f"   ✗ Modelos en el reporte: {sorted(modelos)}")
+        sys.exit(1)
+    print(f"   ✓ {len(clasificaciones)} filas de reporte para {sorted(modelos)}")
+finally:
+    shutil.rmtree(directorio, ignore_errors=True)
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
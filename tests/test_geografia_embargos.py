@@ -0,0 +1,155 @@
+"""
+Script de prueba para el mapa de la pestaña geográfica: las variantes de
+escritura de una ciudad deben resolverse al mismo municipio DANE, los nombres
+desconocidos, ambiguos o con otro departamento a ninguno (nunca a un municipio
+de otro departamento), cada nombre debe resolverse una sola vez, y
+los oficios y montos por municipio sumados desde el agregado por ciudad deben
+coincidir con los calculados fila por fila
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from agregados_embargos import resumen_ciudades
+from geografia_embargos import IndiceMunicipios, cargar_geojson, cargar_municipios
+from motor_filtros import VistaFiltrada
+
+print("="*60)
+print("TEST: Municipios DANE del mapa geográfico")
+print("="*60)
+
+municipios = cargar_municipios()
+indice = IndiceMunicipios(municipios)
+
+print("\n1. Listado de municipios incluido")
+codigos = municipios['codigo_dane']
+if not (codigos.str.fullmatch(r'\d{5}').all() and codigos.is_unique):
+    print("   ✗ Los códigos DANE deben ser únicos y de 5 dígitos")
+    sys.exit(1)
+if not (municipios['latitud'].between(-4.3, 13.5).all() and municipios['longitud'].between(-82, -66.8).all()):
+    print("   ✗ Hay centroides fuera de Colombia")
+    sys.exit(1)
+if len(municipios) < 1_100 or municipios.groupby(codigos.str[:2])['departamento'].nunique().max() != 1:
+    print("   ✗ Debe ser el listado completo, con un departamento por código de 2 dígitos")
+    sys.exit(1)
+print(f"   ✓ {len(municipios)} municipios con código y centroide válidos")
+
+print("\n2. Variantes de escritura")
+variantes = {
+    '11001': ['BOGOTA', 'Bogotá D.C.', 'BOGOTA, D.C.', 'SANTAFE DE BOGOTA'],
+    '05001': ['MEDELLIN', 'Medellín (Antioquia)', 'MEDELLIN - ANTIOQUIA', 'MEDELIN'],
+    '54001': ['CUCUTA', 'Cúcuta', 'SAN JOSE DE CUCUTA'],
+    '54498': ['OCAÑA', 'OCANA'],
+    '47001': ['SANTA MARTA D.T.C.H.', 'STA MARTA'],
+    '76001': ['  cali ', 'SANTIAGO DE CALI', 'CALI VALLE DEL CAUCA', 'CALI - VALLE'],
+    '18150': ['CARTAGENA DEL CHAIRA', 'Cartagena del Chairá (Caquetá)'],
+    '63001': ['ARMENIA', 'ARMENIA QUINDIO'],
+    '05059': ['ARMENIA ANTIOQUIA', 'Armenia - Ant.'],
+    '52399': ['LA UNION NARIÑO', 'LA UNIÓN (NARIÑO)'],
+    '76400': ['LA UNION - VALLE'],
+    '08001': ['BARRANQUILLA D.E.I.P.'],
+    '15001': ['TUNJA BOY'],
+}
+for codigo, nombres in variantes.items():
+    obtenidos = set(municipios['codigo_dane'].iloc[indice.resolver(nombres)])
+    if obtenidos != {codigo}:
+        print(f"   ✗ {nombres} -> {obtenidos} (esperado {codigo})")
+        sys.exit(1)
+print(f"   ✓ {sum(map(len, variantes.values()))} variantes de {len(variantes)} municipios")
+desconocidos = ['MUNICIPIO 98', 'SIN CIUDAD', '', 'XX', None, np.nan]
+if (indice.resolver(desconocidos) != -1).any():
+    print(f"   ✗ Nombres desconocidos resueltos: {indice.resolver(desconocidos)}")
+    sys.exit(1)
+print("   ✓ Los nombres desconocidos quedan sin municipio")
+# Ninguno de estos es un municipio del listado: la primera palabra o un nombre corto
+# parecido no bastan, un nombre repetido sin capital es ambiguo y el departamento
+# escrito debe ser el del municipio
+no_resolver = ['ARMENIA MANTEQUILLA', 'CALI ZONA FRANCA', 'MEDELLIN CENTRO', 'BOGOTA NORTE', 'SAN', 'LA UNION',
+               'RIONEGRO', 'CARTAGENA CAQUETA', 'ARMENIA CAUCA', 'ANTIOQUIA', 'VALLE DEL CAUCA']
+resueltos = indice.resolver(no_resolver)
+if (resueltos != -1).any():
+    errores = {n: municipios['codigo_dane'].iat[p] for n, p in zip(no_resolver, resueltos) if p >= 0}
+    print(f"   ✗ Nombres que no deben resolverse: {errores}")
+    sys.exit(1)
+print(f"   ✓ {len(no_resolver)} nombres ambiguos, con otro departamento o que solo empiezan como un municipio, sin ubicar")
+
+print("\n3. Oficios y montos por municipio")
+rng = np.random.default_rng(11)
+n = 200_000
+nombres = [nombre for lista in variantes.values() for nombre in lista] + [f'MUNICIPIO {i}' for i in range(300)] + [None]
+df = pd.DataFrame({
+    'ciudad': pd.Categorical(rng.choice(np.array(nombres, dtype=object), n)),
+    'montoaembargar': np.where(rng.random(n) < 0.1, np.nan, rng.lognormal(13, 2, n)),
+})
+for caso, posiciones in {'sin filtros': None, 'filtro': np.sort(rng.choice(n, n // 3, replace=False)),
+                         'sin filas': np.empty(0, dtype=np.int64)}.items():
+    vista = VistaFiltrada(df, posiciones)
+    mapa = indice.por_municipio(resumen_ciudades(vista)['por_ciudad'])
+    filas = vista.frame(['ciudad', 'montoaembargar'])
+    # Referencia: el municipio de cada fila, agrupado
+    por_fila = indice.resolver(filas['ciudad'].astype(object))
+    filas['codigo_dane'] = np.where(por_fila >= 0, municipios['codigo_dane'].to_numpy()[por_fila], None)
+    esperado = filas.groupby('codigo_dane').agg(oficios=('ciudad', 'size'), monto=('montoaembargar', 'sum'))
+    obtenido = mapa['municipios'].set_index('codigo_dane')[['oficios', 'monto']].sort_index()
+    try:
+        pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False, check_names=False,
+                                      check_index_type=False, rtol=1e-9)
+    except AssertionError as e:
+        print(f"   ✗ {caso}: {e}")
+        sys.exit(1)
+    if mapa['municipios']['oficios'].sum() + mapa['sin_ubicar']['oficios'].sum() != filas['ciudad'].notna().sum():
+        print(f"   ✗ {caso}: los oficios ubicados y sin ubicar no suman el total")
+        sys.exit(1)
+    print(f"   ✓ {caso}: {len(mapa['municipios'])} municipios, {len(mapa['sin_ubicar'])} ciudades sin ubicar")
+
+print("\n4. Resolución memoizada")
+indice = IndiceMunicipios(municipios)
+por_ciudad = resumen_ciudades(VistaFiltrada(df))['por_ciudad']
+inicio = time.perf_counter()
+indice.por_municipio(por_ciudad)
+primera = time.perf_counter() - inicio
+inicio = time.perf_counter()
+for _ in range(20):
+    indice.por_municipio(por_ciudad)
+siguientes = (time.perf_counter() - inicio) / 20
+if len(indice._resueltos) != len(por_ciudad):
+    print(f"   ✗ Se resolvieron {len(indice._resueltos)} nombres para {len(por_ciudad)} ciudades")
+    sys.exit(1)
+print(f"   ✓ Primera vez: {primera * 1000:.1f} ms | con los nombres ya resueltos: {siguientes * 1000:.2f} ms")
+
+print("\n5. Geometrías opcionales")
+directorio = tempfile.mkdtemp()
+try:
+    ruta = os.path.join(directorio, 'municipios_colombia.geojson')
+    if cargar_geojson(ruta) is not None:
+        print("   ✗ Sin archivo debe devolver None")
+        sys.exit(1)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'type': 'FeatureCollection', 'features': []}, f)
+    if cargar_geojson(ruta) != {'type': 'FeatureCollection', 'features': []}:
+        print("   ✗ No se leyó el GeoJSON")
+        sys.exit(1)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write('{incompleto')
+    if cargar_geojson(ruta) is not None:
+        print("   ✗ Un GeoJSON dañado debe devolver None")
+        sys.exit(1)
+    print("   ✓ Sin archivo o dañado: mapa de burbujas; con archivo: coropleta")
+finally:
+    shutil.rmtree(directorio, ignore_errors=True)
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,134 @@
+"""
+Script de prueba para las columnas canónicas y el índice de filtros del dashboard:
+cualquier combinación de filtros debe devolver exactamente las mismas filas que el
+filtrado por máscaras de texto que reemplaza
+"""
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from motor_filtros import (IndiceFiltros, ESTADOS_PERMITIDOS_MAP, TIPO_EMBARGO_MAP,
+                           agregar_columnas_canonicas, normalizar_estado,
+                           normalize_tipo_documento_series)
+
+print("="*60)
+print("TEST: Columnas canónicas e índice de filtros del dashboard")
+print("="*60)
+
+
+def filtrar_con_mascaras(df, filtros):
+    """Filtrado de referencia: normaliza las columnas completas y combina máscaras."""
+    mask = pd.Series(True, index=df.index)
+    if filtros.get('banco'):
+        bancos_sel = [str(b).strip().upper() for b in filtros['banco']]
+        mask &= df['entidad_bancaria'].astype(str).str.strip().str.upper().isin(bancos_sel)
+    if filtros.get('ciudad'):
+        mask &= df['ciudad'].isin(filtros['ciudad'])
+    if filtros.get('estado'):
+        estados_df = df['estado_embargo'].astype(str).str.strip().str.upper().str.replace(' ', '_').str.replace('-', '_').str.rstrip('_')
+        mask_estado = pd.Series(False, index=df.index)
+        for estado in filtros['estado']:
+            variaciones = [v.upper().replace(' ', '_').replace('-', '_').rstrip('_') for v in ESTADOS_PERMITIDOS_MAP[estado]]
+            mask_estado |= estados_df.isin(variaciones)
+        mask &= mask_estado
+    if filtros.get('tipo'):
+        tipos_df = df['tipo_embargo'].astype(str).str.strip().str.upper().str.replace(' ', '_').str.rstrip('_')
+        mask_tipo = pd.Series(False, index=df.index)
+        for tipo in filtros['tipo']:
+            variaciones = [v.upper().replace(' ', '_').rstrip('_') for v in TIPO_EMBARGO_MAP[tipo]]
+            mask_tipo |= tipos_df.isin(variaciones)
+        mask &= mask_tipo
+    if filtros.get('tipo_documento'):
+        mask &= normalize_tipo_documento_series(df['tipo_documento']).isin(filtros['tipo_documento'])
+    if filtros.get('mes'):
+        mask &= df['mes'].astype(str).isin([str(m) for m in filtros['mes']])
+    return np.flatnonzero(mask.to_numpy())
+
+
+rng = np.random.default_rng(7)
+n = 200_000
+df = pd.DataFrame({
+    'entidad_bancaria': rng.choice(['FALABELLA', 'Falabella ', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER', 'PROCESADO'], n),
+    'ciudad': rng.choice(['BOGOTA', 'MEDELLIN', 'CALI', 'Cartagena', 'PASTO'], n),
+    'estado_embargo': rng.choice(['CONFIRMADO', 'Procesado', 'SIN CONFIRMAR', 'procesado con error', 'CON-ERRORES_', 'OTRO'], n),
+    'tipo_embargo': rng.choice(['JUDICIAL', 'Coactivo', 'judiciales', 'COACTIVO ', '0'], n),
+    'tipo_documento': rng.choice(['EMBARGO', 'DESEMBARGO', 'LEVANTAMIENTO', 'REQUERIMIENTO', 'NO PROCESABLE'], n),
+    'mes': rng.choice(['2023-01', '2023-02', '2023-03', '2024-01'], n),
+}).astype('category')
+df.index = df.index * 3  # índice no posicional, como tras dropna
+
+print("\n1. Columnas canónicas")
+df_canon = agregar_columnas_canonicas(df.copy())
+estado_esperado = normalizar_estado(df['estado_embargo'])
+if not df_canon['estado_canon'].astype(object).equals(estado_esperado.astype(object)):
+    print("   ✗ estado_canon no coincide con la normalización fila a fila")
+    sys.exit(1)
+doc_esperado = normalize_tipo_documento_series(df['tipo_documento'])
+if not df_canon['tipo_documento_canon'].astype(object).equals(doc_esperado):
+    print("   ✗ tipo_documento_canon no coincide con la normalización fila a fila")
+    sys.exit(1)
+bancos = set(df_canon['banco_canon'].dropna().unique())
+if bancos != {'FALABELLA', 'COLPATRIA', 'COOPCENTRAL', 'SANTANDER'} or df_canon['banco_canon'].isna().sum() == 0:
+    print(f"   ✗ banco_canon inesperado: {bancos}")
+    sys.exit(1)
+print("   ✓ estado_canon, tipo_documento_canon y banco_canon correctos")
+
+print("\n2. Construcción del índice (columnas originales y canónicas)")
+inicio = time.perf_counter()
+indice = IndiceFiltros(df)
+indice_canon = IndiceFiltros(df_canon)
+print(f"   ✓ {len(indice.columnas)} columnas indexadas en {time.perf_counter() - inicio:.3f}s")
+
+print("\n3. Valores canónicos disponibles")
+esperados = {
+    'estado': {'CONFIRMADO', 'PROCESADO', 'SIN_CONFIRMAR', 'PROCESADO_CON_ERRORES'},
+    'tipo': {'JUDICIAL', 'COACTIVO'},
+    'tipo_documento': {'Embargo', 'Desembargo', 'Requerimiento', 'No procesable'},
+}
+for clave, valores in esperados.items():
+    if set(indice.valores(clave)) != valores or set(indice_canon.valores(clave)) != valores:
+        print(f"   ✗ {clave}: {indice.valores(clave)}")
+        sys.exit(1)
+print("   ✓ Estados, tipos y tipos de documento normalizados")
+
+print("\n4. Combinaciones de filtros contra el filtrado por máscaras")
+opciones = {
+    'banco': [[], ['FALABELLA'], ['COLPATRIA', 'SANTANDER']],
+    'ciudad': [[], ['BOGOTA'], ['Cartagena', 'PASTO']],
+    'estado': [[], ['PROCESADO_CON_ERRORES'], ['CONFIRMADO', 'SIN_CONFIRMAR']],
+    'tipo': [[], ['JUDICIAL']],
+    'tipo_documento': [[], ['Desembargo'], ['Embargo', 'No procesable']],
+    'mes': [[], ['2023-02', '2024-01']],
+}
+combinaciones = 0
+for valores in itertools.product(*opciones.values()):
+    filtros = dict(zip(opciones.keys(), valores))
+    esperado = filtrar_con_mascaras(df, filtros)
+    for ind in (indice, indice_canon):
+        obtenido = ind.seleccionar(filtros)
+        obtenido = np.arange(n) if obtenido is None else obtenido
+        if not np.array_equal(esperado, obtenido):
+            print(f"   ✗ Diferencia con filtros {filtros}: {len(esperado)} vs {len(obtenido)} filas")
+            sys.exit(1)
+    combinaciones += 1
+print(f"   ✓ {combinaciones} combinaciones coinciden")
+
+print("\n5. Valores desconocidos no seleccionan filas")
+if len(indice.seleccionar({'estado': ['INEXISTENTE']})) != 0:
+    print("   ✗ Se seleccionaron filas para un estado inexistente")
+    sys.exit(1)
+print("   ✓ Selección vacía")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,119 @@
+"""
+Script de prueba para la tabla paginada del dashboard: cada página de la
+selección ordenada con los órdenes precalculados debe coincidir con la misma
+página de `sort_values(kind='stable', na_position='last')` sobre las filas
+filtradas (también con el orden descendente derivado del ascendente), el
+índice debe conservar a lo sumo `COLUMNAS_EN_CACHE` columnas, y las filas de
+una página deben ser las del DataFrame completo sin que el conjunto guarde
+columnas leídas de la tabla Arrow
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agregar la carpeta src/dashboards al path para importar los módulos
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+dashboards_dir = os.path.join(project_root, "src", "dashboards")
+sys.path.insert(0, dashboards_dir)
+
+from datos_embargos import PYARROW_AVAILABLE, ConjuntoDatos, abrir_arrow
+from paginacion_embargos import COLUMNAS_EN_CACHE, IndiceOrden, total_paginas
+
+print("="*60)
+print("TEST: Tabla paginada con órdenes precalculados")
+print("="*60)
+
+rng = np.random.default_rng(8)
+n = 200_000
+df = pd.DataFrame({
+    # Categorías en un orden que no es el alfabético
+    'ciudad': pd.Categorical(rng.choice(['PEREIRA', 'BOGOTA', 'CALI', None], n), categories=['PEREIRA', 'CALI', 'BOGOTA']),
+    'nombres': np.where(rng.random(n) < 0.05, None, rng.choice(['ANA', 'JOSÉ', 'ÁLVARO', 'PEDRO', 'ana'], n)),
+    'montoaembargar': np.where(rng.random(n) < 0.1, np.nan, rng.integers(0, 500, n).astype(float)),
+    'fecha_oficio': pd.to_datetime('2023-01-01') + pd.to_timedelta(np.where(rng.random(n) < 0.05, np.nan, rng.integers(0, 90, n)), unit='D'),
+    'es_cliente': rng.integers(0, 2, n).astype('int8'),
+})
+
+
+def pagina_esperada(posiciones, columna, descendente, numero, filas):
+    """Referencia: ordenar con pandas las filas filtradas y cortar la página."""
+    seleccion = df if posiciones is None else df.iloc[posiciones]
+    serie = seleccion[columna]
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    orden = serie.sort_values(ascending=not descendente, kind='stable', na_position='last')
+    return df.index.get_indexer(orden.index)[(numero - 1) * filas:numero * filas]
+
+
+indice = IndiceOrden(df)
+selecciones = {
+    'sin filtros': None,
+    'filtro grande': np.sort(rng.choice(n, n // 2, replace=False)),
+    'filtro pequeño': np.sort(rng.choice(n, 3_000, replace=False)),
+    'sin filas': np.empty(0, dtype=np.int64),
+}
+
+print("\n1. Páginas contra sort_values")
+for nombre, posiciones in selecciones.items():
+    total = n if posiciones is None else len(posiciones)
+    for columna in df.columns:
+        for descendente in (False, True):
+            for numero in (1, 7, total_paginas(total, 100)):
+                esperado = pagina_esperada(posiciones, columna, descendente, numero, 100)
+                obtenido = indice.pagina(posiciones, numero, 100, columna, descendente)
+                if not np.array_equal(esperado, obtenido):
+                    print(f"   ✗ {nombre} / {columna} / descendente={descendente} / página {numero}")
+                    sys.exit(1)
+    sin_orden = indice.pagina(posiciones, 2, 50)
+    if not np.array_equal(sin_orden, np.arange(n)[50:100] if posiciones is None else posiciones[50:100]):
+        print(f"   ✗ {nombre}: página sin orden")
+        sys.exit(1)
+    print(f"   ✓ {nombre}")
+if len(indice._columnas) > COLUMNAS_EN_CACHE or list(indice._columnas) != list(df.columns[-COLUMNAS_EN_CACHE:]):
+    print(f"   ✗ Columnas guardadas: {list(indice._columnas)} (a lo sumo {COLUMNAS_EN_CACHE}, las más recientes)")
+    sys.exit(1)
+print(f"   ✓ Solo se conservan las {COLUMNAS_EN_CACHE} columnas ordenadas más recientemente")
+
+print("\n2. Tiempo por página")
+posiciones = selecciones['filtro grande']
+inicio = time.perf_counter()
+for numero in range(1, 21):
+    indice.pagina(posiciones, numero, 100, 'nombres', True)
+print(f"   ✓ {(time.perf_counter() - inicio) / 20 * 1000:.1f} ms por página ordenada en {len(posiciones):,} filas")
+
+print("\n3. Filas de una página desde la tabla Arrow")
+if not PYARROW_AVAILABLE:
+    print("   - Sin pyarrow, se omite")
+else:
+    directorio = tempfile.mkdtemp()
+    try:
+        ruta = os.path.join(directorio, 'consolidado.arrow')
+        df.to_feather(ruta)
+        filas = np.arange(1, n, 3)
+        tabla, cargado = abrir_arrow(ruta, ['ciudad', 'montoaembargar'])
+        conjunto = ConjuntoDatos(cargado.iloc[filas].reset_index(drop=True), huella='prueba', tabla=tabla, filas=filas)
+        pagina = IndiceOrden(conjunto).pagina(None, 3, 100, 'fecha_oficio')
+        obtenido = conjunto.tomar(list(df.columns), pagina)
+        esperado = df.iloc[filas].reset_index(drop=True).iloc[pagina]
+        try:
+            pd.testing.assert_frame_equal(obtenido, esperado, check_dtype=False, check_categorical=False)
+        except AssertionError as e:
+            print(f"   ✗ {e}")
+            sys.exit(1)
+        # La columna de orden se lee para sus rangos, pero no queda guardada en el conjunto
+        if conjunto._perezosas:
+            print(f"   ✗ Columnas guardadas completas en el conjunto: {list(conjunto._perezosas)}")
+            sys.exit(1)
+        print("   ✓ Mismos valores, sin guardar en el conjunto columnas completas de la tabla Arrow")
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)
@@ -0,0 +1,128 @@
+"""
+Script de prueba para el reporte de ejecución: la memoria de cada sección debe
+ser la suya (memoria al entrar, pico durante la sección e incremento), no el
+pico de toda la vida del proceso, tanto reiniciando el pico del proceso (Linux)
+como muestreando la memoria residente, y el pico del reporte debe cubrir el de
+todas las secciones
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Agregar la carpeta src/pipeline_ml al path para importar el módulo
+test_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(test_dir)
+pipeline_ml_dir = os.path.join(project_root, "src", "pipeline_ml")
+sys.path.insert(0, pipeline_ml_dir)
+
+import perfilado
+from perfilado import ARCHIVO_REPORTE, RegistroSecciones, rss_actual_mb
+
+print("="*60)
+print("TEST: Memoria por sección del reporte de ejecución")
+print("="*60)
+
+MB = 1024 * 1024
+GRANDE_MB, CHICA_MB, RETENIDA_MB = 400, 20, 80
+
+
+def ocupar(mb: int, espera: float = 0.0) -> np.ndarray:
+    """Reserva y toca `mb` MB; con `espera` los mantiene ese tiempo (para el muestreo)."""
+    datos = np.ones(mb * MB // 8)
+    time.sleep(espera)
+    return datos
+
+
+def ejecutar(registro: RegistroSecciones, espera: float) -> dict:
+    """Una sección grande que libera su memoria seguida de dos chicas; devuelve las secciones por nombre."""
+    with registro.medir('total'):
+        with registro.medir('grande', filas=10):
+            grande = ocupar(GRANDE_MB, espera)
+            del grande
+        with registro.medir('chica'):
+            chica = ocupar(CHICA_MB, espera)
+            del chica
+        with registro.medir('retiene'):
+            retenida = ocupar(RETENIDA_MB, espera)
+    del retenida
+    return {s['seccion']: s for s in registro.secciones}
+
+
+def verificar(secciones: dict, modo: str, tolerancia: float) -> None:
+    errores = []
+    for nombre, esperado in [('total/grande', GRANDE_MB), ('total/chica', CHICA_MB), ('total/retiene', RETENIDA_MB)]:
+        incremento = secciones[nombre]['rss_incremento_mb']
+        if not (esperado * (1 - tolerancia) <= incremento <= esperado * (1 + tolerancia) + 5):
+            errores.append(f"{nombre}: incremento {incremento} MB, esperado ~{esperado} MB")
+    # La sección chica va después de la grande: su pico no debe arrastrar el de la grande
+    if secciones['total/chica']['rss_pico_seccion_mb'] >= secciones['total/grande']['rss_pico_seccion_mb'] - GRANDE_MB / 2:
+        errores.append("la sección chica reporta el pico de la grande")
+    if secciones['total']['rss_pico_seccion_mb'] < secciones['total/grande']['rss_pico_seccion_mb']:
+        errores.append("la sección que contiene a la grande debe incluir su pico")
+    if secciones['total/grande'].get('filas') != 10:
+        errores.append("se perdieron las filas anotadas")
+    if errores:
+        print(f"   ✗ {modo}:")
+        for error in errores:
+            print(f"     - {error}")
+        sys.exit(1)
+    incrementos = ', '.join(f"{n.split('/')[-1]} {s['rss_incremento_mb']:.0f} MB" for n, s in secciones.items())
+    print(f"   ✓ {modo}: {incrementos}")
+
+
+if rss_actual_mb() is None:
+    print("\n[OMITIDO] No se puede medir la memoria residente en esta plataforma")
+    sys.exit(0)
+
+print("\n1. Pico por sección")
+registro = RegistroSecciones()
+modo = "reiniciando VmHWM" if registro._con_reinicio else "muestreando"
+verificar(ejecutar(registro, espera=0.3), modo, tolerancia=0.1)
+
+print("\n2. Pico por sección muestreando la memoria residente")
+reiniciar_original = perfilado._reiniciar_vmhwm
+perfilado._reiniciar_vmhwm = lambda: False
+try:
+    registro = RegistroSecciones()
+    if registro._con_reinicio:
+        print("   ✗ Sin reinicio del pico se debe muestrear")
+        sys.exit(1)
+    # El muestreo ve la memoria mientras la sección la mantiene
+    verificar(ejecutar(registro, espera=8 * perfilado.INTERVALO_MUESTREO_S), "muestreando", tolerancia=0.1)
+    if registro._muestreo is not None:
+        print("   ✗ El muestreo debe detenerse al cerrar la última sección")
+        sys.exit(1)
+    print("   ✓ El muestreo se detiene al cerrar la última sección")
+finally:
+    perfilado._reiniciar_vmhwm = reiniciar_original
+
+print("\n3. Reporte")
+registro = RegistroSecciones()
+ejecutar(registro, espera=0.3)
+directorio = tempfile.mkdtemp()
+try:
+    ruta = registro.guardar_reporte(directorio)
+    if os.path.basename(ruta) != ARCHIVO_REPORTE:
+        print(f"   ✗ Reporte guardado como {os.path.basename(ruta)}")
+        sys.exit(1)
+    with open(ruta, encoding='utf-8') as f:
+        reporte = json.load(f)
+finally:
+    shutil.rmtree(directorio, ignore_errors=True)
+claves = {'rss_inicio_mb', 'rss_pico_seccion_mb', 'rss_incremento_mb'}
+if any(not claves <= set(s) or 'rss_pico_mb' in s for s in reporte['secciones']):
+    print(f"   ✗ Claves de memoria de las secciones: {sorted(reporte['secciones'][0])}")
+    sys.exit(1)
+if reporte['rss_pico_mb'] < max(s['rss_pico_seccion_mb'] for s in reporte['secciones']):
+    print(f"   ✗ El pico del reporte ({reporte['rss_pico_mb']} MB) es menor que el de una sección")
+    sys.exit(1)
+print(f"   ✓ {len(reporte['secciones'])} secciones con memoria propia; pico del proceso {reporte['rss_pico_mb']:.0f} MB")
+
+print("\n" + "="*60)
+print("[OK] Todas las verificaciones pasaron")
+print("="*60)